@@ -6,16 +6,28 @@ This package contains the AI agents that power the E-AdaptiveLearning system:
 - LearningGuideAgent: Generates personalized learning content and study plans
 - QuizMasterAgent: Creates adaptive quizzes and evaluates student responses
 - ProgressTrackerAgent: Monitors student progress and provides insights
+
+QuestionBank holds pre-generated quiz questions for the Quiz Master, and
+QuizAnalysisBatcher analyzes its completed quizzes in batches.
+
+AgentRegistry keeps one shared instance of each agent per process.
 """
 
 from .ai_tutor import AITutorAgent
 from .learning_guide import LearningGuideAgent
 from .quiz_master import QuizMasterAgent
 from .progress_tracker import ProgressTrackerAgent
+from .question_bank import QuestionBank
+from .quiz_analysis import QuizAnalysisBatcher
+from .registry import AgentRegistry, get_agent_registry
 
 __all__ = [
     'AITutorAgent',
     'LearningGuideAgent',
     'QuizMasterAgent',
-    'ProgressTrackerAgent'
+    'ProgressTrackerAgent',
+    'QuestionBank',
+    'QuizAnalysisBatcher',
+    'AgentRegistry',
+    'get_agent_registry'
 ]
\ No newline at end of file
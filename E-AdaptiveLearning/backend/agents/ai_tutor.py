@@ -1,9 +1,12 @@
 import os
-from typing import Dict, Any, List, Tuple
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import LLMChain
+import asyncio
+from typing import Dict, Any, List, Tuple, Optional
 from langchain.prompts import PromptTemplate
 from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler
+from llm.router import ModelRouter, get_model_router
+from llm.semantic_cache import get_semantic_cache
+from state import StateManager
 
 class AITutorAgent:
     """
@@ -11,21 +14,30 @@ class AITutorAgent:
     and providing personalized explanations based on the student's learning history.
     """
     
-    def __init__(self, api_key: str = None, model: str = "gemini-1.5-flash"):
+    def __init__(self, api_key: str = None, model: Optional[str] = None,
+                 db: Optional[DatabaseHandler] = None, adb: Optional[AsyncDatabaseHandler] = None,
+                 router: Optional[ModelRouter] = None):
         """
         Initialize the AI Tutor Agent.
         
         Args:
             api_key (str): Google API key
-            model (str): LLM model to use
+            model (str, optional): LLM model to use for every operation, instead of the routed tiers
+            db (DatabaseHandler, optional): Shared database handler
+            adb (AsyncDatabaseHandler, optional): Shared async database handler for the a* methods
+            router (ModelRouter, optional): Model router, defaults to the process-wide router
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        self.llm = ChatGoogleGenerativeAI(temperature=0.7, model=model, google_api_key=self.api_key)
-        self.db = DatabaseHandler()
+        self.router = router or get_model_router()
+        chain_options = {"temperature": 0.7, "model": model, "api_key": self.api_key}
+        self.db = db or DatabaseHandler()
+        self.adb = adb or AsyncDatabaseHandler()
+        self.semantic_cache = get_semantic_cache()
         
         # Create the tutor prompt template
         self.tutor_prompt = PromptTemplate(
-            input_variables=["student_id", "question", "topic", "learning_history", "difficulty_level"],
+            input_variables=["student_id", "question", "topic", "learning_history", "difficulty_level",
+                             "conversation"],
             template="""
             You are an AI Tutor specializing in {topic}. 
             
@@ -36,8 +48,12 @@ class AITutorAgent:
             
             Their learning history shows: {learning_history}
             
+            Recent conversation in this session:
+            {conversation}
+            
             Provide a personalized explanation that:
-            1. Directly addresses their question
+            1. Directly addresses their question, reading it as a follow-up to the
+               recent conversation where it refers back to it
             2. Is adjusted to their current difficulty level
             3. Connects to concepts they've already mastered
             4. Uses examples that build on their previous knowledge
@@ -48,7 +64,47 @@ class AITutorAgent:
             """
         )
         
-        self.tutor_chain = LLMChain(llm=self.llm, prompt=self.tutor_prompt)
+        self.tutor_chain = self.router.chain("ai_tutor.answer", self.tutor_prompt,
+                                             **chain_options, streamable=True)
+        
+        # Create the hint prompt template
+        self.hint_prompt = PromptTemplate(
+            input_variables=["question", "difficulty_level"],
+            template="""
+            For the following question: 
+            
+            {question}
+            
+            Provide a helpful hint that guides the student toward the answer without giving it away.
+            Tailor your hint to difficulty level: {difficulty_level} (1-5 scale).
+            """
+        )
+        
+        self.hint_chain = self.router.chain("ai_tutor.hint", self.hint_prompt, **chain_options)
+        
+        # Create the misconception prompt template
+        self.misconception_prompt = PromptTemplate(
+            input_variables=["wrong_answer", "correct_answer", "difficulty_level", "struggle_areas"],
+            template="""
+            The student provided this answer: {wrong_answer}
+            
+            The correct answer is: {correct_answer}
+            
+            The student has struggled with these concepts: {struggle_areas}
+            
+            Explain the misconception in a way that:
+            1. Is respectful and encourages further learning
+            2. Clearly identifies the specific error in their thinking
+            3. Connects the correct answer to concepts they are familiar with
+            4. Is tailored to difficulty level: {difficulty_level} (1-5 scale)
+            
+            Your explanation should help the student understand why their answer was incorrect
+            and strengthen their understanding of the concept.
+            """
+        )
+        
+        self.misconception_chain = self.router.chain("ai_tutor.misconception", self.misconception_prompt,
+                                                     **chain_options)
         
     def get_learning_history(self, student_id: str, topic: str) -> Dict[str, Any]:
         """
@@ -62,18 +118,50 @@ class AITutorAgent:
             Dict: Learning history with mastered concepts and struggle areas
         """
         # Get learning history from database
-        learning_logs = self.db.get_learning_logs(student_id, topic, limit=10)
-        quiz_results = self.db.get_quiz_results(student_id, topic, limit=10)
+        learning_logs = self.db.get_learning_logs(student_id, topic, limit=10, projection="log_subtopics")
+        quiz_results = self.db.get_quiz_results(student_id, topic, limit=10, projection="result_concepts")
         
+        return self._summarize_learning_history(learning_logs, quiz_results)
+    
+    async def aget_learning_history(self, student_id: str, topic: str) -> Dict[str, Any]:
+        """
+        Async version of get_learning_history.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The current topic of study
+            
+        Returns:
+            Dict: Learning history with mastered concepts and struggle areas
+        """
+        learning_logs, quiz_results = await asyncio.gather(
+            self.adb.get_learning_logs(student_id, topic, limit=10, projection="log_subtopics"),
+            self.adb.get_quiz_results(student_id, topic, limit=10, projection="result_concepts")
+        )
+        
+        return self._summarize_learning_history(learning_logs, quiz_results)
+    
+    @staticmethod
+    def _summarize_learning_history(learning_logs: List[Dict], quiz_results: List[Dict]) -> Dict[str, Any]:
+        """
+        Turn recent learning logs and quiz results into a learning history.
+        
+        Args:
+            learning_logs (List[Dict]): Recent learning logs
+            quiz_results (List[Dict]): Recent quiz results
+            
+        Returns:
+            Dict: Learning history with mastered concepts and struggle areas
+        """
         # Process learning history to identify mastered concepts and struggle areas
         mastered_concepts = []
         struggle_areas = []
         
         for result in quiz_results:
             if result["score"] > 80:
-                mastered_concepts.extend(result["concepts"])
+                mastered_concepts.extend(result.get("concepts", []))
             elif result["score"] < 60:
-                struggle_areas.extend(result["concepts"])
+                struggle_areas.extend(result.get("concepts", []))
         
         # Remove duplicates
         mastered_concepts = list(set(mastered_concepts))
@@ -86,7 +174,8 @@ class AITutorAgent:
             "quiz_performance": quiz_results
         }
     
-    def answer_question(self, student_id: str, question: str, topic: str) -> str:
+    def answer_question(self, student_id: str, question: str, topic: str,
+                        conversation: Optional[List[Dict[str, Any]]] = None) -> str:
         """
         Answer a specific question from a student with personalized context.
         
@@ -94,6 +183,8 @@ class AITutorAgent:
             student_id (str): Unique identifier for the student
             question (str): The student's question
             topic (str): The topic related to the question
+            conversation (List[Dict], optional): Prompt window of the session
+                (StateManager.get_prompt_window())
             
         Returns:
             str: Personalized answer to the student's question
@@ -101,25 +192,36 @@ class AITutorAgent:
         # Get student's current difficulty level
         difficulty_level = self.db.get_student_difficulty_level(student_id, topic) or 3
         
+        # Serve this student's near-duplicate questions on the same topic and level from the semantic
+        # cache, unless earlier turns may change what the question means
+        use_cache = not conversation
+        cached_answer = self.semantic_cache.lookup(student_id, topic, difficulty_level, question) if use_cache else None
+        if cached_answer is not None:
+            self.db.log_learning_interaction(
+                student_id=student_id,
+                interaction_type="question",
+                topic=topic,
+                content=question,
+                response=cached_answer
+            )
+            return cached_answer
+        
         # Get learning history
         learning_history = self.get_learning_history(student_id, topic)
         
-        # Format the learning history for the prompt
-        history_formatted = f"""
-        Mastered concepts: {', '.join(learning_history['mastered_concepts']) if learning_history['mastered_concepts'] else 'None yet'}
-        Struggle areas: {', '.join(learning_history['struggle_areas']) if learning_history['struggle_areas'] else 'None identified yet'}
-        Recent topics studied: {', '.join(learning_history['recent_topics']) if learning_history['recent_topics'] else 'Just starting'}
-        """
-        
         # Generate the response
         response = self.tutor_chain.invoke({
             "student_id": student_id,
             "question": question,
             "topic": topic,
-            "learning_history": history_formatted,
-            "difficulty_level": difficulty_level
+            "learning_history": self._format_learning_history(learning_history),
+            "difficulty_level": difficulty_level,
+            "conversation": StateManager.format_prompt_window(conversation)
         })
         
+        if use_cache:
+            self.semantic_cache.store(student_id, topic, difficulty_level, question, response['text'])
+        
         # Log this interaction
         self.db.log_learning_interaction(
             student_id=student_id,
@@ -131,6 +233,76 @@ class AITutorAgent:
         
         return response['text']
     
+    async def aanswer_question(self, student_id: str, question: str, topic: str,
+                               conversation: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Async version of answer_question.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            question (str): The student's question
+            topic (str): The topic related to the question
+            conversation (List[Dict], optional): Prompt window of the session
+                (StateManager.get_prompt_window())
+            
+        Returns:
+            str: Personalized answer to the student's question
+        """
+        difficulty_level = await self.adb.get_student_difficulty_level(student_id, topic) or 3
+        
+        use_cache = not conversation
+        cached_answer = self.semantic_cache.lookup(student_id, topic, difficulty_level, question) if use_cache else None
+        if cached_answer is not None:
+            await self.adb.log_learning_interaction(
+                student_id=student_id,
+                interaction_type="question",
+                topic=topic,
+                content=question,
+                response=cached_answer
+            )
+            return cached_answer
+        
+        learning_history = await self.aget_learning_history(student_id, topic)
+        
+        response = await self.tutor_chain.ainvoke({
+            "student_id": student_id,
+            "question": question,
+            "topic": topic,
+            "learning_history": self._format_learning_history(learning_history),
+            "difficulty_level": difficulty_level,
+            "conversation": StateManager.format_prompt_window(conversation)
+        })
+        
+        if use_cache:
+            self.semantic_cache.store(student_id, topic, difficulty_level, question, response['text'])
+        
+        await self.adb.log_learning_interaction(
+            student_id=student_id,
+            interaction_type="question",
+            topic=topic,
+            content=question,
+            response=response['text']
+        )
+        
+        return response['text']
+    
+    @staticmethod
+    def _format_learning_history(learning_history: Dict[str, Any]) -> str:
+        """
+        Format a learning history for the tutor prompt.
+        
+        Args:
+            learning_history (Dict): Output of get_learning_history
+            
+        Returns:
+            str: Learning history as prompt text
+        """
+        return f"""
+        Mastered concepts: {', '.join(learning_history['mastered_concepts']) if learning_history['mastered_concepts'] else 'None yet'}
+        Struggle areas: {', '.join(learning_history['struggle_areas']) if learning_history['struggle_areas'] else 'None identified yet'}
+        Recent topics studied: {', '.join(learning_history['recent_topics']) if learning_history['recent_topics'] else 'Just starting'}
+        """
+    
     def provide_hint(self, student_id: str, question_id: str, topic: str) -> str:
         """
         Provide a hint for a quiz question without giving away the answer.
@@ -144,7 +316,7 @@ class AITutorAgent:
             str: A helpful hint
         """
         # Get the question details
-        question_details = self.db.get_quiz_question(question_id)
+        question_details = self.db.get_quiz_question(question_id, projection="question_text")
         
         if not question_details:
             return "Sorry, I couldn't find that question."
@@ -152,23 +324,8 @@ class AITutorAgent:
         # Get student's current difficulty level
         difficulty_level = self.db.get_student_difficulty_level(student_id, topic) or 3
         
-        # Create a hint prompt
-        hint_prompt = PromptTemplate(
-            input_variables=["question", "difficulty_level"],
-            template="""
-            For the following question: 
-            
-            {question}
-            
-            Provide a helpful hint that guides the student toward the answer without giving it away.
-            Tailor your hint to difficulty level: {difficulty_level} (1-5 scale).
-            """
-        )
-        
-        hint_chain = LLMChain(llm=self.llm, prompt=hint_prompt)
-        
         # Generate the hint
-        response = hint_chain.invoke({
+        response = self.hint_chain.invoke({
             "question": question_details["question"],
             "difficulty_level": difficulty_level
         })
@@ -203,33 +360,10 @@ class AITutorAgent:
         # Get learning history
         learning_history = self.get_learning_history(student_id, topic)
         
-        # Create a misconception prompt
-        misconception_prompt = PromptTemplate(
-            input_variables=["wrong_answer", "correct_answer", "difficulty_level", "struggle_areas"],
-            template="""
-            The student provided this answer: {wrong_answer}
-            
-            The correct answer is: {correct_answer}
-            
-            The student has struggled with these concepts: {struggle_areas}
-            
-            Explain the misconception in a way that:
-            1. Is respectful and encourages further learning
-            2. Clearly identifies the specific error in their thinking
-            3. Connects the correct answer to concepts they are familiar with
-            4. Is tailored to difficulty level: {difficulty_level} (1-5 scale)
-            
-            Your explanation should help the student understand why their answer was incorrect
-            and strengthen their understanding of the concept.
-            """
-        )
-        
-        misconception_chain = LLMChain(llm=self.llm, prompt=misconception_prompt)
-        
         # Generate the explanation
         struggle_areas_str = ", ".join(learning_history["struggle_areas"]) if learning_history["struggle_areas"] else "None identified yet"
         
-        response = misconception_chain.invoke({
+        response = self.misconception_chain.invoke({
             "wrong_answer": wrong_answer,
             "correct_answer": correct_answer,
             "difficulty_level": difficulty_level,
@@ -1,9 +1,11 @@
 import os
+import asyncio
 from typing import Dict, Any, List, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler
+from llm.router import ModelRouter, get_model_router
+from state import StateManager
 
 class LearningGuideAgent:
     """
@@ -11,36 +13,47 @@ class LearningGuideAgent:
     and study materials based on the student's progress and learning goals.
     """
     
-    def __init__(self, api_key: str = None, model: str = "gemini-1.5-flash"):
+    def __init__(self, api_key: str = None, model: Optional[str] = None,
+                 db: Optional[DatabaseHandler] = None, adb: Optional[AsyncDatabaseHandler] = None,
+                 router: Optional[ModelRouter] = None):
         """
         Initialize the Learning Guide Agent.
         
         Args:
             api_key (str): Google API key
-            model (str): LLM model to use
+            model (str, optional): LLM model to use for every operation, instead of the routed tiers
+            db (DatabaseHandler, optional): Shared database handler
+            adb (AsyncDatabaseHandler, optional): Shared async database handler for the a* methods
+            router (ModelRouter, optional): Model router, defaults to the process-wide router
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        self.llm = ChatGoogleGenerativeAI(temperature=0.5, model=model, google_api_key=self.api_key)
-        self.db = DatabaseHandler()
+        self.router = router or get_model_router()
+        chain_options = {"temperature": 0.5, "model": model, "api_key": self.api_key}
+        self.db = db or DatabaseHandler()
+        self.adb = adb or AsyncDatabaseHandler()
         
         # Create the learning content prompt template
         self.content_prompt = PromptTemplate(
-            input_variables=["student_id", "topic", "subtopic", "difficulty_level", "learning_style", "previous_knowledge"],
+            input_variables=["topic", "subtopic", "difficulty_level", "learning_style", "previous_knowledge",
+                             "conversation"],
             template="""
             You are an expert Learning Guide specializing in creating personalized educational content.
             
-            Student ID: {student_id}
             Topic: {topic}
             Subtopic: {subtopic}
             Current difficulty level: {difficulty_level} (1-5 scale)
             Learning style preference: {learning_style}
             Previous knowledge: {previous_knowledge}
             
+            Recent conversation in this session:
+            {conversation}
+            
             Create a comprehensive learning module for this student that:
             
             1. Starts with a brief introduction to the subtopic
             2. Explains key concepts with clear definitions
-            3. Provides illustrative examples that match their learning style
+            3. Provides illustrative examples that match their learning style and
+               pick up what was already discussed in the conversation
             4. Includes analogies that connect to their previous knowledge
             5. Contains step-by-step explanations where appropriate
             6. Highlights important points and common misconceptions
@@ -51,7 +64,73 @@ class LearningGuideAgent:
             """
         )
         
-        self.content_chain = LLMChain(llm=self.llm, prompt=self.content_prompt)
+        self.content_chain = self.router.chain("learning_guide.content", self.content_prompt,
+                                               **chain_options, streamable=True)
+        
+        # Create study plan prompt
+        self.study_plan_prompt = PromptTemplate(
+            input_variables=["topic", "goal", "timeline", "previous_knowledge", "learning_style", "conversation"],
+            template="""
+            Create a comprehensive study plan for a student with the following:
+            
+            Topic: {topic}
+            Learning goal: {goal}
+            Timeline: {timeline}
+            Learning style: {learning_style}
+            
+            Previous knowledge:
+            {previous_knowledge}
+            
+            Recent conversation in this session:
+            {conversation}
+            
+            The study plan should:
+            1. Break down the goal into achievable milestones
+            2. Provide a week-by-week schedule of subtopics to cover
+            3. Include recommended learning activities for each subtopic
+            4. Suggest practice exercises or projects
+            5. Include checkpoints for self-assessment
+            6. Address any identified knowledge gaps as priorities, including
+               difficulties the student mentioned in the conversation
+            
+            The plan should be realistic, motivating, and tailored to the student's 
+            learning style and previous knowledge.
+            """
+        )
+        
+        self.study_plan_chain = self.router.chain("learning_guide.study_plan", self.study_plan_prompt,
+                                                  **chain_options, streamable=True)
+        
+        # Create resources prompt
+        self.resources_prompt = PromptTemplate(
+            input_variables=["topic", "subtopic", "learning_style", "difficulty_level"],
+            template="""
+            Recommend learning resources for a student studying:
+            
+            Topic: {topic}
+            Subtopic: {subtopic}
+            Learning style preference: {learning_style}
+            Difficulty level: {difficulty_level} (1-5 scale)
+            
+            Provide 5 diverse resources including:
+            - Online articles or tutorials
+            - Video content
+            - Interactive exercises
+            - Books or textbook sections
+            - Practice problems
+            
+            For each resource, include:
+            1. Title
+            2. Type (article, video, etc.)
+            3. Brief description (1-2 sentences)
+            4. Why it's appropriate for this student's learning style and level
+            
+            Format your response as a structured list with clear headings.
+            """
+        )
+        
+        self.resources_chain = self.router.chain("learning_guide.resources", self.resources_prompt,
+                                                 **chain_options)
         
     def get_student_profile(self, student_id: str) -> Dict[str, Any]:
         """
@@ -77,6 +156,28 @@ class LearningGuideAgent:
         
         return profile
     
+    async def aget_student_profile(self, student_id: str) -> Dict[str, Any]:
+        """
+        Async version of get_student_profile.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            
+        Returns:
+            Dict: Student's learning profile including preferences and history
+        """
+        profile = await self.adb.get_student_profile(student_id)
+        
+        if not profile:
+            profile = {
+                "learning_style": "balanced",
+                "difficulty_preferences": {},
+                "interests": []
+            }
+            await self.adb.create_student_profile(student_id, profile)
+        
+        return profile
+    
     def analyze_previous_knowledge(self, student_id: str, topic: str) -> Dict[str, Any]:
         """
         Analyze student's previous knowledge on the topic.
@@ -88,35 +189,53 @@ class LearningGuideAgent:
         Returns:
             Dict: Analysis of previous knowledge
         """
-        # Get learning logs and quiz results
-        learning_logs = self.db.get_learning_logs(student_id, topic, limit=20)
-        quiz_results = self.db.get_quiz_results(student_id, topic, limit=20)
-        
-        # Analyze mastered concepts, gaps, and strengths
-        subtopics_covered = set()
-        mastered_concepts = []
-        knowledge_gaps = []
+        # Subtopics covered and concepts by quiz score, aggregated server-side
+        stats = self.db.get_progress_stats(student_id, topics=[topic]).get(topic, {})
         
-        for log in learning_logs:
-            subtopics_covered.add(log["subtopic"])
-        
-        for result in quiz_results:
-            if result["score"] >= 80:
-                mastered_concepts.extend(result["concepts"])
-            elif result["score"] < 60:
-                knowledge_gaps.extend(result["concepts"])
+        return {
+            "subtopics_covered": stats.get("subtopics", []),
+            "mastered_concepts": stats.get("mastered_concepts", []),
+            "knowledge_gaps": stats.get("knowledge_gaps", [])
+        }
+    
+    async def aanalyze_previous_knowledge(self, student_id: str, topic: str) -> Dict[str, Any]:
+        """
+        Async version of analyze_previous_knowledge.
         
-        # Remove duplicates
-        mastered_concepts = list(set(mastered_concepts))
-        knowledge_gaps = list(set(knowledge_gaps))
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The topic to analyze
+            
+        Returns:
+            Dict: Analysis of previous knowledge
+        """
+        stats = (await self.adb.get_progress_stats(student_id, topics=[topic])).get(topic, {})
         
         return {
-            "subtopics_covered": list(subtopics_covered),
-            "mastered_concepts": mastered_concepts,
-            "knowledge_gaps": knowledge_gaps
+            "subtopics_covered": stats.get("subtopics", []),
+            "mastered_concepts": stats.get("mastered_concepts", []),
+            "knowledge_gaps": stats.get("knowledge_gaps", [])
         }
     
-    def generate_learning_content(self, student_id: str, topic: str, subtopic: str) -> str:
+    @staticmethod
+    def _format_previous_knowledge(previous_knowledge: Dict[str, Any]) -> str:
+        """
+        Format a previous knowledge analysis for the content and study plan prompts.
+        
+        Args:
+            previous_knowledge (Dict): Output of analyze_previous_knowledge
+            
+        Returns:
+            str: Previous knowledge as prompt text
+        """
+        return f"""
+        Subtopics already covered: {', '.join(previous_knowledge['subtopics_covered']) if previous_knowledge['subtopics_covered'] else 'None yet'}
+        Mastered concepts: {', '.join(previous_knowledge['mastered_concepts']) if previous_knowledge['mastered_concepts'] else 'None yet'}
+        Knowledge gaps: {', '.join(previous_knowledge['knowledge_gaps']) if previous_knowledge['knowledge_gaps'] else 'None identified yet'}
+        """
+    
+    def generate_learning_content(self, student_id: str, topic: str, subtopic: str,
+                                  conversation: Optional[List[Dict[str, Any]]] = None) -> str:
         """
         Generate personalized learning content for a specific subtopic.
         
@@ -124,6 +243,8 @@ class LearningGuideAgent:
             student_id (str): Unique identifier for the student
             topic (str): The main topic (e.g., "Mathematics")
             subtopic (str): The specific subtopic (e.g., "Quadratic Equations")
+            conversation (List[Dict], optional): Prompt window of the session
+                (StateManager.get_prompt_window())
             
         Returns:
             str: Personalized learning content
@@ -139,20 +260,18 @@ class LearningGuideAgent:
         previous_knowledge = self.analyze_previous_knowledge(student_id, topic)
         
         # Format previous knowledge for the prompt
-        previous_knowledge_formatted = f"""
-        Subtopics already covered: {', '.join(previous_knowledge['subtopics_covered']) if previous_knowledge['subtopics_covered'] else 'None yet'}
-        Mastered concepts: {', '.join(previous_knowledge['mastered_concepts']) if previous_knowledge['mastered_concepts'] else 'None yet'}
-        Knowledge gaps: {', '.join(previous_knowledge['knowledge_gaps']) if previous_knowledge['knowledge_gaps'] else 'None identified yet'}
-        """
+        previous_knowledge_formatted = self._format_previous_knowledge(previous_knowledge)
         
-        # Generate the learning content
+        # Generate the learning content. The prompt carries no student ID, so
+        # students with the same profile on a popular topic share cached content
+        # when they ask for it at the start of a session.
         response = self.content_chain.invoke({
-            "student_id": student_id,
             "topic": topic,
             "subtopic": subtopic,
             "difficulty_level": difficulty_level,
             "learning_style": learning_style,
-            "previous_knowledge": previous_knowledge_formatted
+            "previous_knowledge": previous_knowledge_formatted,
+            "conversation": StateManager.format_prompt_window(conversation)
         })
         
         # Log this learning session
@@ -166,7 +285,50 @@ class LearningGuideAgent:
         
         return response['text']
     
-    def create_study_plan(self, student_id: str, topic: str, goal: str, timeline: str) -> str:
+    async def agenerate_learning_content(self, student_id: str, topic: str, subtopic: str,
+                                         conversation: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Async version of generate_learning_content.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic (e.g., "Mathematics")
+            subtopic (str): The specific subtopic (e.g., "Quadratic Equations")
+            conversation (List[Dict], optional): Prompt window of the session
+                (StateManager.get_prompt_window())
+            
+        Returns:
+            str: Personalized learning content
+        """
+        # The three lookups are independent, so run them concurrently
+        profile, difficulty_level, previous_knowledge = await asyncio.gather(
+            self.aget_student_profile(student_id),
+            self.adb.get_student_difficulty_level(student_id, topic),
+            self.aanalyze_previous_knowledge(student_id, topic)
+        )
+        difficulty_level = difficulty_level or 3
+        
+        response = await self.content_chain.ainvoke({
+            "topic": topic,
+            "subtopic": subtopic,
+            "difficulty_level": difficulty_level,
+            "learning_style": profile.get("learning_style", "balanced"),
+            "previous_knowledge": self._format_previous_knowledge(previous_knowledge),
+            "conversation": StateManager.format_prompt_window(conversation)
+        })
+        
+        await self.adb.log_learning_session(
+            student_id=student_id,
+            topic=topic,
+            subtopic=subtopic,
+            difficulty_level=difficulty_level,
+            content_summary="Generated learning content"
+        )
+        
+        return response['text']
+    
+    def create_study_plan(self, student_id: str, topic: str, goal: str, timeline: str,
+                          conversation: Optional[List[Dict[str, Any]]] = None) -> str:
         """
         Create a personalized study plan based on learning goals and timeline.
         
@@ -175,6 +337,8 @@ class LearningGuideAgent:
             topic (str): The main topic for the study plan
             goal (str): The student's learning goal
             timeline (str): The timeline for completing the goal
+            conversation (List[Dict], optional): Prompt window of the session
+                (StateManager.get_prompt_window())
             
         Returns:
             str: Personalized study plan
@@ -185,49 +349,17 @@ class LearningGuideAgent:
         # Analyze previous knowledge
         previous_knowledge = self.analyze_previous_knowledge(student_id, topic)
         
-        # Create study plan prompt
-        study_plan_prompt = PromptTemplate(
-            input_variables=["topic", "goal", "timeline", "previous_knowledge", "learning_style"],
-            template="""
-            Create a comprehensive study plan for a student with the following:
-            
-            Topic: {topic}
-            Learning goal: {goal}
-            Timeline: {timeline}
-            Learning style: {learning_style}
-            
-            Previous knowledge:
-            {previous_knowledge}
-            
-            The study plan should:
-            1. Break down the goal into achievable milestones
-            2. Provide a week-by-week schedule of subtopics to cover
-            3. Include recommended learning activities for each subtopic
-            4. Suggest practice exercises or projects
-            5. Include checkpoints for self-assessment
-            6. Address any identified knowledge gaps as priorities
-            
-            The plan should be realistic, motivating, and tailored to the student's 
-            learning style and previous knowledge.
-            """
-        )
-        
-        study_plan_chain = LLMChain(llm=self.llm, prompt=study_plan_prompt)
-        
         # Format previous knowledge for the prompt
-        previous_knowledge_formatted = f"""
-        Subtopics already covered: {', '.join(previous_knowledge['subtopics_covered']) if previous_knowledge['subtopics_covered'] else 'None yet'}
-        Mastered concepts: {', '.join(previous_knowledge['mastered_concepts']) if previous_knowledge['mastered_concepts'] else 'None yet'}
-        Knowledge gaps: {', '.join(previous_knowledge['knowledge_gaps']) if previous_knowledge['knowledge_gaps'] else 'None identified yet'}
-        """
+        previous_knowledge_formatted = self._format_previous_knowledge(previous_knowledge)
         
         # Generate the study plan
-        response = study_plan_chain.invoke({
+        response = self.study_plan_chain.invoke({
             "topic": topic,
             "goal": goal,
             "timeline": timeline,
             "previous_knowledge": previous_knowledge_formatted,
-            "learning_style": profile.get("learning_style", "balanced")
+            "learning_style": profile.get("learning_style", "balanced"),
+            "conversation": StateManager.format_prompt_window(conversation)
         })
         
         # Save the study plan to the database
@@ -241,6 +373,46 @@ class LearningGuideAgent:
         
         return response['text']
     
+    async def acreate_study_plan(self, student_id: str, topic: str, goal: str, timeline: str,
+                                 conversation: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Async version of create_study_plan.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic for the study plan
+            goal (str): The student's learning goal
+            timeline (str): The timeline for completing the goal
+            conversation (List[Dict], optional): Prompt window of the session
+                (StateManager.get_prompt_window())
+            
+        Returns:
+            str: Personalized study plan
+        """
+        profile, previous_knowledge = await asyncio.gather(
+            self.aget_student_profile(student_id),
+            self.aanalyze_previous_knowledge(student_id, topic)
+        )
+        
+        response = await self.study_plan_chain.ainvoke({
+            "topic": topic,
+            "goal": goal,
+            "timeline": timeline,
+            "previous_knowledge": self._format_previous_knowledge(previous_knowledge),
+            "learning_style": profile.get("learning_style", "balanced"),
+            "conversation": StateManager.format_prompt_window(conversation)
+        })
+        
+        await self.adb.save_study_plan(
+            student_id=student_id,
+            topic=topic,
+            goal=goal,
+            timeline=timeline,
+            plan_content=response['text']
+        )
+        
+        return response['text']
+    
     def recommend_resources(self, student_id: str, topic: str, subtopic: str) -> List[Dict[str, str]]:
         """
         Recommend additional learning resources based on student's profile.
@@ -260,38 +432,9 @@ class LearningGuideAgent:
         # Get student's current difficulty level
         difficulty_level = self.db.get_student_difficulty_level(student_id, topic) or 3
         
-        # Create resources prompt
-        resources_prompt = PromptTemplate(
-            input_variables=["topic", "subtopic", "learning_style", "difficulty_level"],
-            template="""
-            Recommend learning resources for a student studying:
-            
-            Topic: {topic}
-            Subtopic: {subtopic}
-            Learning style preference: {learning_style}
-            Difficulty level: {difficulty_level} (1-5 scale)
-            
-            Provide 5 diverse resources including:
-            - Online articles or tutorials
-            - Video content
-            - Interactive exercises
-            - Books or textbook sections
-            - Practice problems
-            
-            For each resource, include:
-            1. Title
-            2. Type (article, video, etc.)
-            3. Brief description (1-2 sentences)
-            4. Why it's appropriate for this student's learning style and level
-            
-            Format your response as a structured list with clear headings.
-            """
-        )
-        
-        resources_chain = LLMChain(llm=self.llm, prompt=resources_prompt)
         
         # Generate resource recommendations
-        response = resources_chain.invoke({
+        response = self.resources_chain.invoke({
             "topic": topic,
             "subtopic": subtopic,
             "learning_style": learning_style,
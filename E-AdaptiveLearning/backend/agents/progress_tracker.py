@@ -1,10 +1,13 @@
 import os
+import asyncio
 import datetime
-from typing import Dict, Any, List, Optional, Tuple
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import LLMChain
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Awaitable, List, Optional, Tuple
 from langchain.prompts import PromptTemplate
 from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler
+from llm.router import ModelRouter, get_model_router
+import config
 
 class ProgressTrackerAgent:
     """
@@ -12,17 +15,25 @@ class ProgressTrackerAgent:
     providing insights, and adjusting the difficulty level of learning materials.
     """
     
-    def __init__(self, api_key: str = None, model: str = "gemini-1.5-flash"):
+    def __init__(self, api_key: str = None, model: Optional[str] = None,
+                 db: Optional[DatabaseHandler] = None, adb: Optional[AsyncDatabaseHandler] = None,
+                 router: Optional[ModelRouter] = None):
         """
         Initialize the Progress Tracker Agent.
         
         Args:
             api_key (str): Google API key
-            model (str): LLM model to use
+            model (str, optional): LLM model to use for every operation, instead of the routed tiers
+            db (DatabaseHandler, optional): Shared database handler
+            adb (AsyncDatabaseHandler, optional): Shared async database handler for the a* methods
+            router (ModelRouter, optional): Model router, defaults to the process-wide router
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        self.llm = ChatGoogleGenerativeAI(temperature=0.2, model=model, google_api_key=self.api_key)
-        self.db = DatabaseHandler()
+        self.router = router or get_model_router()
+        chain_options = {"temperature": 0.2, "model": model, "api_key": self.api_key}
+        self.db = db or DatabaseHandler()
+        self.adb = adb or AsyncDatabaseHandler()
+        self.max_workers = config.PROGRESS_SUMMARY_MAX_WORKERS
         
         # Create the progress analysis prompt template
         self.progress_prompt = PromptTemplate(
@@ -54,7 +65,62 @@ class ProgressTrackerAgent:
             """
         )
         
-        self.progress_chain = LLMChain(llm=self.llm, prompt=self.progress_prompt)
+        self.progress_chain = self.router.chain("progress_tracker.progress", self.progress_prompt,
+                                                **chain_options)
+        
+        # Create a pattern analysis prompt
+        self.pattern_prompt = PromptTemplate(
+            input_variables=["learning_logs", "quiz_results"],
+            template="""
+            Analyze the following student learning data to identify patterns:
+            
+            Learning activity logs:
+            {learning_logs}
+            
+            Quiz performance:
+            {quiz_results}
+            
+            Identify patterns in:
+            1. Learning session frequency and timing
+            2. Performance trends across different subtopics
+            3. Correlation between study time and quiz performance
+            4. Topics where progress is consistent vs. inconsistent
+            5. Learning style indicators based on performance patterns
+            
+            Provide data-driven insights that could help personalize the learning experience.
+            """
+        )
+        
+        self.pattern_chain = self.router.chain("progress_tracker.pattern", self.pattern_prompt,
+                                               **chain_options)
+        
+        # Generate an overall summary prompt
+        self.summary_prompt = PromptTemplate(
+            input_variables=["student_id", "overall_stats", "topic_summaries"],
+            template="""
+            Generate a comprehensive progress summary for:
+            
+            Student ID: {student_id}
+            
+            Overall statistics:
+            - Total study time: {overall_stats}
+            
+            Topic summaries:
+            {topic_summaries}
+            
+            Provide:
+            1. An executive summary of overall progress
+            2. Key achievements and milestones
+            3. Areas for improvement across topics
+            4. Cross-topic patterns and insights
+            5. Recommended next steps for continued growth
+            
+            Your summary should be encouraging, insightful, and actionable.
+            """
+        )
+        
+        self.summary_chain = self.router.chain("progress_tracker.summary", self.summary_prompt,
+                                               **chain_options)
         
     def get_learning_data(self, student_id: str, topic: str, days: int = 30) -> Tuple[List[Dict], List[Dict]]:
         """
@@ -75,19 +141,64 @@ class ProgressTrackerAgent:
         learning_logs = self.db.get_learning_logs(
             student_id=student_id, 
             topic=topic, 
-            start_date=start_date
+            start_date=start_date,
+            projection="log_timeline"
         )
         
         # Get quiz results from database
         quiz_results = self.db.get_quiz_results(
             student_id=student_id, 
             topic=topic, 
-            start_date=start_date
+            start_date=start_date,
+            projection="result_timeline"
+        )
+        
+        return learning_logs, quiz_results
+    
+    async def aget_learning_data(self, student_id: str, topic: str, days: int = 30) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Async version of get_learning_data.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic
+            days (int): Number of days to look back
+            
+        Returns:
+            Tuple[List[Dict], List[Dict]]: Learning logs and quiz results
+        """
+        start_date = datetime.datetime.now() - datetime.timedelta(days=days)
+        
+        learning_logs, quiz_results = await asyncio.gather(
+            self.adb.get_learning_logs(student_id=student_id, topic=topic, start_date=start_date,
+                                       projection="log_timeline"),
+            self.adb.get_quiz_results(student_id=student_id, topic=topic, start_date=start_date,
+                                      projection="result_timeline")
         )
         
         return learning_logs, quiz_results
     
-    def analyze_progress(self, student_id: str, topic: str, days: int = 30) -> Dict[str, Any]:
+    @staticmethod
+    def _within_days(records: List[Dict], days: int) -> List[Dict]:
+        """
+        Narrow records fetched for a longer period down to the last `days` days.
+        
+        Records are sorted newest first, so this gives the same result as
+        querying the shorter period directly.
+        
+        Args:
+            records (List[Dict]): Learning logs or quiz results
+            days (int): Number of days to keep
+            
+        Returns:
+            List[Dict]: Records from the last `days` days
+        """
+        start_date = datetime.datetime.now() - datetime.timedelta(days=days)
+        return [record for record in records
+                if not isinstance(record.get("timestamp"), datetime.datetime) or record["timestamp"] >= start_date]
+    
+    def analyze_progress(self, student_id: str, topic: str, days: int = 30,
+                         learning_data: Optional[Tuple[List[Dict], List[Dict]]] = None) -> Dict[str, Any]:
         """
         Analyze student's progress over a specific time period.
         
@@ -95,12 +206,58 @@ class ProgressTrackerAgent:
             student_id (str): Unique identifier for the student
             topic (str): The main topic
             days (int): Number of days to look back
+            learning_data (Tuple, optional): Learning logs and quiz results already fetched for this period
             
         Returns:
             Dict: Progress analysis with insights and recommendations
         """
         # Get learning data
-        learning_logs, quiz_results = self.get_learning_data(student_id, topic, days)
+        learning_logs, quiz_results = learning_data or self.get_learning_data(student_id, topic, days)
+        
+        if not learning_logs and not quiz_results:
+            return {
+                "error": "Insufficient data for analysis",
+                "message": f"No learning data found for the past {days} days."
+            }
+        
+        # Generate the progress analysis
+        response = self.progress_chain.invoke(
+            self._progress_inputs(student_id, topic, days, learning_logs, quiz_results)
+        )
+        
+        # Calculate average quiz score
+        avg_score = self._average_score(quiz_results)
+        
+        # Save progress report to database
+        report_id = self.db.save_progress_report(
+            student_id=student_id,
+            topic=topic,
+            time_period=days,
+            average_score=avg_score,
+            analysis=response['text']
+        )
+        
+        return {
+            "report_id": report_id,
+            "average_score": avg_score,
+            "analysis": response['text']
+        }
+    
+    async def aanalyze_progress(self, student_id: str, topic: str, days: int = 30,
+                                learning_data: Optional[Tuple[List[Dict], List[Dict]]] = None) -> Dict[str, Any]:
+        """
+        Async version of analyze_progress.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic
+            days (int): Number of days to look back
+            learning_data (Tuple, optional): Learning logs and quiz results already fetched for this period
+            
+        Returns:
+            Dict: Progress analysis with insights and recommendations
+        """
+        learning_logs, quiz_results = learning_data or await self.aget_learning_data(student_id, topic, days)
         
         if not learning_logs and not quiz_results:
             return {
@@ -108,6 +265,41 @@ class ProgressTrackerAgent:
                 "message": f"No learning data found for the past {days} days."
             }
         
+        response = await self.progress_chain.ainvoke(
+            self._progress_inputs(student_id, topic, days, learning_logs, quiz_results)
+        )
+        avg_score = self._average_score(quiz_results)
+        
+        report_id = await self.adb.save_progress_report(
+            student_id=student_id,
+            topic=topic,
+            time_period=days,
+            average_score=avg_score,
+            analysis=response['text']
+        )
+        
+        return {
+            "report_id": report_id,
+            "average_score": avg_score,
+            "analysis": response['text']
+        }
+    
+    @staticmethod
+    def _progress_inputs(student_id: str, topic: str, days: int,
+                         learning_logs: List[Dict], quiz_results: List[Dict]) -> Dict[str, Any]:
+        """
+        Build the progress analysis prompt inputs.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic
+            days (int): Number of days covered
+            learning_logs (List[Dict]): Learning logs for the period
+            quiz_results (List[Dict]): Quiz results for the period
+            
+        Returns:
+            Dict: Inputs for progress_chain
+        """
         # Format learning history for the prompt
         learning_history = ""
         for log in learning_logs:
@@ -124,35 +316,30 @@ class ProgressTrackerAgent:
             score = result.get("score", 0)
             quiz_results_formatted += f"- {date}: Quiz on {subtopic} - Score: {score}%\n"
         
-        # Generate the progress analysis
-        response = self.progress_chain.invoke({
+        return {
             "student_id": student_id,
             "topic": topic,
             "time_period": f"Past {days} days",
             "learning_history": learning_history,
             "quiz_results": quiz_results_formatted
-        })
+        }
+    
+    @staticmethod
+    def _average_score(quiz_results: List[Dict]) -> float:
+        """
+        Calculate the average score of a list of quiz results.
         
-        # Calculate average quiz score
+        Args:
+            quiz_results (List[Dict]): Quiz results
+            
+        Returns:
+            float: Average score, 0 if there are no results
+        """
         avg_score = 0
         if quiz_results:
             total_score = sum(result.get("score", 0) for result in quiz_results)
             avg_score = total_score / len(quiz_results)
-        
-        # Save progress report to database
-        report_id = self.db.save_progress_report(
-            student_id=student_id,
-            topic=topic,
-            time_period=days,
-            average_score=avg_score,
-            analysis=response['text']
-        )
-        
-        return {
-            "report_id": report_id,
-            "average_score": avg_score,
-            "analysis": response['text']
-        }
+        return avg_score
     
     def recommend_difficulty_adjustment(self, student_id: str, topic: str) -> Dict[str, Any]:
         """
@@ -172,7 +359,8 @@ class ProgressTrackerAgent:
         recent_results = self.db.get_quiz_results(
             student_id=student_id, 
             topic=topic, 
-            limit=5
+            limit=5,
+            projection="result_scores"
         )
         
         if not recent_results:
@@ -216,19 +404,21 @@ class ProgressTrackerAgent:
             "explanation": explanation
         }
     
-    def identify_learning_pattern(self, student_id: str, topic: str) -> Dict[str, Any]:
+    def identify_learning_pattern(self, student_id: str, topic: str,
+                                  learning_data: Optional[Tuple[List[Dict], List[Dict]]] = None) -> Dict[str, Any]:
         """
         Identify patterns in the student's learning behavior and performance.
         
         Args:
             student_id (str): Unique identifier for the student
             topic (str): The main topic
+            learning_data (Tuple, optional): Learning logs and quiz results already fetched for the past 60 days
             
         Returns:
             Dict: Identified learning patterns and insights
         """
         # Get learning logs and quiz results
-        learning_logs, quiz_results = self.get_learning_data(student_id, topic, days=60)
+        learning_logs, quiz_results = learning_data or self.get_learning_data(student_id, topic, days=60)
         
         if not learning_logs and not quiz_results:
             return {
@@ -236,29 +426,67 @@ class ProgressTrackerAgent:
                 "message": "Not enough learning data available."
             }
         
-        # Create a pattern analysis prompt
-        pattern_prompt = PromptTemplate(
-            input_variables=["learning_logs", "quiz_results"],
-            template="""
-            Analyze the following student learning data to identify patterns:
-            
-            Learning activity logs:
-            {learning_logs}
-            
-            Quiz performance:
-            {quiz_results}
-            
-            Identify patterns in:
-            1. Learning session frequency and timing
-            2. Performance trends across different subtopics
-            3. Correlation between study time and quiz performance
-            4. Topics where progress is consistent vs. inconsistent
-            5. Learning style indicators based on performance patterns
+        # Generate the pattern analysis
+        response = self.pattern_chain.invoke(self._pattern_inputs(learning_logs, quiz_results))
+        
+        # Save the pattern analysis to the database
+        analysis_id = self.db.save_learning_pattern_analysis(
+            student_id=student_id,
+            topic=topic,
+            analysis=response['text']
+        )
+        
+        return {
+            "analysis_id": analysis_id,
+            "patterns": response['text']
+        }
+    
+    async def aidentify_learning_pattern(self, student_id: str, topic: str,
+                                         learning_data: Optional[Tuple[List[Dict], List[Dict]]] = None) -> Dict[str, Any]:
+        """
+        Async version of identify_learning_pattern.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic
+            learning_data (Tuple, optional): Learning logs and quiz results already fetched for the past 60 days
             
-            Provide data-driven insights that could help personalize the learning experience.
-            """
+        Returns:
+            Dict: Identified learning patterns and insights
+        """
+        learning_logs, quiz_results = learning_data or await self.aget_learning_data(student_id, topic, days=60)
+        
+        if not learning_logs and not quiz_results:
+            return {
+                "error": "Insufficient data for pattern identification",
+                "message": "Not enough learning data available."
+            }
+        
+        response = await self.pattern_chain.ainvoke(self._pattern_inputs(learning_logs, quiz_results))
+        
+        analysis_id = await self.adb.save_learning_pattern_analysis(
+            student_id=student_id,
+            topic=topic,
+            analysis=response['text']
         )
         
+        return {
+            "analysis_id": analysis_id,
+            "patterns": response['text']
+        }
+    
+    @staticmethod
+    def _pattern_inputs(learning_logs: List[Dict], quiz_results: List[Dict]) -> Dict[str, Any]:
+        """
+        Build the pattern analysis prompt inputs.
+        
+        Args:
+            learning_logs (List[Dict]): Learning logs
+            quiz_results (List[Dict]): Quiz results
+            
+        Returns:
+            Dict: Inputs for pattern_chain
+        """
         # Format learning logs for the prompt
         learning_logs_formatted = ""
         for log in learning_logs:
@@ -277,29 +505,80 @@ class ProgressTrackerAgent:
             concepts = ", ".join(result.get("concepts", []))
             quiz_results_formatted += f"- {date}: Quiz on {subtopic} - Score: {score}% (Concepts: {concepts})\n"
         
-        pattern_chain = LLMChain(llm=self.llm, prompt=pattern_prompt)
-        
-        # Generate the pattern analysis
-        response = pattern_chain.invoke({
+        return {
             "learning_logs": learning_logs_formatted,
             "quiz_results": quiz_results_formatted
-        })
+        }
+    
+    def generate_progress_summary(self, student_id: str, topic: Optional[str] = None, days: int = 30) -> Dict[str, Any]:
+        """
+        Generate a comprehensive progress summary for a student.
         
-        # Save the pattern analysis to the database
-        analysis_id = self.db.save_learning_pattern_analysis(
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str, optional): The main topic, or all topics if None
+            days (int): Number of days to look back
+            
+        Returns:
+            Dict: Progress summary with visualizations and recommendations
+        """
+        # Per-topic counts, scores and difficulty levels for the period, in one
+        # aggregation; topics without activity in the period are left out
+        start_date = datetime.datetime.now() - datetime.timedelta(days=days)
+        progress_stats = self.db.get_progress_stats(student_id, since=start_date,
+                                                    topics=[topic] if topic else None)
+        topics = list(progress_stats)
+        
+        if not topics:
+            return self._no_data_summary(student_id, days)
+        
+        # Fetch each topic's history once, for the longer of the summary period
+        # and the 60 days used by pattern analysis
+        fetch_days = max(days, 60)
+        workers = max(1, min(self.max_workers, 2 * len(topics)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fetched = list(executor.map(
+                lambda topic_name: self.get_learning_data(student_id, topic_name, fetch_days),
+                topics
+            ))
+            
+            # Run every topic's progress and pattern analyses concurrently
+            futures = {}
+            for topic_name, pattern_data in zip(topics, fetched):
+                period_data = (self._within_days(pattern_data[0], days), self._within_days(pattern_data[1], days))
+                futures[topic_name] = (
+                    executor.submit(self.analyze_progress, student_id, topic_name, days, period_data),
+                    executor.submit(self.identify_learning_pattern, student_id, topic_name, pattern_data)
+                )
+            
+            analyses = {topic_name: (progress_future.result(), pattern_future.result())
+                        for topic_name, (progress_future, pattern_future) in futures.items()}
+        
+        topic_summaries, overall_stats = self._combine_topic_analyses(progress_stats, analyses)
+        
+        # Generate the overall summary
+        response = self.summary_chain.invoke(self._summary_inputs(student_id, overall_stats, topic_summaries))
+        
+        # Save the progress summary to the database
+        summary_id = self.db.save_progress_summary(
             student_id=student_id,
-            topic=topic,
-            analysis=response['text']
+            time_period=days,
+            summary=response['text'],
+            topic_summaries=topic_summaries
         )
         
         return {
-            "analysis_id": analysis_id,
-            "patterns": response['text']
+            "summary_id": summary_id,
+            "overall_stats": overall_stats,
+            "topic_summaries": topic_summaries,
+            "overall_summary": response['text']
         }
     
-    def generate_progress_summary(self, student_id: str, topic: Optional[str] = None, days: int = 30) -> Dict[str, Any]:
+    async def agenerate_progress_summary(self, student_id: str, topic: Optional[str] = None, days: int = 30) -> Dict[str, Any]:
         """
-        Generate a comprehensive progress summary for a student.
+        Async version of generate_progress_summary. Topics are analysed
+        concurrently on the event loop instead of a thread pool, with at most
+        PROGRESS_SUMMARY_MAX_WORKERS fetches and model calls in flight.
         
         Args:
             student_id (str): Unique identifier for the student
@@ -309,16 +588,72 @@ class ProgressTrackerAgent:
         Returns:
             Dict: Progress summary with visualizations and recommendations
         """
-        # If topic is None, get all topics the student has studied
-        topics = [topic] if topic else self.db.get_student_topics(student_id)
+        start_date = datetime.datetime.now() - datetime.timedelta(days=days)
+        progress_stats = await self.adb.get_progress_stats(student_id, since=start_date,
+                                                           topics=[topic] if topic else None)
+        topics = list(progress_stats)
         
         if not topics:
-            return {
-                "error": "No learning data found",
-                "message": f"No topics found for student {student_id}."
-            }
+            return self._no_data_summary(student_id, days)
+        
+        fetch_days = max(days, 60)
+        slots = asyncio.Semaphore(max(1, self.max_workers))
+        
+        async def limited(call: Awaitable) -> Any:
+            async with slots:
+                return await call
+        
+        fetched = await asyncio.gather(*(limited(self.aget_learning_data(student_id, topic_name, fetch_days))
+                                         for topic_name in topics))
+        
+        async def analyse(topic_name: str, pattern_data: Tuple[List[Dict], List[Dict]]) -> Tuple[Dict, Dict]:
+            period_data = (self._within_days(pattern_data[0], days), self._within_days(pattern_data[1], days))
+            return await asyncio.gather(
+                limited(self.aanalyze_progress(student_id, topic_name, days, period_data)),
+                limited(self.aidentify_learning_pattern(student_id, topic_name, pattern_data))
+            )
+        
+        results = await asyncio.gather(*(analyse(topic_name, pattern_data)
+                                         for topic_name, pattern_data in zip(topics, fetched)))
+        topic_summaries, overall_stats = self._combine_topic_analyses(progress_stats, dict(zip(topics, results)))
         
-        # Generate summary for each topic
+        response = await self.summary_chain.ainvoke(self._summary_inputs(student_id, overall_stats, topic_summaries))
+        
+        summary_id = await self.adb.save_progress_summary(
+            student_id=student_id,
+            time_period=days,
+            summary=response['text'],
+            topic_summaries=topic_summaries
+        )
+        
+        return {
+            "summary_id": summary_id,
+            "overall_stats": overall_stats,
+            "topic_summaries": topic_summaries,
+            "overall_summary": response['text']
+        }
+    
+    @staticmethod
+    def _no_data_summary(student_id: str, days: int) -> Dict[str, Any]:
+        """Progress summary returned when the student has no activity in the period."""
+        return {
+            "error": "No learning data found",
+            "message": f"No learning data found for student {student_id} in the past {days} days."
+        }
+    
+    @staticmethod
+    def _combine_topic_analyses(progress_stats: Dict[str, Dict[str, Any]],
+                                analyses: Dict[str, Tuple[Dict, Dict]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Combine per-topic statistics and analyses into topic summaries and overall stats.
+        
+        Args:
+            progress_stats (Dict): Output of get_progress_stats, by topic
+            analyses (Dict): Progress analysis and pattern analysis, by topic
+            
+        Returns:
+            Tuple[Dict, Dict]: Topic summaries and overall stats
+        """
         topic_summaries = {}
         overall_stats = {
             "total_study_time": 0,
@@ -329,34 +664,24 @@ class ProgressTrackerAgent:
             "concepts_struggling": set()
         }
         
-        for topic_name in topics:
-            # Get learning data for this topic
-            learning_logs, quiz_results = self.get_learning_data(student_id, topic_name, days)
-            
-            # Skip if no data for this topic
-            if not learning_logs and not quiz_results:
-                continue
-            
-            # Analyze progress for this topic
-            progress_analysis = self.analyze_progress(student_id, topic_name, days)
+        for topic_name, (progress_analysis, learning_patterns) in analyses.items():
+            stats = progress_stats[topic_name]
             
-            # Get learning pattern insights
-            learning_patterns = self.identify_learning_pattern(student_id, topic_name)
-            
-            # Calculate stats for this topic
+            # Stats for this topic
             topic_stats = {
-                "study_sessions": len(learning_logs),
-                "study_time": sum(log.get("duration", 0) for log in learning_logs),
-                "quizzes_taken": len(quiz_results),
-                "average_score": progress_analysis.get("average_score", 0),
-                "current_difficulty": self.db.get_student_difficulty_level(student_id, topic_name) or 3
+                "study_sessions": stats["sessions"],
+                "study_time": stats["study_minutes"],
+                "quizzes_taken": stats["quizzes"],
+                "average_score": stats["average_score"],
+                "current_difficulty": stats["difficulty_level"] or 3
             }
             
             # Update overall stats
             overall_stats["total_study_time"] += topic_stats["study_time"]
             overall_stats["quizzes_taken"] += topic_stats["quizzes_taken"]
-            if quiz_results:
-                overall_stats["total_score"] += sum(result.get("score", 0) for result in quiz_results)
+            overall_stats["total_score"] += stats["average_score"] * stats["quizzes"]
+            overall_stats["concepts_mastered"].update(stats["mastered_concepts"])
+            overall_stats["concepts_struggling"].update(stats["knowledge_gaps"])
             
             # Add to topic summaries
             topic_summaries[topic_name] = {
@@ -369,31 +694,26 @@ class ProgressTrackerAgent:
         if overall_stats["quizzes_taken"] > 0:
             overall_stats["average_score"] = overall_stats["total_score"] / overall_stats["quizzes_taken"]
         
-        # Generate an overall summary prompt
-        summary_prompt = PromptTemplate(
-            input_variables=["student_id", "overall_stats", "topic_summaries"],
-            template="""
-            Generate a comprehensive progress summary for:
-            
-            Student ID: {student_id}
-            
-            Overall statistics:
-            - Total study time: {overall_stats}
-            
-            Topic summaries:
-            {topic_summaries}
-            
-            Provide:
-            1. An executive summary of overall progress
-            2. Key achievements and milestones
-            3. Areas for improvement across topics
-            4. Cross-topic patterns and insights
-            5. Recommended next steps for continued growth
-            
-            Your summary should be encouraging, insightful, and actionable.
-            """
-        )
+        # Sets are not JSON serializable
+        overall_stats["concepts_mastered"] = sorted(overall_stats["concepts_mastered"])
+        overall_stats["concepts_struggling"] = sorted(overall_stats["concepts_struggling"])
         
+        return topic_summaries, overall_stats
+    
+    @staticmethod
+    def _summary_inputs(student_id: str, overall_stats: Dict[str, Any],
+                        topic_summaries: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the overall summary prompt inputs.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            overall_stats (Dict): Overall stats from _combine_topic_analyses
+            topic_summaries (Dict): Topic summaries from _combine_topic_analyses
+            
+        Returns:
+            Dict: Inputs for summary_chain
+        """
         # Format the topic_summaries for the prompt
         topic_summaries_formatted = ""
         for topic_name, summary in topic_summaries.items():
@@ -404,26 +724,8 @@ class ProgressTrackerAgent:
             topic_summaries_formatted += f"- Average score: {summary['stats']['average_score']:.1f}%\n"
             topic_summaries_formatted += f"- Current difficulty level: {summary['stats']['current_difficulty']}\n\n"
         
-        summary_chain = LLMChain(llm=self.llm, prompt=summary_prompt)
-        
-        # Generate the overall summary
-        response = summary_chain.invoke({
+        return {
             "student_id": student_id,
             "overall_stats": f"{overall_stats['total_study_time']} minutes, {overall_stats['quizzes_taken']} quizzes, {overall_stats['average_score']:.1f}% average score",
             "topic_summaries": topic_summaries_formatted
-        })
-        
-        # Save the progress summary to the database
-        summary_id = self.db.save_progress_summary(
-            student_id=student_id,
-            time_period=days,
-            summary=response['text'],
-            topic_summaries=topic_summaries
-        )
-        
-        return {
-            "summary_id": summary_id,
-            "overall_stats": overall_stats,
-            "topic_summaries": topic_summaries,
-            "overall_summary": response['text']
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,279 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler
+from state import QuizQuestion
+
+# (topic, subtopic, difficulty_level)
+BankKey = Tuple[str, str, int]
+
+class QuestionBank:
+    """
+    Pre-generated quiz questions, stored per (topic, subtopic, difficulty,
+    concept) in the question_bank collection.
+    
+    Quizzes are assembled from the bank without a model call. Each question
+    is handed out once; a background thread tops every subtopic and
+    difficulty that has been asked for back up to depth questions per
+    concept, right after questions are taken and again every
+    refill_interval seconds.
+    """
+    
+    def __init__(self, generator: Callable[[str, str, int, str, int], List[QuizQuestion]],
+                 db: Optional[DatabaseHandler] = None, adb: Optional[AsyncDatabaseHandler] = None,
+                 enabled: bool = True, depth: int = 10, batch_size: int = 5,
+                 refill_interval: float = 300, max_keys: int = 500):
+        """
+        Initialize the question bank.
+        
+        Args:
+            generator (Callable): Generates questions for (topic, subtopic, difficulty_level, concept, count)
+            db (DatabaseHandler, optional): Database handler
+            adb (AsyncDatabaseHandler, optional): Async database handler for atake()
+            enabled (bool): If False, take() always misses and nothing is generated
+            depth (int): Questions to keep per topic, subtopic, difficulty and concept
+            batch_size (int): Questions per generation call
+            refill_interval (float): Seconds between sweeps over every tracked subtopic
+            max_keys (int): Subtopic/difficulty pairs kept topped up; least recently used ones are dropped
+        """
+        self.generator = generator
+        self.db = db or DatabaseHandler()
+        self.adb = adb or AsyncDatabaseHandler()
+        self.enabled = enabled
+        self.depth = depth
+        self.batch_size = batch_size
+        self.refill_interval = refill_interval
+        self.max_keys = max_keys
+        
+        self._keys: "OrderedDict[BankKey, None]" = OrderedDict()
+        self._dirty: "OrderedDict[BankKey, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        
+        self.quizzes = 0
+        self.full_hits = 0
+        self.misses = 0
+        self.questions_requested = 0
+        self.questions_served = 0
+        self.questions_generated = 0
+        self.refill_errors = 0
+    
+    # ==================== Quiz assembly ====================
+    
+    def take(self, topic: str, subtopic: str, difficulty_level: int,
+             concepts: List[str], count: int) -> List[QuizQuestion]:
+        """
+        Take up to count questions for a quiz out of the bank.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level of the quiz
+            concepts (List[str]): Concepts to test, highest priority first
+            count (int): Number of questions wanted
+        
+        Returns:
+            List[QuizQuestion]: The questions, fewer than count on a bank miss
+        """
+        if not self.enabled:
+            return []
+        
+        try:
+            docs = self.db.take_bank_questions(topic, subtopic, difficulty_level, concepts, count)
+        except Exception as e:
+            print(f"Error taking questions from the question bank: {e}")
+            docs = []
+        return self._served(topic, subtopic, difficulty_level, count, docs)
+    
+    async def atake(self, topic: str, subtopic: str, difficulty_level: int,
+                    concepts: List[str], count: int) -> List[QuizQuestion]:
+        """
+        Async version of take.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level of the quiz
+            concepts (List[str]): Concepts to test, highest priority first
+            count (int): Number of questions wanted
+        
+        Returns:
+            List[QuizQuestion]: The questions, fewer than count on a bank miss
+        """
+        if not self.enabled:
+            return []
+        
+        try:
+            docs = await self.adb.take_bank_questions(topic, subtopic, difficulty_level, concepts, count)
+        except Exception as e:
+            print(f"Error taking questions from the question bank: {e}")
+            docs = []
+        return self._served(topic, subtopic, difficulty_level, count, docs)
+    
+    def _served(self, topic: str, subtopic: str, difficulty_level: int, count: int,
+                docs: List[Dict[str, Any]]) -> List[QuizQuestion]:
+        """
+        Record a take() in the hit counters, schedule a refill and convert
+        the documents.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level of the quiz
+            count (int): Number of questions wanted
+            docs (List[Dict]): question_bank documents taken
+        
+        Returns:
+            List[QuizQuestion]: The questions
+        """
+        with self._lock:
+            self.quizzes += 1
+            self.questions_requested += count
+            self.questions_served += len(docs)
+            if len(docs) >= count:
+                self.full_hits += 1
+            else:
+                self.misses += 1
+        
+        self.request_refill(topic, subtopic, difficulty_level)
+        return [self._to_question(doc, difficulty_level) for doc in docs]
+    
+    @staticmethod
+    def _to_question(doc: Dict[str, Any], difficulty_level: int) -> QuizQuestion:
+        """
+        Convert a question_bank document back into a QuizQuestion.
+        
+        Args:
+            doc (Dict): question_bank document
+            difficulty_level (int): Difficulty level of the quiz
+        
+        Returns:
+            QuizQuestion: The question
+        """
+        return QuizQuestion(
+            question_text=doc["question"],
+            options=doc["options"],
+            correct_answer=doc["correct_answer"],
+            explanation=doc.get("explanation", ""),
+            concepts=doc.get("concepts", []),
+            difficulty_level=difficulty_level
+        )
+    
+    # ==================== Replenishment ====================
+    
+    def request_refill(self, topic: str, subtopic: str, difficulty_level: int) -> None:
+        """
+        Start tracking a subtopic and difficulty and top it up in the background.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level
+        """
+        if not self.enabled:
+            return
+        
+        key = (topic, subtopic, difficulty_level)
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+            self._dirty[key] = None
+        
+        self._ensure_worker()
+        self._wake.set()
+    
+    def _ensure_worker(self) -> None:
+        """
+        Start the refill thread on first use, or again in a forked child.
+        """
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        
+        with self._lock:
+            if self._pid != os.getpid():
+                self._worker = None
+                self._pid = os.getpid()
+            
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="question-bank", daemon=True)
+                self._worker.start()
+    
+    def _run(self) -> None:
+        """
+        Worker loop: refill the subtopics that were just used, or all
+        tracked ones when refill_interval passes without any.
+        """
+        while True:
+            woken = self._wake.wait(self.refill_interval)
+            self._wake.clear()
+            with self._lock:
+                keys = list(self._dirty) if woken else list(self._keys)
+                self._dirty.clear()
+            
+            for key in keys:
+                self.refill(*key)
+    
+    def refill(self, topic: str, subtopic: str, difficulty_level: int) -> int:
+        """
+        Top up every concept of a subtopic and difficulty to depth questions.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level
+        
+        Returns:
+            int: Number of questions added
+        """
+        added = 0
+        try:
+            counts = self.db.count_bank_questions(topic, subtopic, difficulty_level)
+            for concept in self.db.get_default_concepts(topic, subtopic):
+                banked = counts.get(concept, 0)
+                while banked < self.depth:
+                    questions = self.generator(topic, subtopic, difficulty_level, concept,
+                                               min(self.batch_size, self.depth - banked))
+                    if not questions:
+                        break
+                    saved = self.db.save_bank_questions(topic, subtopic, difficulty_level, concept,
+                                                        [question.model_dump(mode="json") for question in questions])
+                    banked += saved
+                    added += saved
+        except Exception as e:
+            print(f"Error refilling question bank for {topic}/{subtopic} (level {difficulty_level}): {e}")
+            with self._lock:
+                self.refill_errors += 1
+        
+        with self._lock:
+            self.questions_generated += added
+        return added
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get question bank metrics.
+        
+        Returns:
+            Dict: Hit counters, hit rates and replenishment counters
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "depth": self.depth,
+                "tracked_subtopics": len(self._keys),
+                "pending_refills": len(self._dirty),
+                "quizzes": self.quizzes,
+                "full_hits": self.full_hits,
+                "misses": self.misses,
+                "hit_rate": self.full_hits / self.quizzes if self.quizzes else 0.0,
+                "questions_requested": self.questions_requested,
+                "questions_served": self.questions_served,
+                "question_hit_rate": self.questions_served / self.questions_requested if self.questions_requested else 0.0,
+                "questions_generated": self.questions_generated,
+                "refill_errors": self.refill_errors
+            }
@@ -0,0 +1,194 @@
+import os
+import time
+import queue
+import threading
+from typing import Dict, Any, Callable, List, Optional
+from database.db_handler import DatabaseHandler
+
+class QuizAnalysisBatcher:
+    """
+    Background queue for the narrative analysis of completed quizzes.
+    
+    The quiz result is saved with its score and analysis_status "pending"
+    when the last answer comes in; the analysis is written to it later by a
+    small pool of worker threads. Each worker collects up to batch_size
+    queued quizzes (waiting at most batch_wait seconds for the batch to
+    fill up) and analyzes them with a single analyzer call, so a burst of
+    quizzes completed at the end of a class costs a few model requests
+    instead of one per quiz.
+    """
+    
+    def __init__(self, analyzer: Callable[[List[Dict[str, Any]]], Dict[str, str]],
+                 db: Optional[DatabaseHandler] = None, enabled: bool = True, batch_size: int = 8,
+                 batch_wait: float = 2.0, max_workers: int = 4, max_queued: int = 1000):
+        """
+        Initialize the batcher.
+        
+        Args:
+            analyzer (Callable): Analyzes a list of jobs in one call; returns the
+                analysis text per result_id and may leave jobs out
+            db (DatabaseHandler, optional): Database handler used to store the analyses
+            enabled (bool): If False, submit() refuses every job and callers analyze inline
+            batch_size (int): Maximum quizzes per analyzer call
+            batch_wait (float): Seconds to wait for a batch to fill up
+            max_workers (int): Concurrent analyzer calls
+            max_queued (int): Maximum queued quizzes before submit() refuses jobs
+        """
+        self.analyzer = analyzer
+        self.db = db or DatabaseHandler()
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        
+        self.queued = 0
+        self.rejected = 0
+        self.batches = 0
+        self.analyzed = 0
+        self.retried = 0
+        self.failed = 0
+        self.max_batch_latency_ms = 0.0
+    
+    def submit(self, job: Dict[str, Any]) -> bool:
+        """
+        Queue a quiz for analysis without waiting.
+        
+        Args:
+            job (Dict): result_id of the saved quiz result plus the analysis prompt
+                inputs (topic, subtopic, score, question_results)
+        
+        Returns:
+            bool: True if queued, False if batching is disabled or the queue is full
+                (the caller then analyzes the quiz itself)
+        """
+        if not self.enabled:
+            return False
+        
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        
+        with self._lock:
+            self.queued += 1
+        return True
+    
+    def _ensure_workers(self) -> None:
+        """
+        Start the worker threads on first use, or again in a forked child.
+        """
+        if len(self._workers) == self.max_workers and self._pid == os.getpid() \
+                and all(worker.is_alive() for worker in self._workers):
+            return
+        
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads and queued jobs do not survive fork()
+                self._queue = queue.Queue(maxsize=self.max_queued)
+                self._workers = []
+                self._pid = os.getpid()
+            
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._run, name=f"quiz-analysis-{len(self._workers)}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+    
+    def _run(self) -> None:
+        """
+        Worker loop: collect a batch, analyze it, repeat.
+        """
+        while True:
+            self._analyze_batch(self._next_batch())
+    
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """
+        Wait for the next batch of queued jobs.
+        
+        Returns:
+            List[Dict]: Between one and batch_size jobs
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _analyze_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Analyze a batch and store the analyses. Jobs the batched call left
+        out (or all of them, if it failed) are retried one at a time.
+        
+        Args:
+            batch (List[Dict]): Jobs to analyze
+        """
+        started = time.monotonic()
+        try:
+            analyses = self.analyzer(batch) if len(batch) > 1 else {}
+        except Exception as e:
+            print(f"Error analyzing a batch of {len(batch)} quizzes: {e}")
+            analyses = {}
+        
+        for job in batch:
+            analysis = analyses.get(job["result_id"])
+            if analysis is None:
+                if len(batch) > 1:
+                    with self._lock:
+                        self.retried += 1
+                try:
+                    analysis = self.analyzer([job]).get(job["result_id"])
+                except Exception as e:
+                    print(f"Error analyzing quiz result {job['result_id']}: {e}")
+            
+            try:
+                if analysis is None:
+                    self.db.update_quiz_result_analysis(job["result_id"], "", analysis_status="failed")
+                else:
+                    self.db.update_quiz_result_analysis(job["result_id"], analysis)
+            except Exception as e:
+                print(f"Error saving analysis of quiz result {job['result_id']}: {e}")
+                analysis = None
+            
+            with self._lock:
+                if analysis is None:
+                    self.failed += 1
+                else:
+                    self.analyzed += 1
+        
+        with self._lock:
+            self.batches += 1
+            self.max_batch_latency_ms = max(self.max_batch_latency_ms, (time.monotonic() - started) * 1000)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth and throughput counters.
+        
+        Returns:
+            Dict: Batcher statistics
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "queue_depth": self._queue.qsize(),
+                "workers": len(self._workers),
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "batches": self.batches,
+                "analyzed": self.analyzed,
+                "average_batch_size": (self.analyzed + self.failed) / self.batches if self.batches else 0.0,
+                "retried": self.retried,
+                "failed": self.failed,
+                "max_batch_latency_ms": self.max_batch_latency_ms
+            }
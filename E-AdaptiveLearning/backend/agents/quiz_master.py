@@ -1,9 +1,16 @@
 import os
-from typing import Dict, Any, List, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import LLMChain
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
 from langchain.prompts import PromptTemplate
 from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler
+import config
+from llm.router import ModelRouter, get_model_router
+from state import QuizQuestion
+from .quiz_parser import QuizFormatError, parse_quiz, parse_feedback, parse_batch_analysis, match_option, render_quiz
+from .question_bank import QuestionBank
+from .quiz_analysis import QuizAnalysisBatcher
 
 class QuizMasterAgent:
     """
@@ -11,17 +18,24 @@ class QuizMasterAgent:
     based on student's learning progress and analyzing their responses.
     """
     
-    def __init__(self, api_key: str = None, model: str = "gemini-1.5-flash"):
+    def __init__(self, api_key: str = None, model: Optional[str] = None,
+                 db: Optional[DatabaseHandler] = None, adb: Optional[AsyncDatabaseHandler] = None,
+                 router: Optional[ModelRouter] = None):
         """
         Initialize the Quiz Master Agent.
         
         Args:
             api_key (str): Google API key
-            model (str): LLM model to use
+            model (str, optional): LLM model to use for every operation, instead of the routed tiers
+            db (DatabaseHandler, optional): Shared database handler
+            adb (AsyncDatabaseHandler, optional): Shared async database handler for the a* methods
+            router (ModelRouter, optional): Model router, defaults to the process-wide router
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        self.llm = ChatGoogleGenerativeAI(temperature=0.3, model=model, google_api_key=self.api_key)
-        self.db = DatabaseHandler()
+        self.router = router or get_model_router()
+        chain_options = {"temperature": 0.3, "model": model, "api_key": self.api_key}
+        self.db = db or DatabaseHandler()
+        self.adb = adb or AsyncDatabaseHandler()
         
         # Create the quiz generation prompt template
         self.quiz_prompt = PromptTemplate(
@@ -47,13 +61,133 @@ class QuizMasterAgent:
             The questions should gradually increase in difficulty, starting with basic understanding
             and moving toward application and analysis.
             
-            Format your response as a structured list of questions with answer choices and explanations.
-            Each question should be labeled with "Question #" and include options A-D, the correct answer,
-            explanation, and concept tags.
+            Return only a JSON array, with no other text, where each question is an object with the fields:
+            - question_text: The question text
+            - options: An array of 4 options, each an object with "letter" (A-D) and "text"
+            - correct_answer: The letter of the correct option
+            - explanation: The explanation for the correct answer
+            - concepts: Array of concept tags associated with the question
+            """
+        )
+        
+        self.quiz_chain = self.router.chain("quiz_master.generate", self.quiz_prompt,
+                                            **chain_options, cacheable=False)
+        
+        # Create a repair prompt, only used when the quiz JSON fails validation
+        self.repair_prompt = PromptTemplate(
+            input_variables=["quiz_json", "error"],
+            template="""
+            The following quiz JSON is invalid: {error}
+            
+            {quiz_json}
+            
+            Return only the corrected JSON array. Each question must have question_text,
+            options (4 objects with "letter" A-D and "text"), correct_answer (one of the
+            option letters), explanation and concepts (array of strings).
+            """
+        )
+        
+        self.repair_chain = self.router.chain("quiz_master.repair", self.repair_prompt, **chain_options)
+        
+        # Create a feedback prompt; answers are graded locally and this only
+        # runs for wrong answers
+        self.evaluation_prompt = PromptTemplate(
+            input_variables=["question", "options", "correct_answer", "explanation", "student_answer"],
+            template="""
+            A student answered this multiple-choice question incorrectly.
+            
+            Question: {question}
+            Options:
+            {options}
+            Correct answer: {correct_answer}
+            Explanation: {explanation}
+            Student's answer: {student_answer}
+            
+            Format your response as a JSON object with fields:
+            - misconception: string (what the student's answer suggests they misunderstand)
+            - improvement_tip: string (a short, helpful tip for improving understanding)
             """
         )
         
-        self.quiz_chain = LLMChain(llm=self.llm, prompt=self.quiz_prompt)
+        self.evaluation_chain = self.router.chain("quiz_master.feedback", self.evaluation_prompt,
+                                                  **chain_options)
+        
+        # Create an analysis prompt
+        self.analysis_prompt = PromptTemplate(
+            input_variables=["topic", "subtopic", "score", "question_results"],
+            template="""
+            Analyze the following quiz results:
+            
+            Topic: {topic}
+            Subtopic: {subtopic}
+            Overall score: {score}%
+            
+            Question results:
+            {question_results}
+            
+            Provide:
+            1. A summary of the student's performance
+            2. Identified strengths (concepts they understood well)
+            3. Identified weaknesses (concepts they struggled with)
+            4. Specific recommendations for further study
+            5. Suggested next subtopics to explore
+            
+            Your analysis should be constructive, encouraging, and provide clear guidance
+            for improvement.
+            """
+        )
+        
+        self.analysis_chain = self.router.chain("quiz_master.analysis", self.analysis_prompt, **chain_options)
+        
+        # Create a prompt that analyzes several completed quizzes in one request
+        self.batch_analysis_prompt = PromptTemplate(
+            input_variables=["quiz_count", "quizzes"],
+            template="""
+            Analyze the results of the following {quiz_count} quizzes, each taken by a different student.
+            
+            {quizzes}
+            
+            For each quiz provide:
+            1. A summary of the student's performance
+            2. Identified strengths (concepts they understood well)
+            3. Identified weaknesses (concepts they struggled with)
+            4. Specific recommendations for further study
+            5. Suggested next subtopics to explore
+            
+            Each analysis should be constructive, encouraging, and provide clear guidance
+            for improvement.
+            
+            Return only a JSON object that maps each quiz number ("1", "2", ...) to its
+            analysis as a single string.
+            """
+        )
+        
+        self.batch_analysis_chain = self.router.chain("quiz_master.batch_analysis", self.batch_analysis_prompt,
+                                                      **chain_options, cacheable=False)
+        
+        # Narrative quiz analyses are filled in in the background, several per
+        # model call (see QUIZ_ANALYSIS_* in config.py)
+        self.analysis_batcher = QuizAnalysisBatcher(
+            analyzer=self.analyze_quiz_batch,
+            db=self.db,
+            enabled=config.FEATURES["enable_batch_quiz_analysis"],
+            batch_size=config.QUIZ_ANALYSIS_BATCH_SIZE,
+            batch_wait=config.QUIZ_ANALYSIS_BATCH_WAIT,
+            max_workers=config.QUIZ_ANALYSIS_WORKERS,
+            max_queued=config.QUIZ_ANALYSIS_MAX_QUEUED
+        )
+        
+        # Pre-generated questions, topped up in the background (see QUESTION_BANK_* in config.py)
+        self.bank = QuestionBank(
+            generator=self.generate_bank_questions,
+            db=self.db,
+            adb=self.adb,
+            enabled=config.FEATURES["enable_question_bank"],
+            depth=config.QUESTION_BANK_DEPTH,
+            batch_size=config.QUESTION_BANK_BATCH_SIZE,
+            refill_interval=config.QUESTION_BANK_REFILL_INTERVAL,
+            max_keys=config.QUESTION_BANK_MAX_KEYS
+        )
         
     def get_testable_concepts(self, student_id: str, topic: str, subtopic: str) -> List[str]:
         """
@@ -68,7 +202,7 @@ class QuizMasterAgent:
             List[str]: List of concepts to test
         """
         # Get learning history
-        learning_logs = self.db.get_learning_logs(student_id, topic, limit=10)
+        learning_logs = self.db.get_learning_logs(student_id, topic, limit=10, projection="log_subtopics")
         
         # Check if the subtopic has been studied
         subtopic_studied = any(log["subtopic"] == subtopic for log in learning_logs)
@@ -78,8 +212,52 @@ class QuizMasterAgent:
             return self.db.get_default_concepts(topic, subtopic)
         
         # Get recent quiz results to identify areas for improvement
-        quiz_results = self.db.get_quiz_results(student_id, topic, limit=10)
+        quiz_results = self.db.get_quiz_results(student_id, topic, limit=10,
+                                                projection="result_concept_scores")
+        
+        # Get all concepts for the subtopic
+        all_concepts = self.db.get_default_concepts(topic, subtopic)
+        
+        return self._prioritize_concepts(all_concepts, quiz_results)
+    
+    async def aget_testable_concepts(self, student_id: str, topic: str, subtopic: str) -> List[str]:
+        """
+        Async version of get_testable_concepts.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            
+        Returns:
+            List[str]: List of concepts to test
+        """
+        learning_logs, all_concepts = await asyncio.gather(
+            self.adb.get_learning_logs(student_id, topic, limit=10, projection="log_subtopics"),
+            self.adb.get_default_concepts(topic, subtopic)
+        )
+        
+        if not any(log["subtopic"] == subtopic for log in learning_logs):
+            return all_concepts
+        
+        quiz_results = await self.adb.get_quiz_results(student_id, topic, limit=10,
+                                                       projection="result_concept_scores")
         
+        return self._prioritize_concepts(all_concepts, quiz_results)
+    
+    @staticmethod
+    def _prioritize_concepts(all_concepts: List[str], quiz_results: List[Dict]) -> List[str]:
+        """
+        Order a subtopic's concepts for testing: weak ones first, then some
+        strong ones for reinforcement, then new ones for advancement.
+        
+        Args:
+            all_concepts (List[str]): All concepts of the subtopic
+            quiz_results (List[Dict]): Recent quiz results with concept scores
+            
+        Returns:
+            List[str]: List of concepts to test
+        """
         # Identify concepts that need reinforcement (score below 70%)
         weak_concepts = []
         strong_concepts = []
@@ -91,9 +269,6 @@ class QuizMasterAgent:
                 else:
                     strong_concepts.append(concept)
         
-        # Get all concepts for the subtopic
-        all_concepts = self.db.get_default_concepts(topic, subtopic)
-        
         # Prioritize weak concepts but include some strong ones for reinforcement
         # and some new ones for advancement
         test_concepts = []
@@ -117,82 +292,221 @@ class QuizMasterAgent:
         
         return test_concepts
     
-    def generate_quiz(self, student_id: str, topic: str, subtopic: str, question_count: int = 5) -> Dict[str, Any]:
+    def _generate_questions(self, student_id: str, topic: str, subtopic: str, difficulty_level: int,
+                            question_count: int, concepts: List[str]) -> Tuple[List[QuizQuestion], str]:
         """
-        Generate an adaptive quiz based on student's learning profile.
+        Generate quiz questions with the model.
         
         Args:
             student_id (str): Unique identifier for the student
             topic (str): The main topic
             subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level of the questions
             question_count (int): Number of questions to generate
+            concepts (List[str]): Concepts to test
             
         Returns:
-            Dict: Quiz content and metadata
+            Tuple[List[QuizQuestion], str]: Validated questions (empty if the output could
+                not be repaired) and the raw model output
         """
-        # Get student's current difficulty level
-        difficulty_level = self.db.get_student_difficulty_level(student_id, topic) or 3
-        
-        # Get concepts to test
-        concepts = self.get_testable_concepts(student_id, topic, subtopic)
-        concepts_str = ", ".join(concepts[:min(len(concepts), 10)])  # Limit to 10 concepts
-        
-        # Generate the quiz
+        # Generate the quiz as JSON in a single call
         response = self.quiz_chain.invoke({
             "student_id": student_id,
             "topic": topic,
             "subtopic": subtopic,
             "difficulty_level": difficulty_level,
             "question_count": question_count,
-            "concepts": concepts_str
+            "concepts": ", ".join(concepts[:10])  # Limit to 10 concepts
         })
         
-        # Process the raw response to extract structured questions
-        # In a real implementation, you would parse the LLM output more robustly
-        # For demo purposes, we'll simulate a parsed result
+        # Validate locally; the repair chain only runs if that fails
+        try:
+            questions = parse_quiz(response['text'], difficulty_level)
+        except QuizFormatError as e:
+            repaired = self.repair_chain.invoke({"quiz_json": response['text'], "error": str(e)})
+            questions = self._parse_repaired(repaired['text'], difficulty_level)
+        return questions[:question_count], response['text']
+    
+    async def _agenerate_questions(self, student_id: str, topic: str, subtopic: str, difficulty_level: int,
+                                   question_count: int, concepts: List[str]) -> Tuple[List[QuizQuestion], str]:
+        """Async version of _generate_questions."""
+        response = await self.quiz_chain.ainvoke({
+            "student_id": student_id,
+            "topic": topic,
+            "subtopic": subtopic,
+            "difficulty_level": difficulty_level,
+            "question_count": question_count,
+            "concepts": ", ".join(concepts[:10])  # Limit to 10 concepts
+        })
         
-        # Create a parser prompt to extract structured data from the quiz response
-        parser_prompt = PromptTemplate(
-            input_variables=["quiz_text"],
-            template="""
-            Parse the following quiz into a structured JSON format:
+        try:
+            questions = parse_quiz(response['text'], difficulty_level)
+        except QuizFormatError as e:
+            repaired = await self.repair_chain.ainvoke({"quiz_json": response['text'], "error": str(e)})
+            questions = self._parse_repaired(repaired['text'], difficulty_level)
+        return questions[:question_count], response['text']
+    
+    def generate_bank_questions(self, topic: str, subtopic: str, difficulty_level: int,
+                                concept: str, count: int) -> List[QuizQuestion]:
+        """
+        Generate questions on a single concept for the question bank.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level of the questions
+            concept (str): Concept to test
+            count (int): Number of questions to generate
             
-            {quiz_text}
+        Returns:
+            List[QuizQuestion]: Validated questions
+        """
+        questions, _ = self._generate_questions("any student", topic, subtopic, difficulty_level, count, [concept])
+        return questions
+    
+    @staticmethod
+    def _uncovered_concepts(concepts: List[str], questions: List[QuizQuestion]) -> List[str]:
+        """
+        Concepts not tested by any of the questions, or all of them if every
+        concept is already covered.
+        
+        Args:
+            concepts (List[str]): Concepts to test, highest priority first
+            questions (List[QuizQuestion]): Questions already in the quiz
             
-            Format each question as a JSON object with the following fields:
-            - question_text: The question text
-            - options: An array of 4 options, each with letter and text
-            - correct_answer: The letter of the correct option
-            - explanation: The explanation for the correct answer
-            - concepts: Array of concept tags associated with the question
+        Returns:
+            List[str]: Concepts to generate the remaining questions for
+        """
+        covered = {concept for question in questions for concept in question.concepts}
+        return [concept for concept in concepts if concept not in covered] or concepts
+    
+    def generate_quiz(self, student_id: str, topic: str, subtopic: str, question_count: int = 5) -> Dict[str, Any]:
+        """
+        Generate an adaptive quiz based on student's learning profile.
+        
+        Questions come from the question bank when it has enough for the
+        student's concepts and difficulty; only the shortfall is generated
+        on demand.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            question_count (int): Number of questions to generate
             
-            Return the result as an array of question objects in proper JSON format.
-            """
-        )
+        Returns:
+            Dict: Quiz content and metadata
+        """
+        # Get student's current difficulty level
+        difficulty_level = self.db.get_student_difficulty_level(student_id, topic) or 3
+        
+        # Get concepts to test
+        concepts = self.get_testable_concepts(student_id, topic, subtopic)
         
-        parser_chain = LLMChain(llm=self.llm, prompt=parser_prompt)
-        parsed_response = parser_chain.invoke({"quiz_text": response['text']})
+        questions = self.bank.take(topic, subtopic, difficulty_level, concepts, question_count)
+        from_bank = len(questions)
+        raw_text = ""
+        if from_bank < question_count:
+            # Bank miss: generate the rest now, for the concepts the bank could not cover
+            generated, raw_text = self._generate_questions(
+                student_id, topic, subtopic, difficulty_level, question_count - from_bank,
+                self._uncovered_concepts(concepts, questions)
+            )
+            questions += generated
+        content = render_quiz(questions) if questions else raw_text
         
-        # In a real implementation, you would parse the JSON from the response
-        # For now, we'll simulate a parsed result
         quiz_id = self.db.save_quiz(
             student_id=student_id,
             topic=topic,
             subtopic=subtopic,
             difficulty_level=difficulty_level,
-            raw_content=response['text'],
-            question_count=question_count
+            raw_content=content,
+            question_count=len(questions) or question_count
+        )
+        if questions:
+            self.db.save_quiz_questions(quiz_id, [question.model_dump(mode="json") for question in questions])
+        
+        return {
+            "quiz_id": quiz_id,
+            "content": content,
+            "question_count": len(questions) or question_count,
+            "from_bank": from_bank
+        }
+    
+    async def agenerate_quiz(self, student_id: str, topic: str, subtopic: str, question_count: int = 5) -> Dict[str, Any]:
+        """
+        Async version of generate_quiz.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            question_count (int): Number of questions to generate
+            
+        Returns:
+            Dict: Quiz content and metadata
+        """
+        difficulty_level, concepts = await asyncio.gather(
+            self.adb.get_student_difficulty_level(student_id, topic),
+            self.aget_testable_concepts(student_id, topic, subtopic)
+        )
+        difficulty_level = difficulty_level or 3
+        
+        questions = await self.bank.atake(topic, subtopic, difficulty_level, concepts, question_count)
+        from_bank = len(questions)
+        raw_text = ""
+        if from_bank < question_count:
+            generated, raw_text = await self._agenerate_questions(
+                student_id, topic, subtopic, difficulty_level, question_count - from_bank,
+                self._uncovered_concepts(concepts, questions)
+            )
+            questions += generated
+        content = render_quiz(questions) if questions else raw_text
+        
+        quiz_id = await self.adb.save_quiz(
+            student_id=student_id,
+            topic=topic,
+            subtopic=subtopic,
+            difficulty_level=difficulty_level,
+            raw_content=content,
+            question_count=len(questions) or question_count
         )
+        if questions:
+            await self.adb.save_quiz_questions(quiz_id, [question.model_dump(mode="json") for question in questions])
         
         return {
             "quiz_id": quiz_id,
-            "content": response['text']
+            "content": content,
+            "question_count": len(questions) or question_count,
+            "from_bank": from_bank
         }
     
+    @staticmethod
+    def _parse_repaired(text: str, difficulty_level: int) -> List[QuizQuestion]:
+        """
+        Parse the output of the repair chain.
+        
+        Args:
+            text (str): Repaired quiz JSON
+            difficulty_level (int): Difficulty level of the quiz
+            
+        Returns:
+            List[QuizQuestion]: Validated questions, or an empty list if the quiz is
+                still invalid (it is then stored as unstructured text)
+        """
+        try:
+            return parse_quiz(text, difficulty_level)
+        except QuizFormatError as e:
+            print(f"Error parsing generated quiz: {e}")
+            return []
+    
     def evaluate_answer(self, student_id: str, quiz_id: str, question_index: int, student_answer: str) -> Dict[str, Any]:
         """
         Evaluate a student's answer to a quiz question.
         
+        The answer is graded locally against the stored correct answer; the
+        model is only asked for misconception feedback on wrong answers.
+        
         Args:
             student_id (str): Unique identifier for the student
             quiz_id (str): The quiz identifier
@@ -202,154 +516,311 @@ class QuizMasterAgent:
         Returns:
             Dict: Evaluation result with correctness, explanation, and next steps
         """
-        # Get the quiz and question details
-        quiz = self.db.get_quiz(quiz_id)
+        # Get the stored question with its answer key
+        question = self.db.get_quiz_question_at(quiz_id, question_index, projection="question_key")
         
-        if not quiz:
-            return {"error": "Quiz not found"}
+        if not question:
+            quiz = self.db.get_quiz(quiz_id, projection={"_id": 1})
+            return {"error": "Question not found" if quiz else "Quiz not found"}
         
-        # In a real implementation, you would parse the quiz content to get the question
-        # and the correct answer. For now, we'll simulate this.
+        evaluation_result = self._grade(question, student_answer)
         
-        # Create an evaluation prompt
-        evaluation_prompt = PromptTemplate(
-            input_variables=["question", "correct_answer", "student_answer"],
-            template="""
-            Evaluate the following student response:
-            
-            Question: {question}
-            Correct answer: {correct_answer}
-            Student's answer: {student_answer}
-            
-            Provide:
-            1. Is the answer correct? (yes/no)
-            2. A brief explanation of why the answer is correct or incorrect
-            3. If incorrect, what misconception might the student have?
-            4. A helpful tip for improving understanding
-            
-            Format your response as a JSON object with fields:
-            - is_correct: boolean
-            - explanation: string
-            - misconception: string (if applicable)
-            - improvement_tip: string
-            """
+        # Feedback for wrong answers; identical wrong answers hit the response cache
+        if not evaluation_result["is_correct"]:
+            try:
+                feedback_response = self.evaluation_chain.invoke(self._feedback_inputs(question, student_answer))
+                evaluation_result.update(parse_feedback(feedback_response['text']))
+            except Exception as e:
+                print(f"Error generating answer feedback: {e}")
+        
+        # Log the student's answer
+        self.db.log_quiz_answer(
+            student_id=student_id,
+            quiz_id=quiz_id,
+            question_index=question_index,
+            student_answer=student_answer,
+            is_correct=evaluation_result["is_correct"],
+            concepts=question.get("concepts", [])
         )
         
-        # For demo purposes, we'll simulate question and correct answer
-        # In a real implementation, you would extract these from the quiz
-        question = f"Simulated question {question_index} from quiz {quiz_id}"
-        correct_answer = "A"  # Simulated correct answer
+        return evaluation_result
+    
+    async def aevaluate_answer(self, student_id: str, quiz_id: str, question_index: int, student_answer: str) -> Dict[str, Any]:
+        """
+        Async version of evaluate_answer.
         
-        evaluation_chain = LLMChain(llm=self.llm, prompt=evaluation_prompt)
+        Args:
+            student_id (str): Unique identifier for the student
+            quiz_id (str): The quiz identifier
+            question_index (int): The index of the question
+            student_answer (str): The student's answer
+            
+        Returns:
+            Dict: Evaluation result with correctness, explanation, and next steps
+        """
+        question = await self.adb.get_quiz_question_at(quiz_id, question_index, projection="question_key")
         
-        # Generate the evaluation
-        evaluation_response = evaluation_chain.invoke({
-            "question": question,
-            "correct_answer": correct_answer,
-            "student_answer": student_answer
-        })
+        if not question:
+            quiz = await self.adb.get_quiz(quiz_id, projection={"_id": 1})
+            return {"error": "Question not found" if quiz else "Quiz not found"}
         
-        # Process the evaluation response
-        # In a real implementation, you would parse the JSON response
-        # For demo purposes, we'll simulate a parsed result
-        is_correct = student_answer.upper() == correct_answer.upper()
+        evaluation_result = self._grade(question, student_answer)
         
-        evaluation_result = {
-            "is_correct": is_correct,
-            "explanation": "Simulated explanation for question " + str(question_index),
-            "misconception": "Simulated misconception" if not is_correct else None,
-            "improvement_tip": "Simulated improvement tip"
-        }
+        if not evaluation_result["is_correct"]:
+            try:
+                feedback_response = await self.evaluation_chain.ainvoke(self._feedback_inputs(question, student_answer))
+                evaluation_result.update(parse_feedback(feedback_response['text']))
+            except Exception as e:
+                print(f"Error generating answer feedback: {e}")
         
-        # Log the student's answer
-        self.db.log_quiz_answer(
+        await self.adb.log_quiz_answer(
             student_id=student_id,
             quiz_id=quiz_id,
             question_index=question_index,
             student_answer=student_answer,
-            is_correct=is_correct
+            is_correct=evaluation_result["is_correct"],
+            concepts=question.get("concepts", [])
         )
         
         return evaluation_result
     
+    @staticmethod
+    def _grade(question: Dict[str, Any], student_answer: str) -> Dict[str, Any]:
+        """
+        Grade an answer against a stored question.
+        
+        Args:
+            question (Dict): quiz_questions document with its answer key
+            student_answer (str): The student's answer (a letter or the option text)
+            
+        Returns:
+            Dict: Evaluation result with correctness, the correct answer and its explanation
+        """
+        chosen = match_option(student_answer, question.get("options", []))
+        
+        return {
+            "is_correct": chosen == question["correct_answer"],
+            "correct_answer": question["correct_answer"],
+            "explanation": question.get("explanation", "")
+        }
+    
+    @staticmethod
+    def _feedback_inputs(question: Dict[str, Any], student_answer: str) -> Dict[str, Any]:
+        """
+        Build the feedback prompt inputs for a wrong answer.
+        
+        The student's answer is normalized to the chosen option, so the same
+        wrong choice by different students renders the same prompt.
+        
+        Args:
+            question (Dict): quiz_questions document with its answer key
+            student_answer (str): The student's answer
+            
+        Returns:
+            Dict: Inputs for evaluation_chain
+        """
+        options = question.get("options", [])
+        texts = {option["letter"]: option["text"] for option in options}
+        chosen = match_option(student_answer, options)
+        
+        return {
+            "question": question["question"],
+            "options": "\n".join(f"{letter}) {text}" for letter, text in texts.items()),
+            "correct_answer": f"{question['correct_answer']}) {texts.get(question['correct_answer'], '')}",
+            "explanation": question.get("explanation", ""),
+            "student_answer": f"{chosen}) {texts[chosen]}" if chosen else student_answer.strip()
+        }
+    
+    def analyze_quiz_batch(self, jobs: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Analyze several completed quizzes in one model call.
+        
+        Args:
+            jobs (List[Dict]): result_id plus topic, subtopic, score and question_results per quiz
+            
+        Returns:
+            Dict[str, str]: Analysis text per result_id; quizzes the model left out are missing
+        """
+        if len(jobs) == 1:
+            response = self.analysis_chain.invoke(self._analysis_inputs(jobs[0]))
+            return {jobs[0]["result_id"]: response['text']}
+        
+        quizzes = "\n\n".join(
+            f"Quiz {number}:\nTopic: {job['topic']}\nSubtopic: {job['subtopic']}\n"
+            f"Overall score: {job['score']}%\nQuestion results:\n{job['question_results']}"
+            for number, job in enumerate(jobs, start=1)
+        )
+        response = self.batch_analysis_chain.invoke({"quiz_count": len(jobs), "quizzes": quizzes})
+        
+        analyses = parse_batch_analysis(response['text'], len(jobs))
+        return {jobs[index]["result_id"]: analysis for index, analysis in analyses.items()}
+    
+    def _analysis_inputs(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Inputs of the single-quiz analysis prompt, taken from a job."""
+        return {key: job[key] for key in self.analysis_prompt.input_variables}
+    
+    @staticmethod
+    def _analysis_lost(result: Dict[str, Any]) -> bool:
+        """
+        Check whether a pending analysis has waited longer than its job can
+        take, e.g. because the process that queued it was restarted.
+        
+        Args:
+            result (Dict): quiz_results document with its result_analysis fields
+            
+        Returns:
+            bool: True if the analysis should be redone
+        """
+        if result.get("analysis_status") != "pending":
+            return False
+        requested_at = result.get("analysis_requested_at") or result.get("timestamp")
+        if requested_at is None:
+            return True
+        return datetime.now() - requested_at > timedelta(seconds=config.QUIZ_ANALYSIS_PENDING_TIMEOUT)
+    
+    @staticmethod
+    def _format_result(quiz_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Turn a stored quiz result into the analyze_quiz_results response.
+        
+        Args:
+            quiz_id (str): The quiz identifier
+            result (Dict): quiz_results document
+            
+        Returns:
+            Dict: Score, analysis (None while it is pending) and analysis status
+        """
+        status = result.get("analysis_status", "ready")
+        return {
+            "quiz_id": quiz_id,
+            "score": result.get("score", 0),
+            "analysis": result.get("analysis") if status == "ready" else None,
+            "analysis_status": status,
+            "result_id": result["_id"]
+        }
+    
     def analyze_quiz_results(self, student_id: str, quiz_id: str) -> Dict[str, Any]:
         """
         Analyze the results of a completed quiz.
         
+        The score is computed and saved right away. With batched analysis
+        enabled the narrative analysis is queued and filled in later
+        (analysis_status "pending"); calling this again returns the stored
+        result, with the analysis once it is ready. The queue lives in one
+        process, so a result still pending after QUIZ_ANALYSIS_PENDING_TIMEOUT
+        is taken to be lost, like a failed one, and analyzed again here.
+        
         Args:
             student_id (str): Unique identifier for the student
             quiz_id (str): The quiz identifier
             
         Returns:
-            Dict: Analysis of quiz results with strengths, weaknesses, and recommendations
+            Dict: Score, analysis with strengths, weaknesses and recommendations, and analysis status
         """
+        existing = self.db.get_quiz_result(student_id, quiz_id, projection="result_analysis")
+        if existing and existing.get("analysis_status") != "failed":
+            if not (self._analysis_lost(existing)
+                    and self.db.claim_quiz_result_analysis(existing["_id"], existing.get("analysis_requested_at"))):
+                return self._format_result(quiz_id, existing)
+        
         # Get quiz answers and details
-        answers = self.db.get_quiz_answers(student_id, quiz_id)
-        quiz = self.db.get_quiz(quiz_id)
+        answers = self.db.get_quiz_answers(student_id, quiz_id, projection="answer_correctness")
+        quiz = self.db.get_quiz(quiz_id, projection="quiz_header")
         
         if not quiz or not answers:
             return {"error": "Quiz or answers not found"}
         
+        score, question_results = self._score_answers(answers)
+        job = {"topic": quiz["topic"], "subtopic": quiz["subtopic"], "score": round(score, 1),
+               "question_results": question_results}
+        
+        result_id = existing["_id"] if existing else None
+        if result_id is None and self.analysis_batcher.enabled:
+            result_id = self.db.save_quiz_result(student_id=student_id, quiz_id=quiz_id, score=score,
+                                                 analysis="", analysis_status="pending")
+            if self.analysis_batcher.submit({**job, "result_id": result_id}):
+                return self._format_result(quiz_id, {"_id": result_id, "score": score, "analysis_status": "pending"})
+        
+        # Analyze inline: batching is disabled, its queue is full or an earlier analysis failed or was lost
+        analysis = self.analysis_chain.invoke(self._analysis_inputs(job))['text']
+        
+        # Save quiz results to database
+        if result_id is None:
+            result_id = self.db.save_quiz_result(student_id=student_id, quiz_id=quiz_id, score=score, analysis=analysis)
+        else:
+            self.db.update_quiz_result_analysis(result_id, analysis)
+        
+        return self._format_result(quiz_id, {"_id": result_id, "score": score, "analysis": analysis})
+    
+    async def aanalyze_quiz_results(self, student_id: str, quiz_id: str) -> Dict[str, Any]:
+        """
+        Async version of analyze_quiz_results.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            quiz_id (str): The quiz identifier
+            
+        Returns:
+            Dict: Score, analysis with strengths, weaknesses and recommendations, and analysis status
+        """
+        existing = await self.adb.get_quiz_result(student_id, quiz_id, projection="result_analysis")
+        if existing and existing.get("analysis_status") != "failed":
+            if not (self._analysis_lost(existing)
+                    and await self.adb.claim_quiz_result_analysis(existing["_id"],
+                                                                  existing.get("analysis_requested_at"))):
+                return self._format_result(quiz_id, existing)
+        
+        answers, quiz = await asyncio.gather(
+            self.adb.get_quiz_answers(student_id, quiz_id, projection="answer_correctness"),
+            self.adb.get_quiz(quiz_id, projection="quiz_header")
+        )
+        
+        if not quiz or not answers:
+            return {"error": "Quiz or answers not found"}
+        
+        score, question_results = self._score_answers(answers)
+        job = {"topic": quiz["topic"], "subtopic": quiz["subtopic"], "score": round(score, 1),
+               "question_results": question_results}
+        
+        result_id = existing["_id"] if existing else None
+        if result_id is None and self.analysis_batcher.enabled:
+            result_id = await self.adb.save_quiz_result(student_id=student_id, quiz_id=quiz_id, score=score,
+                                                        analysis="", analysis_status="pending")
+            if self.analysis_batcher.submit({**job, "result_id": result_id}):
+                return self._format_result(quiz_id, {"_id": result_id, "score": score, "analysis_status": "pending"})
+        
+        analysis = (await self.analysis_chain.ainvoke(self._analysis_inputs(job)))['text']
+        
+        if result_id is None:
+            result_id = await self.adb.save_quiz_result(student_id=student_id, quiz_id=quiz_id, score=score,
+                                                        analysis=analysis)
+        else:
+            await self.adb.update_quiz_result_analysis(result_id, analysis)
+        
+        return self._format_result(quiz_id, {"_id": result_id, "score": score, "analysis": analysis})
+    
+    @staticmethod
+    def _score_answers(answers: List[Dict]) -> Tuple[float, str]:
+        """
+        Score a quiz's answers and format them for the analysis prompt.
+        
+        Args:
+            answers (List[Dict]): Logged answers with correctness
+            
+        Returns:
+            Tuple[float, str]: Score in percent and the per-question results
+        """
         # Calculate overall score
         total_questions = len(answers)
         correct_answers = sum(1 for answer in answers if answer["is_correct"])
         score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
         
-        # Create an analysis prompt
-        analysis_prompt = PromptTemplate(
-            input_variables=["topic", "subtopic", "score", "question_results"],
-            template="""
-            Analyze the following quiz results:
-            
-            Topic: {topic}
-            Subtopic: {subtopic}
-            Overall score: {score}%
-            
-            Question results:
-            {question_results}
-            
-            Provide:
-            1. A summary of the student's performance
-            2. Identified strengths (concepts they understood well)
-            3. Identified weaknesses (concepts they struggled with)
-            4. Specific recommendations for further study
-            5. Suggested next subtopics to explore
-            
-            Your analysis should be constructive, encouraging, and provide clear guidance
-            for improvement.
-            """
-        )
-        
         # Format question results for the prompt
         question_results = ""
         for i, answer in enumerate(answers):
             question_results += f"Question {i+1}: {'Correct' if answer['is_correct'] else 'Incorrect'}\n"
         
-        analysis_chain = LLMChain(llm=self.llm, prompt=analysis_prompt)
-        
-        # Generate the analysis
-        analysis_response = analysis_chain.invoke({
-            "topic": quiz["topic"],
-            "subtopic": quiz["subtopic"],
-            "score": round(score, 1),
-            "question_results": question_results
-        })
-        
-        # Save quiz results to database
-        result_id = self.db.save_quiz_result(
-            student_id=student_id,
-            quiz_id=quiz_id,
-            score=score,
-            analysis=analysis_response['text']
-        )
-        
-        # Return the analysis
-        return {
-            "quiz_id": quiz_id,
-            "score": score,
-            "analysis": analysis_response['text'],
-            "result_id": result_id
-        }
+        return score, question_results
     
     def generate_follow_up_quiz(self, student_id: str, previous_quiz_id: str) -> Dict[str, Any]:
         """
@@ -363,14 +834,14 @@ class QuizMasterAgent:
             Dict: New quiz focused on areas that need improvement
         """
         # Get previous quiz details and results
-        previous_quiz = self.db.get_quiz(previous_quiz_id)
-        previous_results = self.db.get_quiz_result(student_id, previous_quiz_id)
+        previous_quiz = self.db.get_quiz(previous_quiz_id, projection="quiz_header")
+        previous_results = self.db.get_quiz_result(student_id, previous_quiz_id, projection="result_exists")
         
         if not previous_quiz or not previous_results:
             return {"error": "Previous quiz or results not found"}
         
         # Get answers to identify weak areas
-        answers = self.db.get_quiz_answers(student_id, previous_quiz_id)
+        answers = self.db.get_quiz_answers(student_id, previous_quiz_id, projection="answer_correctness")
         
         # Identify concepts from incorrect answers
         weak_concepts = []
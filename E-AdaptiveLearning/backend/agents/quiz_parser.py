@@ -0,0 +1,198 @@
+import re
+import json
+from typing import Any, Dict, List, Optional
+from pydantic import ValidationError
+from state import QuizQuestion, DifficultyLevel
+
+class QuizFormatError(ValueError):
+    """Raised when model output cannot be turned into valid quiz questions."""
+
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*$", re.MULTILINE)
+_TRAILING_COMMA = re.compile(r",\s*([\]}])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_OPTION_LETTERS = "ABCDEFGH"
+# "B", "b)", "(B)", "B.", "Option B", optionally followed by the option text
+_CHOICE = re.compile(r"^\(?\s*(?:option\s+)?([A-H])\s*(?:[).:]\s*.*|\s*)$", re.IGNORECASE | re.DOTALL)
+
+def _load_json(text: str) -> Any:
+    """
+    Load the JSON value in a model response, fixing the common slips
+    (code fences, surrounding prose, trailing commas, smart quotes).
+    
+    Args:
+        text (str): Model response
+    
+    Returns:
+        Any: The decoded JSON value
+    
+    Raises:
+        QuizFormatError: If no JSON value can be decoded
+    """
+    cleaned = _CODE_FENCE.sub("", text)
+    starts = [index for index in (cleaned.find("["), cleaned.find("{")) if index >= 0]
+    end = max(cleaned.rfind("]"), cleaned.rfind("}"))
+    if not starts or end < min(starts):
+        raise QuizFormatError("Response contains no JSON")
+    candidate = cleaned[min(starts):end + 1]
+    
+    without_commas = _TRAILING_COMMA.sub(r"\1", candidate)
+    error = None
+    for attempt in (candidate, without_commas, without_commas.translate(_SMART_QUOTES)):
+        try:
+            return json.loads(attempt)
+        except json.JSONDecodeError as e:
+            error = error or e
+    raise QuizFormatError(f"Invalid JSON: {error}")
+
+def _normalize_options(options: Any) -> List[Dict[str, str]]:
+    """
+    Bring the option shapes models produce into QuizQuestion's {letter, text} list.
+    
+    Args:
+        options (Any): {"A": "..."} mapping, list of {letter, text} objects or list of strings
+    
+    Returns:
+        List[Dict[str, str]]: Options as {letter, text} dicts
+    """
+    if isinstance(options, dict):
+        return [{"letter": str(letter).strip().upper(), "text": str(text)} for letter, text in options.items()]
+    
+    normalized = []
+    for index, option in enumerate(options or []):
+        if isinstance(option, dict):
+            letter = option.get("letter") or _OPTION_LETTERS[index % len(_OPTION_LETTERS)]
+            normalized.append({"letter": str(letter).strip().upper(), "text": str(option.get("text", ""))})
+        else:
+            normalized.append({"letter": _OPTION_LETTERS[index % len(_OPTION_LETTERS)], "text": str(option)})
+    return normalized
+
+def parse_quiz(text: str, difficulty_level: Optional[int] = None) -> List[QuizQuestion]:
+    """
+    Parse and validate a quiz generated as JSON.
+    
+    Args:
+        text (str): Model response holding a JSON array of questions (or {"questions": [...]})
+        difficulty_level (int, optional): Difficulty level to record on the questions
+    
+    Returns:
+        List[QuizQuestion]: Validated questions
+    
+    Raises:
+        QuizFormatError: If the response is not a valid quiz
+    """
+    data = _load_json(text)
+    if isinstance(data, dict):
+        data = data.get("questions")
+    if not isinstance(data, list) or not data:
+        raise QuizFormatError("Expected a non-empty JSON array of questions")
+    
+    questions = []
+    for number, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            raise QuizFormatError(f"Question {number} is not an object")
+        
+        fields = dict(item)
+        fields["question_text"] = fields.get("question_text") or fields.get("question")
+        fields["options"] = _normalize_options(fields.get("options"))
+        fields["correct_answer"] = str(fields.get("correct_answer", "")).strip().upper()[:1]
+        fields.setdefault("explanation", "")
+        if difficulty_level in (level.value for level in DifficultyLevel):
+            fields["difficulty_level"] = difficulty_level
+        
+        try:
+            question = QuizQuestion(**{key: fields[key] for key in QuizQuestion.model_fields if key in fields})
+        except ValidationError as e:
+            raise QuizFormatError(f"Question {number}: {e}") from e
+        
+        letters = [option["letter"] for option in question.options]
+        if len(letters) < 2 or len(set(letters)) != len(letters):
+            raise QuizFormatError(f"Question {number}: needs at least two options with distinct letters")
+        if question.correct_answer not in letters:
+            raise QuizFormatError(f"Question {number}: correct_answer must be one of {', '.join(letters)}")
+        questions.append(question)
+    
+    return questions
+
+def match_option(answer: str, options: List[Dict[str, str]]) -> Optional[str]:
+    """
+    Work out which option a free-form answer picks.
+    
+    Args:
+        answer (str): The student's answer, as a letter or the option text
+        options (List[Dict[str, str]]): The question's {letter, text} options
+    
+    Returns:
+        str: The chosen option letter, or None if the answer matches no option
+    """
+    text = (answer or "").strip()
+    letters = {option["letter"] for option in options}
+    
+    match = _CHOICE.match(text)
+    if match and match.group(1).upper() in letters:
+        return match.group(1).upper()
+    
+    for option in options:
+        if text.casefold() == option["text"].strip().casefold():
+            return option["letter"]
+    return None
+
+def parse_feedback(text: str) -> Dict[str, str]:
+    """
+    Parse the misconception feedback generated for a wrong answer.
+    
+    Args:
+        text (str): Model response holding a JSON object
+    
+    Returns:
+        Dict[str, str]: The misconception and improvement_tip fields that are present
+    
+    Raises:
+        QuizFormatError: If the response is not a JSON object
+    """
+    data = _load_json(text)
+    if not isinstance(data, dict):
+        raise QuizFormatError("Expected a JSON object")
+    return {key: str(data[key]) for key in ("misconception", "improvement_tip") if data.get(key)}
+
+def parse_batch_analysis(text: str, count: int) -> Dict[int, str]:
+    """
+    Parse the analyses of several quizzes generated in one response.
+    
+    Args:
+        text (str): Model response holding a JSON object keyed by quiz number ("1", "2", ...)
+        count (int): Number of quizzes in the batch
+    
+    Returns:
+        Dict[int, str]: Analysis text per zero-based quiz position; quizzes the
+            response left out are missing
+    
+    Raises:
+        QuizFormatError: If the response is not a JSON object
+    """
+    data = _load_json(text)
+    if not isinstance(data, dict):
+        raise QuizFormatError("Expected a JSON object")
+    
+    analyses = {}
+    for key, analysis in data.items():
+        number = str(key).strip().lower().removeprefix("quiz").strip()
+        if number.isdigit() and 1 <= int(number) <= count and analysis:
+            analyses[int(number) - 1] = analysis if isinstance(analysis, str) else json.dumps(analysis)
+    return analyses
+
+def render_quiz(questions: List[QuizQuestion]) -> str:
+    """
+    Render questions for the student, without answers or explanations.
+    
+    Args:
+        questions (List[QuizQuestion]): Validated questions
+    
+    Returns:
+        str: The quiz as text
+    """
+    blocks = []
+    for number, question in enumerate(questions, start=1):
+        lines = [f"Question {number}: {question.question_text}"]
+        lines.extend(f"{option['letter']}) {option['text']}" for option in question.options)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
@@ -0,0 +1,109 @@
+import os
+import threading
+from typing import Dict, Any, Optional
+from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler
+from .ai_tutor import AITutorAgent
+from .learning_guide import LearningGuideAgent
+from .quiz_master import QuizMasterAgent
+from .progress_tracker import ProgressTrackerAgent
+
+class AgentRegistry:
+    """
+    Process-wide pool of agents.
+    
+    Each agent type is built lazily on first use and then shared by every
+    Flask route and the LangGraph workflow, so the LLM client, prompt
+    templates, chains and database handler are only constructed once per
+    worker process.
+    """
+    
+    AGENT_TYPES = {
+        "ai_tutor": AITutorAgent,
+        "learning_guide": LearningGuideAgent,
+        "quiz_master": QuizMasterAgent,
+        "progress_tracker": ProgressTrackerAgent
+    }
+    
+    def __init__(self, api_key: Optional[str] = None, db: Optional[DatabaseHandler] = None,
+                 adb: Optional[AsyncDatabaseHandler] = None):
+        """
+        Initialize the agent registry.
+        
+        Args:
+            api_key (str, optional): Google API key shared by all agents
+            db (DatabaseHandler, optional): Database handler shared by all agents
+            adb (AsyncDatabaseHandler, optional): Async database handler shared by all agents
+        """
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self.db = db or DatabaseHandler()
+        self.adb = adb or AsyncDatabaseHandler()
+        self._agents: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, agent_name: str) -> Any:
+        """
+        Get the shared instance of an agent, building it on first use.
+        
+        Args:
+            agent_name (str): One of the keys of AGENT_TYPES
+        
+        Returns:
+            Any: The shared agent instance
+        """
+        agent = self._agents.get(agent_name)
+        if agent is not None:
+            return agent
+        
+        if agent_name not in self.AGENT_TYPES:
+            raise KeyError(f"Unknown agent: {agent_name}")
+        
+        with self._lock:
+            # Another thread may have built the agent while we were waiting
+            agent = self._agents.get(agent_name)
+            if agent is None:
+                agent = self.AGENT_TYPES[agent_name](api_key=self.api_key, db=self.db, adb=self.adb)
+                self._agents[agent_name] = agent
+        return agent
+    
+    def warm_up(self) -> None:
+        """Build every agent up front, e.g. right after a worker starts."""
+        for agent_name in self.AGENT_TYPES:
+            self.get(agent_name)
+    
+    @property
+    def ai_tutor(self) -> AITutorAgent:
+        """Shared AI Tutor agent."""
+        return self.get("ai_tutor")
+    
+    @property
+    def learning_guide(self) -> LearningGuideAgent:
+        """Shared Learning Guide agent."""
+        return self.get("learning_guide")
+    
+    @property
+    def quiz_master(self) -> QuizMasterAgent:
+        """Shared Quiz Master agent."""
+        return self.get("quiz_master")
+    
+    @property
+    def progress_tracker(self) -> ProgressTrackerAgent:
+        """Shared Progress Tracker agent."""
+        return self.get("progress_tracker")
+
+_registry: Optional[AgentRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_agent_registry() -> AgentRegistry:
+    """
+    Get the process-wide agent registry.
+    
+    Returns:
+        AgentRegistry: Singleton instance of AgentRegistry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AgentRegistry()
+    return _registry
@@ -0,0 +1,556 @@
+import os
+import json
+import asyncio
+from datetime import datetime, timedelta
+from quart import Quart, request, jsonify, render_template, session, make_response
+
+from database.connection import get_db_connection
+from database.indexes import ensure_indexes
+from database.write_behind import get_write_behind_queue
+import config
+from state import StateManager, HistoryPolicy, LearningMode, DifficultyLevel
+from langgraph_workflow import get_learning_workflow
+from agents.registry import get_agent_registry
+from llm.cache import get_llm_cache
+from llm.semantic_cache import get_semantic_cache
+from llm.summarizer import get_history_summarizer
+from llm.router import get_model_router
+from llm.resilience import ModelCallError, CircuitOpenError, get_resilient_invoker
+from session_store import get_session_store, SessionConflictError
+
+# ASGI variant of flask_api: the same routes and JSON contracts, served by
+# Quart so LLM and database waits do not hold a worker thread.
+# Run with e.g.: hypercorn asgi_api:app --bind 0.0.0.0:5000
+app = Quart(__name__,
+            static_folder="../frontend/static",
+            template_folder="../frontend/templates")
+
+# Set up session configuration (the session cookie is compatible with flask_api's)
+app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
+app.config["SESSION_PERMANENT"] = True
+app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=7)
+
+# Shared agent pool; routes and the workflow use the same agent instances
+agents = get_agent_registry()
+
+# Async database handler shared with the agents' a* methods
+adb = agents.adb
+
+# Initialize the learning workflow
+learning_workflow = get_learning_workflow()
+
+# Bounded, expiring store of session state (see SESSION_STORE_* in config.py)
+session_store = get_session_store()
+
+# Sliding-window conversation history; older messages are summarized in the background
+StateManager.default_history_policy = HistoryPolicy(
+    max_turns=config.HISTORY_MAX_TURNS,
+    max_chars=config.HISTORY_MAX_CHARS,
+    summary_max_chars=config.HISTORY_SUMMARY_MAX_CHARS
+)
+if config.FEATURES["enable_history_summary"]:
+    StateManager.summarizer = get_history_summarizer()
+
+@app.before_serving
+async def startup():
+    """Create indexes and replay spilled log documents, as flask_api does at import"""
+    # Make sure the indexes behind the handler queries exist (idempotent)
+    try:
+        await asyncio.to_thread(ensure_indexes)
+    except Exception as e:
+        print(f"Could not ensure MongoDB indexes: {e}")
+    
+    # Re-insert log documents spilled to disk while MongoDB was unavailable
+    try:
+        replayed = await asyncio.to_thread(get_write_behind_queue().replay_spill)
+        if replayed:
+            print(f"Replayed {replayed} spilled log documents")
+    except Exception as e:
+        print(f"Could not replay spilled log documents: {e}")
+
+@app.route('/')
+async def index():
+    """Render the main chatbot interface"""
+    return await render_template('index.html')
+
+@app.route('/dashboard')
+async def dashboard():
+    """Render the progress dashboard"""
+    return await render_template('dashboard.html')
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    """API health check endpoint"""
+    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+
+@app.route('/api/db/pool', methods=['GET'])
+async def db_pool_stats():
+    """MongoDB connection pool utilisation and write-behind queue depth"""
+    stats = get_db_connection().get_pool_stats()
+    stats["write_behind"] = get_write_behind_queue().get_stats()
+    return jsonify(stats)
+
+@app.route('/api/cache/stats', methods=['GET'])
+async def cache_stats():
+    """LLM response and semantic cache hit/miss counters"""
+    stats = get_llm_cache().get_stats()
+    stats["semantic"] = get_semantic_cache().get_stats()
+    return jsonify(stats)
+
+@app.route('/api/models/stats', methods=['GET'])
+async def model_stats():
+    """Per-tier load, per-operation model latency and estimated cost, retries and circuit states"""
+    stats = get_model_router().get_stats()
+    stats["resilience"] = get_resilient_invoker().get_stats()
+    return jsonify(stats)
+
+@app.errorhandler(ModelCallError)
+async def model_unavailable(error):
+    """Answer with 503 when the models failed or their circuits are open"""
+    response = jsonify({"error": "The AI model is temporarily unavailable, please try again shortly"})
+    response.status_code = 503
+    if isinstance(error, CircuitOpenError):
+        response.headers["Retry-After"] = str(max(int(error.retry_after + 0.999), 1))
+    return response
+
+@app.errorhandler(SessionConflictError)
+async def session_conflict(error):
+    """Answer with 409 when another request saved the session first"""
+    return jsonify({"error": "The session was changed by another request, please try again"}), 409
+
+@app.route('/api/session/stats', methods=['GET'])
+async def session_stats():
+    """Live sessions, evictions and stored bytes of the session store"""
+    return jsonify(session_store.get_stats())
+
+@app.route('/api/quiz/bank/stats', methods=['GET'])
+async def question_bank_stats():
+    """Question bank hit rate and replenishment counters"""
+    return jsonify(agents.quiz_master.bank.get_stats())
+
+@app.route('/api/quiz/analysis/stats', methods=['GET'])
+async def quiz_analysis_stats():
+    """Batched quiz analysis queue depth and throughput counters"""
+    return jsonify(agents.quiz_master.analysis_batcher.get_stats())
+
+@app.route('/api/session', methods=['POST'])
+async def create_session():
+    """Create a new learning session for a student"""
+    data = await request.get_json()
+    student_id = data.get('student_id')
+    
+    if not student_id:
+        return jsonify({"error": "Student ID is required"}), 400
+    
+    # Check if student exists, create if not
+    student = await adb.get_student_profile(student_id)
+    if not student:
+        # Create a basic profile for new students
+        await adb.create_student_profile(student_id, {
+            "name": data.get('name', f"Student {student_id}"),
+            "learning_style": "balanced",
+            "difficulty_preferences": {},
+            "interests": []
+        })
+    
+    # Create a new state manager for this session
+    session_id = f"session_{student_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    state_manager = StateManager(student_id)
+    
+    # Store session ID in the cookie session
+    session['session_id'] = session_id
+    session['student_id'] = student_id
+    
+    # Log this session start
+    topic = data.get('topic')
+    subtopic = data.get('subtopic')
+    if topic:
+        # Create a learning session in the database
+        log_id = await adb.log_learning_session(
+            student_id=student_id,
+            topic=topic,
+            subtopic=subtopic or "general",
+            difficulty_level=data.get('difficulty_level', 3),
+            content_summary="Session started"
+        )
+        
+        # Update state manager with the topic and session ID
+        state_manager.start_learning_session(
+            topic=topic,
+            subtopic=subtopic or "general",
+            difficulty_level=DifficultyLevel(data.get('difficulty_level', 3)),
+            learning_mode=LearningMode(data.get('learning_mode', 'exploration')),
+            session_id=log_id
+        )
+    
+    session_store.save(session_id, state_manager)
+    
+    return jsonify({
+        "session_id": session_id,
+        "student_id": student_id,
+        "message": "Session created successfully"
+    })
+
+@app.route('/api/message', methods=['POST'])
+async def process_message():
+    """Process a user message and return the AI response"""
+    data = await request.get_json()
+    message = data.get('message')
+    session_id = data.get('session_id') or session.get('session_id')
+    student_id = data.get('student_id') or session.get('student_id')
+    
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+    
+    if not student_id:
+        return jsonify({"error": "Student ID is required"}), 400
+    
+    if not session_id:
+        return jsonify({"error": "Session not found or expired, create a new one with /api/session"}), 404
+    
+    # Messages of one session are processed one at a time, each on the state the previous one saved
+    async with session_store.alock(session_id):
+        state_manager = session_store.get(session_id)
+        if not state_manager:
+            return jsonify({"error": "Session not found or expired, create a new one with /api/session"}), 404
+        
+        # Process the message through the workflow
+        result = await learning_workflow.aprocess(
+            student_id=student_id,
+            message=message,
+            state_manager=state_manager
+        )
+        session_store.save(session_id, state_manager)
+    
+    # Format the response
+    return jsonify({
+        "response": result["response"],
+        "state": result["state"]
+    })
+
+@app.route('/api/message/stream', methods=['POST'])
+async def stream_message():
+    """Process a user message, streaming progress and answer tokens as Server-Sent Events"""
+    data = await request.get_json()
+    message = data.get('message')
+    session_id = data.get('session_id') or session.get('session_id')
+    student_id = data.get('student_id') or session.get('student_id')
+    
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+    
+    if not student_id:
+        return jsonify({"error": "Student ID is required"}), 400
+    
+    # Get state manager for this session
+    state_manager = session_store.get(session_id) if session_id else None
+    if not state_manager:
+        return jsonify({"error": "Session not found or expired, create a new one with /api/session"}), 404
+    
+    async def generate():
+        # Hold the session for the whole turn and reload it, so a message sent
+        # while another was streaming sees that one's answer. Closing the
+        # event stream inside the lock waits for an abandoned run to stop.
+        async with session_store.alock(session_id):
+            current_state = session_store.get(session_id) or state_manager
+            events = learning_workflow.aprocess_stream(
+                student_id=student_id,
+                message=message,
+                state_manager=current_state
+            )
+            try:
+                async for event in events:
+                    if event["event"] == "done":
+                        # Persist the final answer before telling the client we are done
+                        try:
+                            session_store.save(session_id, current_state)
+                        except SessionConflictError as e:
+                            event = {"event": "error", "error": str(e)}
+                    yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n".encode("utf-8")
+            finally:
+                await events.aclose()
+    
+    response = await make_response(generate(), {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    # Long generations must not hit Quart's default response timeout
+    response.timeout = None
+    return response
+
+@app.route('/api/quiz/generate', methods=['POST'])
+async def generate_quiz():
+    """Generate a quiz for a student"""
+    data = await request.get_json()
+    student_id = data.get('student_id') or session.get('student_id')
+    topic = data.get('topic')
+    subtopic = data.get('subtopic')
+    question_count = data.get('question_count', 5)
+    
+    if not student_id:
+        return jsonify({"error": "Student ID is required"}), 400
+    
+    if not topic:
+        return jsonify({"error": "Topic is required"}), 400
+    
+    # Generate quiz
+    quiz_result = await agents.quiz_master.agenerate_quiz(
+        student_id=student_id,
+        topic=topic,
+        subtopic=subtopic or "general",
+        question_count=question_count
+    )
+    
+    # Update state manager if session exists
+    session_id = data.get('session_id') or session.get('session_id')
+    if session_id:
+        async with session_store.alock(session_id):
+            state_manager = session_store.get(session_id)
+            if state_manager:
+                state_manager.start_quiz(quiz_result["quiz_id"])
+                session_store.save(session_id, state_manager)
+    
+    return jsonify({
+        "quiz_id": quiz_result["quiz_id"],
+        "content": quiz_result["content"]
+    })
+
+@app.route('/api/quiz/evaluate', methods=['POST'])
+async def evaluate_quiz_answer():
+    """Evaluate a student's quiz answer"""
+    data = await request.get_json()
+    student_id = data.get('student_id') or session.get('student_id')
+    quiz_id = data.get('quiz_id')
+    question_index = data.get('question_index')
+    answer = data.get('answer')
+    
+    if not all([student_id, quiz_id, question_index is not None, answer]):
+        return jsonify({"error": "student_id, quiz_id, question_index, and answer are required"}), 400
+    
+    # Evaluate answer
+    evaluation = await agents.quiz_master.aevaluate_answer(
+        student_id=student_id,
+        quiz_id=quiz_id,
+        question_index=question_index,
+        student_answer=answer
+    )
+    
+    return jsonify(evaluation)
+
+@app.route('/api/quiz/result', methods=['GET'])
+async def get_quiz_result():
+    """Get results for a completed quiz"""
+    student_id = request.args.get('student_id') or session.get('student_id')
+    quiz_id = request.args.get('quiz_id')
+    
+    if not all([student_id, quiz_id]):
+        return jsonify({"error": "student_id and quiz_id are required"}), 400
+    
+    # Get quiz results
+    results = await agents.quiz_master.aanalyze_quiz_results(
+        student_id=student_id,
+        quiz_id=quiz_id
+    )
+    
+    return jsonify(results)
+
+@app.route('/api/progress', methods=['GET'])
+async def get_progress():
+    """Get a student's learning progress"""
+    student_id = request.args.get('student_id') or session.get('student_id')
+    topic = request.args.get('topic')
+    days = int(request.args.get('days', 30))
+    
+    if not student_id:
+        return jsonify({"error": "Student ID is required"}), 400
+    
+    # Get progress summary
+    progress_summary = await agents.progress_tracker.agenerate_progress_summary(
+        student_id=student_id,
+        topic=topic,
+        days=days
+    )
+    
+    return jsonify(progress_summary)
+
+@app.route('/api/content', methods=['GET'])
+async def get_learning_content():
+    """Get learning content for a topic"""
+    student_id = request.args.get('student_id') or session.get('student_id')
+    topic = request.args.get('topic')
+    subtopic = request.args.get('subtopic')
+    
+    if not all([student_id, topic]):
+        return jsonify({"error": "Student ID and topic are required"}), 400
+    
+    # Generate learning content
+    content = await agents.learning_guide.agenerate_learning_content(
+        student_id=student_id,
+        topic=topic,
+        subtopic=subtopic or "general"
+    )
+    
+    return jsonify({
+        "content": content,
+        "topic": topic,
+        "subtopic": subtopic or "general"
+    })
+
+@app.route('/api/study-plan', methods=['POST'])
+async def create_study_plan():
+    """Create a study plan for a student"""
+    data = await request.get_json()
+    student_id = data.get('student_id') or session.get('student_id')
+    topic = data.get('topic')
+    goal = data.get('goal')
+    timeline = data.get('timeline')
+    
+    if not all([student_id, topic, goal, timeline]):
+        return jsonify({"error": "Student ID, topic, goal, and timeline are required"}), 400
+    
+    # Create study plan
+    study_plan = await agents.learning_guide.acreate_study_plan(
+        student_id=student_id,
+        topic=topic,
+        goal=goal,
+        timeline=timeline
+    )
+    
+    return jsonify({
+        "study_plan": study_plan,
+        "topic": topic
+    })
+
+@app.route('/api/resources', methods=['GET'])
+async def get_resources():
+    """Get recommended learning resources"""
+    student_id = request.args.get('student_id') or session.get('student_id')
+    topic = request.args.get('topic')
+    subtopic = request.args.get('subtopic')
+    
+    if not all([student_id, topic]):
+        return jsonify({"error": "Student ID and topic are required"}), 400
+    
+    # Agent methods without an async version run on a worker thread
+    resources = await asyncio.to_thread(
+        agents.learning_guide.recommend_resources,
+        student_id=student_id,
+        topic=topic,
+        subtopic=subtopic or "general"
+    )
+    
+    return jsonify({
+        "resources": resources,
+        "topic": topic,
+        "subtopic": subtopic or "general"
+    })
+
+@app.route('/api/learning-patterns', methods=['GET'])
+async def get_learning_patterns():
+    """Get learning pattern analysis for a student"""
+    student_id = request.args.get('student_id') or session.get('student_id')
+    topic = request.args.get('topic')
+    
+    if not student_id:
+        return jsonify({"error": "Student ID is required"}), 400
+    
+    # Get learning pattern analysis
+    patterns = await agents.progress_tracker.aidentify_learning_pattern(
+        student_id=student_id,
+        topic=topic
+    )
+    
+    return jsonify(patterns)
+
+@app.route('/api/difficulty-recommendation', methods=['GET'])
+async def get_difficulty_recommendation():
+    """Get a recommendation for difficulty level adjustment"""
+    student_id = request.args.get('student_id') or session.get('student_id')
+    topic = request.args.get('topic')
+    
+    if not all([student_id, topic]):
+        return jsonify({"error": "Student ID and topic are required"}), 400
+    
+    recommendation = await asyncio.to_thread(
+        agents.progress_tracker.recommend_difficulty_adjustment,
+        student_id=student_id,
+        topic=topic
+    )
+    
+    return jsonify(recommendation)
+
+@app.route('/api/hint', methods=['GET'])
+async def get_hint():
+    """Get a hint for a quiz question"""
+    student_id = request.args.get('student_id') or session.get('student_id')
+    question_id = request.args.get('question_id')
+    topic = request.args.get('topic')
+    
+    if not all([student_id, question_id, topic]):
+        return jsonify({"error": "Student ID, question ID, and topic are required"}), 400
+    
+    hint = await asyncio.to_thread(
+        agents.ai_tutor.provide_hint,
+        student_id=student_id,
+        question_id=question_id,
+        topic=topic
+    )
+    
+    return jsonify({"hint": hint})
+
+@app.route('/api/misconception', methods=['POST'])
+async def explain_misconception():
+    """Explain a misconception in a student's answer"""
+    data = await request.get_json()
+    student_id = data.get('student_id') or session.get('student_id')
+    topic = data.get('topic')
+    wrong_answer = data.get('wrong_answer')
+    correct_answer = data.get('correct_answer')
+    
+    if not all([student_id, topic, wrong_answer, correct_answer]):
+        return jsonify({"error": "Student ID, topic, wrong answer, and correct answer are required"}), 400
+    
+    explanation = await asyncio.to_thread(
+        agents.ai_tutor.explain_misconception,
+        student_id=student_id,
+        topic=topic,
+        wrong_answer=wrong_answer,
+        correct_answer=correct_answer
+    )
+    
+    return jsonify({"explanation": explanation})
+
+@app.route('/api/session/end', methods=['POST'])
+async def end_session():
+    """End the current learning session"""
+    data = await request.get_json()
+    session_id = data.get('session_id') or session.get('session_id')
+    
+    if not session_id:
+        return jsonify({"error": "Session ID is required"}), 400
+    
+    # Clean up state manager
+    state_manager = session_store.get(session_id)
+    if state_manager:
+        # Get the learning session ID from state manager
+        learning_session_id = state_manager.user_state.current_session_id
+        
+        # Update the session in the database if it exists
+        if learning_session_id:
+            await adb.update_learning_session(
+                log_id=learning_session_id,
+                duration=data.get('duration', 0)
+            )
+        
+        # Remove the state manager
+        session_store.delete(session_id)
+    
+    # Clear the cookie session
+    session.pop('session_id', None)
+    
+    return jsonify({"message": "Session ended successfully"})
+
+if __name__ == '__main__':
+    port = int(os.environ.get("PORT", 5000))
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get("FLASK_DEBUG", "False") == "True")
@@ -27,6 +27,45 @@ DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gemini-1.5-flash")
 DEFAULT_TEMPERATURE = float(os.getenv("DEFAULT_TEMPERATURE", "0.5"))
 FALLBACK_MODEL = os.getenv("FALLBACK_MODEL", "gemini-1.0-pro")
 
+# Model tiers; each agent operation runs on the tier MODEL_ROUTES maps it to
+# (see llm/router.py). max_concurrency caps the calls in flight per tier and process.
+MODEL_TIERS = {
+    "small": {
+        "model": os.getenv("MODEL_TIER_SMALL", "gemini-1.5-flash-8b"),
+        "max_concurrency": int(os.getenv("MODEL_TIER_SMALL_CONCURRENCY", "32")),
+    },
+    "medium": {
+        "model": os.getenv("MODEL_TIER_MEDIUM", DEFAULT_MODEL),
+        "max_concurrency": int(os.getenv("MODEL_TIER_MEDIUM_CONCURRENCY", "16")),
+    },
+    "large": {
+        "model": os.getenv("MODEL_TIER_LARGE", "gemini-1.5-pro"),
+        "max_concurrency": int(os.getenv("MODEL_TIER_LARGE_CONCURRENCY", "8")),
+    },
+}
+
+# Operation -> tier. Override single routes with MODEL_ROUTES="ai_tutor.answer=large,..."
+MODEL_ROUTES = {
+    "ai_tutor.answer": "medium",
+    "ai_tutor.hint": "small",
+    "ai_tutor.misconception": "small",
+    "learning_guide.content": "large",
+    "learning_guide.study_plan": "large",
+    "learning_guide.resources": "medium",
+    "quiz_master.generate": "medium",
+    "quiz_master.repair": "small",
+    "quiz_master.feedback": "small",
+    "quiz_master.analysis": "medium",
+    "quiz_master.batch_analysis": "medium",
+    "progress_tracker.progress": "medium",
+    "progress_tracker.pattern": "medium",
+    "progress_tracker.summary": "medium",
+    "history.summary": "small",
+}
+MODEL_ROUTES.update(
+    route.strip().split("=", 1) for route in os.getenv("MODEL_ROUTES", "").split(",") if "=" in route
+)
+
 # Learning settings
 DEFAULT_DIFFICULTY_LEVEL = int(os.getenv("DEFAULT_DIFFICULTY_LEVEL", "3"))
 MAX_DIFFICULTY_LEVEL = 5
@@ -39,6 +78,21 @@ MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
 MONGODB_DB = os.getenv("MONGODB_DB", "e_adaptive_learning")
 MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
 MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+# Wire compression in order of preference; zstd needs the zstandard package,
+# snappy needs python-snappy
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "zstd,zlib")
+
+# Write-behind logging (interaction and audit inserts, see FEATURES["enable_write_behind"])
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))  # Documents per insert_many
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))  # Seconds
+WRITE_BEHIND_MAX_QUEUED = int(os.getenv("WRITE_BEHIND_MAX_QUEUED", "10000"))  # Callers block beyond this
+WRITE_BEHIND_ENQUEUE_TIMEOUT = float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT", "1.0"))  # Then write through
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "3"))
+WRITE_BEHIND_SPILL_PATH = os.getenv("WRITE_BEHIND_SPILL_PATH", "")  # JSON lines file, empty to disable
 
 # Collection names
 COLLECTIONS = {
@@ -47,6 +101,7 @@ COLLECTIONS = {
     "interactions": "interactions",
     "quizzes": "quizzes",
     "quiz_questions": "quiz_questions",
+    "question_bank": "question_bank",
     "quiz_answers": "quiz_answers",
     "quiz_results": "quiz_results",
     "progress_reports": "progress_reports",
@@ -62,6 +117,46 @@ COLLECTIONS = {
 CACHE_TYPE = os.getenv("CACHE_TYPE", "SimpleCache")
 CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", "300"))  # 5 minutes
 CACHE_THRESHOLD = int(os.getenv("CACHE_THRESHOLD", "1000"))  # Maximum number of items
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_DIR, "cache"))  # Used by on-disk cache types
+
+# Session store settings (conversation state behind /api/session and /api/message)
+SESSION_STORE_TYPE = os.getenv("SESSION_STORE_TYPE", "memory")  # memory (per process) or sqlite (shared by workers)
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(CACHE_DIR, "sessions.sqlite3"))
+SESSION_STORE_MAX_SESSIONS = int(os.getenv("SESSION_STORE_MAX_SESSIONS", "10000"))
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", "7200"))  # 2 hours without activity
+
+# Conversation history kept per session (older messages are rolled into a running summary)
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "20"))  # Messages kept verbatim
+HISTORY_MAX_CHARS = int(os.getenv("HISTORY_MAX_CHARS", "8000"))  # About 2000 tokens
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "1500"))
+HISTORY_SUMMARY_WORKERS = int(os.getenv("HISTORY_SUMMARY_WORKERS", "2"))  # Background summary calls
+
+# Question bank (pre-generated quiz questions, see FEATURES["enable_question_bank"])
+QUESTION_BANK_DEPTH = int(os.getenv("QUESTION_BANK_DEPTH", "10"))  # Questions kept per topic/subtopic/difficulty/concept
+QUESTION_BANK_BATCH_SIZE = int(os.getenv("QUESTION_BANK_BATCH_SIZE", "5"))  # Questions per generation call
+QUESTION_BANK_REFILL_INTERVAL = float(os.getenv("QUESTION_BANK_REFILL_INTERVAL", "300"))  # Seconds between full sweeps
+QUESTION_BANK_MAX_KEYS = int(os.getenv("QUESTION_BANK_MAX_KEYS", "500"))  # Subtopic/difficulty pairs kept topped up
+
+# Batched quiz analysis (see FEATURES["enable_batch_quiz_analysis"])
+QUIZ_ANALYSIS_BATCH_SIZE = int(os.getenv("QUIZ_ANALYSIS_BATCH_SIZE", "8"))  # Quizzes per model call
+QUIZ_ANALYSIS_BATCH_WAIT = float(os.getenv("QUIZ_ANALYSIS_BATCH_WAIT", "2.0"))  # Seconds to wait for a batch to fill
+QUIZ_ANALYSIS_WORKERS = int(os.getenv("QUIZ_ANALYSIS_WORKERS", "4"))  # Concurrent model calls
+QUIZ_ANALYSIS_MAX_QUEUED = int(os.getenv("QUIZ_ANALYSIS_MAX_QUEUED", "1000"))  # Then quizzes are analyzed inline
+# Seconds after which a still-pending analysis is redone on the next request (its worker was lost to a restart)
+QUIZ_ANALYSIS_PENDING_TIMEOUT = float(os.getenv("QUIZ_ANALYSIS_PENDING_TIMEOUT", "300"))
+
+# Semantic cache settings (AI Tutor answers, see FEATURES["enable_semantic_cache"])
+# The threshold was checked on paraphrase and near-miss question pairs: rephrasings of the
+# same question ("What is photosynthesis?" / "Can you explain what photosynthesis is?")
+# score 1.0 once question boilerplate is dropped, while different questions on the same
+# subject ("mitosis" / "meiosis", "capital of France" / "of Spain") stay below 0.6.
+# Questions that differ in a number, operator, variable or negation never match,
+# whatever their similarity.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))  # Minimum cosine similarity
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))  # Per student/topic/difficulty scope
+SEMANTIC_CACHE_MAX_SCOPES = int(os.getenv("SEMANTIC_CACHE_MAX_SCOPES", "1000"))  # Least recently used scopes dropped
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # 1 hour
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
 
 # Logging configuration
 LOGGING = {
@@ -106,9 +201,18 @@ FEATURES = {
     "enable_ai_tutor": os.getenv("ENABLE_AI_TUTOR", "True").lower() == "true",
     "enable_dashboard": os.getenv("ENABLE_DASHBOARD", "True").lower() == "true",
     "enable_caching": os.getenv("ENABLE_CACHING", "True").lower() == "true",
+    "enable_semantic_cache": os.getenv("ENABLE_SEMANTIC_CACHE", "False").lower() == "true",
+    "enable_question_bank": os.getenv("ENABLE_QUESTION_BANK", "True").lower() == "true",
+    "enable_batch_quiz_analysis": os.getenv("ENABLE_BATCH_QUIZ_ANALYSIS", "True").lower() == "true",
+    "enable_history_summary": os.getenv("ENABLE_HISTORY_SUMMARY", "True").lower() == "true",
+    "enable_model_resilience": os.getenv("ENABLE_MODEL_RESILIENCE", "True").lower() == "true",
+    "enable_write_behind": os.getenv("ENABLE_WRITE_BEHIND", "True").lower() == "true",
     "enable_auto_difficulty_adjust": os.getenv("ENABLE_AUTO_DIFFICULTY_ADJUST", "True").lower() == "true",
 }
 
+# Progress summaries analyse topics concurrently; caps the parallel model calls per summary
+PROGRESS_SUMMARY_MAX_WORKERS = int(os.getenv("PROGRESS_SUMMARY_MAX_WORKERS", "8"))
+
 # Timeout settings (in seconds)
 TIMEOUTS = {
     "model_request": int(os.getenv("MODEL_REQUEST_TIMEOUT", "30")),
@@ -116,6 +220,17 @@ TIMEOUTS = {
     "api_request": int(os.getenv("API_REQUEST_TIMEOUT", "60")),
 }
 
+# Model call resilience (see FEATURES["enable_model_resilience"] and llm/resilience.py).
+# Each attempt gets TIMEOUTS["model_request"]; retries and the failover to
+# FALLBACK_MODEL all have to fit in MODEL_CALL_DEADLINE.
+MODEL_CALL_DEADLINE = float(os.getenv("MODEL_CALL_DEADLINE", "45"))
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "2"))  # Per model
+MODEL_RETRY_BACKOFF_BASE = float(os.getenv("MODEL_RETRY_BACKOFF_BASE", "0.5"))
+MODEL_RETRY_BACKOFF_MAX = float(os.getenv("MODEL_RETRY_BACKOFF_MAX", "4"))
+MODEL_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("MODEL_CIRCUIT_FAILURE_THRESHOLD", "5"))  # Consecutive failures
+MODEL_CIRCUIT_RESET_TIMEOUT = float(os.getenv("MODEL_CIRCUIT_RESET_TIMEOUT", "30"))  # Seconds before a probe call
+MODEL_MAX_ABANDONED_CALLS = int(os.getenv("MODEL_MAX_ABANDONED_CALLS", "8"))  # Timed-out calls still running before a model is skipped
+
 # Rate limiting
 RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
 RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "100/hour")
@@ -142,18 +257,31 @@ def get_model_config(model_name=None):
     Returns:
         dict: Model configuration
     """
+    # Costs are USD per million tokens, used for the router's cost accounting
     models = {
+        "gemini-1.5-flash-8b": {
+            "temperature": float(os.getenv("GEMINI_1_5_FLASH_8B_TEMPERATURE", "0.3")),
+            "api_key": GOOGLE_API_KEY,
+            "input_cost_per_mtok": 0.0375,
+            "output_cost_per_mtok": 0.15,
+        },
         "gemini-1.5-flash": {
             "temperature": float(os.getenv("GEMINI_1_5_FLASH_TEMPERATURE", "0.5")),
             "api_key": GOOGLE_API_KEY,
+            "input_cost_per_mtok": 0.075,
+            "output_cost_per_mtok": 0.30,
         },
         "gemini-1.5-pro": {
             "temperature": float(os.getenv("GEMINI_1_5_PRO_TEMPERATURE", "0.7")),
             "api_key": GOOGLE_API_KEY,
+            "input_cost_per_mtok": 1.25,
+            "output_cost_per_mtok": 5.00,
         },
         "gemini-1.0-pro": {
             "temperature": float(os.getenv("GEMINI_1_0_PRO_TEMPERATURE", "0.7")),
             "api_key": GOOGLE_API_KEY,
+            "input_cost_per_mtok": 0.50,
+            "output_cost_per_mtok": 1.50,
         }
     }
     
@@ -174,5 +302,10 @@ def get_db_config():
         "db_name": MONGODB_DB,
         "connect_timeout_ms": MONGODB_CONNECT_TIMEOUT_MS,
         "server_selection_timeout_ms": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "max_pool_size": MONGODB_MAX_POOL_SIZE,
+        "min_pool_size": MONGODB_MIN_POOL_SIZE,
+        "max_idle_time_ms": MONGODB_MAX_IDLE_TIME_MS,
+        "wait_queue_timeout_ms": MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "compressors": MONGODB_COMPRESSORS,
         "collections": COLLECTIONS
     }
\ No newline at end of file
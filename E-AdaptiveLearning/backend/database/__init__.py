@@ -7,9 +7,28 @@ including connection management and CRUD operations for learning data.
 
 from .connection import DatabaseConnection, get_db_connection
 from .db_handler import DatabaseHandler
+from .async_db_handler import AsyncDatabaseConnection, AsyncDatabaseHandler, get_async_db_connection
+from .write_behind import WriteBehindQueue, get_write_behind_queue
+from .records import (PROJECTIONS, LearningLogRecord, QuizRecord, QuizAnswerRecord,
+                      QuizResultRecord)
+from .indexes import INDEXES, ensure_indexes, check_query_plans, assert_no_collection_scans
 
 __all__ = [
     'DatabaseConnection',
     'get_db_connection',
-    'DatabaseHandler'
+    'DatabaseHandler',
+    'AsyncDatabaseConnection',
+    'AsyncDatabaseHandler',
+    'get_async_db_connection',
+    'WriteBehindQueue',
+    'get_write_behind_queue',
+    'PROJECTIONS',
+    'LearningLogRecord',
+    'QuizRecord',
+    'QuizAnswerRecord',
+    'QuizResultRecord',
+    'INDEXES',
+    'ensure_indexes',
+    'check_query_plans',
+    'assert_no_collection_scans'
 ]
\ No newline at end of file
@@ -0,0 +1,594 @@
+import os
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Union
+from motor.motor_asyncio import AsyncIOMotorClient
+from .db_handler import DatabaseHandler
+from .write_behind import get_write_behind_queue
+from .records import resolve_projection, to_record, to_records
+
+class AsyncDatabaseConnection:
+    """
+    Motor (asyncio) counterpart of DatabaseConnection.
+    
+    Motor clients are bound to the event loop they are first used on, so one
+    client is kept per running loop and per process. Clients are keyed by the
+    loop object itself, not its id(), and closed once their loop is closed,
+    so a short-lived loop (asyncio.run per call) never leaves a client behind
+    for a later loop to pick up.
+    """
+    
+    _instance = None
+    
+    def __new__(cls, *args, **kwargs):
+        """
+        Singleton pattern to ensure only one async connection manager is created.
+        """
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+    
+    def __init__(self, connection_string: Optional[str] = None, db_name: Optional[str] = None):
+        """
+        Initialize the async database connection.
+        
+        Args:
+            connection_string (str, optional): MongoDB connection string. If None, uses config.
+            db_name (str, optional): Database name. If None, uses config.
+        """
+        if self._initialized:
+            return
+        
+        # Import config here to avoid circular imports
+        import config
+        
+        self.db_config = config.get_db_config()
+        self.connection_string = connection_string or self.db_config["uri"]
+        self.db_name = db_name or self.db_config["db_name"]
+        self._clients: Dict[asyncio.AbstractEventLoop, AsyncIOMotorClient] = {}
+        self._pid = os.getpid()
+        
+        self._initialized = True
+    
+    def _client_options(self) -> Dict[str, Any]:
+        """
+        Build the Motor client pool and timeout options from config.
+        
+        Returns:
+            Dict: Keyword arguments for AsyncIOMotorClient
+        """
+        options = {
+            "maxPoolSize": self.db_config["max_pool_size"],
+            "minPoolSize": self.db_config["min_pool_size"],
+            "maxIdleTimeMS": self.db_config["max_idle_time_ms"],
+            "waitQueueTimeoutMS": self.db_config["wait_queue_timeout_ms"],
+            "connectTimeoutMS": self.db_config["connect_timeout_ms"],
+            "serverSelectionTimeoutMS": self.db_config["server_selection_timeout_ms"]
+        }
+        if self.db_config["compressors"]:
+            options["compressors"] = self.db_config["compressors"]
+        return options
+    
+    def get_database(self):
+        """
+        Get the Motor database for the running event loop.
+        
+        Returns:
+            AsyncIOMotorDatabase: Motor database object
+        """
+        if self._pid != os.getpid():
+            # Clients inherited from the parent process belong to its loops
+            self._clients = {}
+            self._pid = os.getpid()
+        
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            self._close_stale_clients()
+            client = AsyncIOMotorClient(self.connection_string, **self._client_options())
+            self._clients[loop] = client
+        return client[self.db_name]
+    
+    def _close_stale_clients(self) -> None:
+        """
+        Close and forget the clients of event loops that have been closed.
+        """
+        for loop in [loop for loop in self._clients if loop.is_closed()]:
+            self._clients.pop(loop).close()
+    
+    def get_collection(self, collection_name: str):
+        """
+        Get a specific collection for the running event loop.
+        
+        Args:
+            collection_name (str): Name of the collection
+        
+        Returns:
+            AsyncIOMotorCollection: Motor collection object
+        """
+        return self.get_database()[collection_name]
+    
+    def close(self) -> None:
+        """
+        Close every Motor client owned by this process.
+        """
+        for client in self._clients.values():
+            client.close()
+        self._clients.clear()
+
+def get_async_db_connection() -> AsyncDatabaseConnection:
+    """
+    Get the async database connection instance.
+    
+    Returns:
+        AsyncDatabaseConnection: Singleton instance of AsyncDatabaseConnection
+    """
+    return AsyncDatabaseConnection()
+
+class AsyncDatabaseHandler:
+    """
+    Asynchronous variant of DatabaseHandler built on Motor.
+    
+    It has the same method names, arguments, documents and return values as
+    DatabaseHandler, but every method is a coroutine. This lets an async
+    caller overlap database I/O with LLM calls.
+    
+    Its own inserts are written directly, but it reads the same collections
+    DatabaseHandler buffers in the write-behind queue, so those reads first
+    wait for the student's queued documents, as DatabaseHandler does.
+    """
+    
+    def __init__(self):
+        """
+        Initialize the AsyncDatabaseHandler.
+        """
+        self.db_conn = get_async_db_connection()
+        self.write_behind = get_write_behind_queue()
+    
+    def _get_collection(self, collection_name: str):
+        """
+        Get a specific collection from the database.
+        
+        Args:
+            collection_name (str): Name of the collection
+        
+        Returns:
+            AsyncIOMotorCollection: Motor collection object
+        """
+        return self.db_conn.get_collection(collection_name)
+    
+    async def _sync_write_behind(self, collection_name: str, student_id: Optional[str] = None) -> None:
+        """
+        Wait for documents the sync path has queued but not yet written.
+        
+        Args:
+            collection_name (str): Name of the collection
+            student_id (str, optional): Only wait for this student's documents
+        """
+        # The common case, nothing queued, costs no thread hop
+        if self.write_behind.is_pending(collection_name, student_id):
+            await asyncio.to_thread(self.write_behind.sync, collection_name, student_id)
+    
+    # ==================== Student Profiles ====================
+    
+    async def get_student_profile(self, student_id: str,
+                                  projection: Optional[Union[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """Async version of DatabaseHandler.get_student_profile."""
+        return await self._get_collection("students").find_one({"_id": student_id}, resolve_projection(projection))
+    
+    async def create_student_profile(self, student_id: str, profile_data: Dict[str, Any]) -> bool:
+        """Async version of DatabaseHandler.create_student_profile."""
+        profile_data["_id"] = student_id
+        profile_data["created_at"] = datetime.now()
+        profile_data["updated_at"] = datetime.now()
+        
+        try:
+            await self._get_collection("students").insert_one(profile_data)
+            return True
+        except Exception as e:
+            print(f"Error creating student profile: {e}")
+            return False
+    
+    async def update_student_profile(self, student_id: str, profile_data: Dict[str, Any]) -> bool:
+        """Async version of DatabaseHandler.update_student_profile."""
+        profile_data["updated_at"] = datetime.now()
+        
+        try:
+            result = await self._get_collection("students").update_one(
+                {"_id": student_id},
+                {"$set": profile_data}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error updating student profile: {e}")
+            return False
+    
+    async def get_student_topics(self, student_id: str) -> List[str]:
+        """Async version of DatabaseHandler.get_student_topics."""
+        await self._sync_write_behind("learning_logs", student_id)
+        topics = await self._get_collection("learning_logs").distinct("topic", {"student_id": student_id})
+        return list(topics)
+    
+    async def get_student_difficulty_level(self, student_id: str, topic: str) -> Optional[int]:
+        """Async version of DatabaseHandler.get_student_difficulty_level."""
+        result = await self._get_collection("student_levels").find_one({"student_id": student_id, "topic": topic},
+                                                                        {"_id": 0, "difficulty_level": 1})
+        
+        if result:
+            return result.get("difficulty_level", 3)
+        return None
+    
+    async def update_student_difficulty_level(self, student_id: str, topic: str, difficulty_level: int) -> bool:
+        """Async version of DatabaseHandler.update_student_difficulty_level."""
+        try:
+            await self._get_collection("student_levels").update_one(
+                {"student_id": student_id, "topic": topic},
+                {"$set": {
+                    "difficulty_level": difficulty_level,
+                    "updated_at": datetime.now()
+                }},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"Error updating student difficulty level: {e}")
+            return False
+    
+    # ==================== Learning Logs ====================
+    
+    async def log_learning_session(self, student_id: str, topic: str, subtopic: str, difficulty_level: int,
+                                   content_summary: str) -> str:
+        """Async version of DatabaseHandler.log_learning_session."""
+        log_id = str(uuid.uuid4())
+        log_entry = {
+            "_id": log_id,
+            "student_id": student_id,
+            "topic": topic,
+            "subtopic": subtopic,
+            "difficulty_level": difficulty_level,
+            "content_summary": content_summary,
+            "activity_type": "study_session",
+            "timestamp": datetime.now(),
+            "duration": 0  # To be updated when session ends
+        }
+        
+        await self._get_collection("learning_logs").insert_one(log_entry)
+        return log_id
+    
+    async def update_learning_session(self, log_id: str, duration: int) -> bool:
+        """Async version of DatabaseHandler.update_learning_session."""
+        await self._sync_write_behind("learning_logs")
+        try:
+            result = await self._get_collection("learning_logs").update_one(
+                {"_id": log_id},
+                {"$set": {"duration": duration}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error updating learning session: {e}")
+            return False
+    
+    async def get_learning_logs(self, student_id: str, topic: Optional[str] = None, subtopic: Optional[str] = None,
+                                start_date: Optional[datetime] = None, limit: int = 20,
+                                projection: Optional[Union[str, Dict[str, Any]]] = None,
+                                record_type: Optional[type] = None) -> List[Any]:
+        """Async version of DatabaseHandler.get_learning_logs."""
+        query = DatabaseHandler._build_history_query(student_id, topic, subtopic, start_date)
+        await self._sync_write_behind("learning_logs", student_id)
+        cursor = self._get_collection("learning_logs").find(query, resolve_projection(projection))
+        cursor = cursor.sort("timestamp", -1).limit(limit)
+        return to_records(await cursor.to_list(length=limit), record_type)
+    
+    async def log_learning_interaction(self, student_id: str, interaction_type: str, topic: str,
+                                       content: str, response: str) -> str:
+        """Async version of DatabaseHandler.log_learning_interaction."""
+        interaction_id = str(uuid.uuid4())
+        interaction = {
+            "_id": interaction_id,
+            "student_id": student_id,
+            "type": interaction_type,
+            "topic": topic,
+            "content": content,
+            "response": response,
+            "timestamp": datetime.now()
+        }
+        
+        await self._get_collection("interactions").insert_one(interaction)
+        return interaction_id
+    
+    # ==================== Quizzes ====================
+    
+    async def save_quiz(self, student_id: str, topic: str, subtopic: str, difficulty_level: int,
+                        raw_content: str, question_count: int) -> str:
+        """Async version of DatabaseHandler.save_quiz."""
+        quiz_id = str(uuid.uuid4())
+        quiz = {
+            "_id": quiz_id,
+            "student_id": student_id,
+            "topic": topic,
+            "subtopic": subtopic,
+            "difficulty_level": difficulty_level,
+            "content": raw_content,
+            "question_count": question_count,
+            "created_at": datetime.now(),
+            "metadata": {}
+        }
+        
+        await self._get_collection("quizzes").insert_one(quiz)
+        return quiz_id
+    
+    async def get_quiz(self, quiz_id: str, projection: Optional[Union[str, Dict[str, Any]]] = None,
+                       record_type: Optional[type] = None) -> Optional[Any]:
+        """Async version of DatabaseHandler.get_quiz."""
+        quiz = await self._get_collection("quizzes").find_one({"_id": quiz_id}, resolve_projection(projection))
+        return to_record(quiz, record_type)
+    
+    async def update_quiz_metadata(self, quiz_id: str, metadata: Dict[str, Any]) -> bool:
+        """Async version of DatabaseHandler.update_quiz_metadata."""
+        try:
+            result = await self._get_collection("quizzes").update_one(
+                {"_id": quiz_id},
+                {"$set": {"metadata": metadata}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error updating quiz metadata: {e}")
+            return False
+    
+    async def save_quiz_questions(self, quiz_id: str, questions: List[Dict[str, Any]]) -> List[str]:
+        """Async version of DatabaseHandler.save_quiz_questions."""
+        docs = DatabaseHandler._build_question_docs(quiz_id, questions)
+        if docs:
+            await self._get_collection("quiz_questions").insert_many(docs)
+        return [doc["_id"] for doc in docs]
+    
+    async def get_quiz_question(self, question_id: str,
+                                projection: Optional[Union[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """Async version of DatabaseHandler.get_quiz_question."""
+        return await self._get_collection("quiz_questions").find_one({"_id": question_id}, resolve_projection(projection))
+    
+    async def get_quiz_question_at(self, quiz_id: str, question_index: int,
+                                   projection: Optional[Union[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """Async version of DatabaseHandler.get_quiz_question_at."""
+        return await self._get_collection("quiz_questions").find_one(
+            {"quiz_id": quiz_id, "question_index": question_index}, resolve_projection(projection)
+        )
+    
+    async def log_quiz_answer(self, student_id: str, quiz_id: str, question_index: int,
+                              student_answer: str, is_correct: bool, concepts: Optional[List[str]] = None) -> str:
+        """Async version of DatabaseHandler.log_quiz_answer."""
+        answer_id = str(uuid.uuid4())
+        answer = {
+            "_id": answer_id,
+            "student_id": student_id,
+            "quiz_id": quiz_id,
+            "question_index": question_index,
+            "student_answer": student_answer,
+            "is_correct": is_correct,
+            "concepts": concepts or [],
+            "timestamp": datetime.now()
+        }
+        
+        await self._get_collection("quiz_answers").insert_one(answer)
+        return answer_id
+    
+    async def get_quiz_answers(self, student_id: str, quiz_id: str,
+                               projection: Optional[Union[str, Dict[str, Any]]] = None,
+                               record_type: Optional[type] = None) -> List[Any]:
+        """Async version of DatabaseHandler.get_quiz_answers."""
+        await self._sync_write_behind("quiz_answers", student_id)
+        cursor = self._get_collection("quiz_answers").find({
+            "student_id": student_id,
+            "quiz_id": quiz_id
+        }, resolve_projection(projection)).sort("question_index", 1)
+        return to_records(await cursor.to_list(length=None), record_type)
+    
+    async def save_quiz_result(self, student_id: str, quiz_id: str, score: float, analysis: str,
+                               analysis_status: str = "ready") -> str:
+        """Async version of DatabaseHandler.save_quiz_result."""
+        quiz = await self.get_quiz(quiz_id, projection="quiz_header")
+        if not quiz:
+            return ""
+        
+        result_id = str(uuid.uuid4())
+        result = {
+            "_id": result_id,
+            "student_id": student_id,
+            "quiz_id": quiz_id,
+            "topic": quiz.get("topic", ""),
+            "subtopic": quiz.get("subtopic", ""),
+            "score": score,
+            "analysis": analysis,
+            "analysis_status": analysis_status,
+            "timestamp": datetime.now()
+        }
+        
+        await self._get_collection("quiz_results").insert_one(result)
+        return result_id
+    
+    async def update_quiz_result_analysis(self, result_id: str, analysis: str, analysis_status: str = "ready") -> bool:
+        """Async version of DatabaseHandler.update_quiz_result_analysis."""
+        try:
+            result = await self._get_collection("quiz_results").update_one(
+                {"_id": result_id},
+                {"$set": {"analysis": analysis, "analysis_status": analysis_status}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error updating quiz result analysis: {e}")
+            return False
+    
+    async def claim_quiz_result_analysis(self, result_id: str, requested_at: Optional[datetime]) -> bool:
+        """Async version of DatabaseHandler.claim_quiz_result_analysis."""
+        try:
+            result = await self._get_collection("quiz_results").update_one(
+                {"_id": result_id, "analysis_status": "pending", "analysis_requested_at": requested_at},
+                {"$set": {"analysis_requested_at": datetime.now()}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error claiming quiz result analysis: {e}")
+            return False
+    
+    async def get_quiz_result(self, student_id: str, quiz_id: str,
+                              projection: Optional[Union[str, Dict[str, Any]]] = None,
+                              record_type: Optional[type] = None) -> Optional[Any]:
+        """Async version of DatabaseHandler.get_quiz_result."""
+        result = await self._get_collection("quiz_results").find_one({"student_id": student_id, "quiz_id": quiz_id},
+                                                                     resolve_projection(projection))
+        return to_record(result, record_type)
+    
+    async def get_quiz_results(self, student_id: str, topic: Optional[str] = None, subtopic: Optional[str] = None,
+                               start_date: Optional[datetime] = None, limit: int = 10,
+                               projection: Optional[Union[str, Dict[str, Any]]] = None,
+                               record_type: Optional[type] = None) -> List[Any]:
+        """Async version of DatabaseHandler.get_quiz_results."""
+        query = DatabaseHandler._build_history_query(student_id, topic, subtopic, start_date)
+        cursor = self._get_collection("quiz_results").find(query, resolve_projection(projection))
+        cursor = cursor.sort("timestamp", -1).limit(limit)
+        return to_records(await cursor.to_list(length=limit), record_type)
+    
+    # ==================== Question Bank ====================
+    
+    async def save_bank_questions(self, topic: str, subtopic: str, difficulty_level: int, concept: str,
+                                  questions: List[Dict[str, Any]]) -> int:
+        """Async version of DatabaseHandler.save_bank_questions."""
+        docs = DatabaseHandler._build_bank_docs(topic, subtopic, difficulty_level, concept, questions)
+        if docs:
+            await self._get_collection("question_bank").insert_many(docs)
+        return len(docs)
+    
+    async def count_bank_questions(self, topic: str, subtopic: str, difficulty_level: int) -> Dict[str, int]:
+        """Async version of DatabaseHandler.count_bank_questions."""
+        pipeline = [
+            {"$match": {"topic": topic, "subtopic": subtopic, "difficulty_level": difficulty_level}},
+            {"$group": {"_id": "$concept", "count": {"$sum": 1}}}
+        ]
+        docs = await self._get_collection("question_bank").aggregate(pipeline).to_list(length=None)
+        return {doc["_id"]: doc["count"] for doc in docs}
+    
+    async def take_bank_questions(self, topic: str, subtopic: str, difficulty_level: int,
+                                  concepts: List[str], count: int) -> List[Dict[str, Any]]:
+        """Async version of DatabaseHandler.take_bank_questions."""
+        bank_coll = self._get_collection("question_bank")
+        query = {"topic": topic, "subtopic": subtopic, "difficulty_level": difficulty_level}
+        
+        taken = []
+        remaining = list(concepts) or [None]
+        while remaining and len(taken) < count:
+            for concept in list(remaining):
+                if len(taken) >= count:
+                    break
+                concept_query = query if concept is None else {**query, "concept": concept}
+                doc = await bank_coll.find_one_and_delete(concept_query, sort=[("created_at", 1)])
+                if doc is None:
+                    remaining.remove(concept)
+                else:
+                    taken.append(doc)
+        return taken
+    
+    # ==================== Progress Tracking ====================
+    
+    async def get_progress_stats(self, student_id: str, since: Optional[datetime] = None,
+                                 topics: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Async version of DatabaseHandler.get_progress_stats."""
+        pipeline = DatabaseHandler._build_progress_stats_pipeline(student_id, since, topics)
+        await self._sync_write_behind("learning_logs", student_id)
+        cursor = self._get_collection("learning_logs").aggregate(pipeline)
+        return DatabaseHandler._format_progress_stats(await cursor.to_list(length=None))
+    
+    async def save_progress_report(self, student_id: str, topic: str, time_period: int,
+                                   average_score: float, analysis: str) -> str:
+        """Async version of DatabaseHandler.save_progress_report."""
+        report_id = str(uuid.uuid4())
+        report = {
+            "_id": report_id,
+            "student_id": student_id,
+            "topic": topic,
+            "time_period": time_period,
+            "average_score": average_score,
+            "analysis": analysis,
+            "created_at": datetime.now()
+        }
+        
+        await self._get_collection("progress_reports").insert_one(report)
+        return report_id
+    
+    async def save_learning_pattern_analysis(self, student_id: str, topic: str, analysis: str) -> str:
+        """Async version of DatabaseHandler.save_learning_pattern_analysis."""
+        analysis_id = str(uuid.uuid4())
+        pattern_analysis = {
+            "_id": analysis_id,
+            "student_id": student_id,
+            "topic": topic,
+            "analysis": analysis,
+            "created_at": datetime.now()
+        }
+        
+        await self._get_collection("learning_patterns").insert_one(pattern_analysis)
+        return analysis_id
+    
+    async def save_progress_summary(self, student_id: str, time_period: int, summary: str,
+                                    topic_summaries: Dict[str, Any]) -> str:
+        """Async version of DatabaseHandler.save_progress_summary."""
+        summary_id = str(uuid.uuid4())
+        summary_doc = {
+            "_id": summary_id,
+            "student_id": student_id,
+            "time_period": time_period,
+            "summary": summary,
+            "topic_summaries": topic_summaries,
+            "created_at": datetime.now()
+        }
+        
+        await self._get_collection("progress_summaries").insert_one(summary_doc)
+        return summary_id
+    
+    # ==================== Study Plans ====================
+    
+    async def save_study_plan(self, student_id: str, topic: str, goal: str, timeline: str,
+                              plan_content: str) -> str:
+        """Async version of DatabaseHandler.save_study_plan."""
+        plan_id = str(uuid.uuid4())
+        plan = {
+            "_id": plan_id,
+            "student_id": student_id,
+            "topic": topic,
+            "goal": goal,
+            "timeline": timeline,
+            "content": plan_content,
+            "created_at": datetime.now()
+        }
+        
+        await self._get_collection("study_plans").insert_one(plan)
+        return plan_id
+    
+    # ==================== Resources ====================
+    
+    async def log_resource_recommendations(self, student_id: str, topic: str, subtopic: str,
+                                           recommendations: str) -> str:
+        """Async version of DatabaseHandler.log_resource_recommendations."""
+        rec_id = str(uuid.uuid4())
+        rec = {
+            "_id": rec_id,
+            "student_id": student_id,
+            "topic": topic,
+            "subtopic": subtopic,
+            "recommendations": recommendations,
+            "created_at": datetime.now()
+        }
+        
+        await self._get_collection("resource_recommendations").insert_one(rec)
+        return rec_id
+    
+    async def get_default_concepts(self, topic: str, subtopic: str) -> List[str]:
+        """Async version of DatabaseHandler.get_default_concepts."""
+        result = await self._get_collection("curriculum").find_one({"topic": topic, "subtopic": subtopic},
+                                                                    {"_id": 0, "concepts": 1})
+        if result and "concepts" in result:
+            return result["concepts"]
+        
+        # Return some dummy concepts if not found
+        return ["Concept 1", "Concept 2", "Concept 3"]
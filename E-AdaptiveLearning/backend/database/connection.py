@@ -1,11 +1,109 @@
 import os
+import time
+import threading
 import pymongo
-from pymongo import MongoClient
-from typing import Optional
+from pymongo import MongoClient, monitoring
+from typing import Dict, Any, Optional
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener that keeps utilisation counters per server,
+    used for capacity planning of maxPoolSize/minPoolSize.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._servers: Dict[str, Dict[str, Any]] = {}
+    
+    def _server(self, address) -> Dict[str, Any]:
+        """Get (or create) the counters for a server address."""
+        key = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+        stats = self._servers.get(key)
+        if stats is None:
+            stats = self._servers[key] = {
+                "open_connections": 0,
+                "checked_out": 0,
+                "max_checked_out": 0,
+                "checkouts": 0,
+                "checkout_failures": 0,
+                "total_checkout_wait_ms": 0.0,
+                "max_checkout_wait_ms": 0.0,
+                "pool_clears": 0
+            }
+        return stats
+    
+    # Event hooks (see pymongo.monitoring.ConnectionPoolListener)
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address)["pool_clears"] += 1
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_created(self, event):
+        with self._lock:
+            self._server(event.address)["open_connections"] += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self._server(event.address)["open_connections"] -= 1
+    
+    def connection_check_out_started(self, event):
+        self._local.check_out_started = time.monotonic()
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._server(event.address)["checkout_failures"] += 1
+    
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "check_out_started", None)
+        wait_ms = (time.monotonic() - started) * 1000 if started else 0.0
+        with self._lock:
+            stats = self._server(event.address)
+            stats["checkouts"] += 1
+            stats["checked_out"] += 1
+            stats["max_checked_out"] = max(stats["max_checked_out"], stats["checked_out"])
+            stats["total_checkout_wait_ms"] += wait_ms
+            stats["max_checkout_wait_ms"] = max(stats["max_checkout_wait_ms"], wait_ms)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._server(event.address)["checked_out"] -= 1
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get a snapshot of the pool counters.
+        
+        Returns:
+            Dict: Server address -> counters
+        """
+        with self._lock:
+            snapshot = {}
+            for address, stats in self._servers.items():
+                stats = dict(stats)
+                checkouts = stats["checkouts"]
+                stats["avg_checkout_wait_ms"] = stats["total_checkout_wait_ms"] / checkouts if checkouts else 0.0
+                snapshot[address] = stats
+            return snapshot
 
 class DatabaseConnection:
     """
     Class to handle MongoDB connection for the E-AdaptiveLearning system.
+    
+    The underlying MongoClient owns a connection pool sized from config.
+    The client is created lazily and re-created after a fork, so gunicorn
+    pre-fork workers never share sockets with the master process.
     """
     
     _instance = None
@@ -30,39 +128,104 @@ class DatabaseConnection:
         # Skip initialization if already initialized (singleton pattern)
         if self._initialized:
             return
-            
+        
         # Import config here to avoid circular imports
-        from backend import config
+        import config
+        
+        self.db_config = config.get_db_config()
         
         # Get connection details from parameters or config
-        self.connection_string = connection_string or config.MONGODB_URI
-        self.db_name = db_name or config.MONGODB_DB
+        self.connection_string = connection_string or self.db_config["uri"]
+        self.db_name = db_name or self.db_config["db_name"]
         
         # Initialize client and database as None
         self.client = None
         self.db = None
+        self.pool_monitor = PoolMonitor()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
         
         # Mark as initialized
         self._initialized = True
     
+    def _client_options(self) -> Dict[str, Any]:
+        """
+        Build the MongoClient pool and timeout options from config.
+        
+        Returns:
+            Dict: Keyword arguments for MongoClient
+        """
+        options = {
+            "maxPoolSize": self.db_config["max_pool_size"],
+            "minPoolSize": self.db_config["min_pool_size"],
+            "maxIdleTimeMS": self.db_config["max_idle_time_ms"],
+            "waitQueueTimeoutMS": self.db_config["wait_queue_timeout_ms"],
+            "connectTimeoutMS": self.db_config["connect_timeout_ms"],
+            "serverSelectionTimeoutMS": self.db_config["server_selection_timeout_ms"],
+            "event_listeners": [self.pool_monitor]
+        }
+        if self.db_config["compressors"]:
+            options["compressors"] = self.db_config["compressors"]
+        return options
+    
     def connect(self) -> None:
         """
-        Establish connection to MongoDB.
+        Create the pooled MongoDB client.
+        
+        The client connects in the background; use ping() to verify that the
+        server is reachable.
+        """
+        with self._lock:
+            self._create_client()
+    
+    def _create_client(self) -> None:
+        """
+        Create the MongoDB client. Caller must hold self._lock.
         """
         try:
             # Create MongoDB client
-            self.client = MongoClient(self.connection_string)
+            self.client = MongoClient(self.connection_string, **self._client_options())
             
             # Get database
             self.db = self.client[self.db_name]
+            self._pid = os.getpid()
+            print(f"MongoDB client created for: {self.db_name}")
             
-            # Test connection
-            self.client.admin.command('ping')
-            print(f"Connected to MongoDB: {self.db_name}")
+        except pymongo.errors.ConfigurationError as e:
+            print(f"Could not configure MongoDB client: {e}")
+            raise
+    
+    def _ensure_connected(self) -> None:
+        """
+        Create the client on first use, or again in a forked child process.
+        """
+        if self.client is not None and self.db is not None and self._pid == os.getpid():
+            return
+        
+        with self._lock:
+            if self.client is not None and self._pid != os.getpid():
+                # A client inherited across fork() must not be used or closed
+                # in the child; drop it and build a fresh pool.
+                self.client = None
+                self.db = None
             
-        except pymongo.errors.ConnectionFailure as e:
+            if self.client is None or self.db is None:
+                self._create_client()
+    
+    def ping(self) -> bool:
+        """
+        Check that the MongoDB server is reachable.
+        
+        Returns:
+            bool: True if the server answered the ping
+        """
+        self._ensure_connected()
+        try:
+            self.client.admin.command('ping')
+            return True
+        except pymongo.errors.PyMongoError as e:
             print(f"Could not connect to MongoDB: {e}")
-            raise
+            return False
     
     def get_database(self):
         """
@@ -71,8 +234,7 @@ class DatabaseConnection:
         Returns:
             Database: pymongo database object
         """
-        if not self.client or not self.db:
-            self.connect()
+        self._ensure_connected()
         return self.db
     
     def get_collection(self, collection_name: str):
@@ -81,27 +243,52 @@ class DatabaseConnection:
         
         Args:
             collection_name (str): Name of the collection
-            
+        
         Returns:
             Collection: pymongo collection object
         """
-        if not self.client or not self.db:
-            self.connect()
+        self._ensure_connected()
         return self.db[collection_name]
     
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Get connection pool configuration and utilisation counters.
+        
+        Returns:
+            Dict: Pool settings and per-server counters
+        """
+        return {
+            "max_pool_size": self.db_config["max_pool_size"],
+            "min_pool_size": self.db_config["min_pool_size"],
+            "servers": self.pool_monitor.get_stats()
+        }
+    
     def close(self) -> None:
         """
         Close the MongoDB connection.
         """
-        if self.client:
+        if self.client is not None:
             self.client.close()
             self.client = None
             self.db = None
             print("MongoDB connection closed")
+    
+    def _reset_after_fork(self) -> None:
+        """
+        Forget the parent's client in a forked child process.
+        """
+        self.client = None
+        self.db = None
+        self.pool_monitor = PoolMonitor()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
 
 # Create a default instance
 db_connection = DatabaseConnection()
 
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=db_connection._reset_after_fork)
+
 def get_db_connection() -> DatabaseConnection:
     """
     Get the database connection instance.
@@ -109,4 +296,4 @@ def get_db_connection() -> DatabaseConnection:
     Returns:
         DatabaseConnection: Singleton instance of DatabaseConnection
     """
-    return db_connection
\ No newline at end of file
+    return db_connection
@@ -1,7 +1,9 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 import uuid
 from .connection import get_db_connection
+from .write_behind import get_write_behind_queue
+from .records import resolve_projection, to_record, to_records
 
 class DatabaseHandler:
     """
@@ -13,6 +15,7 @@ class DatabaseHandler:
         Initialize the DatabaseHandler.
         """
         self.db_conn = get_db_connection()
+        self.write_behind = get_write_behind_queue()
         
     def _get_collection(self, collection_name: str):
         """
@@ -26,20 +29,48 @@ class DatabaseHandler:
         """
         return self.db_conn.get_collection(collection_name)
     
+    @staticmethod
+    def _build_history_query(student_id: str, topic: Optional[str] = None, subtopic: Optional[str] = None,
+                             start_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Build the filter shared by learning log and quiz result queries.
+        
+        Field order follows the compound indexes declared in database.indexes.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            topic (str, optional): Filter by topic
+            subtopic (str, optional): Filter by subtopic
+            start_date (datetime, optional): Filter by start date
+            
+        Returns:
+            Dict: MongoDB filter document
+        """
+        query = {"student_id": student_id}
+        if topic:
+            query["topic"] = topic
+        if subtopic:
+            query["subtopic"] = subtopic
+        if start_date:
+            query["timestamp"] = {"$gte": start_date}
+        return query
+    
     # ==================== Student Profiles ====================
     
-    def get_student_profile(self, student_id: str) -> Optional[Dict[str, Any]]:
+    def get_student_profile(self, student_id: str,
+                            projection: Optional[Union[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
         """
         Retrieve a student's profile.
         
         Args:
             student_id (str): Unique identifier for the student
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
             
         Returns:
             Dict: Student profile data or None if not found
         """
         students_coll = self._get_collection("students")
-        return students_coll.find_one({"_id": student_id})
+        return students_coll.find_one({"_id": student_id}, resolve_projection(projection))
     
     def create_student_profile(self, student_id: str, profile_data: Dict[str, Any]) -> bool:
         """
@@ -100,6 +131,9 @@ class DatabaseHandler:
         """
         learning_logs_coll = self._get_collection("learning_logs")
         
+        # Topics first studied in the last flush window may still be queued
+        self.write_behind.sync("learning_logs", student_id)
+        
         # Find distinct topics in learning logs
         topics = learning_logs_coll.distinct("topic", {"student_id": student_id})
         return list(topics)
@@ -116,7 +150,8 @@ class DatabaseHandler:
             int: Difficulty level (1-5) or None if not set
         """
         student_levels_coll = self._get_collection("student_levels")
-        result = student_levels_coll.find_one({"student_id": student_id, "topic": topic})
+        result = student_levels_coll.find_one({"student_id": student_id, "topic": topic},
+                                              {"_id": 0, "difficulty_level": 1})
         
         if result:
             return result.get("difficulty_level", 3)  # Default to level 3 if not specified
@@ -166,8 +201,6 @@ class DatabaseHandler:
         Returns:
             str: ID of the log entry
         """
-        learning_logs_coll = self._get_collection("learning_logs")
-        
         log_id = str(uuid.uuid4())
         log_entry = {
             "_id": log_id,
@@ -181,7 +214,7 @@ class DatabaseHandler:
             "duration": 0  # To be updated when session ends
         }
         
-        learning_logs_coll.insert_one(log_entry)
+        self.write_behind.insert("learning_logs", log_entry)
         return log_id
     
     def update_learning_session(self, log_id: str, duration: int) -> bool:
@@ -197,6 +230,9 @@ class DatabaseHandler:
         """
         learning_logs_coll = self._get_collection("learning_logs")
         
+        # The session entry may still be in the write-behind queue
+        self.write_behind.sync("learning_logs")
+        
         try:
             result = learning_logs_coll.update_one(
                 {"_id": log_id},
@@ -208,7 +244,9 @@ class DatabaseHandler:
             return False
     
     def get_learning_logs(self, student_id: str, topic: Optional[str] = None, subtopic: Optional[str] = None, 
-                         start_date: Optional[datetime] = None, limit: int = 20) -> List[Dict[str, Any]]:
+                         start_date: Optional[datetime] = None, limit: int = 20,
+                         projection: Optional[Union[str, Dict[str, Any]]] = None,
+                         record_type: Optional[type] = None) -> List[Any]:
         """
         Get learning logs for a student.
         
@@ -218,24 +256,21 @@ class DatabaseHandler:
             subtopic (str, optional): Filter by subtopic
             start_date (datetime, optional): Filter by start date
             limit (int): Maximum number of logs to return
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
+            record_type (type, optional): NamedTuple record class from database.records to return instead of dicts
             
         Returns:
-            List[Dict]: List of learning logs
+            List: Learning logs, as dicts or record_type instances
         """
         learning_logs_coll = self._get_collection("learning_logs")
         
         # Build query
-        query = {"student_id": student_id}
-        if topic:
-            query["topic"] = topic
-        if subtopic:
-            query["subtopic"] = subtopic
-        if start_date:
-            query["timestamp"] = {"$gte": start_date}
+        query = self._build_history_query(student_id, topic, subtopic, start_date)
         
-        # Execute query
-        logs = list(learning_logs_coll.find(query).sort("timestamp", -1).limit(limit))
-        return logs
+        # Make queued session logs visible, then execute query
+        self.write_behind.sync("learning_logs", student_id)
+        logs = list(learning_logs_coll.find(query, resolve_projection(projection)).sort("timestamp", -1).limit(limit))
+        return to_records(logs, record_type)
     
     def log_learning_interaction(self, student_id: str, interaction_type: str, topic: str, 
                                content: str, response: str) -> str:
@@ -252,8 +287,6 @@ class DatabaseHandler:
         Returns:
             str: ID of the interaction log
         """
-        interactions_coll = self._get_collection("interactions")
-        
         interaction_id = str(uuid.uuid4())
         interaction = {
             "_id": interaction_id,
@@ -265,7 +298,7 @@ class DatabaseHandler:
             "timestamp": datetime.now()
         }
         
-        interactions_coll.insert_one(interaction)
+        self.write_behind.insert("interactions", interaction)
         return interaction_id
     
     # ==================== Quizzes ====================
@@ -304,18 +337,21 @@ class DatabaseHandler:
         quizzes_coll.insert_one(quiz)
         return quiz_id
     
-    def get_quiz(self, quiz_id: str) -> Optional[Dict[str, Any]]:
+    def get_quiz(self, quiz_id: str, projection: Optional[Union[str, Dict[str, Any]]] = None,
+                 record_type: Optional[type] = None) -> Optional[Any]:
         """
         Get a quiz by ID.
         
         Args:
             quiz_id (str): ID of the quiz
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
+            record_type (type, optional): NamedTuple record class from database.records to return instead of dicts
             
         Returns:
-            Dict: Quiz data or None if not found
+            Dict: Quiz data (or a record_type instance) or None if not found
         """
         quizzes_coll = self._get_collection("quizzes")
-        return quizzes_coll.find_one({"_id": quiz_id})
+        return to_record(quizzes_coll.find_one({"_id": quiz_id}, resolve_projection(projection)), record_type)
     
     def update_quiz_metadata(self, quiz_id: str, metadata: Dict[str, Any]) -> bool:
         """
@@ -340,21 +376,85 @@ class DatabaseHandler:
             print(f"Error updating quiz metadata: {e}")
             return False
     
-    def get_quiz_question(self, question_id: str) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _build_question_docs(quiz_id: str, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Build quiz_questions documents for a quiz's parsed questions.
+        
+        Args:
+            quiz_id (str): ID of the quiz
+            questions (List[Dict]): Questions as dumped from state.QuizQuestion
+            
+        Returns:
+            List[Dict]: Documents to insert, in question order
+        """
+        created_at = datetime.now()
+        return [
+            {
+                "_id": str(uuid.uuid4()),
+                "quiz_id": quiz_id,
+                "question_index": index,
+                "question": question["question_text"],
+                "options": question["options"],
+                "correct_answer": question["correct_answer"],
+                "explanation": question.get("explanation", ""),
+                "concepts": question.get("concepts", []),
+                "difficulty_level": question.get("difficulty_level"),
+                "created_at": created_at
+            }
+            for index, question in enumerate(questions)
+        ]
+    
+    def save_quiz_questions(self, quiz_id: str, questions: List[Dict[str, Any]]) -> List[str]:
+        """
+        Save the parsed questions of a quiz, one document per question.
+        
+        Args:
+            quiz_id (str): ID of the quiz
+            questions (List[Dict]): Questions as dumped from state.QuizQuestion
+            
+        Returns:
+            List[str]: IDs of the questions, in question order
+        """
+        docs = self._build_question_docs(quiz_id, questions)
+        if docs:
+            self._get_collection("quiz_questions").insert_many(docs)
+        return [doc["_id"] for doc in docs]
+    
+    def get_quiz_question(self, question_id: str,
+                          projection: Optional[Union[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
         """
         Get a specific quiz question.
         
         Args:
             question_id (str): ID of the question
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
             
         Returns:
             Dict: Question data or None if not found
         """
         questions_coll = self._get_collection("quiz_questions")
-        return questions_coll.find_one({"_id": question_id})
+        return questions_coll.find_one({"_id": question_id}, resolve_projection(projection))
+    
+    def get_quiz_question_at(self, quiz_id: str, question_index: int,
+                             projection: Optional[Union[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a quiz question by its position in the quiz.
+        
+        Args:
+            quiz_id (str): ID of the quiz
+            question_index (int): Index of the question
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
+            
+        Returns:
+            Dict: Question data or None if not found
+        """
+        questions_coll = self._get_collection("quiz_questions")
+        return questions_coll.find_one({"quiz_id": quiz_id, "question_index": question_index},
+                                       resolve_projection(projection))
     
     def log_quiz_answer(self, student_id: str, quiz_id: str, question_index: int, 
-                       student_answer: str, is_correct: bool) -> str:
+                       student_answer: str, is_correct: bool, concepts: Optional[List[str]] = None) -> str:
         """
         Log a student's answer to a quiz question.
         
@@ -364,12 +464,11 @@ class DatabaseHandler:
             question_index (int): Index of the question
             student_answer (str): Student's answer
             is_correct (bool): Whether the answer is correct
+            concepts (List[str], optional): Concepts the question tests
             
         Returns:
             str: ID of the answer log
         """
-        answers_coll = self._get_collection("quiz_answers")
-        
         answer_id = str(uuid.uuid4())
         answer = {
             "_id": answer_id,
@@ -378,33 +477,42 @@ class DatabaseHandler:
             "question_index": question_index,
             "student_answer": student_answer,
             "is_correct": is_correct,
+            "concepts": concepts or [],
             "timestamp": datetime.now()
         }
         
-        answers_coll.insert_one(answer)
+        self.write_behind.insert("quiz_answers", answer)
         return answer_id
     
-    def get_quiz_answers(self, student_id: str, quiz_id: str) -> List[Dict[str, Any]]:
+    def get_quiz_answers(self, student_id: str, quiz_id: str,
+                         projection: Optional[Union[str, Dict[str, Any]]] = None,
+                         record_type: Optional[type] = None) -> List[Any]:
         """
         Get all answers for a specific quiz.
         
         Args:
             student_id (str): Unique identifier for the student
             quiz_id (str): ID of the quiz
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
+            record_type (type, optional): NamedTuple record class from database.records to return instead of dicts
             
         Returns:
-            List[Dict]: List of answers
+            List: Answers, as dicts or record_type instances
         """
         answers_coll = self._get_collection("quiz_answers")
         
+        # Answers logged moments ago may still be in the write-behind queue
+        self.write_behind.sync("quiz_answers", student_id)
+        
         answers = list(answers_coll.find({
             "student_id": student_id,
             "quiz_id": quiz_id
-        }).sort("question_index", 1))
+        }, resolve_projection(projection)).sort("question_index", 1))
         
-        return answers
+        return to_records(answers, record_type)
     
-    def save_quiz_result(self, student_id: str, quiz_id: str, score: float, analysis: str) -> str:
+    def save_quiz_result(self, student_id: str, quiz_id: str, score: float, analysis: str,
+                         analysis_status: str = "ready") -> str:
         """
         Save quiz result with analysis.
         
@@ -413,6 +521,7 @@ class DatabaseHandler:
             quiz_id (str): ID of the quiz
             score (float): Score as a percentage
             analysis (str): Analysis of the quiz result
+            analysis_status (str): "ready", or "pending" while the analysis is generated in the background
             
         Returns:
             str: ID of the result
@@ -420,7 +529,7 @@ class DatabaseHandler:
         results_coll = self._get_collection("quiz_results")
         
         # Get the quiz to include topic and subtopic
-        quiz = self.get_quiz(quiz_id)
+        quiz = self.get_quiz(quiz_id, projection="quiz_header")
         if not quiz:
             return ""
         
@@ -433,28 +542,85 @@ class DatabaseHandler:
             "subtopic": quiz.get("subtopic", ""),
             "score": score,
             "analysis": analysis,
+            "analysis_status": analysis_status,
             "timestamp": datetime.now()
         }
         
         results_coll.insert_one(result)
         return result_id
     
-    def get_quiz_result(self, student_id: str, quiz_id: str) -> Optional[Dict[str, Any]]:
+    def update_quiz_result_analysis(self, result_id: str, analysis: str, analysis_status: str = "ready") -> bool:
+        """
+        Fill in the analysis of a saved quiz result.
+        
+        Args:
+            result_id (str): ID of the result
+            analysis (str): Analysis of the quiz result
+            analysis_status (str): "ready", or "failed" if no analysis could be generated
+            
+        Returns:
+            bool: True if the result was updated, False otherwise
+        """
+        results_coll = self._get_collection("quiz_results")
+        
+        try:
+            result = results_coll.update_one(
+                {"_id": result_id},
+                {"$set": {"analysis": analysis, "analysis_status": analysis_status}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error updating quiz result analysis: {e}")
+            return False
+    
+    def claim_quiz_result_analysis(self, result_id: str, requested_at: Optional[datetime]) -> bool:
+        """
+        Take over a pending analysis whose background job was lost. Only one
+        caller wins: the claim succeeds if the result is still pending and
+        nobody has re-requested it since requested_at was read.
+        
+        Args:
+            result_id (str): ID of the result
+            requested_at (datetime, optional): analysis_requested_at as read, None if it was never set
+            
+        Returns:
+            bool: True if this caller now owns the analysis
+        """
+        results_coll = self._get_collection("quiz_results")
+        
+        try:
+            result = results_coll.update_one(
+                {"_id": result_id, "analysis_status": "pending", "analysis_requested_at": requested_at},
+                {"$set": {"analysis_requested_at": datetime.now()}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error claiming quiz result analysis: {e}")
+            return False
+    
+    def get_quiz_result(self, student_id: str, quiz_id: str,
+                        projection: Optional[Union[str, Dict[str, Any]]] = None,
+                        record_type: Optional[type] = None) -> Optional[Any]:
         """
         Get a specific quiz result.
         
         Args:
             student_id (str): Unique identifier for the student
             quiz_id (str): ID of the quiz
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
+            record_type (type, optional): NamedTuple record class from database.records to return instead of dicts
             
         Returns:
-            Dict: Quiz result or None if not found
+            Dict: Quiz result (or a record_type instance) or None if not found
         """
         results_coll = self._get_collection("quiz_results")
-        return results_coll.find_one({"student_id": student_id, "quiz_id": quiz_id})
+        result = results_coll.find_one({"student_id": student_id, "quiz_id": quiz_id}, resolve_projection(projection))
+        return to_record(result, record_type)
     
     def get_quiz_results(self, student_id: str, topic: Optional[str] = None, subtopic: Optional[str] = None,
-                        start_date: Optional[datetime] = None, limit: int = 10) -> List[Dict[str, Any]]:
+                        start_date: Optional[datetime] = None, limit: int = 10,
+                        projection: Optional[Union[str, Dict[str, Any]]] = None,
+                        record_type: Optional[type] = None) -> List[Any]:
         """
         Get quiz results for a student.
         
@@ -464,27 +630,262 @@ class DatabaseHandler:
             subtopic (str, optional): Filter by subtopic
             start_date (datetime, optional): Filter by start date
             limit (int): Maximum number of results to return
+            projection (str or Dict, optional): Fields to return, as a PROJECTIONS preset name or projection document
+            record_type (type, optional): NamedTuple record class from database.records to return instead of dicts
             
         Returns:
-            List[Dict]: List of quiz results
+            List: Quiz results, as dicts or record_type instances
         """
         results_coll = self._get_collection("quiz_results")
         
         # Build query
-        query = {"student_id": student_id}
-        if topic:
-            query["topic"] = topic
-        if subtopic:
-            query["subtopic"] = subtopic
-        if start_date:
-            query["timestamp"] = {"$gte": start_date}
+        query = self._build_history_query(student_id, topic, subtopic, start_date)
         
         # Execute query
-        results = list(results_coll.find(query).sort("timestamp", -1).limit(limit))
-        return results
+        results = list(results_coll.find(query, resolve_projection(projection)).sort("timestamp", -1).limit(limit))
+        return to_records(results, record_type)
+    
+    # ==================== Question Bank ====================
+    
+    @staticmethod
+    def _build_bank_docs(topic: str, subtopic: str, difficulty_level: int, concept: str,
+                         questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Build question_bank documents for pre-generated questions.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level of the questions
+            concept (str): Concept the questions were generated for
+            questions (List[Dict]): Questions as dumped from state.QuizQuestion
+            
+        Returns:
+            List[Dict]: Documents to insert
+        """
+        created_at = datetime.now()
+        return [
+            {
+                "_id": str(uuid.uuid4()),
+                "topic": topic,
+                "subtopic": subtopic,
+                "difficulty_level": difficulty_level,
+                "concept": concept,
+                "question": question["question_text"],
+                "options": question["options"],
+                "correct_answer": question["correct_answer"],
+                "explanation": question.get("explanation", ""),
+                "concepts": question.get("concepts") or [concept],
+                "created_at": created_at
+            }
+            for question in questions
+        ]
+    
+    def save_bank_questions(self, topic: str, subtopic: str, difficulty_level: int, concept: str,
+                            questions: List[Dict[str, Any]]) -> int:
+        """
+        Add pre-generated questions to the question bank.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level of the questions
+            concept (str): Concept the questions were generated for
+            questions (List[Dict]): Questions as dumped from state.QuizQuestion
+            
+        Returns:
+            int: Number of questions added
+        """
+        docs = self._build_bank_docs(topic, subtopic, difficulty_level, concept, questions)
+        if docs:
+            self._get_collection("question_bank").insert_many(docs)
+        return len(docs)
+    
+    def count_bank_questions(self, topic: str, subtopic: str, difficulty_level: int) -> Dict[str, int]:
+        """
+        Count the banked questions of a subtopic and difficulty level.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level
+            
+        Returns:
+            Dict[str, int]: Number of banked questions per concept
+        """
+        bank_coll = self._get_collection("question_bank")
+        pipeline = [
+            {"$match": {"topic": topic, "subtopic": subtopic, "difficulty_level": difficulty_level}},
+            {"$group": {"_id": "$concept", "count": {"$sum": 1}}}
+        ]
+        return {doc["_id"]: doc["count"] for doc in bank_coll.aggregate(pipeline)}
+    
+    def take_bank_questions(self, topic: str, subtopic: str, difficulty_level: int,
+                            concepts: List[str], count: int) -> List[Dict[str, Any]]:
+        """
+        Remove and return up to count banked questions, cycling through the
+        concepts in order so the quiz covers as many of them as possible.
+        
+        Questions are taken with find_one_and_delete, so concurrent quizzes
+        never get the same question.
+        
+        Args:
+            topic (str): The main topic
+            subtopic (str): The specific subtopic
+            difficulty_level (int): Difficulty level
+            concepts (List[str]): Concepts to test, highest priority first (empty for any concept)
+            count (int): Number of questions wanted
+            
+        Returns:
+            List[Dict]: The questions taken, oldest first per concept
+        """
+        bank_coll = self._get_collection("question_bank")
+        query = {"topic": topic, "subtopic": subtopic, "difficulty_level": difficulty_level}
+        
+        taken = []
+        remaining = list(concepts) or [None]
+        while remaining and len(taken) < count:
+            for concept in list(remaining):
+                if len(taken) >= count:
+                    break
+                concept_query = query if concept is None else {**query, "concept": concept}
+                doc = bank_coll.find_one_and_delete(concept_query, sort=[("created_at", 1)])
+                if doc is None:
+                    remaining.remove(concept)
+                else:
+                    taken.append(doc)
+        return taken
     
     # ==================== Progress Tracking ====================
     
+    @staticmethod
+    def _build_progress_stats_pipeline(student_id: str, since: Optional[datetime] = None,
+                                       topics: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Build the aggregation behind get_progress_stats.
+        
+        Learning logs are grouped by topic inside a $facet, which always
+        emits exactly one document, even for a student without logs. The
+        student's difficulty levels and quiz results are joined onto that
+        document with $lookup on student_id, and a second $facet groups the
+        quiz results by topic. Only $facet, $group and equality $lookup are
+        used, so it runs on any MongoDB from 3.4 on.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            since (datetime, optional): Only count activity from this date on
+            topics (List[str], optional): Only include these topics
+            
+        Returns:
+            List[Dict]: Aggregation pipeline for the learning_logs collection
+        """
+        match = {"student_id": student_id}
+        quiz_match = {"quiz": {"$exists": True}}
+        if topics:
+            match["topic"] = {"$in": list(topics)}
+            quiz_match["quiz.topic"] = {"$in": list(topics)}
+        if since:
+            match["timestamp"] = {"$gte": since}
+            quiz_match["quiz.timestamp"] = {"$gte": since}
+        
+        score = "$quiz.score"
+        concepts = {"$ifNull": ["$quiz.concepts", []]}
+        
+        return [
+            {"$match": match},
+            {"$facet": {"topics": [{"$group": {
+                "_id": "$topic",
+                "study_minutes": {"$sum": {"$ifNull": ["$duration", 0]}},
+                "sessions": {"$sum": 1},
+                "subtopics": {"$addToSet": "$subtopic"}
+            }}]}},
+            {"$addFields": {"student_id": {"$literal": student_id}}},
+            {"$lookup": {"from": "student_levels", "localField": "student_id", "foreignField": "student_id",
+                         "as": "levels"}},
+            # $lookup directly followed by $unwind is executed as one stage, so
+            # the joined results never have to fit in a single document
+            {"$lookup": {"from": "quiz_results", "localField": "student_id", "foreignField": "student_id",
+                         "as": "quiz"}},
+            {"$unwind": {"path": "$quiz", "preserveNullAndEmptyArrays": True}},
+            {"$facet": {
+                "logs": [
+                    {"$limit": 1},
+                    {"$project": {"_id": 0, "topics": 1, "levels.topic": 1, "levels.difficulty_level": 1}}
+                ],
+                "quizzes": [
+                    {"$match": quiz_match},
+                    {"$group": {
+                        "_id": "$quiz.topic",
+                        "quizzes": {"$sum": 1},
+                        "average_score": {"$avg": score},
+                        "min_score": {"$min": score},
+                        "max_score": {"$max": score},
+                        "mastered": {"$push": {"$cond": [{"$gte": [score, 80]}, concepts, []]}},
+                        "gaps": {"$push": {"$cond": [{"$lt": [score, 60]}, concepts, []]}}
+                    }}
+                ]
+            }}
+        ]
+    
+    @staticmethod
+    def _format_progress_stats(docs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Turn get_progress_stats aggregation output into a dict keyed by topic.
+        
+        Args:
+            docs (List[Dict]): Aggregation results, a single document with "logs" and "quizzes"
+            
+        Returns:
+            Dict[str, Dict]: Per-topic statistics, for topics with activity in the period
+        """
+        if not docs:
+            return {}
+        
+        seed = docs[0]["logs"][0] if docs[0]["logs"] else {}
+        logs = {doc["_id"]: doc for doc in seed.get("topics", [])}
+        levels = {level.get("topic"): level.get("difficulty_level") for level in seed.get("levels", [])}
+        quizzes = {doc["_id"]: doc for doc in docs[0]["quizzes"]}
+        
+        stats = {}
+        for topic in sorted(set(logs) | set(quizzes)):
+            log_stats = logs.get(topic, {})
+            quiz_stats = quizzes.get(topic, {})
+            stats[topic] = {
+                "study_minutes": log_stats.get("study_minutes", 0),
+                "sessions": log_stats.get("sessions", 0),
+                "quizzes": quiz_stats.get("quizzes", 0),
+                "average_score": quiz_stats.get("average_score") or 0,
+                "min_score": quiz_stats.get("min_score"),
+                "max_score": quiz_stats.get("max_score"),
+                "difficulty_level": levels.get(topic),
+                "subtopics": sorted(subtopic for subtopic in log_stats.get("subtopics", []) if subtopic is not None),
+                "mastered_concepts": sorted({concept for group in quiz_stats.get("mastered", []) for concept in group}),
+                "knowledge_gaps": sorted({concept for group in quiz_stats.get("gaps", []) for concept in group})
+            }
+        return stats
+    
+    def get_progress_stats(self, student_id: str, since: Optional[datetime] = None,
+                           topics: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Compute per-topic progress statistics in a single aggregation.
+        
+        Args:
+            student_id (str): Unique identifier for the student
+            since (datetime, optional): Only count activity from this date on
+            topics (List[str], optional): Only include these topics
+            
+        Returns:
+            Dict[str, Dict]: Topic -> study_minutes, sessions, quizzes, average/min/max
+            score, difficulty_level, subtopics, mastered_concepts and knowledge_gaps
+        """
+        learning_logs_coll = self._get_collection("learning_logs")
+        
+        # Make queued session logs visible before aggregating
+        self.write_behind.sync("learning_logs", student_id)
+        
+        pipeline = self._build_progress_stats_pipeline(student_id, since, topics)
+        return self._format_progress_stats(list(learning_logs_coll.aggregate(pipeline)))
+    
     def save_progress_report(self, student_id: str, topic: str, time_period: int, 
                            average_score: float, analysis: str) -> str:
         """
@@ -528,8 +929,6 @@ class DatabaseHandler:
         Returns:
             str: ID of the analysis
         """
-        patterns_coll = self._get_collection("learning_patterns")
-        
         analysis_id = str(uuid.uuid4())
         pattern_analysis = {
             "_id": analysis_id,
@@ -539,7 +938,7 @@ class DatabaseHandler:
             "created_at": datetime.now()
         }
         
-        patterns_coll.insert_one(pattern_analysis)
+        self.write_behind.insert("learning_patterns", pattern_analysis)
         return analysis_id
     
     def save_progress_summary(self, student_id: str, time_period: int, summary: str, 
@@ -620,8 +1019,6 @@ class DatabaseHandler:
         Returns:
             str: ID of the recommendations log
         """
-        resources_coll = self._get_collection("resource_recommendations")
-        
         rec_id = str(uuid.uuid4())
         rec = {
             "_id": rec_id,
@@ -632,7 +1029,7 @@ class DatabaseHandler:
             "created_at": datetime.now()
         }
         
-        resources_coll.insert_one(rec)
+        self.write_behind.insert("resource_recommendations", rec)
         return rec_id
     
     def get_default_concepts(self, topic: str, subtopic: str) -> List[str]:
@@ -648,7 +1045,7 @@ class DatabaseHandler:
         """
         curriculum_coll = self._get_collection("curriculum")
         
-        result = curriculum_coll.find_one({"topic": topic, "subtopic": subtopic})
+        result = curriculum_coll.find_one({"topic": topic, "subtopic": subtopic}, {"_id": 0, "concepts": 1})
         if result and "concepts" in result:
             return result["concepts"]
         
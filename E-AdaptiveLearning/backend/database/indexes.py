@@ -0,0 +1,207 @@
+import sys
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
+import config
+from .connection import get_db_connection
+from .db_handler import DatabaseHandler
+
+# Compound indexes required by the DatabaseHandler query shapes, keyed by the
+# logical collection names in config.COLLECTIONS. Equality fields come first,
+# then the sort/range field (timestamp), so each query is a bounded index scan
+# that returns documents already in sort order.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "learning_logs": [
+        # get_student_topics, get_learning_logs(student_id[, start_date])
+        IndexModel([("student_id", ASCENDING), ("timestamp", DESCENDING)],
+                   name="student_timestamp"),
+        # get_learning_logs(student_id, topic[, start_date])
+        IndexModel([("student_id", ASCENDING), ("topic", ASCENDING), ("timestamp", DESCENDING)],
+                   name="student_topic_timestamp"),
+        # get_learning_logs(student_id, topic, subtopic[, start_date])
+        IndexModel([("student_id", ASCENDING), ("topic", ASCENDING), ("subtopic", ASCENDING),
+                    ("timestamp", DESCENDING)],
+                   name="student_topic_subtopic_timestamp"),
+    ],
+    "quiz_results": [
+        IndexModel([("student_id", ASCENDING), ("timestamp", DESCENDING)],
+                   name="student_timestamp"),
+        IndexModel([("student_id", ASCENDING), ("topic", ASCENDING), ("timestamp", DESCENDING)],
+                   name="student_topic_timestamp"),
+        IndexModel([("student_id", ASCENDING), ("topic", ASCENDING), ("subtopic", ASCENDING),
+                    ("timestamp", DESCENDING)],
+                   name="student_topic_subtopic_timestamp"),
+        # get_quiz_result
+        IndexModel([("student_id", ASCENDING), ("quiz_id", ASCENDING)],
+                   name="student_quiz"),
+    ],
+    "student_levels": [
+        # get/update_student_difficulty_level; one level per student and topic
+        IndexModel([("student_id", ASCENDING), ("topic", ASCENDING)],
+                   name="student_topic", unique=True),
+    ],
+    "quiz_answers": [
+        # get_quiz_answers sorts by question_index
+        IndexModel([("student_id", ASCENDING), ("quiz_id", ASCENDING), ("question_index", ASCENDING)],
+                   name="student_quiz_question"),
+    ],
+    "quiz_questions": [
+        # Questions of a quiz in order
+        IndexModel([("quiz_id", ASCENDING), ("question_index", ASCENDING)],
+                   name="quiz_question"),
+    ],
+    "question_bank": [
+        # take_bank_questions (oldest question of a concept first), count_bank_questions
+        IndexModel([("topic", ASCENDING), ("subtopic", ASCENDING), ("difficulty_level", ASCENDING),
+                    ("concept", ASCENDING), ("created_at", ASCENDING)],
+                   name="topic_subtopic_level_concept_created"),
+    ],
+    "curriculum": [
+        # get_default_concepts
+        IndexModel([("topic", ASCENDING), ("subtopic", ASCENDING)],
+                   name="topic_subtopic"),
+    ],
+    "interactions": [
+        IndexModel([("student_id", ASCENDING), ("timestamp", DESCENDING)],
+                   name="student_timestamp"),
+    ],
+}
+
+def ensure_indexes(indexes: Optional[Dict[str, List[IndexModel]]] = None) -> Dict[str, List[str]]:
+    """
+    Create the declared indexes. Safe to call on every startup: MongoDB
+    treats creating an existing index with the same spec as a no-op.
+    
+    Args:
+        indexes (Dict, optional): Index declarations, defaults to INDEXES
+    
+    Returns:
+        Dict[str, List[str]]: Names of the indexes ensured per collection
+    """
+    db_conn = get_db_connection()
+    ensured = {}
+    
+    for collection_key, models in (indexes or INDEXES).items():
+        collection = db_conn.get_collection(config.COLLECTIONS[collection_key])
+        ensured[collection_key] = collection.create_indexes(models)
+    
+    return ensured
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """
+    Collect every stage name in an explain() plan tree.
+    
+    Args:
+        plan (Dict): A winningPlan document
+    
+    Returns:
+        List[str]: Stage names
+    """
+    stages = [plan.get("stage", "")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    # Plans executed by the slot-based engine wrap the classic plan
+    if "queryPlan" in plan:
+        stages += _plan_stages(plan["queryPlan"])
+    return stages
+
+def _handler_query_shapes(handler: DatabaseHandler, student_id: str) -> Dict[str, Any]:
+    """
+    Build the queries DatabaseHandler issues, with sample values.
+    
+    Args:
+        handler (DatabaseHandler): Handler whose query builders are used
+        student_id (str): Sample student ID
+    
+    Returns:
+        Dict: Query name -> (collection key, filter, sort) tuples
+    """
+    since = datetime.now()
+    history_queries = {
+        "by_student": handler._build_history_query(student_id),
+        "by_topic": handler._build_history_query(student_id, "topic"),
+        "by_subtopic": handler._build_history_query(student_id, "topic", "subtopic"),
+        "by_topic_since": handler._build_history_query(student_id, "topic", start_date=since),
+        "by_subtopic_since": handler._build_history_query(student_id, "topic", "subtopic", since),
+    }
+    
+    shapes = {}
+    for name, query in history_queries.items():
+        shapes[f"get_learning_logs.{name}"] = ("learning_logs", query, [("timestamp", -1)])
+        shapes[f"get_quiz_results.{name}"] = ("quiz_results", query, [("timestamp", -1)])
+    
+    shapes["get_quiz_result"] = ("quiz_results", {"student_id": student_id, "quiz_id": "quiz"}, None)
+    shapes["get_student_difficulty_level"] = ("student_levels", {"student_id": student_id, "topic": "topic"}, None)
+    shapes["get_quiz_answers"] = ("quiz_answers", {"student_id": student_id, "quiz_id": "quiz"},
+                                  [("question_index", 1)])
+    shapes["get_quiz_question_at"] = ("quiz_questions", {"quiz_id": "quiz", "question_index": 0}, None)
+    bank_query = {"topic": "topic", "subtopic": "subtopic", "difficulty_level": 3}
+    shapes["take_bank_questions.by_concept"] = ("question_bank", {**bank_query, "concept": "concept"},
+                                                [("created_at", 1)])
+    shapes["take_bank_questions.any_concept"] = ("question_bank", bank_query, [("created_at", 1)])
+    shapes["get_default_concepts"] = ("curriculum", {"topic": "topic", "subtopic": "subtopic"}, None)
+    return shapes
+
+def check_query_plans(student_id: str = "__index_check__") -> Dict[str, List[str]]:
+    """
+    Run explain() on every DatabaseHandler query shape.
+    
+    Args:
+        student_id (str): Sample student ID used in the filters
+    
+    Returns:
+        Dict[str, List[str]]: Query name -> plan stages of the winning plan
+    """
+    handler = DatabaseHandler()
+    db_conn = get_db_connection()
+    plans = {}
+    
+    for name, (collection_key, query, sort) in _handler_query_shapes(handler, student_id).items():
+        collection = db_conn.get_collection(config.COLLECTIONS[collection_key])
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.limit(1).explain()
+        plans[name] = _plan_stages(explain["queryPlanner"]["winningPlan"])
+    
+    # get_student_topics uses distinct()
+    explain = db_conn.get_database().command({
+        "explain": {
+            "distinct": config.COLLECTIONS["learning_logs"],
+            "key": "topic",
+            "query": {"student_id": student_id}
+        }
+    })
+    plans["get_student_topics"] = _plan_stages(explain["queryPlanner"]["winningPlan"])
+    
+    return plans
+
+def assert_no_collection_scans(student_id: str = "__index_check__") -> None:
+    """
+    Fail if any DatabaseHandler query is still planned as a collection scan.
+    
+    Args:
+        student_id (str): Sample student ID used in the filters
+    
+    Raises:
+        RuntimeError: If one or more queries use COLLSCAN
+    """
+    plans = check_query_plans(student_id)
+    collscans = sorted(name for name, stages in plans.items() if "COLLSCAN" in stages)
+    if collscans:
+        raise RuntimeError(f"Queries without a supporting index (COLLSCAN): {', '.join(collscans)}")
+
+if __name__ == "__main__":
+    # Usage: python -m database.indexes [--check]
+    for collection_key, names in ensure_indexes().items():
+        print(f"{collection_key}: {', '.join(names)}")
+    
+    if "--check" in sys.argv:
+        try:
+            assert_no_collection_scans()
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        print("All handler queries use an index.")
@@ -0,0 +1,118 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, NamedTuple, Union
+
+# Projection presets for DatabaseHandler reads, named after what the caller
+# needs. Large free-text fields (content, analysis, content_summary) are
+# only fetched by callers that actually use them.
+PROJECTIONS: Dict[str, Dict[str, int]] = {
+    # learning_logs
+    "log_subtopics": {"_id": 0, "subtopic": 1},
+    "log_timeline": {"_id": 0, "timestamp": 1, "subtopic": 1, "activity_type": 1, "duration": 1},
+    # quiz_results
+    "result_exists": {"_id": 1},
+    "result_scores": {"_id": 0, "score": 1},
+    "result_concepts": {"_id": 0, "score": 1, "concepts": 1},
+    "result_concept_scores": {"_id": 0, "concept_scores": 1},
+    "result_analysis": {"score": 1, "analysis": 1, "analysis_status": 1, "timestamp": 1, "analysis_requested_at": 1},
+    "result_timeline": {"_id": 0, "timestamp": 1, "subtopic": 1, "score": 1, "concepts": 1},
+    # quizzes
+    "quiz_header": {"student_id": 1, "topic": 1, "subtopic": 1, "difficulty_level": 1,
+                    "question_count": 1, "created_at": 1, "metadata": 1},
+    # quiz_answers
+    "answer_correctness": {"_id": 0, "question_index": 1, "is_correct": 1, "concepts": 1},
+    # quiz_questions
+    "question_text": {"question": 1},
+    "question_key": {"_id": 0, "question": 1, "options": 1, "correct_answer": 1, "explanation": 1, "concepts": 1}
+}
+
+class LearningLogRecord(NamedTuple):
+    """Lightweight, typed view of a learning_logs document."""
+    id: Optional[str] = None
+    student_id: Optional[str] = None
+    topic: Optional[str] = None
+    subtopic: Optional[str] = None
+    difficulty_level: Optional[int] = None
+    activity_type: Optional[str] = None
+    duration: int = 0
+    timestamp: Optional[datetime] = None
+
+class QuizRecord(NamedTuple):
+    """Lightweight, typed view of a quizzes document (without its content)."""
+    id: Optional[str] = None
+    student_id: Optional[str] = None
+    topic: Optional[str] = None
+    subtopic: Optional[str] = None
+    difficulty_level: Optional[int] = None
+    question_count: int = 0
+    created_at: Optional[datetime] = None
+
+class QuizAnswerRecord(NamedTuple):
+    """Lightweight, typed view of a quiz_answers document."""
+    id: Optional[str] = None
+    quiz_id: Optional[str] = None
+    question_index: int = 0
+    student_answer: Optional[str] = None
+    is_correct: bool = False
+    timestamp: Optional[datetime] = None
+
+class QuizResultRecord(NamedTuple):
+    """Lightweight, typed view of a quiz_results document (without its analysis)."""
+    id: Optional[str] = None
+    quiz_id: Optional[str] = None
+    topic: Optional[str] = None
+    subtopic: Optional[str] = None
+    score: float = 0.0
+    concepts: Optional[List[str]] = None
+    concept_scores: Optional[Dict[str, float]] = None
+    timestamp: Optional[datetime] = None
+
+def resolve_projection(projection: Optional[Union[str, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Turn a projection argument into a MongoDB projection document.
+    
+    Args:
+        projection (str or Dict, optional): A PROJECTIONS preset name or a projection document
+    
+    Returns:
+        Dict: Projection document, or None for whole documents
+    
+    Raises:
+        KeyError: If the preset name is unknown
+    """
+    if isinstance(projection, str):
+        return PROJECTIONS[projection]
+    return projection
+
+def to_record(doc: Optional[Dict[str, Any]], record_type: Optional[type] = None) -> Any:
+    """
+    Convert a document to a typed record. Fields missing from the document
+    (e.g. projected out) take the record's defaults; extra fields are dropped.
+    
+    Args:
+        doc (Dict, optional): MongoDB document
+        record_type (type, optional): NamedTuple record class; None keeps the dict
+    
+    Returns:
+        The record, the unchanged document if record_type is None, or None
+    """
+    if doc is None or record_type is None:
+        return doc
+    values = {field: doc[field] for field in record_type._fields if field in doc}
+    if "_id" in doc and "id" in record_type._fields:
+        values["id"] = doc["_id"]
+    return record_type(**values)
+
+def to_records(docs: List[Dict[str, Any]], record_type: Optional[type] = None) -> List[Any]:
+    """
+    Convert a list of documents to typed records.
+    
+    Args:
+        docs (List[Dict]): MongoDB documents
+        record_type (type, optional): NamedTuple record class; None keeps the dicts
+    
+    Returns:
+        List: Records, or the unchanged documents if record_type is None
+    """
+    if record_type is None:
+        return docs
+    return [to_record(doc, record_type) for doc in docs]
@@ -0,0 +1,439 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+import pymongo
+from bson import json_util
+import config
+from .connection import get_db_connection
+
+# Duplicate key: the document was already written by an earlier attempt
+_DUPLICATE_KEY_ERROR = 11000
+
+class WriteBehindQueue:
+    """
+    Background buffer for append-only inserts (interaction and audit logs).
+    
+    Documents are queued and written by a worker thread with
+    insert_many(ordered=False), in batches of up to batch_size or every
+    flush_interval seconds. Callers get control back immediately. The
+    queue is bounded: when MongoDB falls behind and the queue fills up,
+    callers block for up to enqueue_timeout and then write through
+    synchronously. Batches that still fail after retries are appended to
+    spill_path (JSON lines) if it is set, and can be re-inserted later with
+    replay_spill().
+    """
+    
+    _stop = object()
+    
+    def __init__(self, enabled: bool = True, batch_size: int = 100, flush_interval: float = 0.5,
+                 max_queued: int = 10000, enqueue_timeout: float = 1.0, max_retries: int = 3,
+                 spill_path: Optional[str] = None):
+        """
+        Initialize the write-behind queue.
+        
+        Args:
+            enabled (bool): If False, every insert is written synchronously
+            batch_size (int): Maximum documents per insert_many
+            flush_interval (float): Seconds to wait for a batch to fill up
+            max_queued (int): Maximum queued documents before callers block
+            enqueue_timeout (float): Seconds a caller blocks on a full queue before writing through
+            max_retries (int): Attempts per batch before it is spilled
+            spill_path (str, optional): JSON lines file for batches that could not be written
+        """
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.spill_path = spill_path
+        self.db_conn = get_db_connection()
+        
+        self._cond = threading.Condition()
+        self._pending: Dict[Tuple[str, Optional[str]], int] = defaultdict(int)  # (collection, student_id) -> queued
+        self._flush_requested = threading.Event()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._worker: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._closed = False
+        
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.write_through = 0
+        self.spilled = 0
+        self.max_batch_latency_ms = 0.0
+    
+    # ==================== Producer side ====================
+    
+    def insert(self, collection_name: str, document: Dict[str, Any]) -> None:
+        """
+        Insert a document, in the background when enabled.
+        
+        Args:
+            collection_name (str): Name of the collection
+            document (Dict): Document to insert; must already carry its _id
+        """
+        if not self.enabled or self._closed:
+            self._write_through(collection_name, document)
+            return
+        
+        self._ensure_worker()
+        with self._cond:
+            self._pending[(collection_name, document.get("student_id"))] += 1
+        
+        try:
+            self._queue.put((collection_name, document), timeout=self.enqueue_timeout)
+            with self._cond:
+                self.queued += 1
+        except queue.Full:
+            # Backpressure: MongoDB is not keeping up, so this caller pays
+            # for its own write instead of growing the buffer
+            self._mark_done(collection_name, [document])
+            self._write_through(collection_name, document)
+    
+    def _write_through(self, collection_name: str, document: Dict[str, Any]) -> None:
+        """
+        Write a single document synchronously, spilling it if that fails.
+        
+        Args:
+            collection_name (str): Name of the collection
+            document (Dict): Document to insert
+        """
+        with self._cond:
+            self.write_through += 1
+        try:
+            self.db_conn.get_collection(collection_name).insert_one(document)
+        except pymongo.errors.DuplicateKeyError:
+            pass
+        except pymongo.errors.PyMongoError as e:
+            print(f"Error writing {collection_name} document: {e}")
+            self._spill(collection_name, [document])
+    
+    def _ensure_worker(self) -> None:
+        """
+        Start the worker thread on first use, or again in a forked child.
+        """
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        
+        with self._cond:
+            if self._pid != os.getpid():
+                # Threads and queued items do not survive fork(); the parent
+                # still owns (and flushes) whatever it had buffered
+                self._queue = queue.Queue(maxsize=self.max_queued)
+                self._pending = defaultdict(int)
+                self._worker = None
+                self._pid = os.getpid()
+            
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._worker.start()
+    
+    # ==================== Consumer side ====================
+    
+    def _run(self) -> None:
+        """
+        Worker loop: collect a batch, write it, repeat until stopped.
+        """
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+            if stop:
+                return
+    
+    def _next_batch(self) -> Tuple[List[Tuple[str, Dict[str, Any]]], bool]:
+        """
+        Wait for the next batch of queued documents.
+        
+        Returns:
+            Tuple: (collection name, document) pairs and whether to stop afterwards
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if self._flush_requested.is_set():
+                timeout = 0
+            elif deadline is None:
+                timeout = None
+            else:
+                # Wait in short slices so a flush request is noticed quickly
+                timeout = min(max(deadline - time.monotonic(), 0), 0.05)
+            
+            try:
+                item = self._queue.get(timeout=timeout) if timeout != 0 else self._queue.get_nowait()
+            except queue.Empty:
+                if self._flush_requested.is_set() or deadline is None or time.monotonic() >= deadline:
+                    break
+                continue
+            
+            if item is self._stop:
+                return batch, True
+            
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        
+        if self._queue.empty():
+            self._flush_requested.clear()
+        return batch, False
+    
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Write a batch, one unordered insert_many per collection.
+        
+        Args:
+            batch (List): (collection name, document) pairs
+        """
+        started = time.monotonic()
+        by_collection: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for collection_name, document in batch:
+            by_collection[collection_name].append(document)
+        
+        for collection_name, documents in by_collection.items():
+            failed = self._insert_many(collection_name, documents)
+            if failed:
+                self._spill(collection_name, failed)
+            with self._cond:
+                self.written += len(documents) - len(failed)
+            self._mark_done(collection_name, documents)
+        
+        with self._cond:
+            self.batches += 1
+            self.max_batch_latency_ms = max(self.max_batch_latency_ms, (time.monotonic() - started) * 1000)
+    
+    def _insert_many(self, collection_name: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert documents with retries.
+        
+        Args:
+            collection_name (str): Name of the collection
+            documents (List[Dict]): Documents to insert
+        
+        Returns:
+            List[Dict]: Documents that could not be written
+        """
+        remaining = documents
+        for attempt in range(self.max_retries):
+            try:
+                self.db_conn.get_collection(collection_name).insert_many(remaining, ordered=False)
+                return []
+            except pymongo.errors.BulkWriteError as e:
+                # With ordered=False every other document was attempted;
+                # duplicates mean an earlier attempt already succeeded
+                errors = [error for error in e.details.get("writeErrors", [])
+                          if error.get("code") != _DUPLICATE_KEY_ERROR]
+                remaining = [remaining[error["index"]] for error in errors]
+                if not remaining:
+                    return []
+                print(f"Error writing {len(remaining)} {collection_name} documents: {errors[0].get('errmsg')}")
+            except pymongo.errors.PyMongoError as e:
+                print(f"Error writing {collection_name} batch (attempt {attempt + 1}): {e}")
+            
+            time.sleep(min(0.5 * 2 ** attempt, 5))
+        
+        return remaining
+    
+    def _mark_done(self, collection_name: str, documents: List[Dict[str, Any]]) -> None:
+        """
+        Record that queued documents have been handled and wake up waiters.
+        
+        Args:
+            collection_name (str): Name of the collection
+            documents (List[Dict]): Documents handled
+        """
+        with self._cond:
+            for document in documents:
+                key = (collection_name, document.get("student_id"))
+                self._pending[key] -= 1
+                if self._pending[key] <= 0:
+                    del self._pending[key]
+            self._cond.notify_all()
+    
+    # ==================== Spill file ====================
+    
+    def _spill(self, collection_name: str, documents: List[Dict[str, Any]]) -> None:
+        """
+        Append documents that could not be written to the spill file.
+        
+        Args:
+            collection_name (str): Name of the collection
+            documents (List[Dict]): Documents to keep
+        """
+        if not self.spill_path:
+            print(f"Dropped {len(documents)} {collection_name} documents (no spill file configured)")
+            return
+        
+        lines = [json_util.dumps({"collection": collection_name, "document": document}) + "\n"
+                 for document in documents]
+        with self._cond:
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                spill_file.writelines(lines)
+                spill_file.flush()
+                os.fsync(spill_file.fileno())
+            self.spilled += len(documents)
+    
+    def replay_spill(self) -> int:
+        """
+        Re-insert documents from the spill file, e.g. at startup.
+        
+        Returns:
+            int: Number of documents written
+        """
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return 0
+        
+        replay_path = f"{self.spill_path}.{os.getpid()}.replay"
+        with self._cond:
+            os.replace(self.spill_path, replay_path)
+        
+        by_collection: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        with open(replay_path, encoding="utf-8") as replay_file:
+            for line in replay_file:
+                if line.strip():
+                    entry = json_util.loads(line)
+                    by_collection[entry["collection"]].append(entry["document"])
+        
+        written = 0
+        for collection_name, documents in by_collection.items():
+            failed = self._insert_many(collection_name, documents)
+            if failed:
+                self._spill(collection_name, failed)
+            written += len(documents) - len(failed)
+        
+        os.remove(replay_path)
+        return written
+    
+    # ==================== Flushing ====================
+    
+    def _is_pending(self, collection_name: str, student_id: Optional[str] = None) -> bool:
+        """
+        Check for queued documents; the caller must hold self._cond.
+        """
+        return any(collection == collection_name and (student_id is None or owner == student_id)
+                   for collection, owner in self._pending)
+    
+    def is_pending(self, collection_name: str, student_id: Optional[str] = None) -> bool:
+        """
+        Check whether documents for a collection are still queued.
+        
+        Args:
+            collection_name (str): Name of the collection
+            student_id (str, optional): Only consider this student's documents
+        
+        Returns:
+            bool: True if a matching document has not been written yet
+        """
+        with self._cond:
+            return self._is_pending(collection_name, student_id)
+    
+    def sync(self, collection_name: str, student_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> bool:
+        """
+        Wait until queued documents for a collection are written, so a
+        following read sees them. Returns at once if nothing is queued.
+        
+        Args:
+            collection_name (str): Name of the collection
+            student_id (str, optional): Only wait for this student's documents
+            timeout (float, optional): Maximum seconds to wait
+        
+        Returns:
+            bool: True if nothing matching is pending
+        """
+        with self._cond:
+            if not self._is_pending(collection_name, student_id):
+                return True
+            self._flush_requested.set()
+            return self._cond.wait_for(lambda: not self._is_pending(collection_name, student_id), timeout)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued document is written.
+        
+        Args:
+            timeout (float, optional): Maximum seconds to wait
+        
+        Returns:
+            bool: True if the queue was fully drained
+        """
+        with self._cond:
+            if not self._pending:
+                return True
+            self._flush_requested.set()
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Flush and stop the worker. Later inserts are written synchronously.
+        
+        Args:
+            timeout (float, optional): Maximum seconds to wait for the worker
+        """
+        if self._closed:
+            return
+        self._closed = True
+        
+        worker = self._worker
+        if worker is not None and worker.is_alive() and self._pid == os.getpid():
+            self._flush_requested.set()
+            self._queue.put(self._stop)
+            worker.join(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth and throughput counters.
+        
+        Returns:
+            Dict: Queue statistics
+        """
+        with self._cond:
+            pending: Dict[str, int] = defaultdict(int)
+            for (collection_name, _), count in self._pending.items():
+                pending[collection_name] += count
+            return {
+                "enabled": self.enabled,
+                "queue_depth": self._queue.qsize(),
+                "pending": dict(pending),
+                "queued": self.queued,
+                "written": self.written,
+                "batches": self.batches,
+                "write_through": self.write_through,
+                "spilled": self.spilled,
+                "max_batch_latency_ms": self.max_batch_latency_ms
+            }
+
+_write_behind_queue: Optional[WriteBehindQueue] = None
+_write_behind_lock = threading.Lock()
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    """
+    Get the process-wide write-behind queue configured from config.py.
+    It is flushed at interpreter exit.
+    
+    Returns:
+        WriteBehindQueue: Singleton instance of WriteBehindQueue
+    """
+    global _write_behind_queue
+    if _write_behind_queue is None:
+        with _write_behind_lock:
+            if _write_behind_queue is None:
+                _write_behind_queue = WriteBehindQueue(
+                    enabled=config.FEATURES["enable_write_behind"],
+                    batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+                    flush_interval=config.WRITE_BEHIND_FLUSH_INTERVAL,
+                    max_queued=config.WRITE_BEHIND_MAX_QUEUED,
+                    enqueue_timeout=config.WRITE_BEHIND_ENQUEUE_TIMEOUT,
+                    max_retries=config.WRITE_BEHIND_MAX_RETRIES,
+                    spill_path=config.WRITE_BEHIND_SPILL_PATH or None
+                )
+                atexit.register(_write_behind_queue.close, config.TIMEOUTS["database_operation"])
+    return _write_behind_queue
@@ -1,18 +1,24 @@
 import os
 import json
+from contextlib import closing
 from typing import Dict, Any, Optional
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, render_template, session, stream_with_context
 from flask_cors import CORS
 from datetime import datetime, timedelta
 
-from database.db_handler import DatabaseHandler
 from database.connection import get_db_connection
-from state import StateManager, LearningMode, DifficultyLevel
+from database.indexes import ensure_indexes
+from database.write_behind import get_write_behind_queue
+import config
+from state import StateManager, HistoryPolicy, LearningMode, DifficultyLevel
 from langgraph_workflow import get_learning_workflow
-from agents.ai_tutor import AITutorAgent
-from agents.learning_guide import LearningGuideAgent
-from agents.quiz_master import QuizMasterAgent
-from agents.progress_tracker import ProgressTrackerAgent
+from agents.registry import get_agent_registry
+from llm.cache import get_llm_cache
+from llm.semantic_cache import get_semantic_cache
+from llm.summarizer import get_history_summarizer
+from llm.router import get_model_router
+from llm.resilience import ModelCallError, CircuitOpenError, get_resilient_invoker
+from session_store import get_session_store, SessionConflictError
 
 # Initialize Flask app
 app = Flask(__name__, 
@@ -25,15 +31,40 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
 app.config["SESSION_PERMANENT"] = True
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=7)
 
+# Shared agent pool; routes and the workflow use the same agent instances
+agents = get_agent_registry()
+
 # Initialize database connection
-db = DatabaseHandler()
+db = agents.db
+
+# Make sure the indexes behind the handler queries exist (idempotent)
+try:
+    ensure_indexes()
+except Exception as e:
+    print(f"Could not ensure MongoDB indexes: {e}")
+
+# Re-insert log documents spilled to disk while MongoDB was unavailable
+try:
+    replayed = get_write_behind_queue().replay_spill()
+    if replayed:
+        print(f"Replayed {replayed} spilled log documents")
+except Exception as e:
+    print(f"Could not replay spilled log documents: {e}")
 
 # Initialize the learning workflow
 learning_workflow = get_learning_workflow()
 
-# Dictionary to store active state managers
-# In a production environment, you would use a database or Redis for this
-active_sessions = {}
+# Bounded, expiring store of session state (see SESSION_STORE_* in config.py)
+session_store = get_session_store()
+
+# Sliding-window conversation history; older messages are summarized in the background
+StateManager.default_history_policy = HistoryPolicy(
+    max_turns=config.HISTORY_MAX_TURNS,
+    max_chars=config.HISTORY_MAX_CHARS,
+    summary_max_chars=config.HISTORY_SUMMARY_MAX_CHARS
+)
+if config.FEATURES["enable_history_summary"]:
+    StateManager.summarizer = get_history_summarizer()
 
 @app.route('/')
 def index():
@@ -50,6 +81,56 @@ def health_check():
     """API health check endpoint"""
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
 
+@app.route('/api/db/pool', methods=['GET'])
+def db_pool_stats():
+    """MongoDB connection pool utilisation and write-behind queue depth"""
+    stats = get_db_connection().get_pool_stats()
+    stats["write_behind"] = get_write_behind_queue().get_stats()
+    return jsonify(stats)
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """LLM response and semantic cache hit/miss counters"""
+    stats = get_llm_cache().get_stats()
+    stats["semantic"] = get_semantic_cache().get_stats()
+    return jsonify(stats)
+
+@app.route('/api/models/stats', methods=['GET'])
+def model_stats():
+    """Per-tier load, per-operation model latency and estimated cost, retries and circuit states"""
+    stats = get_model_router().get_stats()
+    stats["resilience"] = get_resilient_invoker().get_stats()
+    return jsonify(stats)
+
+@app.errorhandler(ModelCallError)
+def model_unavailable(error):
+    """Answer with 503 when the models failed or their circuits are open"""
+    response = jsonify({"error": "The AI model is temporarily unavailable, please try again shortly"})
+    response.status_code = 503
+    if isinstance(error, CircuitOpenError):
+        response.headers["Retry-After"] = str(max(int(error.retry_after + 0.999), 1))
+    return response
+
+@app.errorhandler(SessionConflictError)
+def session_conflict(error):
+    """Answer with 409 when another request saved the session first"""
+    return jsonify({"error": "The session was changed by another request, please try again"}), 409
+
+@app.route('/api/session/stats', methods=['GET'])
+def session_stats():
+    """Live sessions, evictions and stored bytes of the session store"""
+    return jsonify(session_store.get_stats())
+
+@app.route('/api/quiz/bank/stats', methods=['GET'])
+def question_bank_stats():
+    """Question bank hit rate and replenishment counters"""
+    return jsonify(agents.quiz_master.bank.get_stats())
+
+@app.route('/api/quiz/analysis/stats', methods=['GET'])
+def quiz_analysis_stats():
+    """Batched quiz analysis queue depth and throughput counters"""
+    return jsonify(agents.quiz_master.analysis_batcher.get_stats())
+
 @app.route('/api/session', methods=['POST'])
 def create_session():
     """Create a new learning session for a student"""
@@ -72,7 +153,7 @@ def create_session():
     
     # Create a new state manager for this session
     session_id = f"session_{student_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    active_sessions[session_id] = StateManager(student_id)
+    state_manager = StateManager(student_id)
     
     # Store session ID in Flask session
     session['session_id'] = session_id
@@ -92,7 +173,6 @@ def create_session():
         )
         
         # Update state manager with the topic and session ID
-        state_manager = active_sessions[session_id]
         state_manager.start_learning_session(
             topic=topic,
             subtopic=subtopic or "general",
@@ -101,6 +181,8 @@ def create_session():
             session_id=log_id
         )
     
+    session_store.save(session_id, state_manager)
+    
     return jsonify({
         "session_id": session_id,
         "student_id": student_id,
@@ -121,19 +203,22 @@ def process_message():
     if not student_id:
         return jsonify({"error": "Student ID is required"}), 400
     
-    # Get state manager for this session
-    state_manager = active_sessions.get(session_id)
-    if not state_manager:
-        # Create a new state manager if none exists
-        state_manager = StateManager(student_id)
-        active_sessions[session_id] = state_manager
+    if not session_id:
+        return jsonify({"error": "Session not found or expired, create a new one with /api/session"}), 404
     
-    # Process the message through the workflow
-    result = learning_workflow.process(
-        student_id=student_id,
-        message=message,
-        state_manager=state_manager
-    )
+    # Messages of one session are processed one at a time, each on the state the previous one saved
+    with session_store.lock(session_id):
+        state_manager = session_store.get(session_id)
+        if not state_manager:
+            return jsonify({"error": "Session not found or expired, create a new one with /api/session"}), 404
+        
+        # Process the message through the workflow
+        result = learning_workflow.process(
+            student_id=student_id,
+            message=message,
+            state_manager=state_manager
+        )
+        session_store.save(session_id, state_manager)
     
     # Format the response
     return jsonify({
@@ -141,6 +226,51 @@ def process_message():
         "state": result["state"]
     })
 
+@app.route('/api/message/stream', methods=['POST'])
+def stream_message():
+    """Process a user message, streaming progress and answer tokens as Server-Sent Events"""
+    data = request.json
+    message = data.get('message')
+    session_id = data.get('session_id') or session.get('session_id')
+    student_id = data.get('student_id') or session.get('student_id')
+    
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+    
+    if not student_id:
+        return jsonify({"error": "Student ID is required"}), 400
+    
+    # Get state manager for this session
+    state_manager = session_store.get(session_id) if session_id else None
+    if not state_manager:
+        return jsonify({"error": "Session not found or expired, create a new one with /api/session"}), 404
+    
+    def generate():
+        # Hold the session for the whole turn and reload it, so a message sent
+        # while another was streaming sees that one's answer. Closing the
+        # event stream inside the lock waits for an abandoned run to stop.
+        with session_store.lock(session_id):
+            current_state = session_store.get(session_id) or state_manager
+            with closing(learning_workflow.process_stream(
+                student_id=student_id,
+                message=message,
+                state_manager=current_state
+            )) as events:
+                for event in events:
+                    if event["event"] == "done":
+                        # Persist the final answer before telling the client we are done
+                        try:
+                            session_store.save(session_id, current_state)
+                        except SessionConflictError as e:
+                            event = {"event": "error", "error": str(e)}
+                    yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route('/api/quiz/generate', methods=['POST'])
 def generate_quiz():
     """Generate a quiz for a student"""
@@ -156,8 +286,8 @@ def generate_quiz():
     if not topic:
         return jsonify({"error": "Topic is required"}), 400
     
-    # Initialize the Quiz Master agent
-    quiz_master = QuizMasterAgent()
+    # Get the shared Quiz Master agent
+    quiz_master = agents.quiz_master
     
     # Generate quiz
     quiz_result = quiz_master.generate_quiz(
@@ -169,9 +299,12 @@ def generate_quiz():
     
     # Update state manager if session exists
     session_id = data.get('session_id') or session.get('session_id')
-    if session_id and session_id in active_sessions:
-        state_manager = active_sessions[session_id]
-        state_manager.start_quiz(quiz_result["quiz_id"])
+    if session_id:
+        with session_store.lock(session_id):
+            state_manager = session_store.get(session_id)
+            if state_manager:
+                state_manager.start_quiz(quiz_result["quiz_id"])
+                session_store.save(session_id, state_manager)
     
     return jsonify({
         "quiz_id": quiz_result["quiz_id"],
@@ -190,8 +323,8 @@ def evaluate_quiz_answer():
     if not all([student_id, quiz_id, question_index is not None, answer]):
         return jsonify({"error": "student_id, quiz_id, question_index, and answer are required"}), 400
     
-    # Initialize the Quiz Master agent
-    quiz_master = QuizMasterAgent()
+    # Get the shared Quiz Master agent
+    quiz_master = agents.quiz_master
     
     # Evaluate answer
     evaluation = quiz_master.evaluate_answer(
@@ -212,8 +345,8 @@ def get_quiz_result():
     if not all([student_id, quiz_id]):
         return jsonify({"error": "student_id and quiz_id are required"}), 400
     
-    # Initialize the Quiz Master agent
-    quiz_master = QuizMasterAgent()
+    # Get the shared Quiz Master agent
+    quiz_master = agents.quiz_master
     
     # Get quiz results
     results = quiz_master.analyze_quiz_results(
@@ -233,8 +366,8 @@ def get_progress():
     if not student_id:
         return jsonify({"error": "Student ID is required"}), 400
     
-    # Initialize the Progress Tracker agent
-    progress_tracker = ProgressTrackerAgent()
+    # Get the shared Progress Tracker agent
+    progress_tracker = agents.progress_tracker
     
     # Get progress summary
     progress_summary = progress_tracker.generate_progress_summary(
@@ -255,8 +388,8 @@ def get_learning_content():
     if not all([student_id, topic]):
         return jsonify({"error": "Student ID and topic are required"}), 400
     
-    # Initialize the Learning Guide agent
-    learning_guide = LearningGuideAgent()
+    # Get the shared Learning Guide agent
+    learning_guide = agents.learning_guide
     
     # Generate learning content
     content = learning_guide.generate_learning_content(
@@ -283,8 +416,8 @@ def create_study_plan():
     if not all([student_id, topic, goal, timeline]):
         return jsonify({"error": "Student ID, topic, goal, and timeline are required"}), 400
     
-    # Initialize the Learning Guide agent
-    learning_guide = LearningGuideAgent()
+    # Get the shared Learning Guide agent
+    learning_guide = agents.learning_guide
     
     # Create study plan
     study_plan = learning_guide.create_study_plan(
@@ -309,8 +442,8 @@ def get_resources():
     if not all([student_id, topic]):
         return jsonify({"error": "Student ID and topic are required"}), 400
     
-    # Initialize the Learning Guide agent
-    learning_guide = LearningGuideAgent()
+    # Get the shared Learning Guide agent
+    learning_guide = agents.learning_guide
     
     # Get resource recommendations
     resources = learning_guide.recommend_resources(
@@ -334,8 +467,8 @@ def get_learning_patterns():
     if not student_id:
         return jsonify({"error": "Student ID is required"}), 400
     
-    # Initialize the Progress Tracker agent
-    progress_tracker = ProgressTrackerAgent()
+    # Get the shared Progress Tracker agent
+    progress_tracker = agents.progress_tracker
     
     # Get learning pattern analysis
     patterns = progress_tracker.identify_learning_pattern(
@@ -354,8 +487,8 @@ def get_difficulty_recommendation():
     if not all([student_id, topic]):
         return jsonify({"error": "Student ID and topic are required"}), 400
     
-    # Initialize the Progress Tracker agent
-    progress_tracker = ProgressTrackerAgent()
+    # Get the shared Progress Tracker agent
+    progress_tracker = agents.progress_tracker
     
     # Get difficulty adjustment recommendation
     recommendation = progress_tracker.recommend_difficulty_adjustment(
@@ -375,8 +508,8 @@ def get_hint():
     if not all([student_id, question_id, topic]):
         return jsonify({"error": "Student ID, question ID, and topic are required"}), 400
     
-    # Initialize the AI Tutor agent
-    ai_tutor = AITutorAgent()
+    # Get the shared AI Tutor agent
+    ai_tutor = agents.ai_tutor
     
     # Get hint
     hint = ai_tutor.provide_hint(
@@ -399,8 +532,8 @@ def explain_misconception():
     if not all([student_id, topic, wrong_answer, correct_answer]):
         return jsonify({"error": "Student ID, topic, wrong answer, and correct answer are required"}), 400
     
-    # Initialize the AI Tutor agent
-    ai_tutor = AITutorAgent()
+    # Get the shared AI Tutor agent
+    ai_tutor = agents.ai_tutor
     
     # Get explanation of misconception
     explanation = ai_tutor.explain_misconception(
@@ -423,12 +556,12 @@ def end_session():
         return jsonify({"error": "Session ID is required"}), 400
     
     # Clean up state manager
-    if session_id in active_sessions:
+    state_manager = session_store.get(session_id)
+    if state_manager:
         # Get duration from request or calculate it
         duration = data.get('duration', 0)
         
         # Get the learning session ID from state manager
-        state_manager = active_sessions[session_id]
         learning_session_id = state_manager.user_state.current_session_id
         
         # Update the session in the database if it exists
@@ -439,7 +572,7 @@ def end_session():
             )
         
         # Remove the state manager
-        del active_sessions[session_id]
+        session_store.delete(session_id)
     
     # Clear the Flask session
     session.pop('session_id', None)
@@ -1,13 +1,14 @@
 import os
-from typing import Dict, Any, List, Literal, TypedDict, Optional, Tuple, Union, Annotated
+import queue
+import asyncio
+import threading
+import contextvars
+from typing import Dict, Any, AsyncIterator, Iterator, List, Literal, TypedDict, Optional, Tuple, Union, Annotated
 from langchain.prompts import PromptTemplate
+from langchain.schema.runnable import RunnableLambda
 from langgraph.graph import END, StateGraph
-from database.db_handler import DatabaseHandler
-from database.connection import get_db_connection
-from agents.ai_tutor import AITutorAgent
-from agents.learning_guide import LearningGuideAgent
-from agents.quiz_master import QuizMasterAgent
-from agents.progress_tracker import ProgressTrackerAgent
+from agents.registry import AgentRegistry, get_agent_registry
+from llm.cache import stream_tokens
 from state import StateManager, UserState, LearningMode, InteractionType
 
 # Type definitions for the state
@@ -30,21 +31,24 @@ class LearningWorkflow:
     Orchestrates the adaptive learning workflow using LangGraph.
     """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, registry: Optional[AgentRegistry] = None):
         """
         Initialize the learning workflow.
         
         Args:
             api_key (str): Google API key
+            registry (AgentRegistry, optional): Agent pool to draw agents from.
+                If None, a private registry is created for this workflow.
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        self.db = DatabaseHandler()
+        self.registry = registry or AgentRegistry(api_key=self.api_key)
+        self.db = self.registry.db
         
-        # Initialize agents
-        self.ai_tutor = AITutorAgent(api_key=self.api_key)
-        self.learning_guide = LearningGuideAgent(api_key=self.api_key)
-        self.quiz_master = QuizMasterAgent(api_key=self.api_key)
-        self.progress_tracker = ProgressTrackerAgent(api_key=self.api_key)
+        # Use the shared agent instances
+        self.ai_tutor = self.registry.ai_tutor
+        self.learning_guide = self.registry.learning_guide
+        self.quiz_master = self.registry.quiz_master
+        self.progress_tracker = self.registry.progress_tracker
         
         # Build the workflow graph
         self.workflow = self._build_graph()
@@ -60,13 +64,15 @@ class LearningWorkflow:
         builder = StateGraph(LearningState)
         
         # Add nodes
+        # Handler nodes carry both a sync and an async implementation, so the
+        # same graph serves invoke()/stream() and ainvoke()
         builder.add_node("classify_input", self._classify_user_input)
-        builder.add_node("handle_question", self._handle_question)
-        builder.add_node("handle_quiz_request", self._handle_quiz_request)
-        builder.add_node("handle_quiz_answer", self._handle_quiz_answer)
-        builder.add_node("handle_content_request", self._handle_content_request)
-        builder.add_node("handle_progress_request", self._handle_progress_request)
-        builder.add_node("handle_study_plan_request", self._handle_study_plan_request)
+        builder.add_node("handle_question", RunnableLambda(self._handle_question, afunc=self._ahandle_question))
+        builder.add_node("handle_quiz_request", RunnableLambda(self._handle_quiz_request, afunc=self._ahandle_quiz_request))
+        builder.add_node("handle_quiz_answer", RunnableLambda(self._handle_quiz_answer, afunc=self._ahandle_quiz_answer))
+        builder.add_node("handle_content_request", RunnableLambda(self._handle_content_request, afunc=self._ahandle_content_request))
+        builder.add_node("handle_progress_request", RunnableLambda(self._handle_progress_request, afunc=self._ahandle_progress_request))
+        builder.add_node("handle_study_plan_request", RunnableLambda(self._handle_study_plan_request, afunc=self._ahandle_study_plan_request))
         builder.add_node("generate_response", self._generate_response)
         
         # Define edges
@@ -168,24 +174,35 @@ class LearningWorkflow:
         answer = self.ai_tutor.answer_question(
             student_id=student_id,
             question=user_message,
-            topic=current_topic
+            topic=current_topic,
+            conversation=state["conversation_history"]
         )
         
         # Update state
         state["system_message"] = answer
         return state
     
-    def _handle_quiz_request(self, state: LearningState) -> LearningState:
+    async def _ahandle_question(self, state: LearningState) -> LearningState:
+        """Async version of _handle_question."""
+        state["system_message"] = await self.ai_tutor.aanswer_question(
+            student_id=state["student_id"],
+            question=state["user_message"],
+            topic=state["current_topic"] or "general",
+            conversation=state["conversation_history"]
+        )
+        return state
+    
+    @staticmethod
+    def _extract_quiz_topic(state: LearningState) -> Tuple[str, Optional[str]]:
         """
-        Handle a quiz request using the Quiz Master.
+        Work out the topic and subtopic of a quiz request.
         
         Args:
             state (LearningState): Current state
             
         Returns:
-            LearningState: Updated state with the quiz
+            Tuple[str, str]: Topic and subtopic (the subtopic may be None)
         """
-        student_id = state["student_id"]
         user_message = state["user_message"]
         current_topic = state["current_topic"]
         current_subtopic = state["current_subtopic"]
@@ -208,21 +225,125 @@ class LearningWorkflow:
             extracted_topic = "general"
             extracted_subtopic = "basics"
         
+        return extracted_topic, extracted_subtopic
+    
+    @staticmethod
+    def _apply_quiz(state: LearningState, topic: str, subtopic: Optional[str],
+                    quiz_result: Dict[str, Any]) -> LearningState:
+        """
+        Put the session into quiz mode for a newly generated quiz.
+        
+        Args:
+            state (LearningState): Current state
+            topic (str): Quiz topic
+            subtopic (str): Quiz subtopic
+            quiz_result (Dict): Output of QuizMasterAgent.generate_quiz
+            
+        Returns:
+            LearningState: Updated state with the quiz
+        """
+        state["current_topic"] = topic
+        state["current_subtopic"] = subtopic
+        state["current_quiz_id"] = quiz_result["quiz_id"]
+        state["current_learning_mode"] = LearningMode.QUIZ.value
+        state["system_message"] = f"Here's a quiz on {topic}"
+        state["context"]["quiz_content"] = quiz_result["content"]
+        state["context"]["total_questions"] = quiz_result.get("question_count", 5)
+        state["context"]["current_question_index"] = 0
+        
+        return state
+    
+    def _handle_quiz_request(self, state: LearningState) -> LearningState:
+        """
+        Handle a quiz request using the Quiz Master.
+        
+        Args:
+            state (LearningState): Current state
+            
+        Returns:
+            LearningState: Updated state with the quiz
+        """
+        extracted_topic, extracted_subtopic = self._extract_quiz_topic(state)
+        
         # Generate the quiz
         quiz_result = self.quiz_master.generate_quiz(
-            student_id=student_id,
+            student_id=state["student_id"],
             topic=extracted_topic,
             subtopic=extracted_subtopic or "general"
         )
         
         # Update state
-        state["current_topic"] = extracted_topic
-        state["current_subtopic"] = extracted_subtopic
-        state["current_quiz_id"] = quiz_result["quiz_id"]
-        state["current_learning_mode"] = LearningMode.QUIZ.value
-        state["system_message"] = f"Here's a quiz on {extracted_topic}"
-        state["context"]["quiz_content"] = quiz_result["content"]
+        return self._apply_quiz(state, extracted_topic, extracted_subtopic, quiz_result)
+    
+    async def _ahandle_quiz_request(self, state: LearningState) -> LearningState:
+        """Async version of _handle_quiz_request."""
+        extracted_topic, extracted_subtopic = self._extract_quiz_topic(state)
+        quiz_result = await self.quiz_master.agenerate_quiz(
+            student_id=state["student_id"],
+            topic=extracted_topic,
+            subtopic=extracted_subtopic or "general"
+        )
+        return self._apply_quiz(state, extracted_topic, extracted_subtopic, quiz_result)
+    
+    @staticmethod
+    def _format_evaluation(evaluation: Dict[str, Any]) -> str:
+        """
+        Turn an answer evaluation into the reply to the student.
+        
+        Args:
+            evaluation (Dict): Output of QuizMasterAgent.evaluate_answer
+            
+        Returns:
+            str: Reply text
+        """
+        if "error" in evaluation:
+            return f"Sorry, I couldn't grade that answer ({evaluation['error'].lower()})."
+        if evaluation.get("is_correct", False):
+            response = f"Correct! {evaluation.get('explanation', '')}"
+        else:
+            response = f"Not quite. The answer is {evaluation.get('correct_answer', '')}. {evaluation.get('explanation', '')}"
+            if "misconception" in evaluation:
+                response += f"\n\nYou might be thinking: {evaluation['misconception']}"
+            if "improvement_tip" in evaluation:
+                response += f"\n\nTip: {evaluation['improvement_tip']}"
+        return response
+    
+    @staticmethod
+    def _is_last_question(state: LearningState, question_index: int) -> bool:
+        """Whether question_index is the last question of the current quiz."""
+        return question_index + 1 >= state["context"].get("total_questions", 5)
+    
+    @staticmethod
+    def _apply_quiz_answer(state: LearningState, question_index: int, response: str,
+                           quiz_analysis: Optional[Dict[str, Any]] = None) -> LearningState:
+        """
+        Advance the quiz after an answer, or close it when quiz_analysis is given.
+        
+        Args:
+            state (LearningState): Current state
+            question_index (int): Index of the answered question
+            response (str): Reply to the answer
+            quiz_analysis (Dict, optional): Output of QuizMasterAgent.analyze_quiz_results
+                if this was the last question
+            
+        Returns:
+            LearningState: Updated state with the answer evaluation
+        """
+        if quiz_analysis is not None:
+            # Add analysis to response
+            analysis = quiz_analysis.get('analysis') or "Your detailed analysis is being prepared and will be ready shortly."
+            response += f"\n\n--- Quiz Completed ---\n\nYour Score: {quiz_analysis.get('score', 0):.1f}%\n\n{analysis}"
+            
+            # Reset quiz state
+            state["current_quiz_id"] = None
+            state["current_learning_mode"] = LearningMode.REVIEW.value
+            state["context"]["current_question_index"] = 0
+        else:
+            # Move to next question
+            state["context"]["current_question_index"] = question_index + 1
         
+        # Update state
+        state["system_message"] = response
         return state
     
     def _handle_quiz_answer(self, state: LearningState) -> LearningState:
@@ -252,53 +373,54 @@ class LearningWorkflow:
         )
         
         # Build response
-        if evaluation.get("is_correct", False):
-            response = f"Correct! {evaluation.get('explanation', '')}"
-        else:
-            response = f"Not quite. {evaluation.get('explanation', '')}"
-            if "misconception" in evaluation:
-                response += f"\n\nYou might be thinking: {evaluation['misconception']}"
-            if "improvement_tip" in evaluation:
-                response += f"\n\nTip: {evaluation['improvement_tip']}"
+        response = self._format_evaluation(evaluation)
         
         # Check if quiz is complete
-        if question_index + 1 >= state["context"].get("total_questions", 5):
+        quiz_analysis = None
+        if self._is_last_question(state, question_index):
             # End of quiz - analyze results
             quiz_analysis = self.quiz_master.analyze_quiz_results(
                 student_id=student_id,
                 quiz_id=quiz_id
             )
-            
-            # Add analysis to response
-            response += f"\n\n--- Quiz Completed ---\n\nYour Score: {quiz_analysis.get('score', 0):.1f}%\n\n{quiz_analysis.get('analysis', '')}"
-            
-            # Reset quiz state
-            state["current_quiz_id"] = None
-            state["current_learning_mode"] = LearningMode.REVIEW.value
-            state["context"]["current_question_index"] = 0
-        else:
-            # Move to next question
-            state["context"]["current_question_index"] = question_index + 1
         
-        # Update state
-        state["system_message"] = response
-        return state
+        return self._apply_quiz_answer(state, question_index, response, quiz_analysis)
     
-    def _handle_content_request(self, state: LearningState) -> LearningState:
+    async def _ahandle_quiz_answer(self, state: LearningState) -> LearningState:
+        """Async version of _handle_quiz_answer."""
+        student_id = state["student_id"]
+        quiz_id = state["current_quiz_id"]
+        question_index = state["context"].get("current_question_index", 0)
+        
+        evaluation = await self.quiz_master.aevaluate_answer(
+            student_id=student_id,
+            quiz_id=quiz_id,
+            question_index=question_index,
+            student_answer=state["user_message"]
+        )
+        
+        quiz_analysis = None
+        if self._is_last_question(state, question_index):
+            quiz_analysis = await self.quiz_master.aanalyze_quiz_results(
+                student_id=student_id,
+                quiz_id=quiz_id
+            )
+        
+        return self._apply_quiz_answer(state, question_index, self._format_evaluation(evaluation), quiz_analysis)
+    
+    @staticmethod
+    def _extract_content_topic(state: LearningState) -> Tuple[str, Optional[str]]:
         """
-        Handle a content request using the Learning Guide.
+        Work out the topic and subtopic of a content request.
         
         Args:
             state (LearningState): Current state
             
         Returns:
-            LearningState: Updated state with the learning content
+            Tuple[str, str]: Topic and subtopic (the subtopic may be None)
         """
-        student_id = state["student_id"]
-        user_message = state["user_message"]
-        
         # Extract topic and subtopic from message
-        message_lower = user_message.lower()
+        message_lower = state["user_message"].lower()
         topic = state["current_topic"]
         subtopic = state["current_subtopic"]
         
@@ -321,14 +443,22 @@ class LearningWorkflow:
             topic = "general"
             subtopic = "basics"
         
-        # Generate the learning content
-        content = self.learning_guide.generate_learning_content(
-            student_id=student_id,
-            topic=topic,
-            subtopic=subtopic or "general"
-        )
+        return topic, subtopic
+    
+    @staticmethod
+    def _apply_content(state: LearningState, topic: str, subtopic: Optional[str], content: str) -> LearningState:
+        """
+        Put the session into guided learning with the generated content.
         
-        # Update state
+        Args:
+            state (LearningState): Current state
+            topic (str): Content topic
+            subtopic (str): Content subtopic
+            content (str): Generated learning content
+            
+        Returns:
+            LearningState: Updated state with the learning content
+        """
         state["current_topic"] = topic
         state["current_subtopic"] = subtopic
         state["current_learning_mode"] = LearningMode.GUIDED_LEARNING.value
@@ -336,6 +466,61 @@ class LearningWorkflow:
         
         return state
     
+    def _handle_content_request(self, state: LearningState) -> LearningState:
+        """
+        Handle a content request using the Learning Guide.
+        
+        Args:
+            state (LearningState): Current state
+            
+        Returns:
+            LearningState: Updated state with the learning content
+        """
+        topic, subtopic = self._extract_content_topic(state)
+        
+        # Generate the learning content
+        content = self.learning_guide.generate_learning_content(
+            student_id=state["student_id"],
+            topic=topic,
+            subtopic=subtopic or "general",
+            conversation=state["conversation_history"]
+        )
+        
+        # Update state
+        return self._apply_content(state, topic, subtopic, content)
+    
+    async def _ahandle_content_request(self, state: LearningState) -> LearningState:
+        """Async version of _handle_content_request."""
+        topic, subtopic = self._extract_content_topic(state)
+        content = await self.learning_guide.agenerate_learning_content(
+            student_id=state["student_id"],
+            topic=topic,
+            subtopic=subtopic or "general",
+            conversation=state["conversation_history"]
+        )
+        return self._apply_content(state, topic, subtopic, content)
+    
+    @staticmethod
+    def _format_progress(progress_summary: Dict[str, Any], time_period: int) -> str:
+        """
+        Turn a progress summary into the reply to the student.
+        
+        Args:
+            progress_summary (Dict): Output of ProgressTrackerAgent.generate_progress_summary
+            time_period (int): Days covered by the summary
+            
+        Returns:
+            str: Reply text
+        """
+        # Check if there was an error
+        if "error" in progress_summary:
+            return f"Not enough learning data available yet. Keep learning and I'll be able to track your progress soon!"
+        
+        # Format the response
+        response = f"Here's your learning progress for the past {time_period} days:\n\n"
+        response += progress_summary.get("overall_summary", "No summary available.")
+        return response
+    
     def _handle_progress_request(self, state: LearningState) -> LearningState:
         """
         Handle a progress request using the Progress Tracker.
@@ -346,45 +531,42 @@ class LearningWorkflow:
         Returns:
             LearningState: Updated state with the progress report
         """
-        student_id = state["student_id"]
-        current_topic = state["current_topic"]
-        
         # Determine time period from message (default to 30 days)
         time_period = 30
         
         # Generate progress summary
         progress_summary = self.progress_tracker.generate_progress_summary(
-            student_id=student_id,
-            topic=current_topic,
+            student_id=state["student_id"],
+            topic=state["current_topic"],
             days=time_period
         )
         
-        # Check if there was an error
-        if "error" in progress_summary:
-            response = f"Not enough learning data available yet. Keep learning and I'll be able to track your progress soon!"
-        else:
-            # Format the response
-            response = f"Here's your learning progress for the past {time_period} days:\n\n"
-            response += progress_summary.get("overall_summary", "No summary available.")
-        
         # Update state
-        state["system_message"] = response
+        state["system_message"] = self._format_progress(progress_summary, time_period)
         return state
     
-    def _handle_study_plan_request(self, state: LearningState) -> LearningState:
+    async def _ahandle_progress_request(self, state: LearningState) -> LearningState:
+        """Async version of _handle_progress_request."""
+        time_period = 30
+        progress_summary = await self.progress_tracker.agenerate_progress_summary(
+            student_id=state["student_id"],
+            topic=state["current_topic"],
+            days=time_period
+        )
+        state["system_message"] = self._format_progress(progress_summary, time_period)
+        return state
+    
+    @staticmethod
+    def _extract_study_goal(user_message: str) -> Tuple[str, str]:
         """
-        Handle a study plan request using the Learning Guide.
+        Work out the goal and timeline of a study plan request.
         
         Args:
-            state (LearningState): Current state
+            user_message (str): User message
             
         Returns:
-            LearningState: Updated state with the study plan
+            Tuple[str, str]: Goal and timeline
         """
-        student_id = state["student_id"]
-        user_message = state["user_message"]
-        current_topic = state["current_topic"] or "general"
-        
         # Extract goal and timeline from message
         # In a real system, use NLP for more sophisticated extraction
         goal = "master the fundamentals"
@@ -398,18 +580,45 @@ class LearningWorkflow:
             timeline_parts = user_message.lower().split("timeline")[1].strip()
             timeline = timeline_parts
         
+        return goal, timeline
+    
+    def _handle_study_plan_request(self, state: LearningState) -> LearningState:
+        """
+        Handle a study plan request using the Learning Guide.
+        
+        Args:
+            state (LearningState): Current state
+            
+        Returns:
+            LearningState: Updated state with the study plan
+        """
+        goal, timeline = self._extract_study_goal(state["user_message"])
+        
         # Generate the study plan
         study_plan = self.learning_guide.create_study_plan(
-            student_id=student_id,
-            topic=current_topic,
+            student_id=state["student_id"],
+            topic=state["current_topic"] or "general",
             goal=goal,
-            timeline=timeline
+            timeline=timeline,
+            conversation=state["conversation_history"]
         )
         
         # Update state
         state["system_message"] = study_plan
         return state
     
+    async def _ahandle_study_plan_request(self, state: LearningState) -> LearningState:
+        """Async version of _handle_study_plan_request."""
+        goal, timeline = self._extract_study_goal(state["user_message"])
+        state["system_message"] = await self.learning_guide.acreate_study_plan(
+            student_id=state["student_id"],
+            topic=state["current_topic"] or "general",
+            goal=goal,
+            timeline=timeline,
+            conversation=state["conversation_history"]
+        )
+        return state
+    
     def _generate_response(self, state: LearningState) -> LearningState:
         """
         Final processing of the response before returning to the user.
@@ -424,9 +633,10 @@ class LearningWorkflow:
         # For now, we'll just return the system message as is
         return state
     
-    def process(self, student_id: str, message: str, state_manager: Optional[StateManager] = None) -> Dict[str, Any]:
+    def _prepare_state(self, student_id: str, message: str,
+                       state_manager: Optional[StateManager] = None) -> Tuple[Dict[str, Any], LearningState]:
         """
-        Process a user message through the workflow.
+        Build the LangGraph input state for a user message.
         
         Args:
             student_id (str): Student ID
@@ -434,12 +644,15 @@ class LearningWorkflow:
             state_manager (StateManager, optional): State manager for the session
             
         Returns:
-            Dict: Response including system message and updated state
+            Tuple[Dict, LearningState]: The session state before the run and the graph input
         """
         # Initialize state
         if state_manager:
-            # Use existing state manager
+            # Use existing state manager; the graph sees the bounded prompt
+            # window rather than the whole conversation
             current_state = state_manager.get_state_summary()
+            current_state["conversation_history"] = state_manager.get_prompt_window()
+            current_state["context"] = dict(state_manager.user_state.context)
         else:
             # Create new state with defaults
             current_state = {
@@ -469,10 +682,22 @@ class LearningWorkflow:
             context=current_state.get("context", {}),
             action=None
         )
+        return current_state, graph_state
+    
+    def _finish(self, message: str, result: Dict[str, Any], current_state: Dict[str, Any],
+                state_manager: Optional[StateManager] = None) -> Dict[str, Any]:
+        """
+        Write a finished run back to the session and build the response.
         
-        # Run the workflow
-        result = self.workflow.invoke(graph_state)
-        
+        Args:
+            message (str): User message
+            result (Dict): Final LangGraph state
+            current_state (Dict): Session state before the run
+            state_manager (StateManager, optional): State manager for the session
+            
+        Returns:
+            Dict: Response including system message and updated state
+        """
         # Update state manager if provided
         if state_manager:
             if result["current_topic"] != current_state.get("current_topic"):
@@ -494,9 +719,11 @@ class LearningWorkflow:
                 "content": result["system_message"]
             })
             
-            # Update context
+            # Update context (only the keys the graph changed)
+            previous_context = state_manager.user_state.context
             for key, value in result["context"].items():
-                state_manager.add_context(key, value)
+                if key not in previous_context or previous_context[key] != value:
+                    state_manager.add_context(key, value)
         
         # Return the response
         return {
@@ -509,14 +736,178 @@ class LearningWorkflow:
                 "in_quiz": result["current_quiz_id"] is not None
             }
         }
-
+    
+    def process(self, student_id: str, message: str, state_manager: Optional[StateManager] = None) -> Dict[str, Any]:
+        """
+        Process a user message through the workflow.
+        
+        Args:
+            student_id (str): Student ID
+            message (str): User message
+            state_manager (StateManager, optional): State manager for the session
+            
+        Returns:
+            Dict: Response including system message and updated state
+        """
+        current_state, graph_state = self._prepare_state(student_id, message, state_manager)
+        
+        # Run the workflow
+        result = self.workflow.invoke(graph_state)
+        
+        return self._finish(message, result, current_state, state_manager)
+    
+    async def aprocess(self, student_id: str, message: str,
+                       state_manager: Optional[StateManager] = None) -> Dict[str, Any]:
+        """
+        Async version of process, running the graph with ainvoke() so agent
+        LLM and database calls do not hold a thread while they wait.
+        
+        Args:
+            student_id (str): Student ID
+            message (str): User message
+            state_manager (StateManager, optional): State manager for the session
+            
+        Returns:
+            Dict: Response including system message and updated state
+        """
+        current_state, graph_state = self._prepare_state(student_id, message, state_manager)
+        result = await self.workflow.ainvoke(graph_state)
+        return self._finish(message, result, current_state, state_manager)
+    
+    def process_stream(self, student_id: str, message: str,
+                       state_manager: Optional[StateManager] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Process a user message through the workflow, yielding progress as it happens.
+        
+        Events are dicts with an "event" key:
+        - "node": a graph node finished ({"node": name})
+        - "token": a chunk of the student-facing answer ({"text": chunk})
+        - "done": the run finished; carries the same "response" and "state" as process()
+        - "error": the run failed ({"error": message})
+        
+        The session is only updated once the run has finished. If the
+        consumer closes the stream early (the client disconnected), the run
+        stops before its next node, and close() returns only once the node
+        in progress has finished, so nothing writes for this session after
+        the caller releases it.
+        
+        Args:
+            student_id (str): Student ID
+            message (str): User message
+            state_manager (StateManager, optional): State manager for the session
+            
+        Yields:
+            Dict: Stream events
+        """
+        current_state, graph_state = self._prepare_state(student_id, message, state_manager)
+        events: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+        
+        def run() -> None:
+            result = None
+            try:
+                with stream_tokens(lambda text: events.put(("token", text))):
+                    for step in self.workflow.stream(graph_state):
+                        for node, output in step.items():
+                            if node != END:
+                                events.put(("node", node))
+                            result = output
+                        if cancelled.is_set():
+                            return
+                events.put(("result", result))
+            except Exception as e:
+                events.put(("error", e))
+        
+        # Run the graph on a worker thread (carrying this context) so tokens
+        # can be yielded while the model is still generating
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True)
+        worker.start()
+        
+        try:
+            while True:
+                kind, payload = events.get()
+                yield self._stream_event(kind, payload, message, current_state, state_manager)
+                if kind in ("result", "error"):
+                    return
+        finally:
+            # The client went away before the run finished
+            cancelled.set()
+            worker.join()
+    
+    async def aprocess_stream(self, student_id: str, message: str,
+                              state_manager: Optional[StateManager] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async version of process_stream, running the graph with astream().
+        Closing the stream early cancels the run and waits for it to unwind.
+        
+        Args:
+            student_id (str): Student ID
+            message (str): User message
+            state_manager (StateManager, optional): State manager for the session
+            
+        Yields:
+            Dict: Stream events, as described in process_stream
+        """
+        current_state, graph_state = self._prepare_state(student_id, message, state_manager)
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def run() -> None:
+            result = None
+            try:
+                with stream_tokens(lambda text: events.put_nowait(("token", text))):
+                    async for step in self.workflow.astream(graph_state):
+                        for node, output in step.items():
+                            if node != END:
+                                events.put_nowait(("node", node))
+                            result = output
+                events.put_nowait(("result", result))
+            except Exception as e:
+                events.put_nowait(("error", e))
+        
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                kind, payload = await events.get()
+                yield self._stream_event(kind, payload, message, current_state, state_manager)
+                if kind in ("result", "error"):
+                    return
+        finally:
+            # The client went away before the run finished
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+    
+    def _stream_event(self, kind: str, payload: Any, message: str, current_state: Dict[str, Any],
+                      state_manager: Optional[StateManager] = None) -> Dict[str, Any]:
+        """
+        Turn an item from the run's event queue into a stream event.
+        
+        Args:
+            kind (str): "token", "node", "error" or "result"
+            payload (Any): Token text, node name, exception or final LangGraph state
+            message (str): User message
+            current_state (Dict): Session state before the run
+            state_manager (StateManager, optional): State manager for the session
+            
+        Returns:
+            Dict: Stream event
+        """
+        if kind == "token":
+            return {"event": "token", "text": payload}
+        if kind == "node":
+            return {"event": "node", "node": payload}
+        if kind == "error":
+            print(f"Error processing message: {payload}")
+            return {"event": "error", "error": str(payload)}
+        return {"event": "done", **self._finish(message, payload, current_state, state_manager)}
 
 def get_learning_workflow():
     """
-    Factory function to get a LearningWorkflow instance.
+    Factory function to get a LearningWorkflow instance backed by the
+    process-wide agent registry.
     
     Returns:
         LearningWorkflow: An instance of the learning workflow
     """
-    api_key = os.getenv("GOOGLE_API_KEY")
-    return LearningWorkflow(api_key=api_key)
\ No newline at end of file
+    registry = get_agent_registry()
+    return LearningWorkflow(api_key=registry.api_key, registry=registry)
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+E-AdaptiveLearning LLM Support
+
+This package contains the infrastructure shared by the agents around their
+LLM calls:
+- LLM response caching (in-memory LRU or on-disk SQLite)
+- CachedChain: a drop-in wrapper around LLMChain that consults the cache
+  and streams user-facing output token by token (stream_tokens)
+- SemanticCache: embedding-similarity cache for near-duplicate tutor questions
+- HistorySummarizer: background summaries of conversation history
+- ModelRouter: maps each agent operation to a model tier, with per-tier
+  concurrency limits and latency/cost accounting
+- ResilientInvoker: per-call timeouts, retries with jitter, failover to the
+  fallback model and per-model circuit breakers
+"""
+
+from .cache import (
+    MemoryCacheBackend,
+    SQLiteCacheBackend,
+    LLMResponseCache,
+    CachedChain,
+    get_llm_cache,
+    stream_tokens
+)
+from .semantic_cache import HashingEmbedder, SemanticCache, get_semantic_cache
+from .summarizer import HistorySummarizer, get_history_summarizer
+from .router import TierLimiter, ModelRouter, get_model_router
+from .resilience import ModelCallError, CircuitOpenError, CircuitBreaker, ResilientInvoker, get_resilient_invoker
+
+__all__ = [
+    'MemoryCacheBackend',
+    'SQLiteCacheBackend',
+    'LLMResponseCache',
+    'CachedChain',
+    'get_llm_cache',
+    'stream_tokens',
+    'HashingEmbedder',
+    'SemanticCache',
+    'get_semantic_cache',
+    'HistorySummarizer',
+    'get_history_summarizer',
+    'TierLimiter',
+    'ModelRouter',
+    'get_model_router',
+    'ModelCallError',
+    'CircuitOpenError',
+    'CircuitBreaker',
+    'ResilientInvoker',
+    'get_resilient_invoker'
+]
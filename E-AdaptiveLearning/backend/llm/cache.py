@@ -0,0 +1,626 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager, nullcontext
+from typing import (Dict, Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, ContextManager,
+                    Iterator, List, Optional, Tuple)
+import config
+
+# Token callback for the request being served; set with stream_tokens()
+_token_callback: contextvars.ContextVar = contextvars.ContextVar("llm_token_callback", default=None)
+
+@contextmanager
+def stream_tokens(on_token: Callable[[str], None]) -> Iterator[None]:
+    """
+    Stream the output of streamable chains invoked inside the block.
+    
+    Args:
+        on_token (Callable): Called with each chunk of generated text
+    """
+    token = _token_callback.set(on_token)
+    try:
+        yield
+    finally:
+        _token_callback.reset(token)
+
+@asynccontextmanager
+async def _async_nullcontext(value: Any) -> AsyncIterator[Any]:
+    """Async context manager that does nothing (contextlib.nullcontext is only async from Python 3.10)."""
+    yield value
+
+class _AbandonedAttempt(Exception):
+    """Stops a streaming model call whose result is no longer awaited."""
+
+def _model_name(llm: Any) -> str:
+    """Name of a LangChain model client."""
+    return getattr(llm, "model", "") or getattr(llm, "model_name", "")
+
+class MemoryCacheBackend:
+    """
+    In-process LRU cache with a per-entry time-to-live.
+    """
+    
+    def __init__(self, max_entries: int = 1000, default_timeout: int = 300):
+        """
+        Initialize the in-memory backend.
+        
+        Args:
+            max_entries (int): Maximum number of entries kept before evicting the least recently used
+            default_timeout (int): Seconds an entry stays valid (0 means no expiry)
+        """
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a value from the cache.
+        
+        Args:
+            key (str): Cache key
+        
+        Returns:
+            Any: Cached value or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> None:
+        """
+        Store a value in the cache.
+        
+        Args:
+            key (str): Cache key
+            value (Any): Value to store
+            timeout (int, optional): Seconds until expiry, defaults to default_timeout
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        expires_at = time.time() + timeout if timeout else 0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache stored in a SQLite file, so cached responses survive restarts
+    and are shared between worker processes on the same host.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 1000, default_timeout: int = 300):
+        """
+        Initialize the SQLite backend.
+        
+        Args:
+            path (str): Path of the SQLite database file
+            max_entries (int): Maximum number of entries kept before evicting the least recently used
+            default_timeout (int): Seconds an entry stays valid (0 means no expiry)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self.evictions = 0
+        self._local = threading.local()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = self._get_conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+        conn.commit()
+    
+    def _get_conn(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection for the current thread.
+        
+        Returns:
+            sqlite3.Connection: Thread-local connection
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a value from the cache.
+        
+        Args:
+            key (str): Cache key
+        
+        Returns:
+            str: Cached value or None if missing or expired
+        """
+        conn = self._get_conn()
+        row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        
+        value, expires_at = row
+        now = time.time()
+        if expires_at and expires_at < now:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        
+        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return value
+    
+    def set(self, key: str, value: str, timeout: Optional[int] = None) -> None:
+        """
+        Store a value in the cache.
+        
+        Args:
+            key (str): Cache key
+            value (str): Value to store
+            timeout (int, optional): Seconds until expiry, defaults to default_timeout
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        now = time.time()
+        expires_at = now + timeout if timeout else 0
+        
+        conn = self._get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, expires_at, now)
+        )
+        
+        # Evict the least recently used entries beyond the threshold
+        count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count > self.max_entries:
+            overflow = count - self.max_entries
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+        conn.commit()
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        conn = self._get_conn()
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
+    
+    def __len__(self) -> int:
+        return self._get_conn().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+class LLMResponseCache:
+    """
+    Cache of LLM responses keyed on (model, temperature, rendered prompt).
+    """
+    
+    def __init__(self, backend: Any, enabled: bool = True):
+        """
+        Initialize the response cache.
+        
+        Args:
+            backend: Storage backend (MemoryCacheBackend or SQLiteCacheBackend)
+            enabled (bool): If False, every lookup is a miss and nothing is stored
+        """
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> str:
+        """
+        Build the cache key for a rendered prompt.
+        
+        Args:
+            model (str): Model name
+            temperature (float): Sampling temperature
+            prompt (str): Fully rendered prompt text
+        
+        Returns:
+            str: Hex digest identifying the request
+        """
+        payload = json.dumps([model, temperature, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def lookup(self, model: str, temperature: float, prompt: str) -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            model (str): Model name
+            temperature (float): Sampling temperature
+            prompt (str): Fully rendered prompt text
+        
+        Returns:
+            str: Cached response text or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        value = self.backend.get(self.make_key(model, temperature, prompt))
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+    
+    def store(self, model: str, temperature: float, prompt: str, response: str) -> None:
+        """
+        Store a response in the cache.
+        
+        Args:
+            model (str): Model name
+            temperature (float): Sampling temperature
+            prompt (str): Fully rendered prompt text
+            response (str): Response text to cache
+        """
+        if not self.enabled:
+            return
+        self.backend.set(self.make_key(model, temperature, prompt), response)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters for the cache.
+        
+        Returns:
+            Dict: Cache statistics
+        """
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": getattr(self.backend, "evictions", 0)
+        }
+
+class CachedChain:
+    """
+    Wrapper around an LLMChain that serves identical prompts from the
+    response cache. It exposes the same invoke() contract as LLMChain:
+    the returned dict contains the inputs plus the generated "text".
+    """
+    
+    def __init__(self, chain: Any, cache: Optional[LLMResponseCache] = None, cacheable: bool = True,
+                 streamable: bool = False, router: Any = None, operation: Optional[str] = None,
+                 fallback_chain: Any = None, invoker: Any = None):
+        """
+        Initialize the cached chain.
+        
+        Args:
+            chain (LLMChain): The chain to wrap
+            cache (LLMResponseCache, optional): Cache to use, defaults to the process-wide cache
+            cacheable (bool): Set to False for chains whose output must be fresh on every call
+            streamable (bool): Set to True for chains whose text is shown to the student as is,
+                so it is streamed inside a stream_tokens() block
+            router (ModelRouter, optional): Router that limits and accounts this chain's model calls
+            operation (str, optional): Operation name the router knows this chain by
+            fallback_chain (LLMChain, optional): Same prompt on the fallback model
+            invoker (ResilientInvoker, optional): Applies timeouts, retries, failover to
+                fallback_chain and circuit breaking to the model calls
+        """
+        self.chain = chain
+        self.prompt = chain.prompt
+        self.llm = chain.llm
+        self.cache = cache or get_llm_cache()
+        self.cacheable = cacheable
+        self.streamable = streamable
+        self.router = router
+        self.operation = operation
+        self.fallback_chain = fallback_chain
+        self.invoker = invoker
+    
+    @property
+    def model(self) -> str:
+        """Name of the wrapped model."""
+        return _model_name(self.llm)
+    
+    @property
+    def temperature(self) -> float:
+        """Sampling temperature of the wrapped model."""
+        return getattr(self.llm, "temperature", None)
+    
+    def render(self, inputs: Dict[str, Any]) -> str:
+        """
+        Render the prompt for a set of inputs.
+        
+        Args:
+            inputs (Dict): Chain inputs
+        
+        Returns:
+            str: The rendered prompt text
+        """
+        return self.prompt.format(**{key: inputs[key] for key in self.prompt.input_variables})
+    
+    def invoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the chain, using the cache when possible.
+        
+        Args:
+            inputs (Dict): Chain inputs
+        
+        Returns:
+            Dict: The inputs plus the generated "text"
+        """
+        on_token = _token_callback.get() if self.streamable else None
+        if not self.cacheable and on_token is None and self.router is None and self.invoker is None:
+            return self.chain.invoke(inputs)
+        
+        prompt_text = self.render(inputs)
+        if self.cacheable:
+            cached = self.cache.lookup(self.model, self.temperature, prompt_text)
+            if cached is not None:
+                if on_token is not None:
+                    on_token(cached)
+                return {**inputs, "text": cached}
+        
+        with self._track(prompt_text) as call:
+            model, text = self._generate(inputs, prompt_text, on_token)
+            call["text"] = text
+            call["model"] = model
+        
+        # Answers from the fallback model are not cached under the primary model
+        if self.cacheable and model == self.model:
+            self.cache.store(self.model, self.temperature, prompt_text, text)
+        return {**inputs, "text": text}
+    
+    def _targets(self) -> List[Tuple[str, Any]]:
+        """The chains to try, as (model name, chain) pairs, primary first."""
+        chains = [self.chain] if self.fallback_chain is None else [self.chain, self.fallback_chain]
+        return [(_model_name(chain.llm), chain) for chain in chains]
+    
+    def _generate(self, inputs: Dict[str, Any], prompt_text: str,
+                  on_token: Optional[Callable[[str], None]]) -> Tuple[str, str]:
+        """
+        Run the model for a cache miss, through the resilient invoker if the chain has one.
+        
+        Args:
+            inputs (Dict): Chain inputs
+            prompt_text (str): The rendered prompt
+            on_token (Callable, optional): Streaming callback
+        
+        Returns:
+            Tuple[str, str]: Model that answered and the generated text
+        """
+        def attempt(model: str, chain: Any) -> Callable[[], Tuple[str, str]]:
+            if on_token is None:
+                return lambda: (model, chain.invoke(inputs)["text"])
+            
+            def stream() -> Tuple[str, str]:
+                attempt_id = current[0]
+                
+                def emit(text: str) -> None:
+                    if current[0] != attempt_id:
+                        # The invoker gave up on this attempt; stop the stream
+                        raise _AbandonedAttempt()
+                    streamed[0] = True
+                    on_token(text)
+                return model, self._stream(chain.llm, prompt_text, emit)
+            return stream
+        
+        current, streamed = [0], [False]
+        
+        def can_retry() -> bool:
+            # Retrying after tokens went out would repeat them
+            current[0] += 1
+            return not streamed[0]
+        
+        targets = [(model, attempt(model, chain)) for model, chain in self._targets()]
+        if self.invoker is None:
+            return targets[0][1]()
+        try:
+            return self.invoker.call(targets, can_retry)
+        finally:
+            current[0] += 1
+    
+    def _track(self, prompt_text: str) -> ContextManager[Dict[str, str]]:
+        """
+        Context for one model call: the router's concurrency limit and
+        accounting, or nothing without a router.
+        
+        Args:
+            prompt_text (str): The rendered prompt
+        
+        Returns:
+            ContextManager: Yields a dict whose "text" and "model" are set to the generated text and the model that answered
+        """
+        if self.router is None:
+            return nullcontext({})
+        return self.router.track(self.operation, self.model, prompt_text)
+    
+    def _atrack(self, prompt_text: str) -> AsyncContextManager[Dict[str, str]]:
+        """
+        Async version of _track().
+        
+        Args:
+            prompt_text (str): The rendered prompt
+        
+        Returns:
+            AsyncContextManager: Yields a dict whose "text" and "model" are set to the generated text and the model that answered
+        """
+        if self.router is None:
+            return _async_nullcontext({})
+        return self.router.atrack(self.operation, self.model, prompt_text)
+    
+    @staticmethod
+    def _stream(llm: Any, prompt_text: str, on_token: Callable[[str], None]) -> str:
+        """
+        Generate with the model's streaming API, passing each chunk to on_token.
+        
+        Args:
+            llm (BaseChatModel): Model to stream from
+            prompt_text (str): The rendered prompt
+            on_token (Callable): Called with each chunk of generated text
+        
+        Returns:
+            str: The full generated text
+        """
+        chunks = []
+        try:
+            for chunk in llm.stream(prompt_text):
+                text = getattr(chunk, "content", chunk)
+                if text:
+                    on_token(text)
+                    chunks.append(text)
+        except _AbandonedAttempt:
+            pass
+        return "".join(chunks)
+    
+    async def ainvoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of invoke(), using the model's async API.
+        
+        Args:
+            inputs (Dict): Chain inputs
+        
+        Returns:
+            Dict: The inputs plus the generated "text"
+        """
+        on_token = _token_callback.get() if self.streamable else None
+        if not self.cacheable and on_token is None and self.router is None and self.invoker is None:
+            return await self.chain.ainvoke(inputs)
+        
+        prompt_text = self.render(inputs)
+        if self.cacheable:
+            cached = self.cache.lookup(self.model, self.temperature, prompt_text)
+            if cached is not None:
+                if on_token is not None:
+                    on_token(cached)
+                return {**inputs, "text": cached}
+        
+        async with self._atrack(prompt_text) as call:
+            model, text = await self._agenerate(inputs, prompt_text, on_token)
+            call["text"] = text
+            call["model"] = model
+        
+        if self.cacheable and model == self.model:
+            self.cache.store(self.model, self.temperature, prompt_text, text)
+        return {**inputs, "text": text}
+    
+    async def _agenerate(self, inputs: Dict[str, Any], prompt_text: str,
+                         on_token: Optional[Callable[[str], None]]) -> Tuple[str, str]:
+        """
+        Async version of _generate(). Timed-out attempts are cancelled, so
+        they cannot keep streaming.
+        
+        Args:
+            inputs (Dict): Chain inputs
+            prompt_text (str): The rendered prompt
+            on_token (Callable, optional): Streaming callback
+        
+        Returns:
+            Tuple[str, str]: Model that answered and the generated text
+        """
+        streamed = [False]
+        
+        def emit(text: str) -> None:
+            streamed[0] = True
+            on_token(text)
+        
+        def attempt(model: str, chain: Any) -> Callable[[], Awaitable[Tuple[str, str]]]:
+            async def run() -> Tuple[str, str]:
+                if on_token is None:
+                    return model, (await chain.ainvoke(inputs))["text"]
+                return model, await self._astream(chain.llm, prompt_text, emit)
+            return run
+        
+        targets = [(model, attempt(model, chain)) for model, chain in self._targets()]
+        if self.invoker is None:
+            return await targets[0][1]()
+        return await self.invoker.acall(targets, lambda: not streamed[0])
+    
+    @staticmethod
+    async def _astream(llm: Any, prompt_text: str, on_token: Callable[[str], None]) -> str:
+        """
+        Async version of _stream().
+        
+        Args:
+            llm (BaseChatModel): Model to stream from
+            prompt_text (str): The rendered prompt
+            on_token (Callable): Called with each chunk of generated text
+        
+        Returns:
+            str: The full generated text
+        """
+        chunks = []
+        async for chunk in llm.astream(prompt_text):
+            text = getattr(chunk, "content", chunk)
+            if text:
+                chunks.append(text)
+                on_token(text)
+        return "".join(chunks)
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+def _build_backend() -> Any:
+    """
+    Build the cache backend selected by config.CACHE_TYPE.
+    
+    Returns:
+        Backend instance
+    """
+    cache_type = config.CACHE_TYPE.lower()
+    if cache_type in ("sqlitecache", "filesystemcache", "sqlite", "disk"):
+        return SQLiteCacheBackend(
+            path=os.path.join(config.CACHE_DIR, "llm_cache.sqlite3"),
+            max_entries=config.CACHE_THRESHOLD,
+            default_timeout=config.CACHE_DEFAULT_TIMEOUT
+        )
+    return MemoryCacheBackend(
+        max_entries=config.CACHE_THRESHOLD,
+        default_timeout=config.CACHE_DEFAULT_TIMEOUT
+    )
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Get the process-wide LLM response cache configured from config.py.
+    
+    Returns:
+        LLMResponseCache: Singleton instance of LLMResponseCache
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                enabled = config.FEATURES["enable_caching"] and config.CACHE_TYPE.lower() != "nullcache"
+                _llm_cache = LLMResponseCache(_build_backend(), enabled=enabled)
+    return _llm_cache
@@ -0,0 +1,444 @@
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+from google.api_core import exceptions as google_exceptions
+import config
+
+T = TypeVar("T")
+
+# Errors that another attempt will not fix (bad request, credentials, unknown
+# model); everything else (timeouts, 429, 5xx, connection errors) is retried
+_PERMANENT_ERRORS = (
+    google_exceptions.InvalidArgument,
+    google_exceptions.PermissionDenied,
+    google_exceptions.Unauthenticated,
+    google_exceptions.NotFound,
+    KeyError,
+    TypeError,
+)
+
+class ModelCallError(RuntimeError):
+    """Raised when a model call failed on every model it was allowed to use."""
+
+class CircuitOpenError(ModelCallError):
+    """Raised without calling the provider because every model's circuit is open."""
+    
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker. After failure_threshold consecutive failures
+    the circuit opens and calls are refused for reset_timeout seconds; then
+    a single probe call is let through, which closes the circuit again if it
+    succeeds. Calls are also refused while max_abandoned timed-out calls are
+    still running against the model.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, max_abandoned: int = 8):
+        """
+        Initialize the circuit breaker.
+        
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds the circuit stays open before a probe call
+            max_abandoned (int): Timed-out calls still running at which calls are refused
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_abandoned = max_abandoned
+        self.state = "closed"
+        self.failures = 0
+        self.abandoned = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """
+        Check whether a call may go to the model now.
+        
+        Returns:
+            bool: False while the circuit is open (or a probe call is already running)
+                or too many abandoned calls are still running
+        """
+        with self._lock:
+            if self.abandoned >= self.max_abandoned:
+                return False
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+    
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe call through."""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+    
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+    
+    def record_abandoned(self, future: Future) -> None:
+        """
+        Count a call the caller stopped waiting for until it finishes.
+        
+        Args:
+            future (Future): The running call
+        """
+        def finished(_: Future) -> None:
+            with self._lock:
+                self.abandoned -= 1
+        
+        with self._lock:
+            self.abandoned += 1
+        future.add_done_callback(finished)
+    
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit at the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+class ResilientInvoker:
+    """
+    Runs model calls with a per-attempt timeout and an overall deadline,
+    retries transient failures with capped exponential backoff and full
+    jitter, and fails over from the primary model to the fallback model.
+    A circuit breaker per model skips a model while it is failing, so a
+    degraded provider costs callers an immediate error instead of a timeout.
+    
+    Each sync attempt runs on a thread of its own so the caller can stop
+    waiting at the attempt timeout. The abandoned call finishes (or times
+    out) in the background without holding up the next attempt, and counts
+    against its model's circuit until it does. Async calls are cancelled
+    with asyncio.wait_for.
+    """
+    
+    def __init__(self, attempt_timeout: float = 30.0, deadline: float = 45.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 4.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, max_workers: int = 64, max_abandoned: int = 8):
+        """
+        Initialize the invoker.
+        
+        Args:
+            attempt_timeout (float): Seconds one model call may take
+            deadline (float): Seconds a call may take in total, over all retries and the fallback
+            max_retries (int): Retries per model after the first attempt
+            backoff_base (float): Backoff before the first retry, doubled per retry
+            backoff_max (float): Maximum backoff
+            failure_threshold (int): Consecutive failures that open a model's circuit
+            reset_timeout (float): Seconds a circuit stays open before a probe call
+            max_workers (int): Sync model calls waited on at once
+            max_abandoned (int): Timed-out calls a model may still be running before it is skipped
+        """
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_abandoned = max_abandoned
+        
+        # Held while a caller waits on an attempt, not by attempts it gave up on
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.fallbacks = 0
+        self.short_circuited = 0
+        self.failures = 0
+    
+    def breaker(self, model: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker of a model.
+        
+        Args:
+            model (str): Model name
+        
+        Returns:
+            CircuitBreaker: The model's circuit breaker
+        """
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.max_abandoned)
+                self._breakers[model] = breaker
+        return breaker
+    
+    @staticmethod
+    def _start(model: str, attempt: Callable[[], T]) -> Future:
+        """
+        Run a sync attempt on a new thread, in the caller's context.
+        
+        Args:
+            model (str): Model name, for the thread name
+            attempt (Callable): The attempt function
+        
+        Returns:
+            Future: The attempt's result
+        """
+        future: Future = Future()
+        context = contextvars.copy_context()
+        
+        def run() -> None:
+            try:
+                future.set_result(context.run(attempt))
+            except BaseException as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=run, name=f"model-call-{model}", daemon=True).start()
+        return future
+    
+    def _backoff(self, retry: int) -> float:
+        """Full-jitter backoff before the given retry (0-based)."""
+        return random.uniform(0, min(self.backoff_base * 2 ** retry, self.backoff_max))
+    
+    def _count(self, counter: str) -> None:
+        """Increment a stats counter."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def _plan(self, targets: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+        """
+        Drop repeated models from the targets, counting the call.
+        
+        Args:
+            targets (List[Tuple]): (model name, attempt function) pairs, primary first
+        
+        Returns:
+            List[Tuple]: The targets to try, in order
+        """
+        self._count("calls")
+        seen = set()
+        plan = []
+        for model, attempt in targets:
+            if model not in seen:
+                seen.add(model)
+                plan.append((model, attempt))
+        return plan
+    
+    def _give_up(self, targets: List[Tuple[str, Any]], last_error: Optional[BaseException]) -> ModelCallError:
+        """
+        Build the error for a call that could not be completed.
+        
+        Args:
+            targets (List[Tuple]): The targets that were tried
+            last_error (BaseException, optional): The last failure, None if every circuit was open
+        
+        Returns:
+            ModelCallError: The error to raise
+        """
+        self._count("failures")
+        models = ", ".join(model for model, _ in targets)
+        if last_error is None:
+            return CircuitOpenError(f"Model circuit open for {models}",
+                                    retry_after=self.retry_after([model for model, _ in targets]))
+        return ModelCallError(f"Model call failed on {models}: {last_error}")
+    
+    def call(self, targets: List[Tuple[str, Callable[[], T]]],
+             can_retry: Callable[[], bool] = lambda: True) -> T:
+        """
+        Run a model call resiliently.
+        
+        Args:
+            targets (List[Tuple]): (model name, attempt function) pairs, primary model first
+            can_retry (Callable): Checked after a failure; return False once retrying would
+                repeat output the caller already used (e.g. streamed tokens)
+        
+        Returns:
+            The result of the first successful attempt
+        
+        Raises:
+            ModelCallError: If no attempt succeeded within the deadline
+            CircuitOpenError: If every model's circuit is open
+        """
+        targets = self._plan(targets)
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        
+        for index, (model, attempt) in enumerate(targets):
+            breaker = self.breaker(model)
+            if index > 0:
+                self._count("fallbacks")
+            for retry in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._give_up(targets, last_error or TimeoutError("deadline exceeded"))
+                if not breaker.allow():
+                    self._count("short_circuited")
+                    break
+                
+                self._count("attempts")
+                with self._slots:
+                    future = self._start(model, attempt)
+                    try:
+                        result = future.result(timeout=min(self.attempt_timeout, remaining))
+                    except FutureTimeoutError:
+                        breaker.record_abandoned(future)
+                        self._count("timeouts")
+                        last_error = TimeoutError(f"{model} did not respond within {min(self.attempt_timeout, remaining):.1f}s")
+                    except _PERMANENT_ERRORS as e:
+                        breaker.record_success()  # The provider answered; the request was at fault
+                        raise ModelCallError(f"Model call to {model} failed: {e}") from e
+                    except Exception as e:
+                        last_error = e
+                    else:
+                        breaker.record_success()
+                        return result
+                
+                breaker.record_failure()
+                print(f"Model call to {model} failed (attempt {retry + 1}): {last_error}")
+                if not can_retry():
+                    raise self._give_up(targets, last_error) from last_error
+                if retry < self.max_retries:
+                    self._count("retries")
+                    time.sleep(min(self._backoff(retry), max(deadline - time.monotonic(), 0)))
+        
+        raise self._give_up(targets, last_error)
+    
+    async def acall(self, targets: List[Tuple[str, Callable[[], Awaitable[T]]]],
+                    can_retry: Callable[[], bool] = lambda: True) -> T:
+        """
+        Async version of call.
+        
+        Args:
+            targets (List[Tuple]): (model name, coroutine function) pairs, primary model first
+            can_retry (Callable): Checked after a failure; return False once retrying would
+                repeat output the caller already used (e.g. streamed tokens)
+        
+        Returns:
+            The result of the first successful attempt
+        
+        Raises:
+            ModelCallError: If no attempt succeeded within the deadline
+            CircuitOpenError: If every model's circuit is open
+        """
+        targets = self._plan(targets)
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        
+        for index, (model, attempt) in enumerate(targets):
+            breaker = self.breaker(model)
+            if index > 0:
+                self._count("fallbacks")
+            for retry in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._give_up(targets, last_error or TimeoutError("deadline exceeded"))
+                if not breaker.allow():
+                    self._count("short_circuited")
+                    break
+                
+                self._count("attempts")
+                try:
+                    result = await asyncio.wait_for(attempt(), timeout=min(self.attempt_timeout, remaining))
+                except asyncio.TimeoutError:
+                    self._count("timeouts")
+                    last_error = TimeoutError(f"{model} did not respond within {min(self.attempt_timeout, remaining):.1f}s")
+                except _PERMANENT_ERRORS as e:
+                    breaker.record_success()
+                    raise ModelCallError(f"Model call to {model} failed: {e}") from e
+                except Exception as e:
+                    last_error = e
+                else:
+                    breaker.record_success()
+                    return result
+                
+                breaker.record_failure()
+                print(f"Model call to {model} failed (attempt {retry + 1}): {last_error}")
+                if not can_retry():
+                    raise self._give_up(targets, last_error) from last_error
+                if retry < self.max_retries:
+                    self._count("retries")
+                    await asyncio.sleep(min(self._backoff(retry), max(deadline - time.monotonic(), 0)))
+        
+        raise self._give_up(targets, last_error)
+    
+    def retry_after(self, models: List[str]) -> float:
+        """
+        Seconds until any of the models accepts calls again.
+        
+        Args:
+            models (List[str]): Model names
+        
+        Returns:
+            float: 0 if one of them accepts calls now
+        """
+        return min((self.breaker(model).retry_after() for model in models), default=0.0)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get call counters and circuit states.
+        
+        Returns:
+            Dict: Invoker statistics
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+            stats = {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "fallbacks": self.fallbacks,
+                "short_circuited": self.short_circuited,
+                "failures": self.failures
+            }
+        stats["circuits"] = {
+            model: {"state": breaker.state, "consecutive_failures": breaker.failures,
+                    "times_opened": breaker.times_opened, "abandoned_calls": breaker.abandoned}
+            for model, breaker in breakers.items()
+        }
+        return stats
+
+_resilient_invoker: Optional[ResilientInvoker] = None
+_resilient_invoker_lock = threading.Lock()
+
+def get_resilient_invoker() -> ResilientInvoker:
+    """
+    Get the process-wide resilient invoker configured from config.py.
+    
+    Returns:
+        ResilientInvoker: Singleton instance of ResilientInvoker
+    """
+    global _resilient_invoker
+    if _resilient_invoker is None:
+        with _resilient_invoker_lock:
+            if _resilient_invoker is None:
+                _resilient_invoker = ResilientInvoker(
+                    attempt_timeout=config.TIMEOUTS["model_request"],
+                    deadline=config.MODEL_CALL_DEADLINE,
+                    max_retries=config.MODEL_MAX_RETRIES,
+                    backoff_base=config.MODEL_RETRY_BACKOFF_BASE,
+                    backoff_max=config.MODEL_RETRY_BACKOFF_MAX,
+                    failure_threshold=config.MODEL_CIRCUIT_FAILURE_THRESHOLD,
+                    reset_timeout=config.MODEL_CIRCUIT_RESET_TIMEOUT,
+                    max_abandoned=config.MODEL_MAX_ABANDONED_CALLS
+                )
+    return _resilient_invoker
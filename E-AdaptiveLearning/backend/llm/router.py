@@ -0,0 +1,381 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from collections import deque
+from typing import Dict, Any, Deque, Iterator, AsyncIterator, Optional, Tuple
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.chains import LLMChain
+import config
+from .cache import CachedChain
+from .resilience import get_resilient_invoker
+
+class TierLimiter:
+    """
+    Caps the concurrent model calls of one tier, for both threads and
+    coroutines. Waiters queue first come, first served, and a released slot
+    is handed straight to the next one: a thread is woken through its
+    event, a coroutine through a future resolved on its own event loop, so
+    nothing polls and the loop keeps running while coroutines wait.
+    """
+    
+    def __init__(self, max_concurrency: int):
+        """
+        Initialize the limiter.
+        
+        Args:
+            max_concurrency (int): Maximum calls in flight
+        """
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._waiters: Deque[Any] = deque()  # threading.Event or (loop, future) per waiter
+        self.in_flight = 0
+        self.waiting = 0
+    
+    def _try_acquire(self) -> bool:
+        """Take a free slot if nobody is queued for one; the caller must hold self._lock."""
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+    
+    def acquire(self) -> None:
+        """Wait for a free slot."""
+        with self._lock:
+            if self._try_acquire():
+                return
+            granted = threading.Event()
+            self._waiters.append(granted)
+            self.waiting += 1
+        granted.wait()
+    
+    async def aacquire(self) -> None:
+        """Async version of acquire."""
+        with self._lock:
+            if self._try_acquire():
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+            self.waiting += 1
+        
+        future = waiter[1]
+        try:
+            await future
+        except BaseException:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+                    self.waiting -= 1
+            if not queued:
+                if future.done() and not future.cancelled():
+                    self.release()
+                else:
+                    # The hand-off is already scheduled; _grant passes the slot on
+                    future.cancel()
+            raise
+    
+    def release(self) -> None:
+        """Give a slot back, or hand it to the next waiter."""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                self.waiting -= 1
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    continue  # Its event loop is closed
+            self.in_flight -= 1
+    
+    def _grant(self, future: "asyncio.Future") -> None:
+        """Complete a coroutine's hand-off on its own loop, or pass the slot on if it gave up."""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+class ModelRouter:
+    """
+    Maps each agent operation (e.g. "ai_tutor.hint") to a model tier from
+    config.MODEL_TIERS via config.MODEL_ROUTES, so cheap classification-like
+    calls run on a small, fast model and long-form generation on a larger
+    one.
+    
+    Every chain built with chain() reports its model calls back to the
+    router, which limits the concurrent calls per tier and keeps latency and
+    cost counters per operation. Token counts are estimated from the prompt
+    and response length (about 4 characters per token).
+    """
+    
+    CHARS_PER_TOKEN = 4
+    
+    def __init__(self, tiers: Optional[Dict[str, Dict[str, Any]]] = None, routes: Optional[Dict[str, str]] = None,
+                 default_tier: str = "medium", api_key: Optional[str] = None):
+        """
+        Initialize the router.
+        
+        Args:
+            tiers (Dict, optional): Tier name -> {"model", "max_concurrency"}, defaults to config.MODEL_TIERS
+            routes (Dict, optional): Operation name -> tier name, defaults to config.MODEL_ROUTES
+            default_tier (str): Tier of operations without a route
+            api_key (str, optional): Google API key, defaults to config.GOOGLE_API_KEY
+        """
+        self.tiers = tiers or config.MODEL_TIERS
+        self.routes = routes or config.MODEL_ROUTES
+        self.default_tier = default_tier
+        self.api_key = api_key or config.GOOGLE_API_KEY
+        
+        self._limiters = {name: TierLimiter(tier["max_concurrency"]) for name, tier in self.tiers.items()}
+        self._llms: Dict[Tuple[str, float, str], ChatGoogleGenerativeAI] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def tier_for(self, operation: str) -> str:
+        """
+        Get the tier an operation runs on.
+        
+        Args:
+            operation (str): Operation name
+        
+        Returns:
+            str: Tier name
+        """
+        tier = self.routes.get(operation, self.default_tier)
+        return tier if tier in self.tiers else self.default_tier
+    
+    def model_for(self, operation: str) -> str:
+        """
+        Get the model an operation runs on.
+        
+        Args:
+            operation (str): Operation name
+        
+        Returns:
+            str: Model name
+        """
+        return self.tiers[self.tier_for(operation)]["model"]
+    
+    def llm(self, operation: str, temperature: Optional[float] = None, model: Optional[str] = None,
+            api_key: Optional[str] = None) -> ChatGoogleGenerativeAI:
+        """
+        Get the shared model client for an operation.
+        
+        Args:
+            operation (str): Operation name
+            temperature (float, optional): Sampling temperature, defaults to the model's
+                temperature from config.get_model_config
+            model (str, optional): Model to use instead of the routed one
+            api_key (str, optional): Google API key, defaults to the router's
+        
+        Returns:
+            ChatGoogleGenerativeAI: Model client, shared by every operation with the same settings
+        """
+        model = model or self.model_for(operation)
+        if temperature is None:
+            temperature = config.get_model_config(model)["temperature"]
+        api_key = api_key or self.api_key
+        
+        key = (model, temperature, api_key or "")
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                # Retries are left to the ResilientInvoker so they do not nest
+                llm = ChatGoogleGenerativeAI(temperature=temperature, model=model, google_api_key=api_key,
+                                             max_retries=1)
+                self._llms[key] = llm
+        return llm
+    
+    def chain(self, operation: str, prompt: Any, temperature: Optional[float] = None, model: Optional[str] = None,
+              api_key: Optional[str] = None, **kwargs: Any) -> CachedChain:
+        """
+        Build a chain for an operation on its routed model. With
+        FEATURES["enable_model_resilience"] on, its model calls get per-attempt
+        timeouts, retries with backoff, a circuit breaker per model and
+        failover to config.FALLBACK_MODEL.
+        
+        Args:
+            operation (str): Operation name
+            prompt (PromptTemplate): The chain's prompt
+            temperature (float, optional): Sampling temperature
+            model (str, optional): Model to use instead of the routed one
+            api_key (str, optional): Google API key
+            **kwargs: Further CachedChain options (cacheable, streamable)
+        
+        Returns:
+            CachedChain: The chain, reporting its model calls to this router
+        """
+        llm = self.llm(operation, temperature, model, api_key)
+        fallback_chain, invoker = None, None
+        if config.FEATURES.get("enable_model_resilience", True):
+            invoker = get_resilient_invoker()
+            if config.FALLBACK_MODEL and config.FALLBACK_MODEL != llm.model:
+                fallback_llm = self.llm(operation, temperature, config.FALLBACK_MODEL, api_key)
+                fallback_chain = LLMChain(llm=fallback_llm, prompt=prompt)
+        return CachedChain(LLMChain(llm=llm, prompt=prompt), router=self, operation=operation,
+                           fallback_chain=fallback_chain, invoker=invoker, **kwargs)
+    
+    # ==================== Call accounting ====================
+    
+    @contextmanager
+    def track(self, operation: str, model: str, prompt_text: str) -> Iterator[Dict[str, str]]:
+        """
+        Run a model call within its tier's concurrency limit and record it.
+        
+        Args:
+            operation (str): Operation name
+            model (str): Model the call goes to
+            prompt_text (str): The rendered prompt
+        
+        Yields:
+            Dict: Set its "text" to the generated text before leaving the block,
+                and its "model" to the model that answered if that was a fallback
+        """
+        limiter = self._limiters[self.tier_for(operation)]
+        limiter.acquire()
+        call = {"text": "", "model": model}
+        started = time.monotonic()
+        try:
+            yield call
+        except BaseException:
+            self._record(operation, call["model"], started, prompt_text, "", failed=True)
+            raise
+        finally:
+            limiter.release()
+        self._record(operation, call["model"], started, prompt_text, call["text"])
+    
+    @asynccontextmanager
+    async def atrack(self, operation: str, model: str, prompt_text: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Async version of track.
+        
+        Args:
+            operation (str): Operation name
+            model (str): Model the call goes to
+            prompt_text (str): The rendered prompt
+        
+        Yields:
+            Dict: Set its "text" to the generated text before leaving the block,
+                and its "model" to the model that answered if that was a fallback
+        """
+        limiter = self._limiters[self.tier_for(operation)]
+        await limiter.aacquire()
+        call = {"text": "", "model": model}
+        started = time.monotonic()
+        try:
+            yield call
+        except BaseException:
+            self._record(operation, call["model"], started, prompt_text, "", failed=True)
+            raise
+        finally:
+            limiter.release()
+        self._record(operation, call["model"], started, prompt_text, call["text"])
+    
+    def _record(self, operation: str, model: str, started: float, prompt_text: str, text: str,
+                failed: bool = False) -> None:
+        """
+        Add a finished model call to the operation's counters, priced and
+        timed against the model that answered it.
+        
+        Args:
+            operation (str): Operation name
+            model (str): Model that answered (or last tried) the call
+            started (float): time.monotonic() at the start of the call
+            prompt_text (str): The rendered prompt
+            text (str): The generated text
+            failed (bool): Whether the call raised
+        """
+        latency_ms = (time.monotonic() - started) * 1000
+        input_tokens = len(prompt_text) // self.CHARS_PER_TOKEN
+        output_tokens = len(text) // self.CHARS_PER_TOKEN
+        model_config = config.get_model_config(model)
+        cost = (input_tokens * model_config.get("input_cost_per_mtok", 0)
+                + output_tokens * model_config.get("output_cost_per_mtok", 0)) / 1_000_000
+        
+        with self._lock:
+            tier = self.tier_for(operation)
+            stats = self._stats.setdefault(operation, {
+                "tier": tier, "model": self.tiers[tier]["model"], "calls": 0, "errors": 0,
+                "total_latency_ms": 0.0, "max_latency_ms": 0.0,
+                "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "by_model": {}
+            })
+            by_model = stats["by_model"].setdefault(model, {
+                "calls": 0, "errors": 0, "total_latency_ms": 0.0, "cost_usd": 0.0
+            })
+            by_model["calls"] += 1
+            by_model["errors"] += int(failed)
+            by_model["total_latency_ms"] += latency_ms
+            by_model["cost_usd"] += cost
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["total_latency_ms"] += latency_ms
+            stats["max_latency_ms"] = max(stats["max_latency_ms"], latency_ms)
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cost_usd"] += cost
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-tier load and per-operation and per-model latency and cost.
+        
+        Returns:
+            Dict: Tier, model and operation statistics
+        """
+        with self._lock:
+            operations = {
+                operation: {
+                    **stats,
+                    "by_model": {model: dict(counts) for model, counts in stats["by_model"].items()},
+                    "avg_latency_ms": stats["total_latency_ms"] / stats["calls"] if stats["calls"] else 0.0
+                }
+                for operation, stats in self._stats.items()
+            }
+        
+        models: Dict[str, Dict[str, Any]] = {}
+        for stats in operations.values():
+            for model, counts in stats["by_model"].items():
+                totals = models.setdefault(model, {"calls": 0, "errors": 0, "total_latency_ms": 0.0, "cost_usd": 0.0})
+                for key in totals:
+                    totals[key] += counts[key]
+        for totals in models.values():
+            totals["avg_latency_ms"] = totals["total_latency_ms"] / totals["calls"] if totals["calls"] else 0.0
+        
+        tiers = {}
+        for name, tier in self.tiers.items():
+            limiter = self._limiters[name]
+            tier_ops = [stats for stats in operations.values() if stats["tier"] == name]
+            # Calls that fell back to another model are billed to that model, not the tier
+            answered = [stats["by_model"].get(tier["model"], {}) for stats in tier_ops]
+            calls = sum(counts.get("calls", 0) for counts in answered)
+            tiers[name] = {
+                "model": tier["model"],
+                "max_concurrency": limiter.max_concurrency,
+                "in_flight": limiter.in_flight,
+                "waiting": limiter.waiting,
+                "calls": calls,
+                "fallback_calls": sum(stats["calls"] for stats in tier_ops) - calls,
+                "cost_usd": sum(counts.get("cost_usd", 0.0) for counts in answered)
+            }
+        return {"tiers": tiers, "models": models, "operations": operations}
+
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+def get_model_router() -> ModelRouter:
+    """
+    Get the process-wide model router configured from config.py.
+    
+    Returns:
+        ModelRouter: Singleton instance of ModelRouter
+    """
+    global _model_router
+    if _model_router is None:
+        with _model_router_lock:
+            if _model_router is None:
+                _model_router = ModelRouter()
+    return _model_router
@@ -0,0 +1,341 @@
+import re
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import config
+
+class HashingEmbedder:
+    """
+    Local, offline embedding function based on the hashing trick.
+    
+    Content words, their bigrams and their character trigrams are hashed into
+    a fixed-size signed vector which is then L2-normalised, so cosine
+    similarity reduces to a dot product. Question boilerplate ("what is",
+    "can you explain") is dropped first, so rephrasings of the same question
+    score close to 1.0.
+    
+    Lexical similarity cannot tell "x^2" from "x^3" or a question from its
+    negation, so signature() extracts the tokens that must match exactly:
+    numbers, operators, single-letter variables, negations and question
+    words such as "why" or "how".
+    """
+    
+    _token_pattern = re.compile(r"[a-z0-9]+")
+    _signature_pattern = re.compile(r"\d+(?:\.\d+)?|[-+*/^=<>%]|[a-z]+n't|[a-z]+")
+    _filler_words = frozenset(
+        "a an the is are was were be been of to in on at by for from with about as and "
+        "it its this that these those i me my you your we us can could would will do does did "
+        "please explain tell describe define what s".split()
+    )
+    _exact_words = frozenset(
+        "not no never none nor without cannot cant dont doesnt isnt arent wasnt wont "
+        "why how when where who which "
+        "plus minus times multiplied divided over squared cubed power root sqrt "
+        "sin cos tan log ln exp mod factorial percent".split()
+    )
+    
+    def __init__(self, dim: int = 1024):
+        """
+        Initialize the embedder.
+        
+        Args:
+            dim (int): Dimension of the embedding vectors
+        """
+        self.dim = dim
+    
+    def _features(self, text: str) -> List[str]:
+        """
+        Extract hashed features from a piece of text.
+        
+        Args:
+            text (str): Input text
+        
+        Returns:
+            List[str]: Feature strings
+        """
+        words = [word for word in self._token_pattern.findall(text.lower())
+                 if word not in self._filler_words]
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f" {word} "
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+    
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a piece of text.
+        
+        Args:
+            text (str): Input text
+        
+        Returns:
+            np.ndarray: L2-normalised float32 vector of length dim
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dim] += sign
+        
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+    
+    def signature(self, text: str) -> Tuple[str, ...]:
+        """
+        Extract the tokens two questions must share to be served the same answer.
+        
+        Args:
+            text (str): Input text
+        
+        Returns:
+            Tuple[str, ...]: Numbers, operators, variables, negations and question words, in order
+        """
+        tokens = self._signature_pattern.findall(text.lower())
+        return tuple(
+            token for token in tokens
+            if not token.isalpha() or token in self._exact_words or token.endswith("n't")
+            or (len(token) == 1 and token not in ("a", "i", "s"))
+        )
+
+class _ScopeIndex:
+    """
+    Fixed-capacity matrix of question embeddings for one cache scope.
+    """
+    
+    _initial_rows = 16
+    
+    def __init__(self, capacity: int, dim: int):
+        # Storage starts small and doubles up to capacity, so rarely used
+        # scopes stay cheap
+        rows = min(capacity, self._initial_rows)
+        self.capacity = capacity
+        self.vectors = np.zeros((rows, dim), dtype=np.float32)
+        self.answers: List[Optional[str]] = [None] * rows
+        self.signatures: List[Optional[Tuple[str, ...]]] = [None] * rows
+        self.last_used = np.zeros(rows, dtype=np.float64)
+        self.created = np.zeros(rows, dtype=np.float64)
+        self.size = 0
+    
+    def _grow(self) -> None:
+        """Double the storage, up to capacity."""
+        rows = min(self.capacity, len(self.answers) * 2)
+        extra = rows - len(self.answers)
+        self.vectors = np.vstack([self.vectors, np.zeros((extra, self.vectors.shape[1]), dtype=np.float32)])
+        self.answers.extend([None] * extra)
+        self.signatures.extend([None] * extra)
+        self.last_used = np.concatenate([self.last_used, np.zeros(extra)])
+        self.created = np.concatenate([self.created, np.zeros(extra)])
+    
+    def search(self, vector: np.ndarray, signature: Tuple[str, ...], ttl: int) -> Tuple[int, float]:
+        """
+        Find the most similar live entry with the same signature.
+        
+        Args:
+            vector (np.ndarray): Query embedding
+            signature (Tuple[str, ...]): Exact-match tokens of the query
+            ttl (int): Seconds an entry stays valid (0 means no expiry)
+        
+        Returns:
+            Tuple[int, float]: Slot index and cosine similarity, (-1, 0.0) if empty
+        """
+        if self.size == 0:
+            return -1, 0.0
+        
+        similarities = self.vectors[:self.size] @ vector
+        if ttl:
+            expired = self.created[:self.size] < time.time() - ttl
+            similarities[expired] = -1.0
+        mismatched = [slot for slot in range(self.size) if self.signatures[slot] != signature]
+        similarities[mismatched] = -1.0
+        
+        best = int(np.argmax(similarities))
+        return best, float(similarities[best])
+    
+    def add(self, vector: np.ndarray, signature: Tuple[str, ...], answer: str) -> bool:
+        """
+        Add an entry, evicting the least recently used one if full.
+        
+        Args:
+            vector (np.ndarray): Question embedding
+            signature (Tuple[str, ...]): Exact-match tokens of the question
+            answer (str): Answer to cache
+        
+        Returns:
+            bool: True if an entry was evicted
+        """
+        evicted = False
+        if self.size == len(self.answers) and self.size < self.capacity:
+            self._grow()
+        
+        if self.size < len(self.answers):
+            slot = self.size
+            self.size += 1
+        else:
+            slot = int(np.argmin(self.last_used[:self.size]))
+            evicted = True
+        
+        now = time.time()
+        self.vectors[slot] = vector
+        self.answers[slot] = answer
+        self.signatures[slot] = signature
+        self.last_used[slot] = now
+        self.created[slot] = now
+        return evicted
+
+class SemanticCache:
+    """
+    Embedding-similarity cache for tutor answers, scoped by student, topic and
+    difficulty level, since answers are personalised with the student's
+    learning history. Questions whose embedding is within the similarity
+    threshold of a cached question, and whose signature is identical, are
+    served the cached answer.
+    """
+    
+    def __init__(self, threshold: float = 0.9, max_entries: int = 500, ttl: int = 3600,
+                 embedder: Optional[HashingEmbedder] = None, enabled: bool = True,
+                 max_scopes: int = 1000):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            threshold (float): Minimum cosine similarity for a hit
+            max_entries (int): Maximum entries per (student, topic, difficulty) scope
+            ttl (int): Seconds an entry stays valid (0 means no expiry)
+            embedder (HashingEmbedder, optional): Embedding function
+            enabled (bool): If False, every lookup is a miss and nothing is stored
+            max_scopes (int): Maximum scopes kept; the least recently used one is dropped
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder or HashingEmbedder()
+        self.enabled = enabled
+        self.max_scopes = max_scopes
+        self._scopes: "OrderedDict[Tuple[str, str, int], _ScopeIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Histogram of best similarities seen on lookups, in 0.05 buckets,
+        # used to pick a threshold from real traffic
+        self.similarity_histogram = np.zeros(20, dtype=np.int64)
+    
+    @staticmethod
+    def _scope_key(student_id: str, topic: str, difficulty_level: int) -> Tuple[str, str, int]:
+        """Normalise (student, topic, difficulty) into a scope key."""
+        return str(student_id), (topic or "general").strip().lower(), int(difficulty_level)
+    
+    def lookup(self, student_id: str, topic: str, difficulty_level: int, question: str) -> Optional[str]:
+        """
+        Look up a cached answer for a question.
+        
+        Args:
+            student_id (str): Student the answer was personalised for
+            topic (str): Topic of the question
+            difficulty_level (int): Student's difficulty level
+            question (str): The student's question
+        
+        Returns:
+            str: Cached answer or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        vector = self.embedder.embed(question)
+        signature = self.embedder.signature(question)
+        key = self._scope_key(student_id, topic, difficulty_level)
+        with self._lock:
+            index = self._scopes.get(key)
+            slot, similarity = index.search(vector, signature, self.ttl) if index else (-1, 0.0)
+            
+            bucket = min(max(int(similarity * 20), 0), 19)
+            self.similarity_histogram[bucket] += 1
+            
+            if slot >= 0 and similarity >= self.threshold:
+                self.hits += 1
+                index.last_used[slot] = time.time()
+                self._scopes.move_to_end(key)
+                return index.answers[slot]
+            
+            self.misses += 1
+            return None
+    
+    def store(self, student_id: str, topic: str, difficulty_level: int, question: str, answer: str) -> None:
+        """
+        Store an answer for a question.
+        
+        Args:
+            student_id (str): Student the answer was personalised for
+            topic (str): Topic of the question
+            difficulty_level (int): Student's difficulty level
+            question (str): The student's question
+            answer (str): The generated answer
+        """
+        if not self.enabled:
+            return
+        
+        vector = self.embedder.embed(question)
+        signature = self.embedder.signature(question)
+        key = self._scope_key(student_id, topic, difficulty_level)
+        with self._lock:
+            index = self._scopes.get(key)
+            if index is None:
+                index = self._scopes[key] = _ScopeIndex(self.max_entries, self.embedder.dim)
+                if len(self._scopes) > self.max_scopes:
+                    self._scopes.popitem(last=False)
+            self._scopes.move_to_end(key)
+            if index.add(vector, signature, answer):
+                self.evictions += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit-rate metrics for threshold tuning.
+        
+        Returns:
+            Dict: Cache statistics
+        """
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "scopes": len(self._scopes),
+            "entries": sum(index.size for index in self._scopes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "similarity_histogram": {
+                f"{i * 0.05:.2f}": int(count) for i, count in enumerate(self.similarity_histogram)
+            }
+        }
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> SemanticCache:
+    """
+    Get the process-wide semantic cache configured from config.py.
+    
+    Returns:
+        SemanticCache: Singleton instance of SemanticCache
+    """
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+                    ttl=config.SEMANTIC_CACHE_TTL,
+                    embedder=HashingEmbedder(dim=config.SEMANTIC_CACHE_DIM),
+                    enabled=config.FEATURES["enable_semantic_cache"],
+                    max_scopes=config.SEMANTIC_CACHE_MAX_SCOPES
+                )
+    return _semantic_cache
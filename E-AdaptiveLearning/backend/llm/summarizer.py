@@ -0,0 +1,124 @@
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from langchain.prompts import PromptTemplate
+import config
+from .router import get_model_router
+
+class HistorySummarizer:
+    """
+    Rolls conversation messages that aged out of a session's window into a
+    running summary, on a background thread so the request that triggered
+    it does not wait for the model.
+    """
+    
+    def __init__(self, chain: Any = None, max_workers: int = 2, max_jobs: int = 1000):
+        """
+        Initialize the summarizer.
+        
+        Args:
+            chain (CachedChain, optional): Summary chain, defaults to one on the "history.summary" route
+            max_workers (int): Concurrent summary calls
+            max_jobs (int): Finished or running jobs kept for collection; older ones are dropped
+        """
+        if chain is None:
+            prompt = PromptTemplate(
+                input_variables=["summary", "messages"],
+                template="""
+                Update the running summary of a tutoring conversation.
+                
+                Current summary:
+                {summary}
+                
+                New messages:
+                {messages}
+                
+                Write the updated summary in at most 150 words. Keep the topics covered,
+                the student's questions, difficulties and progress, and anything the tutor
+                promised to follow up on. Return only the summary.
+                """
+            )
+            chain = get_model_router().chain("history.summary", prompt, temperature=0.2)
+        
+        self.chain = chain
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-summary")
+        self._jobs: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _summarize(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        """
+        Run the summary chain.
+        
+        Args:
+            summary (str): Current running summary
+            messages (List[Dict]): Messages to fold in
+        
+        Returns:
+            str: Updated summary
+        """
+        formatted = "\n".join(f"{message.get('role', 'user')}: {message.get('content', '')}" for message in messages)
+        response = self.chain.invoke({"summary": summary or "None yet", "messages": formatted})
+        return response["text"].strip()
+    
+    def submit(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        """
+        Start summarizing messages into the running summary.
+        
+        Args:
+            summary (str): Current running summary
+            messages (List[Dict]): Messages to fold in
+        
+        Returns:
+            str: Job ID to pass to collect()
+        """
+        job_id = uuid.uuid4().hex
+        future = self._executor.submit(self._summarize, summary, messages)
+        with self._lock:
+            self._jobs[job_id] = future
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job_id
+    
+    def collect(self, job_id: str) -> Optional[str]:
+        """
+        Get the result of a summary job without waiting.
+        
+        Args:
+            job_id (str): ID returned by submit()
+        
+        Returns:
+            str: The updated summary, or None while the job is still running
+        
+        Raises:
+            KeyError: If the job is unknown to this process or failed
+        """
+        with self._lock:
+            future = self._jobs[job_id]
+            if not future.done():
+                return None
+            del self._jobs[job_id]
+        
+        if future.exception() is not None:
+            print(f"Error summarizing conversation history: {future.exception()}")
+            raise KeyError(job_id)
+        return future.result()
+
+_history_summarizer: Optional[HistorySummarizer] = None
+_history_summarizer_lock = threading.Lock()
+
+def get_history_summarizer() -> HistorySummarizer:
+    """
+    Get the process-wide history summarizer.
+    
+    Returns:
+        HistorySummarizer: Singleton instance of HistorySummarizer
+    """
+    global _history_summarizer
+    if _history_summarizer is None:
+        with _history_summarizer_lock:
+            if _history_summarizer is None:
+                _history_summarizer = HistorySummarizer(max_workers=config.HISTORY_SUMMARY_WORKERS)
+    return _history_summarizer
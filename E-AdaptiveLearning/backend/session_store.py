@@ -0,0 +1,537 @@
+import os
+import time
+import zlib
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, List, Optional
+import config
+from state import StateManager
+
+class SessionConflictError(RuntimeError):
+    """Raised by save() when the session was changed or removed since it was loaded."""
+
+def serialize_session(state_manager: StateManager) -> bytes:
+    """
+    Serialize a state manager to compressed JSON.
+    
+    Args:
+        state_manager (StateManager): Session state
+    
+    Returns:
+        bytes: zlib-compressed JSON
+    """
+    return zlib.compress(state_manager.to_json().encode("utf-8"))
+
+def deserialize_session(data: bytes) -> StateManager:
+    """
+    Restore a state manager serialized with serialize_session().
+    
+    Args:
+        data (bytes): zlib-compressed JSON
+    
+    Returns:
+        StateManager: Session state
+    """
+    return StateManager.from_json(zlib.decompress(data).decode("utf-8"))
+
+class SessionLocks:
+    """
+    One lock per session id, so requests of the same session run their
+    load, update and save one at a time. Locks are dropped again when no
+    request holds or waits for them. The locks are per process; across the
+    worker processes sharing a SQLite store, save() detects the conflict.
+    """
+    
+    def __init__(self):
+        """Initialize the lock registry."""
+        self._lock = threading.Lock()
+        self._locks: Dict[str, List[Any]] = {}  # session id -> [threading.Lock, holders and waiters]
+        self._async_locks: Dict[str, List[Any]] = {}  # session id -> [asyncio.Lock, holders and waiters]
+    
+    @contextmanager
+    def hold(self, session_id: str):
+        """
+        Run the block while no other thread of this process holds the session.
+        
+        Args:
+            session_id (str): Session identifier
+        """
+        with self._lock:
+            entry = self._locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[session_id]
+    
+    @asynccontextmanager
+    async def ahold(self, session_id: str):
+        """
+        Async version of hold(), for requests served on one event loop.
+        
+        Args:
+            session_id (str): Session identifier
+        """
+        entry = self._async_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._async_locks[session_id]
+
+class MemorySessionStore:
+    """
+    In-process session store: an LRU of serialized sessions with an idle
+    time-to-live. Keeping sessions serialized bounds memory per session
+    and makes the bytes metric exact.
+    
+    get() hands out a copy, so callers that update a session hold
+    lock(session_id) from get() to save(). Each session also has a version;
+    save() refuses a copy that is older than the stored session.
+    """
+    
+    def __init__(self, max_sessions: int = 10000, ttl: int = 7200):
+        """
+        Initialize the in-memory store.
+        
+        Args:
+            max_sessions (int): Maximum sessions kept before evicting the least recently used
+            ttl (int): Seconds a session may stay idle before it expires (0 means no expiry)
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # session id -> (data, last access, version)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.locks = SessionLocks()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def lock(self, session_id: str):
+        """
+        Hold a session from get() to save().
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            Context manager holding the session's lock
+        """
+        return self.locks.hold(session_id)
+    
+    def alock(self, session_id: str):
+        """
+        Async version of lock().
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            Async context manager holding the session's lock
+        """
+        return self.locks.ahold(session_id)
+    
+    def get(self, session_id: str) -> Optional[StateManager]:
+        """
+        Load a session.
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            StateManager: Session state or None if unknown or expired
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            data, last_access, version = entry
+            if self.ttl and last_access < time.time() - self.ttl:
+                self._remove(session_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._sessions[session_id] = (data, time.time(), version)
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+        state_manager = deserialize_session(data)
+        state_manager.store_version = version
+        return state_manager
+    
+    def save(self, session_id: str, state_manager: StateManager) -> None:
+        """
+        Store a session, creating or replacing it.
+        
+        Args:
+            session_id (str): Session identifier
+            state_manager (StateManager): Session state
+        
+        Raises:
+            SessionConflictError: If state_manager came from get() and the session
+                was saved or removed since
+        """
+        data = serialize_session(state_manager)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            version = entry[2] if entry else 0
+            if state_manager.store_version is not None and (entry is None or state_manager.store_version != version):
+                raise SessionConflictError(f"Session {session_id} was changed or removed since it was loaded")
+            
+            self._remove(session_id)
+            self._sessions[session_id] = (data, time.time(), version + 1)
+            self._bytes += len(data)
+            state_manager.store_version = version + 1
+            
+            while len(self._sessions) > self.max_sessions:
+                oldest = next(iter(self._sessions))
+                self._remove(oldest)
+                self.evictions += 1
+    
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session.
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            bool: True if the session existed
+        """
+        with self._lock:
+            return self._remove(session_id)
+    
+    def _remove(self, session_id: str) -> bool:
+        """Remove a session. Caller must hold self._lock."""
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry[0])
+        return True
+    
+    def purge_expired(self) -> int:
+        """
+        Remove every expired session.
+        
+        Returns:
+            int: Number of sessions removed
+        """
+        if not self.ttl:
+            return 0
+        
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            # Entries are in access order, so expired ones are at the front
+            expired = []
+            for session_id, (_, last_access, _) in self._sessions.items():
+                if last_access >= cutoff:
+                    break
+                expired.append(session_id)
+            for session_id in expired:
+                self._remove(session_id)
+            self.expirations += len(expired)
+        return len(expired)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get session store metrics.
+        
+        Returns:
+            Dict: Store statistics
+        """
+        self.purge_expired()
+        with self._lock:
+            live = len(self._sessions)
+            return {
+                "backend": type(self).__name__,
+                "live_sessions": live,
+                "bytes": self._bytes,
+                "avg_session_bytes": self._bytes / live if live else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+class SQLiteSessionStore:
+    """
+    Session store in a SQLite file, shared by every worker process on the
+    host, with the same LRU and idle time-to-live rules as MemorySessionStore.
+    
+    lock(session_id) only serializes the requests of one process, so save()
+    is a compare-and-set on the row's version: a copy loaded before another
+    process saved the session is refused.
+    """
+    
+    # Expired rows are purged on every Nth save
+    _purge_every = 100
+    
+    def __init__(self, path: str, max_sessions: int = 10000, ttl: int = 7200):
+        """
+        Initialize the SQLite store.
+        
+        Args:
+            path (str): Path of the SQLite database file
+            max_sessions (int): Maximum sessions kept before evicting the least recently used
+            ttl (int): Seconds a session may stay idle before it expires (0 means no expiry)
+        """
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._saves = 0
+        self.locks = SessionLocks()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = self._get_conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "version" not in columns:
+            # Stores created before sessions were versioned
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        conn.commit()
+    
+    def _get_conn(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection for the current thread.
+        
+        Returns:
+            sqlite3.Connection: Thread-local connection
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def _count(self, counter: str, amount: int = 1) -> None:
+        """Increment a metrics counter."""
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+    
+    def lock(self, session_id: str):
+        """
+        Hold a session from get() to save() within this process.
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            Context manager holding the session's lock
+        """
+        return self.locks.hold(session_id)
+    
+    def alock(self, session_id: str):
+        """
+        Async version of lock().
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            Async context manager holding the session's lock
+        """
+        return self.locks.ahold(session_id)
+    
+    def get(self, session_id: str) -> Optional[StateManager]:
+        """
+        Load a session.
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            StateManager: Session state or None if unknown or expired
+        """
+        conn = self._get_conn()
+        row = conn.execute(
+            "SELECT data, last_access, version FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        
+        data, last_access, version = row
+        now = time.time()
+        if self.ttl and last_access < now - self.ttl:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.commit()
+            self._count("expirations")
+            self._count("misses")
+            return None
+        
+        conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        conn.commit()
+        self._count("hits")
+        state_manager = deserialize_session(data)
+        state_manager.store_version = version
+        return state_manager
+    
+    def save(self, session_id: str, state_manager: StateManager) -> None:
+        """
+        Store a session, creating or replacing it.
+        
+        Args:
+            session_id (str): Session identifier
+            state_manager (StateManager): Session state
+        
+        Raises:
+            SessionConflictError: If state_manager came from get() and the session
+                was saved or removed since
+        """
+        data = serialize_session(state_manager)
+        conn = self._get_conn()
+        if state_manager.store_version is None:
+            conn.execute(
+                "INSERT INTO sessions (session_id, data, last_access, version) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (session_id) DO UPDATE SET data = excluded.data, "
+                "last_access = excluded.last_access, version = version + 1",
+                (session_id, data, time.time())
+            )
+            version = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()[0]
+        else:
+            cursor = conn.execute(
+                "UPDATE sessions SET data = ?, last_access = ?, version = version + 1 "
+                "WHERE session_id = ? AND version = ?",
+                (data, time.time(), session_id, state_manager.store_version)
+            )
+            if cursor.rowcount == 0:
+                conn.rollback()
+                raise SessionConflictError(f"Session {session_id} was changed or removed since it was loaded")
+            version = state_manager.store_version + 1
+        state_manager.store_version = version
+        
+        with self._stats_lock:
+            self._saves += 1
+            purge = self._saves % self._purge_every == 0
+        if purge:
+            self._purge_expired(conn)
+        
+        # Evict the least recently used sessions beyond the threshold
+        count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        if count > self.max_sessions:
+            overflow = count - self.max_sessions
+            conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._count("evictions", overflow)
+        conn.commit()
+    
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session.
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            bool: True if the session existed
+        """
+        conn = self._get_conn()
+        cursor = conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+    
+    def _purge_expired(self, conn: sqlite3.Connection) -> int:
+        """Delete expired rows without committing."""
+        if not self.ttl:
+            return 0
+        cursor = conn.execute("DELETE FROM sessions WHERE last_access < ?", (time.time() - self.ttl,))
+        self._count("expirations", cursor.rowcount)
+        return cursor.rowcount
+    
+    def purge_expired(self) -> int:
+        """
+        Remove every expired session.
+        
+        Returns:
+            int: Number of sessions removed
+        """
+        conn = self._get_conn()
+        removed = self._purge_expired(conn)
+        conn.commit()
+        return removed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get session store metrics. Hit, miss and eviction counters are per process.
+        
+        Returns:
+            Dict: Store statistics
+        """
+        self.purge_expired()
+        live, size = self._get_conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions"
+        ).fetchone()
+        return {
+            "backend": type(self).__name__,
+            "live_sessions": live,
+            "bytes": size,
+            "avg_session_bytes": size / live if live else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+_session_store: Optional[Any] = None
+_session_store_lock = threading.Lock()
+
+def get_session_store() -> Any:
+    """
+    Get the process-wide session store selected by config.SESSION_STORE_TYPE.
+    
+    Returns:
+        MemorySessionStore or SQLiteSessionStore: Singleton session store
+    """
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                if config.SESSION_STORE_TYPE.lower() == "sqlite":
+                    _session_store = SQLiteSessionStore(
+                        path=config.SESSION_STORE_PATH,
+                        max_sessions=config.SESSION_STORE_MAX_SESSIONS,
+                        ttl=config.SESSION_IDLE_TTL
+                    )
+                else:
+                    _session_store = MemorySessionStore(
+                        max_sessions=config.SESSION_STORE_MAX_SESSIONS,
+                        ttl=config.SESSION_IDLE_TTL
+                    )
+    return _session_store
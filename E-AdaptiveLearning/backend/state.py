@@ -91,6 +91,12 @@ class LearningSession(BaseModel):
     duration: int = 0  # Duration in minutes
     content_summary: str = ""
 
+class HistoryPolicy(BaseModel):
+    """Limits on the conversation history kept verbatim per session"""
+    max_turns: int = 20  # Most recent messages kept verbatim
+    max_chars: int = 8000  # Character budget for those messages (about 4 characters per token)
+    summary_max_chars: int = 1500  # Size cap of the running summary of older messages
+
 class UserState(BaseModel):
     """Model for tracking user state during a session"""
     student_id: str
@@ -100,7 +106,11 @@ class UserState(BaseModel):
     current_learning_mode: LearningMode = LearningMode.EXPLORATION
     current_quiz_id: Optional[str] = None
     current_session_id: Optional[str] = None
-    conversation_history: List[Dict[str, Any]] = Field(default_factory=list)
+    conversation_history: List[Dict[str, Any]] = Field(default_factory=list)  # Recent messages only
+    history_summary: str = ""  # Running summary of messages that aged out of conversation_history
+    summary_backlog: List[Dict[str, Any]] = Field(default_factory=list)  # Aged-out messages not summarized yet
+    summary_job: Optional[str] = None  # Background summarizer job covering the start of the backlog
+    summary_job_size: int = 0
     context: Dict[str, Any] = Field(default_factory=dict)  # Additional context for agents
 
 class StudentProfile(BaseModel):
@@ -148,16 +158,29 @@ class LearningResource(BaseModel):
 class StateManager:
     """
     Manages the application state during a session.
+    
+    The conversation history is a sliding window bounded by a HistoryPolicy.
+    Messages that age out are rolled into a running summary, by the shared
+    background summarizer when one is configured, so memory per session
+    stays constant however long the conversation gets.
     """
     
-    def __init__(self, student_id: str):
+    # Defaults shared by all sessions, configured at application startup
+    default_history_policy = HistoryPolicy()
+    summarizer = None  # Object with submit(summary, messages) -> job id and collect(job id) -> summary
+    
+    def __init__(self, student_id: str, history_policy: Optional[HistoryPolicy] = None):
         """
         Initialize the state manager.
         
         Args:
             student_id (str): The ID of the current student
+            history_policy (HistoryPolicy, optional): History limits, defaults to default_history_policy
         """
         self.user_state = UserState(student_id=student_id)
+        self.history_policy = history_policy or self.default_history_policy
+        # Version of the session store entry this state was loaded from or saved as
+        self.store_version: Optional[int] = None
         
     def start_learning_session(self, topic: str, subtopic: str, 
                              difficulty_level: DifficultyLevel, 
@@ -202,6 +225,118 @@ class StateManager:
             message (Dict): The message to add
         """
         self.user_state.conversation_history.append(message)
+        self._trim_history()
+        
+    def _trim_history(self) -> None:
+        """
+        Move messages beyond the turn or character budget to the summary backlog.
+        """
+        policy = self.history_policy
+        history = self.user_state.conversation_history
+        
+        overflow = max(len(history) - policy.max_turns, 0)
+        chars = sum(len(str(message.get("content", ""))) for message in history[overflow:])
+        while overflow < len(history) - 1 and chars > policy.max_chars:
+            chars -= len(str(history[overflow].get("content", "")))
+            overflow += 1
+        
+        if overflow:
+            self.user_state.summary_backlog.extend(history[:overflow])
+            del history[:overflow]
+        
+        self._update_summary()
+        
+    def _update_summary(self) -> None:
+        """
+        Collect a finished summary job and start the next one for the backlog.
+        """
+        state = self.user_state
+        policy = self.history_policy
+        summarizer = self.summarizer
+        
+        if state.summary_job and summarizer is not None:
+            try:
+                summary = summarizer.collect(state.summary_job)
+            except KeyError:
+                # The job failed or ran in another worker process; resubmit
+                summary = None
+                state.summary_job = None
+                state.summary_job_size = 0
+            
+            if summary is not None:
+                state.history_summary = summary[-policy.summary_max_chars:]
+                del state.summary_backlog[:state.summary_job_size]
+                state.summary_job = None
+                state.summary_job_size = 0
+        
+        # Without a summarizer, or if it falls behind, fold the backlog in
+        # locally so the backlog stays bounded too
+        if state.summary_backlog and (summarizer is None or len(state.summary_backlog) > policy.max_turns):
+            state.history_summary = self._fold_summary(state.history_summary, state.summary_backlog,
+                                                       policy.summary_max_chars)
+            state.summary_backlog = []
+            state.summary_job = None
+            state.summary_job_size = 0
+        
+        if state.summary_backlog and not state.summary_job:
+            state.summary_job = summarizer.submit(state.history_summary, list(state.summary_backlog))
+            state.summary_job_size = len(state.summary_backlog)
+        
+    @staticmethod
+    def _fold_summary(summary: str, messages: List[Dict[str, Any]], max_chars: int) -> str:
+        """
+        Append short excerpts of messages to a summary, keeping its tail within max_chars.
+        
+        Args:
+            summary (str): The current summary
+            messages (List[Dict]): Messages to fold in
+            max_chars (int): Maximum summary length
+            
+        Returns:
+            str: The updated summary
+        """
+        lines = [summary] if summary else []
+        for message in messages:
+            content = " ".join(str(message.get("content", "")).split())
+            if len(content) > 200:
+                content = content[:197] + "..."
+            lines.append(f"{message.get('role', 'user')}: {content}")
+        return "\n".join(lines)[-max_chars:]
+        
+    def get_prompt_window(self) -> List[Dict[str, Any]]:
+        """
+        Get the conversation window to put in a prompt: a summary of older
+        messages (if any) followed by the recent messages.
+        
+        Returns:
+            List[Dict]: Messages with "role" and "content"; the summary has role "summary"
+        """
+        state = self.user_state
+        summary = state.history_summary
+        if state.summary_backlog:
+            # Messages still waiting for the summarizer are folded in locally
+            summary = self._fold_summary(summary, state.summary_backlog, self.history_policy.summary_max_chars)
+        
+        window = [{"role": "summary", "content": summary}] if summary else []
+        return window + list(state.conversation_history)
+    
+    @staticmethod
+    def format_prompt_window(window: Optional[List[Dict[str, Any]]]) -> str:
+        """
+        Render a get_prompt_window() result as prompt text.
+        
+        Args:
+            window (List[Dict], optional): Summary and recent messages
+            
+        Returns:
+            str: One line per message, or a note that the conversation just started
+        """
+        if not window:
+            return "This is the start of the conversation."
+        
+        speakers = {"summary": "Summary of earlier conversation", "user": "Student", "system": "Tutor"}
+        return "\n".join(f"{speakers.get(message.get('role'), message.get('role', 'user'))}: {message.get('content', '')}"
+                         for message in window)
         
     def add_context(self, key: str, value: Any) -> None:
         """
@@ -260,6 +395,32 @@ class StateManager:
             "conversation_length": len(self.user_state.conversation_history)
         }
         
+    def to_json(self) -> str:
+        """
+        Serialize the state compactly (fields at their defaults are omitted).
+        
+        Returns:
+            str: JSON representation of the user state
+        """
+        return self.user_state.model_dump_json(exclude_defaults=True)
+        
+    @classmethod
+    def from_json(cls, data: str) -> "StateManager":
+        """
+        Restore a state manager serialized with to_json().
+        
+        Args:
+            data (str): JSON representation of the user state
+            
+        Returns:
+            StateManager: The restored state manager
+        """
+        state_manager = cls.__new__(cls)
+        state_manager.user_state = UserState.model_validate_json(data)
+        state_manager.history_policy = cls.default_history_policy
+        state_manager.store_version = None
+        return state_manager
+        
     def clear_session(self) -> None:
         """Clear the current session data but keep student ID."""
         student_id = self.user_state.student_id
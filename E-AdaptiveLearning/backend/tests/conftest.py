@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the backend tests.
+
+No MongoDB server is needed: DatabaseHandler runs against mongomock and
+AsyncDatabaseHandler against mongomock_motor, its Motor stand-in.
+    
+    pip install -r ../requirements.txt pytest mongomock mongomock-motor
+    python -m pytest tests
+"""
+import os
+import sys
+import asyncio
+import inspect
+from typing import Any, Dict
+
+import pytest
+import mongomock
+from mongomock_motor import AsyncMongoMockClient
+
+# The backend modules import each other as top-level modules (import config)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_db_connection
+from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler, get_async_db_connection
+from database.write_behind import WriteBehindQueue
+
+class HandlerBackend:
+    """
+    Calls DatabaseHandler or AsyncDatabaseHandler methods the same way, so
+    one test body checks the contract of both.
+    """
+    
+    def __init__(self, name: str, handler: Any, db: Any, loop: asyncio.AbstractEventLoop):
+        self.name = name
+        self.handler = handler
+        self.db = db
+        self.loop = loop
+    
+    def __getattr__(self, method: str):
+        function = getattr(self.handler, method)
+        if not inspect.iscoroutinefunction(function):
+            return function
+        return lambda *args, **kwargs: self.loop.run_until_complete(function(*args, **kwargs))
+    
+    def seed(self, collection_name: str, document: Dict[str, Any]) -> None:
+        """Insert a document directly into the backing collection."""
+        result = self.db[collection_name].insert_one(document)
+        if inspect.isawaitable(result):
+            self.loop.run_until_complete(result)
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest.fixture
+def sync_handler(monkeypatch):
+    """DatabaseHandler on mongomock, writing synchronously."""
+    db = mongomock.MongoClient()["e_adaptive_learning_test"]
+    monkeypatch.setattr(get_db_connection(), "get_collection", db.__getitem__)
+    handler = DatabaseHandler()
+    handler.write_behind = WriteBehindQueue(enabled=False)
+    return handler, db
+
+@pytest.fixture
+def async_handler(monkeypatch):
+    """AsyncDatabaseHandler on mongomock_motor."""
+    db = AsyncMongoMockClient()["e_adaptive_learning_test"]
+    monkeypatch.setattr(get_async_db_connection(), "get_collection", db.__getitem__)
+    handler = AsyncDatabaseHandler()
+    handler.write_behind = WriteBehindQueue(enabled=False)
+    return handler, db
+
+@pytest.fixture(params=["sync", "async"])
+def backend(request, loop) -> HandlerBackend:
+    """Each contract test runs once per handler."""
+    handler, db = request.getfixturevalue(f"{request.param}_handler")
+    return HandlerBackend(request.param, handler, db, loop)
@@ -0,0 +1,58 @@
+"""
+Tests for the per-event-loop Motor client cache of AsyncDatabaseConnection.
+"""
+import asyncio
+
+import pytest
+
+from database import async_db_handler
+from database.async_db_handler import get_async_db_connection
+
+class FakeMotorClient:
+    """Records close() instead of opening connections."""
+    
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+    
+    def __getitem__(self, db_name: str):
+        return self
+    
+    def close(self) -> None:
+        self.closed = True
+
+@pytest.fixture
+def connection(monkeypatch):
+    conn = get_async_db_connection()
+    monkeypatch.setattr(async_db_handler, "AsyncIOMotorClient", FakeMotorClient)
+    monkeypatch.setattr(conn, "_clients", {})
+    return conn
+
+def test_one_client_per_running_loop(connection):
+    async def databases():
+        return connection.get_database(), connection.get_database()
+    
+    first, second = asyncio.run(databases())
+    assert first is second
+
+def test_client_of_closed_loop_is_closed_not_reused(connection):
+    async def database():
+        return connection.get_database()
+    
+    first = asyncio.run(database())
+    second = asyncio.run(database())
+    assert second is not first
+    assert first.closed and not second.closed
+    assert list(connection._clients.values()) == [second]
+
+def test_close_closes_every_client(connection):
+    async def database():
+        return connection.get_database()
+    
+    loop = asyncio.new_event_loop()
+    try:
+        client = loop.run_until_complete(database())
+        connection.close()
+        assert client.closed
+        assert connection._clients == {}
+    finally:
+        loop.close()
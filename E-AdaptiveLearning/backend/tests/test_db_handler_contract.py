@@ -0,0 +1,127 @@
+"""
+Contract tests shared by DatabaseHandler and AsyncDatabaseHandler: the same
+calls must store the same documents and return the same values.
+"""
+import inspect
+import time
+
+from database.db_handler import DatabaseHandler
+from database.async_db_handler import AsyncDatabaseHandler
+from database.records import LearningLogRecord
+from database.write_behind import WriteBehindQueue
+
+QUESTIONS = [
+    {"question_text": "2 + 2?", "options": ["3", "4"], "correct_answer": "4", "concepts": ["addition"]},
+    {"question_text": "3 * 3?", "options": ["6", "9"], "correct_answer": "9", "concepts": ["multiplication"]}
+]
+
+def test_async_handler_mirrors_sync_methods():
+    for name, method in inspect.getmembers(DatabaseHandler, inspect.isfunction):
+        if name.startswith("_"):
+            continue
+        async_method = getattr(AsyncDatabaseHandler, name, None)
+        assert async_method is not None, f"AsyncDatabaseHandler.{name} is missing"
+        assert inspect.iscoroutinefunction(async_method), f"AsyncDatabaseHandler.{name} is not a coroutine"
+        assert list(inspect.signature(async_method).parameters.items()) == \
+            list(inspect.signature(method).parameters.items()), f"{name} signatures differ"
+
+def test_student_profile(backend):
+    assert backend.get_student_profile("s1") is None
+    assert backend.create_student_profile("s1", {"name": "Ada"}) is True
+    assert backend.create_student_profile("s1", {"name": "Ada"}) is False
+    
+    assert backend.update_student_profile("s1", {"grade": 7}) is True
+    assert backend.update_student_profile("missing", {"grade": 7}) is False
+    
+    profile = backend.get_student_profile("s1")
+    assert (profile["_id"], profile["name"], profile["grade"]) == ("s1", "Ada", 7)
+
+def test_difficulty_level(backend):
+    assert backend.get_student_difficulty_level("s1", "math") is None
+    assert backend.update_student_difficulty_level("s1", "math", 4) is True
+    assert backend.get_student_difficulty_level("s1", "math") == 4
+    assert backend.get_student_difficulty_level("s1", "physics") is None
+
+def test_learning_logs(backend):
+    first = backend.log_learning_session("s1", "math", "algebra", 2, "Linear equations")
+    time.sleep(0.002)  # Distinct timestamps, so the newest-first order is defined
+    second = backend.log_learning_session("s1", "physics", "motion", 3, "Velocity")
+    backend.log_learning_session("s2", "history", "rome", 1, "Republic")
+    
+    logs = backend.get_learning_logs("s1")
+    assert [log["_id"] for log in logs] == [second, first]
+    assert [log["topic"] for log in backend.get_learning_logs("s1", topic="math")] == ["math"]
+    assert sorted(backend.get_student_topics("s1")) == ["math", "physics"]
+    
+    assert backend.update_learning_session(first, 30) is True
+    assert backend.update_learning_session("missing", 30) is False
+    
+    records = backend.get_learning_logs("s1", topic="math", record_type=LearningLogRecord)
+    assert isinstance(records[0], LearningLogRecord)
+    assert (records[0].id, records[0].subtopic, records[0].duration) == (first, "algebra", 30)
+    assert backend.get_learning_logs("s1", projection="log_subtopics") == [{"subtopic": "motion"},
+                                                                          {"subtopic": "algebra"}]
+
+def test_quiz_round_trip(backend):
+    quiz_id = backend.save_quiz("s1", "math", "arithmetic", 2, "raw quiz text", 2)
+    quiz = backend.get_quiz(quiz_id)
+    assert (quiz["topic"], quiz["question_count"], quiz["metadata"]) == ("math", 2, {})
+    assert "content" not in backend.get_quiz(quiz_id, projection="quiz_header")
+    assert backend.update_quiz_metadata(quiz_id, {"source": "bank"}) is True
+    assert backend.get_quiz(quiz_id)["metadata"] == {"source": "bank"}
+    
+    question_ids = backend.save_quiz_questions(quiz_id, QUESTIONS)
+    assert len(question_ids) == 2
+    assert backend.get_quiz_question(question_ids[1])["question"] == "3 * 3?"
+    assert backend.get_quiz_question_at(quiz_id, 0)["correct_answer"] == "4"
+    assert backend.get_quiz_question_at(quiz_id, 5) is None
+    
+    backend.log_quiz_answer("s1", quiz_id, 1, "9", True, ["multiplication"])
+    backend.log_quiz_answer("s1", quiz_id, 0, "3", False)
+    answers = backend.get_quiz_answers("s1", quiz_id, projection="answer_correctness")
+    assert answers == [{"question_index": 0, "is_correct": False, "concepts": []},
+                       {"question_index": 1, "is_correct": True, "concepts": ["multiplication"]}]
+
+def test_quiz_results(backend):
+    quiz_id = backend.save_quiz("s1", "math", "arithmetic", 2, "raw quiz text", 2)
+    assert backend.save_quiz_result("s1", "missing", 50.0, "") == ""
+    
+    result_id = backend.save_quiz_result("s1", quiz_id, 50.0, "", analysis_status="pending")
+    result = backend.get_quiz_result("s1", quiz_id)
+    assert (result["_id"], result["subtopic"], result["analysis_status"]) == (result_id, "arithmetic", "pending")
+    
+    assert backend.update_quiz_result_analysis(result_id, "Revise multiplication") is True
+    analysis = backend.get_quiz_result("s1", quiz_id, projection="result_analysis")
+    assert analysis.pop("timestamp") == result["timestamp"]
+    assert analysis == {"_id": result_id, "score": 50.0, "analysis": "Revise multiplication", "analysis_status": "ready"}
+    assert [r["score"] for r in backend.get_quiz_results("s1", topic="math")] == [50.0]
+    assert backend.get_quiz_results("s2") == []
+
+def test_question_bank(backend):
+    assert backend.save_bank_questions("math", "arithmetic", 2, "addition", QUESTIONS[:1] * 2) == 2
+    assert backend.save_bank_questions("math", "arithmetic", 2, "multiplication", QUESTIONS[1:]) == 1
+    assert backend.save_bank_questions("math", "arithmetic", 2, "division", []) == 0
+    assert backend.count_bank_questions("math", "arithmetic", 2) == {"addition": 2, "multiplication": 1}
+    
+    taken = backend.take_bank_questions("math", "arithmetic", 2, ["multiplication", "addition"], 2)
+    assert [question["concept"] for question in taken] == ["multiplication", "addition"]
+    assert len(backend.take_bank_questions("math", "arithmetic", 2, [], 5)) == 1
+    assert backend.take_bank_questions("math", "arithmetic", 2, [], 5) == []
+
+def test_default_concepts(backend):
+    assert backend.get_default_concepts("math", "algebra") == ["Concept 1", "Concept 2", "Concept 3"]
+    backend.seed("curriculum", {"topic": "math", "subtopic": "algebra", "concepts": ["variables"]})
+    assert backend.get_default_concepts("math", "algebra") == ["variables"]
+
+def test_queued_learning_logs_are_read_back(sync_handler):
+    handler, _ = sync_handler
+    handler.write_behind = WriteBehindQueue(enabled=True, flush_interval=60)
+    try:
+        log_id = handler.log_learning_session("s1", "math", "algebra", 2, "Linear equations")
+        handler.log_learning_interaction("s1", "question", "math", "What is x?", "A variable")
+        
+        assert handler.get_student_topics("s1") == ["math"]
+        assert handler.update_learning_session(log_id, 15) is True
+        assert handler.get_learning_logs("s1")[0]["duration"] == 15
+    finally:
+        handler.write_behind.close(timeout=5)
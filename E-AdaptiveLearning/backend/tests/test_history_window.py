@@ -0,0 +1,116 @@
+"""
+Tests for the bounded conversation window and the background history summarizer.
+"""
+import threading
+
+import pytest
+
+from llm.summarizer import HistorySummarizer
+from state import HistoryPolicy, StateManager
+
+class ManualSummarizer:
+    """Summarizer whose jobs finish only when the test says so."""
+    
+    def __init__(self):
+        self.jobs = {}
+        self.finished = set()
+    
+    def submit(self, summary, messages):
+        job_id = str(len(self.jobs))
+        self.jobs[job_id] = f"summary of {len(messages)} messages"
+        return job_id
+    
+    def collect(self, job_id):
+        if job_id not in self.finished:
+            return None
+        return self.jobs[job_id]
+
+class GatedChain:
+    """Summary chain that blocks until released."""
+    
+    def __init__(self, fail: bool = False):
+        self.released = threading.Event()
+        self.fail = fail
+    
+    def invoke(self, inputs):
+        self.released.wait(5)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return {"text": f" {inputs['summary']} + {inputs['messages']} "}
+
+def message(i: int, content: str = None):
+    return {"role": "user", "content": content or f"message {i}"}
+
+def test_window_keeps_recent_turns_and_folds_older_ones_locally():
+    manager = StateManager("student", HistoryPolicy(max_turns=3, max_chars=10000, summary_max_chars=200))
+    for i in range(10):
+        manager.add_message(message(i))
+    
+    window = manager.get_prompt_window()
+    assert [entry["content"] for entry in window[1:]] == ["message 7", "message 8", "message 9"]
+    assert window[0]["role"] == "summary"
+    assert "message 6" in window[0]["content"]
+    assert manager.user_state.summary_backlog == []
+
+def test_character_budget_trims_long_messages():
+    manager = StateManager("student", HistoryPolicy(max_turns=10, max_chars=100))
+    manager.add_message(message(0, "x" * 80))
+    manager.add_message(message(1, "y" * 80))
+    
+    assert [entry["content"] for entry in manager.user_state.conversation_history] == ["y" * 80]
+
+def test_serialized_session_size_stays_bounded():
+    manager = StateManager("student", HistoryPolicy(max_turns=5, max_chars=1000, summary_max_chars=300))
+    for i in range(200):
+        manager.add_message(message(i, f"question number {i} about fractions"))
+    
+    # Summary and window budgets plus JSON overhead, far below the 200 messages' size
+    assert len(manager.to_json()) < 300 + 1000 + 5 * 50
+
+def test_backlog_is_summarized_in_the_background():
+    summarizer = ManualSummarizer()
+    manager = StateManager("student", HistoryPolicy(max_turns=2))
+    manager.summarizer = summarizer
+    for i in range(4):
+        manager.add_message(message(i))
+    
+    state = manager.user_state
+    # The first job covers message 0; message 1 aged out while it ran
+    assert state.summary_job == "0" and len(state.summary_backlog) == 2
+    # While the job runs, the backlog is folded into the window locally
+    assert "message 1" in manager.get_prompt_window()[0]["content"]
+    
+    summarizer.finished.add("0")
+    manager.add_message(message(4))
+    assert state.history_summary == "summary of 1 messages"
+    assert [entry["content"] for entry in state.summary_backlog] == ["message 1", "message 2"]
+    assert state.summary_job == "1"
+
+def test_summarizer_result_is_collected_without_waiting():
+    chain = GatedChain()
+    summarizer = HistorySummarizer(chain=chain, max_workers=1)
+    job_id = summarizer.submit("", [message(0)])
+    
+    assert summarizer.collect(job_id) is None
+    chain.released.set()
+    summarizer._jobs[job_id].result(timeout=5)
+    assert summarizer.collect(job_id) == "None yet + user: message 0"
+    with pytest.raises(KeyError):
+        summarizer.collect(job_id)
+
+def test_failed_summary_job_is_resubmitted():
+    chain = GatedChain(fail=True)
+    chain.released.set()
+    summarizer = HistorySummarizer(chain=chain, max_workers=1)
+    manager = StateManager("student", HistoryPolicy(max_turns=2))
+    manager.summarizer = summarizer
+    for i in range(3):
+        manager.add_message(message(i))
+    
+    failed_job = manager.user_state.summary_job
+    summarizer._jobs[failed_job].exception(timeout=5)
+    manager.add_message(message(3))
+    
+    assert manager.user_state.summary_job not in (None, failed_job)
+    assert manager.user_state.summary_job_size == 2
+    assert manager.user_state.history_summary == ""
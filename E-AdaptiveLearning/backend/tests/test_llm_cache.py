@@ -0,0 +1,112 @@
+"""
+Tests for the LLM response cache, its backends and CachedChain.
+"""
+from types import SimpleNamespace
+
+import pytest
+from langchain.prompts import PromptTemplate
+
+from llm import cache as cache_module
+from llm.cache import CachedChain, LLMResponseCache, MemoryCacheBackend, SQLiteCacheBackend
+
+class Clock:
+    """Stands in for the time module so entries can be aged."""
+    
+    def __init__(self):
+        self.now = 1_000_000.0
+    
+    def time(self) -> float:
+        return self.now
+
+class CountingChain:
+    """LLMChain stand-in that counts its model calls."""
+    
+    def __init__(self, model: str = "gemini-1.5-flash", temperature: float = 0.2):
+        self.prompt = PromptTemplate(input_variables=["topic"], template="Explain {topic}")
+        self.llm = SimpleNamespace(model=model, temperature=temperature)
+        self.calls = 0
+    
+    def invoke(self, inputs):
+        self.calls += 1
+        return {**inputs, "text": f"answer {self.calls}"}
+    
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemoryCacheBackend(**kwargs)
+        return SQLiteCacheBackend(str(tmp_path / "llm_cache.sqlite3"), **kwargs)
+    return make
+
+def test_entries_expire_after_their_timeout(make_backend, clock):
+    backend = make_backend(default_timeout=60)
+    backend.set("kept", "value", timeout=0)
+    backend.set("expiring", "value")
+    
+    clock.now += 59
+    assert backend.get("expiring") == "value"
+    clock.now += 2
+    assert backend.get("expiring") is None
+    assert backend.get("kept") == "value"
+
+def test_least_recently_used_entry_is_evicted(make_backend, clock):
+    backend = make_backend(max_entries=2)
+    backend.set("a", "1")
+    clock.now += 1
+    backend.set("b", "2")
+    clock.now += 1
+    assert backend.get("a") == "1"  # "b" is now the least recently used
+    clock.now += 1
+    backend.set("c", "3")
+    
+    assert backend.get("b") is None
+    assert (backend.get("a"), backend.get("c")) == ("1", "3")
+    assert backend.evictions == 1
+
+def test_identical_prompt_is_served_from_cache():
+    chain = CountingChain()
+    cache = LLMResponseCache(MemoryCacheBackend())
+    cached = CachedChain(chain, cache=cache)
+    
+    first = cached.invoke({"topic": "fractions"})
+    second = cached.invoke({"topic": "fractions"})
+    other = cached.invoke({"topic": "decimals"})
+    
+    assert first["text"] == second["text"] == "answer 1"
+    assert other["text"] == "answer 2"
+    assert chain.calls == 2
+    assert cache.get_stats()["hits"] == 1
+
+def test_cache_key_includes_model_and_temperature():
+    cache = LLMResponseCache(MemoryCacheBackend())
+    cache.store("gemini-1.5-flash", 0.2, "Explain fractions", "cached")
+    
+    assert cache.lookup("gemini-1.5-flash", 0.2, "Explain fractions") == "cached"
+    assert cache.lookup("gemini-1.5-flash", 0.7, "Explain fractions") is None
+    assert cache.lookup("gemini-1.5-pro", 0.2, "Explain fractions") is None
+
+def test_uncacheable_chain_always_calls_the_model(loop):
+    chain = CountingChain()
+    cached = CachedChain(chain, cache=LLMResponseCache(MemoryCacheBackend()), cacheable=False)
+    
+    cached.invoke({"topic": "fractions"})
+    loop.run_until_complete(cached.ainvoke({"topic": "fractions"}))
+    
+    assert chain.calls == 2
+
+def test_disabled_cache_stores_nothing():
+    backend = MemoryCacheBackend()
+    cache = LLMResponseCache(backend, enabled=False)
+    cache.store("gemini-1.5-flash", 0.2, "Explain fractions", "cached")
+    
+    assert cache.lookup("gemini-1.5-flash", 0.2, "Explain fractions") is None
+    assert len(backend) == 0
@@ -0,0 +1,85 @@
+"""
+Tests for get_progress_stats: the single aggregation must return what the
+per-topic loop it replaced computed from the raw documents.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+NOW = datetime.now()
+
+def seed_history(backend):
+    """Two students, logs and results inside and outside a 30-day window."""
+    logs = [
+        ("s1", "math", "algebra", 20, 2), ("s1", "math", "geometry", 15, 5), ("s1", "math", "algebra", 0, 40),
+        ("s1", "physics", "motion", 30, 3), ("s1", "history", "rome", 10, 90), ("s2", "math", "algebra", 60, 1)
+    ]
+    for number, (student_id, topic, subtopic, duration, days_ago) in enumerate(logs):
+        backend.seed("learning_logs", {"_id": f"log-{number}", "student_id": student_id, "topic": topic,
+                                       "subtopic": subtopic, "duration": duration,
+                                       "timestamp": NOW - timedelta(days=days_ago)})
+    results = [
+        ("s1", "math", 90.0, ["fractions", "equations"], 1), ("s1", "math", 50.0, ["angles"], 4),
+        ("s1", "math", 70.0, ["ratios"], 6), ("s1", "chemistry", 40.0, None, 2),
+        ("s1", "physics", 85.0, ["velocity"], 45), ("s2", "math", 100.0, ["equations"], 1)
+    ]
+    for number, (student_id, topic, score, concepts, days_ago) in enumerate(results):
+        result = {"_id": f"result-{number}", "student_id": student_id, "quiz_id": f"quiz-{number}", "topic": topic,
+                  "subtopic": "mixed", "score": score, "timestamp": NOW - timedelta(days=days_ago)}
+        if concepts is not None:
+            result["concepts"] = concepts
+        backend.seed("quiz_results", result)
+    backend.update_student_difficulty_level("s1", "math", 4)
+    backend.update_student_difficulty_level("s1", "history", 2)
+    backend.update_student_difficulty_level("s2", "physics", 5)
+
+def per_topic_loop(backend, student_id, since=None, topics=None):
+    """The per-topic queries and Python sums that get_progress_stats replaced."""
+    stats = {}
+    studied = set(backend.get_student_topics(student_id))
+    studied |= {result["topic"] for result in backend.get_quiz_results(student_id, limit=100)}
+    for topic in sorted(topics or studied):
+        logs = backend.get_learning_logs(student_id, topic, start_date=since, limit=100)
+        results = backend.get_quiz_results(student_id, topic, start_date=since, limit=100)
+        if not logs and not results:
+            continue
+        scores = [result["score"] for result in results]
+        stats[topic] = {
+            "study_minutes": sum(log.get("duration", 0) for log in logs),
+            "sessions": len(logs),
+            "quizzes": len(results),
+            "average_score": sum(scores) / len(scores) if scores else 0,
+            "min_score": min(scores) if scores else None,
+            "max_score": max(scores) if scores else None,
+            "difficulty_level": backend.get_student_difficulty_level(student_id, topic),
+            "subtopics": sorted({log["subtopic"] for log in logs}),
+            "mastered_concepts": sorted({concept for result in results if result["score"] >= 80
+                                         for concept in result.get("concepts", [])}),
+            "knowledge_gaps": sorted({concept for result in results if result["score"] < 60
+                                      for concept in result.get("concepts", [])})
+        }
+    return stats
+
+@pytest.mark.parametrize("student_id, days, topics", [
+    ("s1", None, None),
+    ("s1", 30, None),
+    ("s1", 30, ["math", "history"]),
+    ("s2", None, None),
+    ("nobody", None, None)
+])
+def test_matches_per_topic_loop(backend, student_id, days, topics):
+    seed_history(backend)
+    since = NOW - timedelta(days=days) if days else None
+    
+    stats = backend.get_progress_stats(student_id, since=since, topics=topics)
+    assert stats == per_topic_loop(backend, student_id, since, topics)
+
+def test_window_and_levels(backend):
+    seed_history(backend)
+    stats = backend.get_progress_stats("s1", since=NOW - timedelta(days=30))
+    
+    assert list(stats) == ["chemistry", "math", "physics"]
+    assert (stats["math"]["study_minutes"], stats["math"]["sessions"], stats["math"]["quizzes"]) == (35, 2, 3)
+    assert stats["math"]["difficulty_level"] == 4
+    assert stats["chemistry"]["sessions"] == 0 and stats["chemistry"]["knowledge_gaps"] == []
+    assert stats["physics"]["quizzes"] == 0 and stats["physics"]["difficulty_level"] is None
@@ -0,0 +1,55 @@
+"""
+Tests for ProgressTrackerAgent's concurrent progress summaries.
+"""
+import asyncio
+
+import pytest
+
+from agents.progress_tracker import ProgressTrackerAgent
+
+TOPICS = ["algebra", "biology", "chemistry", "geometry", "history", "physics"]
+
+def topic_stats(sessions: int):
+    return {"sessions": sessions, "study_minutes": 10 * sessions, "quizzes": 1, "average_score": 80.0,
+            "difficulty_level": 3, "mastered_concepts": [], "knowledge_gaps": []}
+
+class FakeChain:
+    async def ainvoke(self, inputs):
+        return {"text": "Overall summary"}
+
+@pytest.fixture
+def agent(sync_handler, async_handler):
+    return ProgressTrackerAgent(api_key="test-key", db=sync_handler[0], adb=async_handler[0])
+
+def test_async_summary_caps_concurrent_calls(agent, loop, monkeypatch):
+    in_flight, peak = 0, 0
+    
+    def call(result):
+        async def tracked(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return result
+        return tracked
+    
+    async def progress_stats(student_id, since=None, topics=None):
+        return {topic: topic_stats(2) for topic in TOPICS}
+    
+    async def save_progress_summary(**kwargs):
+        return "summary-1"
+    
+    agent.max_workers = 2
+    agent.summary_chain = FakeChain()
+    monkeypatch.setattr(agent.adb, "get_progress_stats", progress_stats)
+    monkeypatch.setattr(agent.adb, "save_progress_summary", save_progress_summary)
+    monkeypatch.setattr(agent, "aget_learning_data", call(([], [])))
+    monkeypatch.setattr(agent, "aanalyze_progress", call({"analysis": "ok"}))
+    monkeypatch.setattr(agent, "aidentify_learning_pattern", call({"patterns": "ok"}))
+    
+    summary = loop.run_until_complete(agent.agenerate_progress_summary("s1"))
+    
+    assert peak == 2
+    assert sorted(summary["topic_summaries"]) == TOPICS
+    assert summary["overall_stats"]["total_study_time"] == 120
@@ -0,0 +1,102 @@
+"""
+Tests for assembling quizzes from the question bank and topping it up.
+"""
+import json
+import time
+
+import pytest
+
+from agents.question_bank import QuestionBank
+from agents.quiz_master import QuizMasterAgent
+from state import QuizQuestion
+
+OPTIONS = [{"letter": "A", "text": "yes"}, {"letter": "B", "text": "no"}]
+
+class Generator:
+    """Question generator that records its calls."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, topic, subtopic, difficulty_level, concept, count):
+        self.calls.append((concept, count))
+        return [QuizQuestion(question_text=f"{concept} question {len(self.calls)}.{i}", options=OPTIONS,
+                             correct_answer="A", explanation="", concepts=[concept]) for i in range(count)]
+
+class FakeChain:
+    def __init__(self, text: str):
+        self.text = text
+        self.inputs = []
+    
+    def invoke(self, inputs):
+        self.inputs.append(inputs)
+        return {"text": self.text}
+
+def bank_for(handler, generator, background: bool = False, **kwargs):
+    bank = QuestionBank(generator=generator, db=handler, **kwargs)
+    if not background:
+        # Refills run only when the test calls refill()
+        bank._ensure_worker = lambda: None
+    return bank
+
+@pytest.fixture
+def db(sync_handler):
+    handler, db = sync_handler
+    db["curriculum"].insert_one({"topic": "math", "subtopic": "fractions", "concepts": ["halves", "thirds"]})
+    return handler
+
+def test_refill_tops_every_concept_up_to_depth(db):
+    generator = Generator()
+    bank = bank_for(db, generator, depth=3, batch_size=2)
+    
+    assert bank.refill("math", "fractions", 2) == 6
+    assert generator.calls == [("halves", 2), ("halves", 1), ("thirds", 2), ("thirds", 1)]
+    assert db.count_bank_questions("math", "fractions", 2) == {"halves": 3, "thirds": 3}
+    assert bank.refill("math", "fractions", 2) == 0
+
+def test_take_covers_concepts_and_hands_out_each_question_once(db):
+    bank = bank_for(db, Generator(), depth=2)
+    bank.refill("math", "fractions", 2)
+    
+    first = bank.take("math", "fractions", 2, ["halves", "thirds"], 3)
+    second = bank.take("math", "fractions", 2, ["halves", "thirds"], 3)
+    
+    assert [question.concepts for question in first] == [["halves"], ["thirds"], ["halves"]]
+    assert [question.concepts for question in second] == [["thirds"]]
+    assert len({question.question_text for question in first + second}) == 4
+    
+    stats = bank.get_stats()
+    assert (stats["full_hits"], stats["misses"], stats["questions_served"]) == (1, 1, 4)
+
+def test_take_schedules_a_background_top_up(db):
+    bank = bank_for(db, Generator(), background=True, depth=2)
+    
+    assert bank.take("math", "fractions", 2, ["halves"], 1) == []
+    for _ in range(200):
+        if db.count_bank_questions("math", "fractions", 2) == {"halves": 2, "thirds": 2}:
+            break
+        time.sleep(0.01)
+    assert db.count_bank_questions("math", "fractions", 2) == {"halves": 2, "thirds": 2}
+    assert [question.concepts for question in bank.take("math", "fractions", 2, ["halves"], 1)] == [["halves"]]
+
+def test_disabled_bank_never_generates(db):
+    generator = Generator()
+    bank = bank_for(db, generator, enabled=False)
+    
+    assert bank.take("math", "fractions", 2, ["halves"], 1) == []
+    assert generator.calls == [] and bank.get_stats()["tracked_subtopics"] == 0
+
+def test_quiz_generates_only_the_shortfall(db, async_handler):
+    quiz_master = QuizMasterAgent(api_key="test-key", db=db, adb=async_handler[0])
+    quiz_master.bank = bank_for(db, Generator())
+    db.save_bank_questions("math", "fractions", 3, "halves",
+                           [q.model_dump(mode="json") for q in Generator()("math", "fractions", 3, "halves", 2)])
+    generated = {"question_text": "What is a third?", "options": OPTIONS, "correct_answer": "A",
+                 "explanation": "", "concepts": ["thirds"]}
+    quiz_master.quiz_chain = FakeChain(json.dumps([generated]))
+    
+    quiz = quiz_master.generate_quiz("s1", "math", "fractions", question_count=3)
+    
+    assert (quiz["from_bank"], quiz["question_count"]) == (2, 3)
+    assert [(inputs["question_count"], inputs["concepts"]) for inputs in quiz_master.quiz_chain.inputs] == [(1, "thirds")]
+    assert db.get_quiz_question_at(quiz["quiz_id"], 2)["question"] == "What is a third?"
@@ -0,0 +1,97 @@
+"""
+Tests for batched quiz analysis and for retrying analyses whose background
+job was lost (e.g. to a restart).
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import config
+from agents.quiz_master import QuizMasterAgent
+from agents.quiz_analysis import QuizAnalysisBatcher
+
+class FakeChain:
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+    
+    def invoke(self, inputs):
+        self.calls += 1
+        return {"text": self.text}
+    
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+@pytest.fixture
+def quiz_master(sync_handler, async_handler):
+    agent = QuizMasterAgent(api_key="test-key", db=sync_handler[0], adb=async_handler[0])
+    agent.analysis_chain = FakeChain("Revise multiplication")
+    return agent
+
+def completed_quiz(handler_backend, age: timedelta, status: str = "pending"):
+    """A two-question quiz, answered, whose result was saved age ago."""
+    quiz_id = handler_backend.save_quiz("s1", "math", "arithmetic", 2, "raw quiz text", 2)
+    handler_backend.log_quiz_answer("s1", quiz_id, 0, "4", True, ["addition"])
+    handler_backend.log_quiz_answer("s1", quiz_id, 1, "6", False, ["multiplication"])
+    handler_backend.seed("quiz_results", {"_id": f"result-{quiz_id}", "student_id": "s1", "quiz_id": quiz_id,
+                                          "topic": "math", "subtopic": "arithmetic", "score": 50.0, "analysis": "",
+                                          "analysis_status": status, "timestamp": datetime.now() - age})
+    return quiz_id
+
+def analyze(quiz_master, backend, quiz_id):
+    if backend.name == "async":
+        return backend.loop.run_until_complete(quiz_master.aanalyze_quiz_results("s1", quiz_id))
+    return quiz_master.analyze_quiz_results("s1", quiz_id)
+
+def test_recent_pending_analysis_is_left_to_its_job(quiz_master, backend):
+    quiz_id = completed_quiz(backend, timedelta(seconds=5))
+    
+    result = analyze(quiz_master, backend, quiz_id)
+    assert (result["analysis_status"], result["analysis"]) == ("pending", None)
+    assert quiz_master.analysis_chain.calls == 0
+
+def test_lost_pending_analysis_is_redone(quiz_master, backend):
+    quiz_id = completed_quiz(backend, timedelta(seconds=config.QUIZ_ANALYSIS_PENDING_TIMEOUT + 60))
+    
+    result = analyze(quiz_master, backend, quiz_id)
+    assert (result["analysis_status"], result["analysis"]) == ("ready", "Revise multiplication")
+    assert quiz_master.analysis_chain.calls == 1
+    
+    stored = backend.get_quiz_result("s1", quiz_id, projection="result_analysis")
+    assert (stored["analysis_status"], stored["analysis"]) == ("ready", "Revise multiplication")
+    assert analyze(quiz_master, backend, quiz_id)["analysis"] == "Revise multiplication"
+    assert quiz_master.analysis_chain.calls == 1
+
+def test_only_one_caller_claims_a_lost_analysis(backend):
+    quiz_id = completed_quiz(backend, timedelta(hours=1))
+    result_id = f"result-{quiz_id}"
+    
+    assert backend.claim_quiz_result_analysis(result_id, None) is True
+    assert backend.claim_quiz_result_analysis(result_id, None) is False
+    
+    requested_at = backend.get_quiz_result("s1", quiz_id, projection="result_analysis")["analysis_requested_at"]
+    assert backend.update_quiz_result_analysis(result_id, "Done") is True
+    assert backend.claim_quiz_result_analysis(result_id, requested_at) is False
+
+def test_batcher_analyzes_queued_quizzes_together(sync_handler):
+    handler, db = sync_handler
+    calls = []
+    
+    def analyzer(jobs):
+        calls.append([job["result_id"] for job in jobs])
+        return {job["result_id"]: f"Analysis of {job['result_id']}" for job in jobs}
+    
+    for number in range(3):
+        db["quiz_results"].insert_one({"_id": f"r{number}", "analysis": "", "analysis_status": "pending"})
+    
+    batcher = QuizAnalysisBatcher(analyzer, db=handler, batch_size=8, batch_wait=0.2, max_workers=1)
+    assert all(batcher.submit({"result_id": f"r{number}"}) for number in range(3))
+    
+    deadline = time.monotonic() + 5
+    while batcher.get_stats()["analyzed"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    
+    assert calls == [["r0", "r1", "r2"]]
+    assert [doc["analysis_status"] for doc in db["quiz_results"].find()] == ["ready"] * 3
+    assert db["quiz_results"].find_one({"_id": "r1"})["analysis"] == "Analysis of r1"
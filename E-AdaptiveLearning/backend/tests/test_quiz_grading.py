@@ -0,0 +1,78 @@
+"""
+Tests for grading quiz answers locally, with model feedback only for wrong answers.
+"""
+import pytest
+
+from agents.quiz_master import QuizMasterAgent
+from agents.quiz_parser import match_option
+
+OPTIONS = [{"letter": "A", "text": "3"}, {"letter": "B", "text": "4"}, {"letter": "C", "text": "22"}]
+
+class FakeChain:
+    def __init__(self, text: str):
+        self.text = text
+        self.inputs = []
+    
+    def invoke(self, inputs):
+        self.inputs.append(inputs)
+        return {"text": self.text}
+    
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+@pytest.fixture
+def quiz_master(sync_handler, async_handler):
+    agent = QuizMasterAgent(api_key="test-key", db=sync_handler[0], adb=async_handler[0])
+    agent.evaluation_chain = FakeChain('{"misconception": "Concatenated the digits", "improvement_tip": "Count up"}')
+    return agent
+
+def saved_quiz(backend) -> str:
+    quiz_id = backend.save_quiz("s1", "math", "arithmetic", 2, "raw quiz text", 1)
+    backend.save_quiz_questions(quiz_id, [{"question_text": "What is 2 + 2?", "options": OPTIONS,
+                                           "correct_answer": "B", "explanation": "Two plus two is four.",
+                                           "concepts": ["addition"]}])
+    return quiz_id
+
+def evaluate(quiz_master, backend, quiz_id, answer, question_index=0):
+    if backend.name == "async":
+        return backend.loop.run_until_complete(quiz_master.aevaluate_answer("s1", quiz_id, question_index, answer))
+    return quiz_master.evaluate_answer("s1", quiz_id, question_index, answer)
+
+@pytest.mark.parametrize("answer, letter", [
+    ("B", "B"), ("b", "B"), ("(B)", "B"), ("b) 4", "B"), ("Option B", "B"), (" 4 ", "B"),
+    ("22", "C"), ("D", None), ("five", None), ("", None),
+])
+def test_answer_is_matched_to_an_option(answer, letter):
+    assert match_option(answer, OPTIONS) == letter
+
+def test_correct_answer_is_graded_without_the_model(quiz_master, backend):
+    quiz_id = saved_quiz(backend)
+    
+    result = evaluate(quiz_master, backend, quiz_id, "4")
+    assert result == {"is_correct": True, "correct_answer": "B", "explanation": "Two plus two is four."}
+    assert quiz_master.evaluation_chain.inputs == []
+    assert [answer["is_correct"] for answer in backend.get_quiz_answers("s1", quiz_id)] == [True]
+
+def test_wrong_answer_gets_model_feedback(quiz_master, backend):
+    quiz_id = saved_quiz(backend)
+    
+    result = evaluate(quiz_master, backend, quiz_id, "c")
+    assert result["is_correct"] is False
+    assert result["misconception"] == "Concatenated the digits"
+    # The prompt names the chosen option, so equal wrong choices share a cached response
+    assert quiz_master.evaluation_chain.inputs[0]["student_answer"] == "C) 22"
+    assert quiz_master.evaluation_chain.inputs[0]["correct_answer"] == "B) 4"
+
+def test_feedback_failure_still_returns_the_grade(quiz_master, backend):
+    quiz_id = saved_quiz(backend)
+    quiz_master.evaluation_chain = FakeChain("not json")
+    
+    result = evaluate(quiz_master, backend, quiz_id, "A")
+    assert (result["is_correct"], result["correct_answer"]) == (False, "B")
+    assert "misconception" not in result
+
+def test_unknown_question_or_quiz(quiz_master, backend):
+    quiz_id = saved_quiz(backend)
+    
+    assert evaluate(quiz_master, backend, quiz_id, "B", question_index=5) == {"error": "Question not found"}
+    assert evaluate(quiz_master, backend, "missing", "B") == {"error": "Quiz not found"}
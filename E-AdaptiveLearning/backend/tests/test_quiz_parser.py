@@ -0,0 +1,88 @@
+"""
+Tests for parsing generated quiz JSON and repairing it only when invalid.
+"""
+import json
+
+import pytest
+
+from agents.quiz_master import QuizMasterAgent
+from agents.quiz_parser import QuizFormatError, parse_batch_analysis, parse_feedback, parse_quiz
+
+QUESTION = {
+    "question_text": "What is 2 + 2?",
+    "options": [{"letter": "A", "text": "3"}, {"letter": "B", "text": "4"}],
+    "correct_answer": "B",
+    "explanation": "Two plus two is four.",
+    "concepts": ["addition"]
+}
+
+class FakeChain:
+    def __init__(self, *texts: str):
+        self.texts = list(texts)
+        self.calls = 0
+    
+    def invoke(self, inputs):
+        self.calls += 1
+        return {"text": self.texts.pop(0)}
+    
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+@pytest.fixture
+def quiz_master(sync_handler, async_handler):
+    return QuizMasterAgent(api_key="test-key", db=sync_handler[0], adb=async_handler[0])
+
+def test_common_json_slips_are_fixed_locally():
+    text = "Here is your quiz:\n```json\n" + json.dumps([QUESTION])[:-2] + ",},]\n```\nGood luck!"
+    text = text.replace('"Two plus two is four."', "“Two plus two is four.”")
+    
+    questions = parse_quiz(text, 2)
+    assert [question.question_text for question in questions] == ["What is 2 + 2?"]
+    assert questions[0].difficulty_level.value == 2
+
+def test_option_shapes_are_normalized():
+    mapping = dict(QUESTION, options={"a": "3", "b": "4"}, correct_answer="b) 4")
+    strings = dict(QUESTION, options=["3", "4"], question=QUESTION["question_text"])
+    del strings["question_text"]
+    
+    questions = parse_quiz(json.dumps({"questions": [mapping, strings]}))
+    assert [question.options for question in questions] == [QUESTION["options"]] * 2
+    assert [question.correct_answer for question in questions] == ["B", "B"]
+
+@pytest.mark.parametrize("question, message", [
+    (dict(QUESTION, correct_answer="D"), "correct_answer must be one of A, B"),
+    (dict(QUESTION, options=["only one"]), "at least two options"),
+    (dict(QUESTION, question_text=None), "Question 1"),
+])
+def test_invalid_question_is_rejected(question, message):
+    with pytest.raises(QuizFormatError, match=message):
+        parse_quiz(json.dumps([question]))
+
+def test_response_without_json_is_rejected():
+    with pytest.raises(QuizFormatError):
+        parse_quiz("Sorry, I cannot create that quiz.")
+
+def test_repair_chain_only_runs_for_invalid_output(quiz_master):
+    quiz_master.quiz_chain = FakeChain(json.dumps([QUESTION]), json.dumps([dict(QUESTION, correct_answer="Z")]))
+    quiz_master.repair_chain = FakeChain(json.dumps([QUESTION]))
+    
+    questions, _ = quiz_master._generate_questions("s1", "math", "arithmetic", 2, 1, ["addition"])
+    assert len(questions) == 1 and quiz_master.repair_chain.calls == 0
+    
+    questions, _ = quiz_master._generate_questions("s1", "math", "arithmetic", 2, 1, ["addition"])
+    assert len(questions) == 1 and quiz_master.repair_chain.calls == 1
+
+def test_unrepairable_output_yields_no_questions(quiz_master, loop):
+    quiz_master.quiz_chain = FakeChain("not a quiz")
+    quiz_master.repair_chain = FakeChain("still not a quiz")
+    
+    questions, raw_text = loop.run_until_complete(
+        quiz_master._agenerate_questions("s1", "math", "arithmetic", 2, 1, ["addition"])
+    )
+    assert (questions, raw_text) == ([], "not a quiz")
+
+def test_feedback_and_batch_analysis_are_parsed():
+    assert parse_feedback('{"misconception": "adds digits", "improvement_tip": ""}') == {"misconception": "adds digits"}
+    assert parse_batch_analysis('{"1": "Good", "Quiz 2": {"summary": "Fair"}, "7": "out of range"}', 2) == {
+        0: "Good", 1: '{"summary": "Fair"}'
+    }
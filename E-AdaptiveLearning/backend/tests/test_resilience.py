@@ -0,0 +1,56 @@
+"""
+Tests for ResilientInvoker's timeouts, failover and circuit breaking.
+"""
+import threading
+import time
+
+import pytest
+
+from llm.resilience import CircuitOpenError, ModelCallError, ResilientInvoker
+
+def invoker(**kwargs):
+    options = dict(attempt_timeout=0.05, deadline=5, max_retries=0, backoff_base=0, backoff_max=0,
+                   failure_threshold=100, reset_timeout=60, max_workers=1, max_abandoned=2)
+    options.update(kwargs)
+    return ResilientInvoker(**options)
+
+def test_abandoned_call_does_not_hold_up_the_next_attempt():
+    released = threading.Event()
+    resilient = invoker(max_workers=1)
+    
+    def hung():
+        released.wait(5)
+        return "late"
+    
+    started = time.monotonic()
+    assert resilient.call([("primary", hung), ("fallback", lambda: "fallback")]) == "fallback"
+    assert time.monotonic() - started < 1
+    assert resilient.get_stats()["circuits"]["primary"]["abandoned_calls"] == 1
+    
+    released.set()
+    for _ in range(100):
+        if resilient.breaker("primary").abandoned == 0:
+            break
+        time.sleep(0.01)
+    assert resilient.breaker("primary").abandoned == 0
+
+def test_model_with_too_many_abandoned_calls_is_skipped():
+    released = threading.Event()
+    calls = []
+    resilient = invoker(max_abandoned=2)
+    
+    def hung():
+        calls.append(1)
+        released.wait(5)
+        return "late"
+    
+    try:
+        for _ in range(2):
+            with pytest.raises(ModelCallError):
+                resilient.call([("primary", hung)])
+        with pytest.raises(CircuitOpenError):
+            resilient.call([("primary", hung)])
+        assert len(calls) == 2
+        assert resilient.get_stats()["short_circuited"] == 1
+    finally:
+        released.set()
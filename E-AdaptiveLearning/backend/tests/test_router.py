@@ -0,0 +1,127 @@
+"""
+Tests for ModelRouter's per-tier concurrency limits and cost accounting.
+"""
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from langchain.prompts import PromptTemplate
+
+import config
+from llm.cache import CachedChain
+from llm.router import ModelRouter, TierLimiter
+
+TIERS = {
+    "small": {"model": "gemini-1.5-flash-8b", "max_concurrency": 2},
+    "large": {"model": "gemini-1.5-pro", "max_concurrency": 2},
+}
+
+class FakeChain:
+    """LLMChain stand-in answering as one model."""
+    
+    def __init__(self, model: str, text: str):
+        self.prompt = PromptTemplate(input_variables=["question"], template="Q: {question}")
+        self.llm = SimpleNamespace(model=model, temperature=0.0)
+        self.text = text
+    
+    def invoke(self, inputs):
+        return {"text": self.text}
+    
+    async def ainvoke(self, inputs):
+        return {"text": self.text}
+
+class FailoverInvoker:
+    """Skips the primary target, as the resilient invoker does once its circuit is open."""
+    
+    def call(self, targets, can_retry):
+        return targets[-1][1]()
+    
+    async def acall(self, targets, can_retry):
+        return await targets[-1][1]()
+
+@pytest.fixture
+def router():
+    return ModelRouter(tiers=TIERS, routes={"quiz.feedback": "large"}, default_tier="small", api_key="test-key")
+
+def failover_chain(router):
+    return CachedChain(FakeChain("gemini-1.5-pro", "primary"), cacheable=False, router=router,
+                       operation="quiz.feedback", fallback_chain=FakeChain("gemini-1.5-flash-8b", "x" * 400),
+                       invoker=FailoverInvoker())
+
+def expected_cost(model, prompt_text, text):
+    model_config = config.get_model_config(model)
+    return (len(prompt_text) // ModelRouter.CHARS_PER_TOKEN * model_config["input_cost_per_mtok"]
+            + len(text) // ModelRouter.CHARS_PER_TOKEN * model_config["output_cost_per_mtok"]) / 1_000_000
+
+def check_billed_to_fallback(router):
+    stats = router.get_stats()
+    operation = stats["operations"]["quiz.feedback"]
+    assert operation["model"] == "gemini-1.5-pro"
+    assert list(operation["by_model"]) == ["gemini-1.5-flash-8b"]
+    assert operation["cost_usd"] == pytest.approx(expected_cost("gemini-1.5-flash-8b", "Q: why?", "x" * 400))
+    assert stats["tiers"]["large"]["calls"] == 0
+    assert stats["tiers"]["large"]["fallback_calls"] == 1
+    assert stats["tiers"]["large"]["cost_usd"] == 0
+    assert stats["models"]["gemini-1.5-flash-8b"]["calls"] == 1
+
+def test_fallback_call_is_billed_to_the_answering_model(router):
+    assert failover_chain(router).invoke({"question": "why?"})["text"] == "x" * 400
+    check_billed_to_fallback(router)
+
+def test_async_fallback_call_is_billed_to_the_answering_model(router, loop):
+    assert loop.run_until_complete(failover_chain(router).ainvoke({"question": "why?"}))["text"] == "x" * 400
+    check_billed_to_fallback(router)
+
+def test_async_waiters_are_woken_without_polling(loop):
+    limiter = TierLimiter(1)
+    order = []
+    
+    async def call(name):
+        await limiter.aacquire()
+        order.append(name)
+        await asyncio.sleep(0)
+        limiter.release()
+    
+    async def run():
+        await limiter.aacquire()
+        tasks = [asyncio.ensure_future(call(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 3
+        limiter.release()
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+    
+    loop.run_until_complete(run())
+    assert order == ["a", "b", "c"]
+    assert (limiter.in_flight, limiter.waiting) == (0, 0)
+
+def test_slot_released_by_a_thread_wakes_a_coroutine(loop):
+    limiter = TierLimiter(1)
+    limiter.acquire()
+    
+    async def run():
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0)
+        threading.Thread(target=limiter.release).start()
+        await asyncio.wait_for(waiter, timeout=1)
+        limiter.release()
+    
+    loop.run_until_complete(run())
+    assert (limiter.in_flight, limiter.waiting) == (0, 0)
+
+def test_cancelled_waiter_does_not_leak_its_slot(loop):
+    limiter = TierLimiter(1)
+    
+    async def run():
+        await limiter.aacquire()
+        cancelled = asyncio.ensure_future(limiter.aacquire())
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.wait_for(waiter, timeout=1)
+        limiter.release()
+    
+    loop.run_until_complete(run())
+    assert (limiter.in_flight, limiter.waiting) == (0, 0)
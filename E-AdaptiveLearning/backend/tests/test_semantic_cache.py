@@ -0,0 +1,88 @@
+"""
+Tests for the semantic tutor-answer cache.
+"""
+import pytest
+
+from llm import semantic_cache as semantic_cache_module
+from llm.semantic_cache import SemanticCache
+
+class Clock:
+    """Stands in for the time module so entries can be aged."""
+    
+    def __init__(self):
+        self.now = 1_000_000.0
+    
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(semantic_cache_module, "time", clock)
+    return clock
+
+def test_rephrased_question_is_a_hit():
+    cache = SemanticCache(threshold=0.9)
+    cache.store("s1", "calculus", 2, "What is a derivative?", "cached")
+    
+    assert cache.lookup("s1", "Calculus ", 2, "Can you explain what a derivative is?") == "cached"
+    assert cache.get_stats()["hits"] == 1
+
+def test_different_numbers_or_negation_are_a_miss():
+    # The threshold is below the lexical similarity of these pairs, so only
+    # the signature keeps them apart
+    cache = SemanticCache(threshold=0.8)
+    cache.store("s1", "calculus", 2, "What is the derivative of x^2?", "2x")
+    cache.store("s1", "numbers", 2, "Why is zero an even number?", "because")
+    
+    assert cache.lookup("s1", "calculus", 2, "What is the derivative of x^3?") is None
+    assert cache.lookup("s1", "numbers", 2, "Why is zero not an even number?") is None
+    assert cache.lookup("s1", "calculus", 2, "Explain the derivative of x^2") == "2x"
+
+def test_answers_are_scoped_by_student_topic_and_level():
+    cache = SemanticCache()
+    cache.store("s1", "calculus", 2, "What is a derivative?", "for s1")
+    
+    assert cache.lookup("s2", "calculus", 2, "What is a derivative?") is None
+    assert cache.lookup("s1", "algebra", 2, "What is a derivative?") is None
+    assert cache.lookup("s1", "calculus", 3, "What is a derivative?") is None
+    assert cache.lookup("s1", "calculus", 2, "What is a derivative?") == "for s1"
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticCache(ttl=60)
+    cache.store("s1", "calculus", 2, "What is a derivative?", "cached")
+    
+    clock.now += 59
+    assert cache.lookup("s1", "calculus", 2, "What is a derivative?") == "cached"
+    clock.now += 2
+    assert cache.lookup("s1", "calculus", 2, "What is a derivative?") is None
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SemanticCache(max_entries=2)
+    cache.store("s1", "calculus", 2, "What is a derivative?", "derivative")
+    clock.now += 1
+    cache.store("s1", "calculus", 2, "What is an integral?", "integral")
+    clock.now += 1
+    assert cache.lookup("s1", "calculus", 2, "What is a derivative?") == "derivative"
+    clock.now += 1
+    cache.store("s1", "calculus", 2, "What is a limit?", "limit")
+    
+    assert cache.lookup("s1", "calculus", 2, "What is an integral?") is None
+    assert cache.lookup("s1", "calculus", 2, "What is a derivative?") == "derivative"
+    assert cache.get_stats()["evictions"] == 1
+
+def test_least_recently_used_scope_is_dropped():
+    cache = SemanticCache(max_scopes=2)
+    for student_id in ("s1", "s2", "s3"):
+        cache.store(student_id, "calculus", 2, "What is a derivative?", student_id)
+    
+    assert cache.get_stats()["scopes"] == 2
+    assert cache.lookup("s1", "calculus", 2, "What is a derivative?") is None
+    assert cache.lookup("s3", "calculus", 2, "What is a derivative?") == "s3"
+
+def test_disabled_cache_stores_nothing():
+    cache = SemanticCache(enabled=False)
+    cache.store("s1", "calculus", 2, "What is a derivative?", "cached")
+    
+    assert cache.lookup("s1", "calculus", 2, "What is a derivative?") is None
+    assert cache.get_stats()["entries"] == 0
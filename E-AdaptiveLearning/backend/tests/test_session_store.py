@@ -0,0 +1,126 @@
+"""
+Tests for the session stores' per-session locking and version checks.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import session_store as session_store_module
+from session_store import MemorySessionStore, SQLiteSessionStore, SessionConflictError, SessionLocks
+from state import StateManager
+
+class Clock:
+    """Stands in for the time module so sessions can be aged."""
+    
+    def __init__(self):
+        self.now = 1_000_000.0
+    
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemorySessionStore(**kwargs)
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), **kwargs)
+    return make
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store_module, "time", clock)
+    return clock
+
+def increment(store, session_id: str) -> None:
+    """Load, update and save a session the way a request handler does."""
+    with store.lock(session_id):
+        state_manager = store.get(session_id)
+        count = state_manager.user_state.context.get("count", 0)
+        time.sleep(0.001)
+        state_manager.add_context("count", count + 1)
+        store.save(session_id, state_manager)
+
+def test_locked_updates_of_one_session_are_not_lost(make_store):
+    store = make_store()
+    store.save("s1", StateManager("student"))
+    
+    threads = [threading.Thread(target=lambda: [increment(store, "s1") for _ in range(10)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert store.get("s1").user_state.context["count"] == 40
+    assert store.locks._locks == {}
+
+def test_stale_copy_is_refused(make_store):
+    store = make_store()
+    store.save("s1", StateManager("student"))
+    first = store.get("s1")
+    second = store.get("s1")
+    
+    store.save("s1", first)
+    with pytest.raises(SessionConflictError):
+        store.save("s1", second)
+
+def test_copy_of_a_deleted_session_is_refused(make_store):
+    store = make_store()
+    store.save("s1", StateManager("student"))
+    state_manager = store.get("s1")
+    
+    assert store.delete("s1")
+    with pytest.raises(SessionConflictError):
+        store.save("s1", state_manager)
+
+def test_new_session_replaces_an_existing_one(make_store):
+    store = make_store()
+    store.save("s1", StateManager("old"))
+    store.save("s1", StateManager("new"))
+    
+    assert store.get("s1").user_state.student_id == "new"
+
+def test_idle_session_expires(make_store, clock):
+    store = make_store(ttl=60)
+    store.save("s1", StateManager("student"))
+    
+    clock.now += 59
+    assert store.get("s1") is not None
+    clock.now += 61
+    assert store.get("s1") is None
+    assert store.get_stats()["expirations"] == 1
+
+def test_least_recently_used_session_is_evicted(make_store, clock):
+    store = make_store(max_sessions=2)
+    store.save("s1", StateManager("a"))
+    clock.now += 1
+    store.save("s2", StateManager("b"))
+    clock.now += 1
+    store.get("s1")
+    clock.now += 1
+    store.save("s3", StateManager("c"))
+    
+    assert store.get("s2") is None
+    assert store.get("s1") is not None and store.get("s3") is not None
+    assert store.get_stats()["evictions"] == 1
+
+def test_async_lock_serializes_coroutines_of_one_session(loop):
+    locks = SessionLocks()
+    active = []
+    overlaps = []
+    
+    async def request(session_id):
+        async with locks.ahold(session_id):
+            active.append(session_id)
+            overlaps.append(active.count(session_id) > 1)
+            await asyncio.sleep(0)
+            active.remove(session_id)
+    
+    async def run():
+        await asyncio.gather(*(request(session_id) for session_id in ["s1", "s1", "s1", "s2"]))
+    
+    loop.run_until_complete(run())
+    assert not any(overlaps)
+    assert locks._async_locks == {}
@@ -0,0 +1,73 @@
+"""
+Tests for closing a message stream early: the run must stop before its next
+node, and close() must not return while a node is still running.
+"""
+import asyncio
+import threading
+
+import pytest
+
+from langgraph_workflow import LearningWorkflow
+
+class SlowGraph:
+    """Three-node run whose second node blocks until released."""
+    
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.ran = []
+    
+    def stream(self, state):
+        yield {"classify_input": {}}
+        self.started.set()
+        self.release.wait(5)
+        self.ran.append("handle_question")
+        yield {"handle_question": {}}
+        self.ran.append("generate_response")
+        yield {"generate_response": {}}
+    
+    async def astream(self, state):
+        yield {"classify_input": {}}
+        self.started.set()
+        while not self.release.is_set():
+            await asyncio.sleep(0.005)
+        self.ran.append("handle_question")
+        yield {"handle_question": {}}
+        self.ran.append("generate_response")
+        yield {"generate_response": {}}
+
+@pytest.fixture
+def workflow(monkeypatch):
+    # Only the streaming plumbing is under test, not the graph or the agents
+    workflow = LearningWorkflow.__new__(LearningWorkflow)
+    workflow.workflow = SlowGraph()
+    monkeypatch.setattr(workflow, "_prepare_state", lambda student_id, message, state_manager: ({}, {}))
+    return workflow
+
+def test_close_waits_for_the_running_node_and_skips_the_rest(workflow):
+    graph = workflow.workflow
+    events = workflow.process_stream("s1", "What is x?")
+    assert next(events) == {"event": "node", "node": "classify_input"}
+    assert graph.started.wait(5)
+    
+    closer = threading.Thread(target=events.close)
+    closer.start()
+    closer.join(0.1)
+    assert closer.is_alive()
+    
+    graph.release.set()
+    closer.join(5)
+    assert not closer.is_alive()
+    assert graph.ran == ["handle_question"]
+
+def test_aclose_cancels_the_run(workflow, loop):
+    graph = workflow.workflow
+    
+    async def disconnect():
+        events = workflow.aprocess_stream("s1", "What is x?")
+        assert await events.__anext__() == {"event": "node", "node": "classify_input"}
+        await events.aclose()
+    
+    loop.run_until_complete(disconnect())
+    graph.release.set()
+    assert graph.ran == []
@@ -0,0 +1,64 @@
+"""
+Tests for WriteBehindQueue: per-student read-your-writes, async readers and
+the throughput counters.
+"""
+import threading
+
+from database.write_behind import WriteBehindQueue
+
+def log(student_id: str, number: int):
+    return {"_id": f"{student_id}-{number}", "student_id": student_id, "topic": "math"}
+
+def test_sync_waits_only_for_the_students_documents(sync_handler):
+    queue = WriteBehindQueue(enabled=True, flush_interval=60)
+    try:
+        queue.insert("learning_logs", log("s1", 1))
+        
+        assert queue.sync("learning_logs", "s2", timeout=0) is True
+        assert queue.is_pending("learning_logs", "s1")
+        assert queue.is_pending("learning_logs")
+        assert not queue.is_pending("interactions")
+        
+        assert queue.sync("learning_logs", "s1", timeout=5) is True
+        assert not queue.is_pending("learning_logs")
+    finally:
+        queue.close(timeout=5)
+
+def test_async_reads_see_documents_queued_by_the_sync_path(async_handler, loop, monkeypatch):
+    handler, db = async_handler
+    # Both handlers on one store: the queue writes through the sync client
+    monkeypatch.setattr(handler.write_behind.db_conn, "get_collection", db.delegate.__getitem__)
+    handler.write_behind = WriteBehindQueue(enabled=True, flush_interval=60)
+    try:
+        handler.write_behind.insert("learning_logs", log("s1", 1))
+        handler.write_behind.insert("quiz_answers", {"_id": "a1", "student_id": "s1", "quiz_id": "q1",
+                                                     "question_index": 0, "is_correct": True})
+        
+        assert loop.run_until_complete(handler.get_student_topics("s1")) == ["math"]
+        answers = loop.run_until_complete(handler.get_quiz_answers("s1", "q1"))
+        assert [answer["_id"] for answer in answers] == ["a1"]
+    finally:
+        handler.write_behind.close(timeout=5)
+
+def test_counters_are_exact_under_concurrent_inserts(sync_handler):
+    _, db = sync_handler
+    queue = WriteBehindQueue(enabled=True, batch_size=7, flush_interval=0.01)
+    
+    def insert_many(student_id: str):
+        for number in range(50):
+            queue.insert("interactions", log(student_id, number))
+    
+    threads = [threading.Thread(target=insert_many, args=(f"s{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert queue.flush(timeout=10) is True
+        stats = queue.get_stats()
+        assert stats["queued"] + stats["write_through"] == 400
+        assert stats["written"] + stats["write_through"] == 400
+        assert stats["pending"] == {}
+        assert db["interactions"].count_documents({}) == 400
+    finally:
+        queue.close(timeout=5)
@@ -1,13 +1,196 @@
-from typing import Dict, TypedDict, List, Optional, Literal, Any
-from langgraph.graph import StateGraph, END # type: ignore
+from typing import Dict, TypedDict, List, Optional, Literal, Any, Annotated
+import time
+import random
+import threading
+import functools
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+from langgraph.graph import StateGraph, START, END # type: ignore
+from langchain_core.runnables import RunnableConfig # type: ignore
 from langchain_core.prompts import ChatPromptTemplate # type: ignore
 from langchain_google_genai import ChatGoogleGenerativeAI # type: ignore
 import os
 from dotenv import load_dotenv # type: ignore
+from support_classifier import SupportClassifier, CATEGORIES, SENTIMENTS, normalize_label, append_example
+from support_faq import FAQIndex
 
 load_dotenv()
 
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+MODEL = os.environ.get("SUPPORT_MODEL", "gemini-1.5-flash")
+FALLBACK_MODEL = os.environ.get("FALLBACK_MODEL", "gemini-1.0-pro")
+
+# Model call resilience: every attempt has its own timeout, failed attempts are
+# retried with jittered exponential backoff, then the fallback model is tried,
+# all within one deadline. A model that keeps failing is skipped for a while.
+MODEL_REQUEST_TIMEOUT = float(os.environ.get("MODEL_REQUEST_TIMEOUT", "30"))
+MODEL_CALL_DEADLINE = float(os.environ.get("MODEL_CALL_DEADLINE", "45"))
+MODEL_MAX_RETRIES = int(os.environ.get("MODEL_MAX_RETRIES", "2"))
+MODEL_RETRY_BACKOFF_BASE = float(os.environ.get("MODEL_RETRY_BACKOFF_BASE", "0.5"))
+MODEL_RETRY_BACKOFF_MAX = float(os.environ.get("MODEL_RETRY_BACKOFF_MAX", "4"))
+MODEL_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("MODEL_CIRCUIT_FAILURE_THRESHOLD", "5"))
+MODEL_CIRCUIT_RESET_TIMEOUT = float(os.environ.get("MODEL_CIRCUIT_RESET_TIMEOUT", "30"))
+# Timed-out calls a model may still have running before it is skipped like an open circuit
+MODEL_MAX_ABANDONED_CALLS = int(os.environ.get("MODEL_MAX_ABANDONED_CALLS", "8"))
+# Provider limits: concurrent model calls and requests per minute (0 = unlimited)
+MODEL_MAX_CONCURRENCY = int(os.environ.get("MODEL_MAX_CONCURRENCY", "32"))
+MODEL_REQUESTS_PER_MINUTE = float(os.environ.get("MODEL_REQUESTS_PER_MINUTE", "0"))
+# Previous turns included in the prompts
+HISTORY_WINDOW = int(os.environ.get("SUPPORT_HISTORY_WINDOW", "3"))
+
+class ModelUnavailableError(RuntimeError):
+    """Raised when no model answered within the deadline."""
+
+_model_clients: Dict[str, Any] = {}
+_model_circuits: Dict[str, Dict[str, float]] = {}
+_model_lock = threading.Lock()
+# Attempts waited on at once; an attempt given up on gives its slot back straight away
+_model_slots = threading.BoundedSemaphore(MODEL_MAX_CONCURRENCY)
+
+class RateLimiter:
+    """Token bucket shared by every model call of the process."""
+    
+    def __init__(self, per_minute: float):
+        self._lock = threading.Lock()
+        self.set_rate(per_minute)
+    
+    def set_rate(self, per_minute: float) -> None:
+        """Change the rate; 0 disables limiting."""
+        with self._lock:
+            self.rate = per_minute / 60
+            self.capacity = max(1.0, self.rate)  # Allow a burst of one second's worth
+            self._tokens = self.capacity
+            self._updated = time.monotonic()
+    
+    def acquire(self) -> None:
+        """Wait until the next request may be sent."""
+        with self._lock:
+            if self.rate <= 0:
+                return
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve a token even if it is not there yet; callers are served in arrival order
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+
+rate_limiter = RateLimiter(MODEL_REQUESTS_PER_MINUTE)
+
+def get_model(model: str) -> ChatGoogleGenerativeAI:
+    """Get the shared client for a model, creating it on first use."""
+    with _model_lock:
+        if model not in _model_clients:
+            # Retries are handled by invoke_model; the client timeout ends calls it gave up on
+            _model_clients[model] = ChatGoogleGenerativeAI(model=model, api_key=GOOGLE_API_KEY, max_retries=1,
+                                                           timeout=MODEL_REQUEST_TIMEOUT)
+        return _model_clients[model]
+
+def _circuit(model: str) -> Dict[str, float]:
+    """Get a model's circuit; the caller must hold _model_lock."""
+    return _model_circuits.setdefault(model, {"failures": 0, "opened_at": 0.0, "abandoned": 0})
+
+def circuit_allows(model: str) -> bool:
+    """
+    Check whether a model may be called, letting one probe through once its
+    circuit has cooled down. A model with MODEL_MAX_ABANDONED_CALLS timed-out
+    calls still running is skipped until some of them finish.
+    """
+    with _model_lock:
+        circuit = _circuit(model)
+        if circuit["abandoned"] >= MODEL_MAX_ABANDONED_CALLS:
+            return False
+        if circuit["failures"] < MODEL_CIRCUIT_FAILURE_THRESHOLD:
+            return True
+        if time.monotonic() - circuit["opened_at"] >= MODEL_CIRCUIT_RESET_TIMEOUT:
+            circuit["opened_at"] = time.monotonic()  # Only one probe per reset period
+            return True
+        return False
+
+def record_model_result(model: str, succeeded: bool) -> None:
+    """Update a model's circuit after a call."""
+    with _model_lock:
+        circuit = _circuit(model)
+        if succeeded:
+            circuit["failures"] = 0
+            return
+        circuit["failures"] += 1
+        if circuit["failures"] >= MODEL_CIRCUIT_FAILURE_THRESHOLD:
+            circuit["opened_at"] = time.monotonic()
+
+def _start_attempt(model: str, chain: Any, inputs: Dict[str, Any]) -> Future:
+    """
+    Run one model call on a thread of its own, so a call given up on after
+    its timeout never holds up the attempts that follow it.
+    """
+    future: Future = Future()
+    
+    def run() -> None:
+        try:
+            future.set_result(chain.invoke(inputs).content)
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=run, name=f"support-model-{model}", daemon=True).start()
+    return future
+
+def _abandon(model: str, future: Future) -> None:
+    """Count a timed-out call against its model's circuit until it finishes."""
+    with _model_lock:
+        circuit = _circuit(model)
+        circuit["abandoned"] += 1
+    
+    def finished(_: Future) -> None:
+        with _model_lock:
+            circuit["abandoned"] -= 1
+    
+    future.add_done_callback(finished)
+
+def invoke_model(prompt: ChatPromptTemplate, inputs: Dict[str, Any],
+                 cancelled: Optional[threading.Event] = None) -> str:
+    """
+    Run a prompt on the support model with timeouts, retries and failover to
+    the fallback model. Setting cancelled stops further attempts.
+    """
+    deadline = time.monotonic() + MODEL_CALL_DEADLINE
+    last_error: Optional[BaseException] = None
+    models = [MODEL] if FALLBACK_MODEL in ("", MODEL) else [MODEL, FALLBACK_MODEL]
+    cancelled = cancelled or threading.Event()
+    
+    for model in models:
+        chain = prompt | get_model(model)
+        for attempt in range(MODEL_MAX_RETRIES + 1):
+            rate_limiter.acquire()
+            remaining = deadline - time.monotonic()
+            if cancelled.is_set() or remaining <= 0 or not circuit_allows(model):
+                break
+            
+            with _model_slots:
+                future = _start_attempt(model, chain, inputs)
+                try:
+                    content = future.result(timeout=min(MODEL_REQUEST_TIMEOUT, remaining))
+                except FutureTimeoutError:
+                    _abandon(model, future)
+                    last_error = TimeoutError(f"{model} did not respond in time")
+                except Exception as e:
+                    last_error = e
+                else:
+                    record_model_result(model, True)
+                    return content
+            
+            record_model_result(model, False)
+            print(f"Model call to {model} failed (attempt {attempt + 1}): {str(last_error)}")
+            if attempt < MODEL_MAX_RETRIES:
+                # Full jitter keeps retries from many conversations from arriving together
+                backoff = random.uniform(0, min(MODEL_RETRY_BACKOFF_MAX, MODEL_RETRY_BACKOFF_BASE * 2 ** attempt))
+                cancelled.wait(min(backoff, max(deadline - time.monotonic(), 0)))
+    
+    raise ModelUnavailableError(f"No model answered ({', '.join(models)}): {str(last_error or 'circuit open')}")
+
+def keep_recent_turns(history: List[Dict[str, str]], new_turns: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Reducer for the history: add the new turns and keep the last HISTORY_WINDOW, all the prompts read."""
+    return (history + new_turns)[-max(HISTORY_WINDOW, 1):]
 
 # Define the state
 class State(TypedDict):
@@ -15,35 +198,102 @@ class State(TypedDict):
     category: Optional[str]
     sentiment: Optional[str]
     response: Optional[str]
-    conversation_history: List[Dict[str, str]]
+    # Nodes return just the new turns. Only the last HISTORY_WINDOW turns stay in
+    # the state (and its checkpoints); support_service.py keeps the full history.
+    conversation_history: Annotated[List[Dict[str, str]], keep_recent_turns]
+    # Who produced each label: "local" classifier, "llm", "default" or "skipped"
+    category_source: Optional[str]
+    sentiment_source: Optional[str]
+    # Set by faq_lookup when the query matches a known FAQ
+    faq_answer: Optional[str]
+    faq_score: Optional[float]
+
+# Local classifier trained from labelled history (see support_classifier.py);
+# queries it is not confident about fall through to the LLM
+classifier = SupportClassifier.load()
+
+# FAQ answers built offline from past conversations (see support_faq.py)
+faq_index = FAQIndex.load()
+
+# categorize and analyze_sentiment run as parallel branches. analyze_sentiment
+# publishes its result on a per-run Future (passed in the run config) so that
+# categorize can stop waiting for its own model call once the query is known
+# to be Negative and will be escalated anyway.
+_branch_executor = ThreadPoolExecutor(max_workers=MODEL_MAX_CONCURRENCY, thread_name_prefix="support-branch")
+
+def sentiment_signal(config: Optional[RunnableConfig]) -> Optional[Future]:
+    """Get the Future analyze_sentiment publishes the sentiment on, if the run has one."""
+    return ((config or {}).get("configurable") or {}).get("sentiment_signal")
 
 # Node functions
-def categorize(state: State) -> Dict:
+def faq_lookup(state: State) -> Dict:
+    """Match the query against the FAQ index so known questions skip the LLM."""
+    found = faq_index.match(state["query"]) if state["query"] else None
+    if found is None:
+        return {"faq_answer": None, "faq_score": None}
+    faq, score = found
+    return {"faq_answer": faq["response"], "faq_score": score, "category": faq["category"]}
+
+def categorize(state: State, config: RunnableConfig = None) -> Dict:
     """Categorize the customer query into Technical, Billing, or General."""
     if not state["query"]:
-        return {"category": "General"}
+        return {"category": "General", "category_source": "default"}
+    if state.get("faq_answer"):
+        # The matched FAQ already carries its category
+        return {"category": state["category"], "category_source": "faq"}
+    
+    category, _ = classifier.predict("category", state["query"])
+    if category is not None:
+        return {"category": category, "category_source": "local"}
         
     prompt = ChatPromptTemplate.from_template(
         "Categorize the following customer query into one of these categories: "
         "Technical, Billing, General. Query: {query}\n\n"
         "Reply with just the category name."
     )
-    chain = prompt | ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=GOOGLE_API_KEY)  
-    category = chain.invoke({"query": state["query"]}).content.strip()
-    return {"category": category}
+    skipped = threading.Event()
+    category_call = _branch_executor.submit(invoke_model, prompt, {"query": state["query"]}, skipped)
+    signal = sentiment_signal(config)
+    if signal is not None:
+        done, _ = wait([category_call, signal], return_when=FIRST_COMPLETED)
+        if category_call not in done and signal.result() == "Negative":
+            # The query is escalated whatever its category; don't wait for the
+            # model, and make no further attempts if the current one fails
+            skipped.set()
+            category_call.cancel()
+            return {"category": "Unknown", "category_source": "skipped"}
+    
+    try:
+        category = normalize_label(category_call.result(), CATEGORIES) or "General"
+        source = "llm"
+    except ModelUnavailableError as e:
+        print(f"Could not categorize query, treating it as General: {str(e)}")
+        category, source = "General", "default"
+    return {"category": category, "category_source": source}
 
-def analyze_sentiment(state: State) -> Dict:
+def analyze_sentiment(state: State, config: RunnableConfig = None) -> Dict:
     """Analyze the sentiment of the customer query as Positive, Neutral, or Negative."""
-    if not state["query"]:
-        return {"sentiment": "Neutral"}
-        
-    prompt = ChatPromptTemplate.from_template(
-        "Analyze the sentiment of the following customer query. "
-        "Respond with only one word - either 'Positive', 'Neutral', or 'Negative'. Query: {query}"
-    )
-    chain = prompt | ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=GOOGLE_API_KEY)  
-    sentiment = chain.invoke({"query": state["query"]}).content.strip()
-    return {"sentiment": sentiment}
+    sentiment, source = "Neutral", "default"
+    try:
+        if state["query"]:
+            local_sentiment, _ = classifier.predict("sentiment", state["query"])
+            if local_sentiment is not None:
+                sentiment, source = local_sentiment, "local"
+            else:
+                prompt = ChatPromptTemplate.from_template(
+                    "Analyze the sentiment of the following customer query. "
+                    "Respond with only one word - either 'Positive', 'Neutral', or 'Negative'. Query: {query}"
+                )
+                try:
+                    sentiment = normalize_label(invoke_model(prompt, {"query": state["query"]}), SENTIMENTS) or "Neutral"
+                    source = "llm"
+                except ModelUnavailableError as e:
+                    print(f"Could not analyze sentiment, treating it as Neutral: {str(e)}")
+    finally:
+        signal = sentiment_signal(config)
+        if signal is not None and not signal.done():
+            signal.set_result(sentiment)
+    return {"sentiment": sentiment, "sentiment_source": source}
 
 def handle_technical(state: State) -> Dict:
     """Provide a technical support response to the query."""
@@ -52,11 +302,10 @@ def handle_technical(state: State) -> Dict:
         "Consider the following conversation history for context: {conversation_history}\n\n"
         "Provide a detailed technical support response to the latest query: {query}"
     )
-    chain = prompt | ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=GOOGLE_API_KEY) 
-    response = chain.invoke({
+    response = invoke_model(prompt, {
         "query": state["query"],
         "conversation_history": format_conversation_history(state["conversation_history"])
-    }).content
+    })
     return {"response": response}
 
 def handle_billing(state: State) -> Dict:
@@ -66,11 +315,10 @@ def handle_billing(state: State) -> Dict:
         "Consider the following conversation history for context: {conversation_history}\n\n"
         "Provide a detailed billing support response to the latest query: {query}"
     )
-    chain = prompt | ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=GOOGLE_API_KEY)  
-    response = chain.invoke({
+    response = invoke_model(prompt, {
         "query": state["query"],
         "conversation_history": format_conversation_history(state["conversation_history"])
-    }).content
+    })
     return {"response": response}
 
 def handle_general(state: State) -> Dict:
@@ -80,36 +328,46 @@ def handle_general(state: State) -> Dict:
         "Consider the following conversation history for context: {conversation_history}\n\n"
         "Provide a detailed general support response to the latest query: {query}"
     )
-    chain = prompt | ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=GOOGLE_API_KEY) 
-    response = chain.invoke({
+    response = invoke_model(prompt, {
         "query": state["query"],
         "conversation_history": format_conversation_history(state["conversation_history"])
-    }).content
+    })
     return {"response": response}
 
+def answer_from_faq(state: State) -> Dict:
+    """Answer a known question with the stored FAQ response."""
+    faq_index.record_served()
+    return {"response": state["faq_answer"]}
+
 def escalate(state: State) -> Dict:
     """Escalate the query to a human agent due to negative sentiment."""
     return {"response": "This query has been escalated to a human agent due to its negative sentiment. A member of our team will contact you shortly."}
 
 def update_conversation_history(state: State) -> Dict:
     """Update the conversation history with the latest query and response."""
-    conversation_history = state.get("conversation_history", []).copy()
+    new_turns = []
     if state["query"]:  # Only add non-empty queries to history
-        conversation_history.append({
+        new_turns.append({
             "query": state["query"],
             "category": state.get("category", "Unknown"),
             "sentiment": state.get("sentiment", "Unknown"),
             "response": state.get("response", "")
         })
-    return {"conversation_history": conversation_history}
+        # Labels the LLM gave become training data for the local classifier
+        append_example(
+            state["query"],
+            state.get("category") if state.get("category_source") == "llm" else None,
+            state.get("sentiment") if state.get("sentiment_source") == "llm" else None
+        )
+    return {"conversation_history": new_turns}
 
-def format_conversation_history(history: List[Dict[str, str]]) -> str:
-    """Format the conversation history for inclusion in prompts."""
+def format_conversation_history(history: List[Dict[str, str]], window: int = HISTORY_WINDOW) -> str:
+    """Format the last window turns of the conversation history for inclusion in prompts."""
     if not history:
         return "No previous conversation."
     
     formatted = []
-    for i, entry in enumerate(history[-3:]):
+    for i, entry in enumerate(history[-window:]):
         formatted.append(f"Turn {i+1}:")
         formatted.append(f"User: {entry.get('query', '')}")
         formatted.append(f"Agent ({entry.get('category', 'Unknown')}, {entry.get('sentiment', 'Unknown')}): {entry.get('response', '')}")
@@ -117,10 +375,16 @@ def format_conversation_history(history: List[Dict[str, str]]) -> str:
     
     return "\n".join(formatted)
 
+def join_classification(state: State) -> Dict:
+    """Wait for both classifier branches before routing the query."""
+    return {}
+
 def route_query(state: State) -> str:
     """Route the query based on its sentiment and category."""
     if state.get("sentiment", "") == "Negative":
         return "escalate"
+    elif state.get("faq_answer"):
+        return "answer_from_faq"
     elif state.get("category", "") == "Technical":
         return "handle_technical"
     elif state.get("category", "") == "Billing":
@@ -128,39 +392,93 @@ def route_query(state: State) -> str:
     else:
         return "handle_general"
 
+class NodeMetrics:
+    """Latency of each graph node, over the most recent calls."""
+    
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+    
+    def record(self, node: str, seconds: float) -> None:
+        """Record one call of a node."""
+        with self._lock:
+            self._latencies.setdefault(node, deque(maxlen=self.window)).append(seconds * 1000)
+    
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Calls, mean, p95 and max latency in milliseconds per node."""
+        with self._lock:
+            latencies = {node: sorted(values) for node, values in self._latencies.items()}
+        return {
+            node: {
+                "calls": len(values),
+                "mean_ms": sum(values) / len(values),
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1]
+            }
+            for node, values in latencies.items() if values
+        }
+
+node_metrics = NodeMetrics()
+
+def timed_node(name: str, node):
+    """Wrap a node function so its latency is recorded in node_metrics."""
+    # functools.wraps keeps the signature LangGraph inspects to pass the run config
+    @functools.wraps(node)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return node(*args, **kwargs)
+        finally:
+            node_metrics.record(name, time.perf_counter() - started)
+    return wrapper
+
 # Create the workflow graph
-def build_workflow():
+def build_workflow(checkpointer=None):
+    """Build the support graph; with a checkpointer, state is kept per thread_id across invocations."""
     workflow = StateGraph(State)
     
     # Add nodes
-    workflow.add_node("categorize", categorize)
-    workflow.add_node("analyze_sentiment", analyze_sentiment)
-    workflow.add_node("handle_technical", handle_technical)
-    workflow.add_node("handle_billing", handle_billing)
-    workflow.add_node("handle_general", handle_general)
-    workflow.add_node("escalate", escalate)
-    workflow.add_node("update_conversation_history", update_conversation_history)
-    
-    # Add edges
-    workflow.add_edge("categorize", "analyze_sentiment")
+    nodes = {
+        "faq_lookup": faq_lookup,
+        "categorize": categorize,
+        "analyze_sentiment": analyze_sentiment,
+        "join_classification": join_classification,
+        "handle_technical": handle_technical,
+        "handle_billing": handle_billing,
+        "handle_general": handle_general,
+        "answer_from_faq": answer_from_faq,
+        "escalate": escalate,
+        "update_conversation_history": update_conversation_history
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, timed_node(name, node))
+    
+    # Add edges: the FAQ lookup runs first (it takes microseconds), then both
+    # classifiers start together and are joined before routing
+    workflow.add_edge(START, "faq_lookup")
+    workflow.add_edge("faq_lookup", "categorize")
+    workflow.add_edge("faq_lookup", "analyze_sentiment")
+    workflow.add_edge(["categorize", "analyze_sentiment"], "join_classification")
     workflow.add_conditional_edges(
-        "analyze_sentiment",
+        "join_classification",
         route_query,
         {
             "handle_technical": "handle_technical",
             "handle_billing": "handle_billing", 
             "handle_general": "handle_general",
+            "answer_from_faq": "answer_from_faq",
             "escalate": "escalate"
         }
     )
     workflow.add_edge("handle_technical", "update_conversation_history")
     workflow.add_edge("handle_billing", "update_conversation_history")
     workflow.add_edge("handle_general", "update_conversation_history")
+    workflow.add_edge("answer_from_faq", "update_conversation_history")
     workflow.add_edge("escalate", "update_conversation_history")
     workflow.add_edge("update_conversation_history", END)
     
-    workflow.set_entry_point("categorize")
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 app = build_workflow()
 
@@ -180,12 +498,19 @@ def process_query(query, conversation_history=None):
         "category": None,
         "sentiment": None,
         "response": None,
-        "conversation_history": conversation_history
+        "conversation_history": conversation_history,
+        "category_source": None,
+        "sentiment_source": None,
+        "faq_answer": None,
+        "faq_score": None
     }
     
     # Process the query
     try:
-        result = app.invoke(state, config={"recursion_limit": 25})
+        result = app.invoke(state, config={
+            "recursion_limit": 25,
+            "configurable": {"sentiment_signal": Future()}
+        })
         
         # Check if this was escalated to a human agent
         is_escalated = "escalated" in result.get("response", "").lower()
@@ -195,6 +520,7 @@ def process_query(query, conversation_history=None):
             "sentiment": result.get("sentiment", "Unknown"),
             "response": result.get("response", "I couldn't process your request."),
             "conversation_history": result.get("conversation_history", conversation_history),
+            "escalated": is_escalated,
             "should_exit": is_exit_phrase(query) or is_escalated
         }
     except Exception as e:
@@ -204,6 +530,8 @@ def process_query(query, conversation_history=None):
             "sentiment": "Neutral",
             "response": f"I'm sorry, but I encountered an error processing your request: {str(e)}",
             "conversation_history": conversation_history,
+            "escalated": False,
+            "error": str(e),
             "should_exit": False
         }
 
@@ -240,6 +568,30 @@ def interactive_customer_support():
             else:
                 print("Thank you for contacting Customer Support. Have a great day!")
             break
+    
+    print_classifier_stats()
+
+def print_classifier_stats():
+    """Report how many labels the local classifier answered without the LLM."""
+    for field, stats in classifier.get_stats().items():
+        if stats["queries"]:
+            print(f"Local {field} classifier answered {stats['local']} of {stats['queries']} queries ({stats['coverage']:.0%}).")
+    print("Retrain it from the labelled history with: python support_classifier.py retrain")
+    faq = get_faq_stats()
+    if faq["lookups"]:
+        print(f"FAQ index answered {faq['served']} of {faq['lookups']} queries ({faq['served_rate']:.0%}), "
+              f"saving about {faq['estimated_latency_saved_ms'] / 1000:.1f}s of generation.")
+
+def get_faq_stats() -> Dict[str, Any]:
+    """FAQ hit rates plus the generation latency the served answers saved, estimated from the handler nodes."""
+    stats = faq_index.get_stats()
+    handlers = [metrics for node, metrics in node_metrics.snapshot().items()
+                if node in ("handle_technical", "handle_billing", "handle_general")]
+    calls = sum(metrics["calls"] for metrics in handlers)
+    mean_generation_ms = sum(metrics["mean_ms"] * metrics["calls"] for metrics in handlers) / calls if calls else 0.0
+    stats["mean_generation_ms"] = mean_generation_ms
+    stats["estimated_latency_saved_ms"] = stats["served"] * max(mean_generation_ms - stats["mean_lookup_ms"], 0.0)
+    return stats
 
 if __name__ == "__main__":
     interactive_customer_support()
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""Batch triage of a support ticket backlog with the customer-support graph.
+
+Tickets are streamed from a JSONL or CSV file and processed concurrently by a
+bounded pool of workers; model calls share the agent's rate limiter. Each
+result is appended to the output JSONL file as soon as it is ready, so an
+interrupted run resumes where it stopped: tickets that already have a
+successful result in the output file are skipped.
+
+Usage:
+    python support_batch.py tickets.jsonl results.jsonl [--workers 8] [--rpm 600]
+
+Each ticket needs a query ("query", "text", "message" or "body" field) and
+may have an id ("id" or "ticket_id"; the line number otherwise). A numeric
+query is read as text; tickets without a text query are skipped and counted
+in the report.
+"""
+from typing import Dict, Iterator, Optional, Set, Tuple, Any, List
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import langgraph_customer_support_agent as agent
+
+QUERY_FIELDS = ("query", "text", "message", "body")
+ID_FIELDS = ("id", "ticket_id")
+
+def _parse_jsonl(lines: Iterator[str]) -> Iterator[Any]:
+    """Parse JSONL lines; blank lines give None and malformed ones a ValueError, so line numbers stay aligned."""
+    for line in lines:
+        if not line.strip():
+            yield None
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+def _query_text(value: Any) -> Optional[str]:
+    """A ticket's query as text: strings as they are, numbers converted, anything else None."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+def read_tickets(path: str, counts: Optional[Counter] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Stream (ticket id, query) pairs from a JSONL or CSV file, counting
+    malformed lines in counts["malformed"] and tickets without a text query
+    in counts["no_query"].
+    """
+    if counts is None:
+        counts = Counter()
+    with open(path, encoding="utf-8", newline="") as tickets:
+        if path.lower().endswith(".csv"):
+            rows: Iterator[Any] = csv.DictReader(tickets)
+        else:
+            rows = _parse_jsonl(tickets)
+        for number, row in enumerate(rows, start=1):
+            if row is None:
+                continue
+            if not isinstance(row, dict):
+                counts["malformed"] += 1
+                print(f"Skipping malformed ticket on line {number} of {path}")
+                continue
+            value = next((row[field] for field in QUERY_FIELDS if row.get(field) not in (None, "")), None)
+            query = _query_text(value)
+            ticket_id = next((str(row[field]) for field in ID_FIELDS if row.get(field) not in (None, "")), str(number))
+            if query is None or not query.strip():
+                counts["no_query"] += 1
+                print(f"Skipping ticket {ticket_id} on line {number} of {path}: no text query")
+                continue
+            yield ticket_id, query
+
+def completed_tickets(path: str) -> Set[str]:
+    """Ids of tickets with a successful result in an earlier run's output."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as results:
+        for line in results:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # A line cut short when the previous run was killed
+            if isinstance(result, dict) and result.get("ticket_id") is not None and not result.get("error"):
+                done.add(str(result.get("ticket_id")))
+    return done
+
+def triage(ticket_id: str, query: str) -> Dict[str, Any]:
+    """Run one ticket through the graph as a fresh conversation."""
+    started = time.perf_counter()
+    result = agent.process_query(query, [])
+    return {
+        "ticket_id": ticket_id,
+        "query": query,
+        "category": result.get("category"),
+        "sentiment": result.get("sentiment"),
+        "escalated": result.get("escalated", False),
+        "response": result.get("response"),
+        "error": result.get("error"),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def print_progress(counts: Counter, started: float) -> None:
+    """Print throughput and outcome counts so far."""
+    elapsed = max(time.monotonic() - started, 1e-9)
+    print(f"{counts['processed']} tickets in {elapsed:.0f}s ({counts['processed'] / elapsed:.2f} tickets/sec), "
+          f"{counts['escalated']} escalated, {counts['errors']} errors")
+
+def print_report(counts: Counter, categories: Counter, started: float) -> None:
+    """Print the final throughput, outcome and per-node latency report."""
+    print("\nBatch complete")
+    print(f"Skipped (already done): {counts['skipped']}")
+    print(f"Skipped (malformed input lines): {counts['malformed']}")
+    print(f"Skipped (no text query): {counts['no_query']}")
+    print_progress(counts, started)
+    print("Categories: " + ", ".join(f"{category}: {count}" for category, count in categories.most_common()))
+    print("Node latency (ms):")
+    for node, stats in sorted(agent.node_metrics.snapshot().items()):
+        print(f"  {node:<28} calls {stats['calls']:>6}  mean {stats['mean_ms']:>8.1f}  "
+              f"p95 {stats['p95_ms']:>8.1f}  max {stats['max_ms']:>8.1f}")
+    for field, stats in agent.classifier.get_stats().items():
+        print(f"Local {field} classifier answered {stats['local']} of {stats['queries']} queries")
+    faq = agent.get_faq_stats()
+    print(f"FAQ index: {faq['served']} of {faq['lookups']} queries answered ({faq['served_rate']:.1%}), "
+          f"hit rate {faq['hit_rate']:.1%}, estimated latency saved {faq['estimated_latency_saved_ms'] / 1000:.1f}s")
+
+def run_batch(input_path: str, output_path: str, workers: int = 8,
+              progress_every: float = 30.0) -> Counter:
+    """Triage every ticket of input_path not yet in output_path, appending results as they finish."""
+    done = completed_tickets(output_path)
+    counts: Counter = Counter()
+    categories: Counter = Counter()
+    started = time.monotonic()
+    last_progress = started
+    pending: Set[Future] = set()
+    
+    def collect(finished: Set[Future], output) -> None:
+        for future in finished:
+            result = future.result()
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            counts["processed"] += 1
+            if result["error"]:
+                counts["errors"] += 1
+            else:
+                categories[result["category"]] += 1
+            if result["escalated"]:
+                counts["escalated"] += 1
+    
+    with open(output_path, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=workers) as pool:
+        for ticket_id, query in read_tickets(input_path, counts):
+            if ticket_id in done:
+                counts["skipped"] += 1
+                continue
+            # Keep the queue short so the input is streamed, not loaded at once
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished, output)
+            pending.add(pool.submit(triage, ticket_id, query))
+            done.add(ticket_id)  # Duplicate ids in the input are triaged once
+            
+            if time.monotonic() - last_progress >= progress_every:
+                print_progress(counts, started)
+                last_progress = time.monotonic()
+        
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished, output)
+    
+    print_report(counts, categories, started)
+    return counts
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Triage a backlog of support tickets.")
+    parser.add_argument("input", help="Tickets (.jsonl or .csv)")
+    parser.add_argument("output", help="Results (.jsonl); existing results are kept and skipped")
+    parser.add_argument("--workers", type=int, default=8, help="Tickets processed concurrently")
+    parser.add_argument("--rpm", type=float, default=agent.MODEL_REQUESTS_PER_MINUTE,
+                        help="Model requests per minute across all workers (0 = unlimited)")
+    args = parser.parse_args(argv)
+    
+    if args.workers * 2 > agent.MODEL_MAX_CONCURRENCY:
+        # Each ticket makes up to two model calls at once (category and sentiment)
+        print(f"Note: {args.workers} workers can need {args.workers * 2} concurrent model calls; "
+              f"MODEL_MAX_CONCURRENCY is {agent.MODEL_MAX_CONCURRENCY}.")
+    agent.rate_limiter.set_rate(args.rpm)
+    
+    try:
+        counts = run_batch(args.input, args.output, args.workers)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume.")
+        return 130
+    return 1 if counts["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
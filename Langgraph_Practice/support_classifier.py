@@ -0,0 +1,290 @@
+"""Local classifier for support query category and sentiment.
+
+Hashed word and character n-gram features with a softmax regression per
+label, in NumPy. It answers in microseconds on the CPU; the agent only calls
+the LLM when the classifier's confidence is below the threshold.
+
+Training data is the labelled history the agent writes: every query the LLM
+classified is appended to SUPPORT_HISTORY_PATH.
+
+Usage:
+    python support_classifier.py retrain [--history PATH] [--model PATH] [--threshold 0.85]
+    python support_classifier.py report [--model PATH]
+"""
+from typing import Dict, List, Optional, Tuple, Any
+import os
+import re
+import sys
+import json
+import zlib
+import argparse
+import threading
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SUPPORT_HISTORY_PATH = os.environ.get("SUPPORT_HISTORY_PATH", os.path.join(BASE_DIR, "support_history.jsonl"))
+SUPPORT_CLASSIFIER_PATH = os.environ.get("SUPPORT_CLASSIFIER_PATH", os.path.join(BASE_DIR, "support_classifier.npz"))
+SUPPORT_CLASSIFIER_THRESHOLD = float(os.environ.get("SUPPORT_CLASSIFIER_THRESHOLD", "0.85"))
+MIN_TRAINING_EXAMPLES = int(os.environ.get("SUPPORT_CLASSIFIER_MIN_EXAMPLES", "30"))
+# A head missing examples of a label would never predict it, so it needs this many of each
+MIN_EXAMPLES_PER_LABEL = int(os.environ.get("SUPPORT_CLASSIFIER_MIN_PER_LABEL", "5"))
+
+CATEGORIES = ["Technical", "Billing", "General"]
+SENTIMENTS = ["Positive", "Neutral", "Negative"]
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+# Batch workers label queries concurrently; one writer at a time keeps history lines whole
+_history_lock = threading.Lock()
+
+def normalize_label(text: Optional[str], labels: List[str]) -> Optional[str]:
+    """Map a model reply such as 'Billing.' or 'negative' onto one of the labels."""
+    if not text:
+        return None
+    text = text.strip().lower()
+    for label in labels:
+        if text.startswith(label.lower()):
+            return label
+    matches = [label for label in labels if label.lower() in text]
+    return matches[0] if len(matches) == 1 else None
+
+def featurize(text: str, n_features: int) -> np.ndarray:
+    """Hash the word unigrams, word bigrams and character trigrams of a text into feature indices."""
+    tokens = _TOKEN.findall(text.lower())
+    grams = [f"w:{token}" for token in tokens]
+    grams += [f"b:{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f" {token} "
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    # crc32 rather than hash() so feature indices are stable across processes
+    return np.unique(np.array([zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams], dtype=np.int64))
+
+class LinearTextClassifier:
+    """Softmax regression over hashed binary features, trained with SGD."""
+    
+    def __init__(self, labels: List[str], n_features: int = 2 ** 18):
+        self.labels = labels
+        self.n_features = n_features
+        self.weights = np.zeros((n_features, len(labels)), dtype=np.float32)
+        self.bias = np.zeros(len(labels), dtype=np.float32)
+    
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        """Numerically stable softmax."""
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+    
+    def _probabilities(self, features: np.ndarray) -> np.ndarray:
+        """Class probabilities for one featurized text."""
+        if not len(features):
+            return self._softmax(self.bias)
+        scale = 1.0 / np.sqrt(len(features))
+        return self._softmax(self.weights[features].sum(axis=0) * scale + self.bias)
+    
+    def fit(self, documents: List[np.ndarray], targets: List[int], epochs: int = 12,
+            learning_rate: float = 0.5, l2: float = 1e-5, seed: int = 0) -> None:
+        """Train from featurized texts and label indices, starting from zero weights."""
+        rng = np.random.default_rng(seed)
+        self.weights[:] = 0
+        self.bias[:] = 0
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + 0.5 * epoch)
+            for i in rng.permutation(len(documents)):
+                features = documents[i]
+                gradient = self._probabilities(features)
+                gradient[targets[i]] -= 1
+                if len(features):
+                    scale = 1.0 / np.sqrt(len(features))
+                    self.weights[features] -= rate * (scale * gradient + l2 * self.weights[features])
+                self.bias -= rate * gradient
+    
+    def predict(self, features: np.ndarray) -> Tuple[str, float]:
+        """Most likely label and its probability."""
+        probabilities = self._probabilities(features)
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+def load_examples(path: str = SUPPORT_HISTORY_PATH) -> List[Dict[str, Any]]:
+    """Read the labelled history, skipping malformed lines."""
+    examples = []
+    if not os.path.exists(path):
+        return examples
+    with open(path, encoding="utf-8") as history:
+        for line in history:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("query"):
+                examples.append(entry)
+    return examples
+
+def append_example(query: str, category: Optional[str], sentiment: Optional[str],
+                   path: str = SUPPORT_HISTORY_PATH) -> None:
+    """Append a query with its LLM labels to the labelled history."""
+    category = normalize_label(category, CATEGORIES)
+    sentiment = normalize_label(sentiment, SENTIMENTS)
+    if not query or (category is None and sentiment is None):
+        return
+    line = json.dumps({"query": query, "category": category, "sentiment": sentiment}) + "\n"
+    try:
+        with _history_lock, open(path, "a", encoding="utf-8") as history:
+            history.write(line)
+    except OSError as e:
+        print(f"Error saving labelled query to {path}: {str(e)}")
+
+def evaluate(classifier: LinearTextClassifier, documents: List[np.ndarray], targets: List[int],
+             threshold: float) -> Dict[str, float]:
+    """Accuracy, coverage at the threshold and accuracy on the covered queries."""
+    predictions = [classifier.predict(features) for features in documents]
+    correct = [classifier.labels[target] == label for (label, _), target in zip(predictions, targets)]
+    covered = [confidence >= threshold for _, confidence in predictions]
+    covered_correct = sum(1 for hit, ok in zip(covered, correct) if hit and ok)
+    return {
+        "examples": len(targets),
+        "accuracy": sum(correct) / len(correct) if correct else 0.0,
+        "coverage": sum(covered) / len(covered) if covered else 0.0,
+        "covered_accuracy": covered_correct / sum(covered) if any(covered) else 0.0
+    }
+
+class SupportClassifier:
+    """Category and sentiment heads plus the confidence gate and usage counters."""
+    
+    def __init__(self, threshold: float = SUPPORT_CLASSIFIER_THRESHOLD, n_features: int = 2 ** 18):
+        self.threshold = threshold
+        self.n_features = n_features
+        self.heads: Dict[str, LinearTextClassifier] = {}
+        self.report: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"category": {"queries": 0, "local": 0}, "sentiment": {"queries": 0, "local": 0}}
+    
+    def predict(self, field: str, query: str) -> Tuple[Optional[str], float]:
+        """Predict "category" or "sentiment"; the label is None when the LLM should decide."""
+        head = self.heads.get(field)
+        label, confidence = (None, 0.0) if head is None else head.predict(featurize(query, self.n_features))
+        confident = label is not None and confidence >= self.threshold
+        with self._lock:
+            self.stats[field]["queries"] += 1
+            if confident:
+                self.stats[field]["local"] += 1
+        return (label if confident else None), confidence
+    
+    def train(self, examples: List[Dict[str, Any]], holdout: float = 0.2, seed: int = 0) -> Dict[str, Any]:
+        """
+        Train both heads, reporting held-out accuracy and coverage before
+        refitting on all examples. A head without MIN_TRAINING_EXAMPLES
+        labelled queries, or MIN_EXAMPLES_PER_LABEL of every label, is not
+        trained and leaves its queries to the LLM.
+        """
+        report: Dict[str, Any] = {"threshold": self.threshold}
+        for field, labels in (("category", CATEGORIES), ("sentiment", SENTIMENTS)):
+            pairs = [(featurize(example["query"], self.n_features), labels.index(label))
+                     for example in examples
+                     for label in [normalize_label(example.get(field), labels)] if label is not None]
+            label_counts = {label: 0 for label in labels}
+            for _, target in pairs:
+                label_counts[labels[target]] += 1
+            scarce = [label for label, count in label_counts.items() if count < MIN_EXAMPLES_PER_LABEL]
+            if len(pairs) < MIN_TRAINING_EXAMPLES or scarce:
+                skipped = (f"needs {MIN_TRAINING_EXAMPLES} labelled queries" if len(pairs) < MIN_TRAINING_EXAMPLES
+                           else f"needs {MIN_EXAMPLES_PER_LABEL} of each label, too few {', '.join(scarce)}")
+                report[field] = {"examples": len(pairs), "label_counts": label_counts, "skipped": skipped}
+                self.heads.pop(field, None)
+                continue
+            
+            order = np.random.default_rng(seed).permutation(len(pairs))
+            split = max(1, int(len(pairs) * holdout))
+            test = [pairs[i] for i in order[:split]]
+            train = [pairs[i] for i in order[split:]]
+            
+            head = LinearTextClassifier(labels, self.n_features)
+            head.fit([features for features, _ in train], [target for _, target in train], seed=seed)
+            report[field] = evaluate(head, [features for features, _ in test], [target for _, target in test],
+                                     self.threshold)
+            report[field]["training_examples"] = len(pairs)
+            report[field]["label_counts"] = label_counts
+            
+            head.fit([features for features, _ in pairs], [target for _, target in pairs], seed=seed)
+            self.heads[field] = head
+        self.report = report
+        return report
+    
+    def save(self, path: str = SUPPORT_CLASSIFIER_PATH) -> None:
+        """Save the trained heads and their evaluation report."""
+        arrays = {}
+        for field, head in self.heads.items():
+            arrays[f"{field}_weights"] = head.weights
+            arrays[f"{field}_bias"] = head.bias
+        meta = {"n_features": self.n_features, "report": self.report,
+                "labels": {field: head.labels for field, head in self.heads.items()}}
+        with open(path, "wb") as model_file:
+            np.savez_compressed(model_file, meta=np.array(json.dumps(meta)), **arrays)
+    
+    @classmethod
+    def load(cls, path: str = SUPPORT_CLASSIFIER_PATH,
+             threshold: float = SUPPORT_CLASSIFIER_THRESHOLD) -> "SupportClassifier":
+        """Load a saved classifier; without a model file every query falls through to the LLM."""
+        if not os.path.exists(path):
+            return cls(threshold)
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                classifier = cls(threshold, meta["n_features"])
+                classifier.report = meta["report"]
+                for field, labels in meta["labels"].items():
+                    head = LinearTextClassifier(labels, classifier.n_features)
+                    head.weights = data[f"{field}_weights"]
+                    head.bias = data[f"{field}_bias"]
+                    classifier.heads[field] = head
+            return classifier
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error loading support classifier from {path}: {str(e)}")
+            return cls(threshold)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Share of live queries answered locally per label."""
+        with self._lock:
+            return {
+                field: {**counts, "coverage": counts["local"] / counts["queries"] if counts["queries"] else 0.0}
+                for field, counts in self.stats.items()
+            }
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a training report."""
+    print(f"Confidence threshold: {report.get('threshold')}")
+    for field in ("category", "sentiment"):
+        result = report.get(field)
+        if not result:
+            print(f"{field}: not trained")
+        elif "skipped" in result:
+            print(f"{field}: skipped, {result['examples']} labelled queries ({result['skipped']})")
+        else:
+            print(f"{field}: {result['training_examples']} labelled queries, held-out accuracy "
+                  f"{result['accuracy']:.1%}, coverage {result['coverage']:.1%} "
+                  f"(accuracy on covered {result['covered_accuracy']:.1%})")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: retrain or report."""
+    parser = argparse.ArgumentParser(description="Train or inspect the local support query classifier.")
+    parser.add_argument("command", choices=["retrain", "report"])
+    parser.add_argument("--history", default=SUPPORT_HISTORY_PATH, help="Labelled history (JSONL)")
+    parser.add_argument("--model", default=SUPPORT_CLASSIFIER_PATH, help="Model file (.npz)")
+    parser.add_argument("--threshold", type=float, default=SUPPORT_CLASSIFIER_THRESHOLD)
+    args = parser.parse_args(argv)
+    
+    if args.command == "report":
+        print_report(SupportClassifier.load(args.model, args.threshold).report)
+        return 0
+    
+    examples = load_examples(args.history)
+    classifier = SupportClassifier(args.threshold)
+    report = classifier.train(examples)
+    print_report(report)
+    if not classifier.heads:
+        print(f"Not enough labelled queries in {args.history}; model not saved.")
+        return 1
+    classifier.save(args.model)
+    print(f"Saved model to {args.model}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
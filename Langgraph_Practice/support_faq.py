@@ -0,0 +1,462 @@
+"""FAQ fast path for the customer-support agent.
+
+An index of frequently asked questions, built offline from past (query,
+response) pairs such as the output of support_batch.py. Queries are
+normalized and vectorized as TF-IDF over words and character trigrams (a
+misspelled word still shares most of its trigrams with the correct one, but
+in a short query one typo can be enough to miss), and near-duplicate
+phrasings are clustered into one FAQ. At run time a query is matched against
+the index with one NumPy matrix product; the agent answers high-similarity,
+non-negative queries from the index instead of generating a response.
+
+Numbers, ids and negations change the answer while barely changing the
+similarity, so they form a signature that must be identical for a query to
+match an FAQ. Answers that quote an order or account id are never indexed.
+
+Phrasings are clustered by their similarity to cluster centroids, and
+clusters with similar centroids are merged, so light rewordings of one
+question end up in one FAQ. Phrasings whose answers disagree are never
+clustered together.
+
+The similarity threshold is calibrated when the index is built: part of the
+pairs is held out, and the threshold is the lowest one at which the answers
+the index would serve agree with the held-out responses at the target
+precision. It is lowered further if needed, so that at least MIN_RECALL of
+the held-out queries the index could answer correctly are served.
+SUPPORT_FAQ_THRESHOLD overrides it.
+
+Usage:
+    python support_faq.py build results.jsonl [more.jsonl ...] [--output support_faq.npz]
+    python support_faq.py match "how do I update my card" [--index support_faq.npz]
+"""
+from typing import Dict, List, Optional, Tuple, Any, Iterable
+import os
+import re
+import sys
+import csv
+import json
+import math
+import time
+import argparse
+import threading
+from itertools import combinations
+from collections import Counter, defaultdict
+import numpy as np
+
+SUPPORT_FAQ_PATH = os.environ.get(
+    "SUPPORT_FAQ_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "support_faq.npz")
+)
+# Overrides the threshold calibrated at build time when set
+SUPPORT_FAQ_THRESHOLD = float(os.environ["SUPPORT_FAQ_THRESHOLD"]) if os.environ.get("SUPPORT_FAQ_THRESHOLD") else None
+DEFAULT_FAQ_THRESHOLD = 0.9  # For indexes built from too few pairs to calibrate
+MIN_CALIBRATION_PAIRS = 50
+RESPONSE_AGREEMENT = 0.5  # Response similarity at which a served answer counts as the right one
+MIN_RECALL = 0.8  # Share of the held-out queries the index could answer correctly that it must serve
+
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_SPACES = re.compile(r"\s+")
+NEGATIONS = frozenset(
+    "not no never none nothing nobody nor without cannot cant dont doesnt didnt isnt arent wasnt "
+    "werent wont wouldnt shouldnt couldnt havent hasnt hadnt".split()
+)
+
+def normalize(text: str) -> str:
+    """Lowercase and drop punctuation; numbers and ids are kept, since they change the answer."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+def numbers(normalized: str) -> List[str]:
+    """Tokens with a digit: amounts, order numbers and other ids."""
+    return [token for token in normalized.split() if any(char.isdigit() for char in token)]
+
+def signature(normalized: str) -> Tuple[str, ...]:
+    """Tokens two queries must share to get the same answer: their numbers and ids, and whether they are negated."""
+    negations = sum(1 for token in normalized.split() if token in NEGATIONS or token.endswith("n't"))
+    return tuple(sorted(numbers(normalized))) + ("not",) * negations
+
+def quoted_ids(normalized: str) -> List[str]:
+    """Tokens that look like order, ticket or account ids: four or more digits, or three mixed with letters."""
+    return [token for token in numbers(normalized)
+            if sum(char.isdigit() for char in token) >= (4 if token.isdigit() else 3)]
+
+def terms(normalized: str) -> Counter:
+    """Word and character trigram counts of a normalized text."""
+    counts: Counter = Counter()
+    for token in normalized.split():
+        counts[f"w:{token}"] += 1
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            counts[f"c:{padded[i:i + 3]}"] += 1
+    return counts
+
+def _weigh(counts: Counter, idf: Dict[str, float], default_idf: float) -> Dict[str, float]:
+    """L2-normalized TF-IDF weights of term counts."""
+    weights = {term: count * idf.get(term, default_idf) for term, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+def _cosine(first: Dict[str, float], second: Dict[str, float]) -> float:
+    """Cosine similarity of two normalized sparse vectors."""
+    if len(first) > len(second):
+        first, second = second, first
+    return sum(weight * second.get(term, 0.0) for term, weight in first.items())
+
+def _normalized(vector: Dict[str, float]) -> Dict[str, float]:
+    """L2-normalize a sparse vector."""
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+def _merge_into(cluster: Dict[str, Any], other: Dict[str, Any]) -> None:
+    """Add other's phrasings to cluster, updating its count-weighted centroid and leading answer."""
+    if other["count"] > cluster["count"]:
+        cluster["answer"] = other["answer"]
+    for term, weight in other["total"].items():
+        cluster["total"][term] = cluster["total"].get(term, 0.0) + weight
+    cluster["centre"] = _normalized(cluster["total"])
+    cluster["count"] += other["count"]
+    cluster["variants"] = sorted(cluster["variants"] + other["variants"], key=lambda variant: -variant[1]["count"])
+
+def _cluster(groups: Dict[str, Dict[str, Any]], idf: Dict[str, float], default_idf: float,
+             cluster_threshold: float) -> List[Dict[str, Any]]:
+    """
+    Cluster phrasings by the cosine similarity of their TF-IDF vectors to
+    cluster centroids. Each phrasing, most frequent first, joins the cluster
+    with the most similar centroid, if it is similar enough. Then clusters
+    whose centroids are similar enough are merged, most similar pair first,
+    until none are left. Phrasings only share a cluster if they have the same
+    signature and their answers agree. Variants are kept most frequent first,
+    so each FAQ is led by its common form.
+    """
+    answer_idf, default_answer_idf = _idf([group["answer_terms"] for group in groups.values()])
+    
+    def compatible(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+        return (first["signature"] == second["signature"]
+                and _cosine(first["answer"], second["answer"]) >= RESPONSE_AGREEMENT)
+    
+    clusters: List[Dict[str, Any]] = []
+    for key, group in sorted(groups.items(), key=lambda item: -item[1]["count"]):
+        vector = _weigh(group["terms"], idf, default_idf)
+        single = {"total": {term: weight * group["count"] for term, weight in vector.items()}, "centre": vector,
+                  "signature": group["signature"], "count": group["count"], "variants": [(key, group)],
+                  "answer": _weigh(group["answer_terms"], answer_idf, default_answer_idf)}
+        similarity, best = max(((_cosine(vector, cluster["centre"]), i) for i, cluster in enumerate(clusters)
+                                if compatible(cluster, single)), default=(0.0, -1))
+        if similarity >= cluster_threshold:
+            _merge_into(clusters[best], single)
+        else:
+            clusters.append(single)
+    
+    similarities = {(i, j): _cosine(clusters[i]["centre"], clusters[j]["centre"])
+                    for i, j in combinations(range(len(clusters)), 2) if compatible(clusters[i], clusters[j])}
+    alive = set(range(len(clusters)))
+    while similarities:
+        (keep, drop), similarity = max(similarities.items(), key=lambda item: item[1])
+        if similarity < cluster_threshold:
+            break
+        _merge_into(clusters[keep], clusters[drop])
+        alive.discard(drop)
+        similarities = {pair: value for pair, value in similarities.items() if drop not in pair}
+        for other in alive:
+            if other != keep and compatible(clusters[keep], clusters[other]):
+                similarities[(min(keep, other), max(keep, other))] = _cosine(clusters[keep]["centre"],
+                                                                             clusters[other]["centre"])
+    return [clusters[i] for i in sorted(alive)]
+
+def _idf(documents: List[Counter]) -> Tuple[Dict[str, float], float]:
+    """Smoothed inverse document frequencies, plus the value for unseen terms."""
+    document_frequency: Counter = Counter()
+    for counts in documents:
+        document_frequency.update(counts.keys())
+    idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+    return idf, math.log(1 + len(documents)) + 1  # Terms never seen are as rare as it gets
+
+def load_pairs(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Read past (query, response) pairs from JSONL or CSV files, keeping only answers worth reusing."""
+    pairs = []
+    for path in paths:
+        with open(path, encoding="utf-8", newline="") as source:
+            if path.lower().endswith(".csv"):
+                rows: Iterable[Any] = csv.DictReader(source)
+            else:
+                rows = []
+                for line in source:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        continue
+            for row in rows:
+                if not isinstance(row, dict) or not row.get("query") or not row.get("response"):
+                    continue
+                escalated = str(row.get("escalated", "")).lower() == "true"
+                if row.get("error") or escalated or row.get("sentiment") == "Negative":
+                    continue
+                # An answer about one customer's order or account must not be served to others
+                response = normalize(row["response"])
+                if quoted_ids(response) or set(numbers(normalize(row["query"]))) & set(response.split()):
+                    continue
+                pairs.append(row)
+    return pairs
+
+class FAQIndex:
+    """TF-IDF matrix of FAQ phrasings with their answers and signatures, plus lookup counters."""
+    
+    def __init__(self, vocabulary: Optional[Dict[str, int]] = None, idf: Optional[np.ndarray] = None,
+                 default_idf: float = 1.0, matrix: Optional[np.ndarray] = None,
+                 answers: Optional[List[Dict[str, Any]]] = None, rows: Optional[List[int]] = None,
+                 signatures: Optional[List[Tuple[str, ...]]] = None, threshold: float = DEFAULT_FAQ_THRESHOLD,
+                 calibration: Optional[Dict[str, Any]] = None):
+        self.vocabulary = vocabulary or {}
+        self.idf = idf if idf is not None else np.zeros(0, dtype=np.float32)
+        self.default_idf = default_idf
+        self.matrix = matrix if matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        self.answers = answers or []  # {"question", "response", "category", "count"} per FAQ
+        self.rows = rows or []  # FAQ of each matrix row
+        self.signatures = [tuple(sig) for sig in signatures or []]  # Signature of each matrix row
+        self.threshold = threshold
+        self.calibration = calibration or {}
+        grouped: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+        for row, sig in enumerate(self.signatures):
+            grouped[sig].append(row)
+        self._rows_by_signature = {sig: np.array(rows) for sig, rows in grouped.items()}  # Candidate rows per signature
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "served": 0, "lookup_ms": 0.0}
+    
+    @classmethod
+    def build(cls, pairs: List[Dict[str, Any]], min_count: int = 2, max_faqs: int = 200,
+              cluster_threshold: float = 0.5, variants_per_faq: int = 5, holdout: float = 0.2,
+              target_precision: float = 0.95, min_recall: float = MIN_RECALL, seed: int = 0) -> "FAQIndex":
+        """Index the most frequent FAQs, calibrating the threshold on held-out pairs before indexing all of them."""
+        order = np.random.default_rng(seed).permutation(len(pairs))
+        split = int(len(pairs) * holdout)
+        threshold, calibration = DEFAULT_FAQ_THRESHOLD, {"held_out": split, "calibrated": False}
+        if split >= MIN_CALIBRATION_PAIRS:
+            trial = cls._index([pairs[i] for i in order[split:]], min_count, max_faqs,
+                               cluster_threshold, variants_per_faq)
+            calibration = trial.calibrate([pairs[i] for i in order[:split]], target_precision, min_recall)
+            threshold = calibration["threshold"]
+        
+        index = cls._index(pairs, min_count, max_faqs, cluster_threshold, variants_per_faq, threshold)
+        index.calibration = calibration
+        return index
+    
+    @classmethod
+    def _index(cls, pairs: List[Dict[str, Any]], min_count: int, max_faqs: int, cluster_threshold: float,
+               variants_per_faq: int, threshold: float = DEFAULT_FAQ_THRESHOLD) -> "FAQIndex":
+        """Cluster past queries into FAQs and index the most frequent ones."""
+        groups: Dict[str, Dict[str, Any]] = {}
+        for pair in pairs:
+            key = normalize(pair["query"])
+            if not key:
+                continue
+            group = groups.setdefault(key, {"count": 0, "terms": terms(key), "signature": signature(key)})
+            group["count"] += 1
+            group["query"] = pair["query"]
+            group["response"] = pair["response"]  # The latest answer wins
+            group["answer_terms"] = terms(normalize(pair["response"]))
+            group["category"] = pair.get("category") or "General"
+        
+        idf, default_idf = _idf([group["terms"] for group in groups.values()])
+        
+        clusters = _cluster(groups, idf, default_idf, cluster_threshold)
+        kept = sorted((cluster for cluster in clusters if cluster["count"] >= min_count),
+                      key=lambda cluster: -cluster["count"])[:max_faqs]
+        
+        answers, rows, signatures, vectors = [], [], [], []
+        for cluster in kept:
+            _, lead = cluster["variants"][0]
+            answers.append({"question": lead["query"], "response": lead["response"],
+                            "category": lead["category"], "count": cluster["count"]})
+            for key, group in cluster["variants"][:variants_per_faq]:
+                rows.append(len(answers) - 1)
+                signatures.append(cluster["signature"])
+                vectors.append(_weigh(group["terms"], idf, default_idf))
+        
+        vocabulary: Dict[str, int] = {}
+        for vector in vectors:
+            for term in vector:
+                vocabulary.setdefault(term, len(vocabulary))
+        matrix = np.zeros((len(vectors), len(vocabulary)), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            for term, weight in vector.items():
+                matrix[row, vocabulary[term]] = weight
+        idf_array = np.array([idf[term] for term in vocabulary], dtype=np.float32)
+        return cls(vocabulary, idf_array, default_idf, matrix, answers, rows, signatures, threshold)
+    
+    def _best(self, query: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Most similar FAQ with the query's signature and its similarity, whatever the threshold."""
+        normalized = normalize(query)
+        candidates = self._rows_by_signature.get(signature(normalized))
+        counts = terms(normalized)
+        if not counts or candidates is None:
+            return None
+        
+        columns, weights, norm = [], [], 0.0
+        for term, count in counts.items():
+            column = self.vocabulary.get(term)
+            weight = count * (self.default_idf if column is None else float(self.idf[column]))
+            norm += weight * weight
+            if column is not None:
+                columns.append(column)
+                weights.append(weight)
+        if not columns:
+            return None
+        
+        scores = self.matrix[np.ix_(candidates, columns)] @ (np.array(weights, dtype=np.float32) / math.sqrt(norm))
+        best = int(scores.argmax())
+        return self.answers[self.rows[candidates[best]]], float(scores[best])
+    
+    def match(self, query: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Best FAQ and its similarity if it reaches the threshold, else None."""
+        started = time.perf_counter()
+        result = self._best(query)
+        if result is not None and result[1] < self.threshold:
+            result = None
+        
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats["hits"] += int(result is not None)
+            self.stats["lookup_ms"] += (time.perf_counter() - started) * 1000
+        return result
+    
+    def calibrate(self, held_out: List[Dict[str, Any]], target_precision: float = 0.95,
+                  min_recall: float = MIN_RECALL) -> Dict[str, Any]:
+        """
+        Lowest threshold at which served answers agree with the held-out
+        responses at the target precision, lowered if needed until at least
+        min_recall of the held-out queries with a matching answer are served.
+        """
+        found = []  # (similarity, held-out response, response the index would serve)
+        for pair in held_out:
+            best = self._best(pair["query"])
+            if best is not None:
+                found.append((best[1], terms(normalize(pair["response"])), terms(normalize(best[0]["response"]))))
+        idf, default_idf = _idf([counts for _, actual, served in found for counts in (actual, served)])
+        scored = sorted(
+            ((score, _cosine(_weigh(actual, idf, default_idf), _weigh(served, idf, default_idf)) >= RESPONSE_AGREEMENT)
+             for score, actual, served in found),
+            reverse=True
+        )
+        
+        # Candidate thresholds: serving every query scoring at least scored[i]
+        answerable = sum(agrees for _, agrees in scored)
+        candidates = []  # (threshold, served, precision, recall), highest threshold first
+        correct = 0
+        for i, (score, agrees) in enumerate(scored):
+            correct += agrees
+            if i + 1 < len(scored) and scored[i + 1][0] == score:
+                continue  # Ties are served together
+            candidates.append((math.floor(score * 10000) / 10000, i + 1, correct / (i + 1),
+                               correct / answerable if answerable else 0.0))
+        
+        chosen = None
+        for candidate in candidates:
+            if candidate[2] >= target_precision:
+                chosen = candidate  # Keep the lowest precise enough threshold
+        if answerable and (chosen is None or chosen[3] < min_recall):
+            chosen = next(candidate for candidate in candidates if candidate[3] >= min_recall)
+        
+        threshold, served, precision, recall = chosen or (1.0, 0, 0.0, 0.0)
+        return {"held_out": len(held_out), "calibrated": True, "target_precision": target_precision,
+                "min_recall": min_recall, "threshold": threshold, "served": served, "precision": precision,
+                "recall": recall, "coverage": served / len(held_out) if held_out else 0.0}
+    
+    def record_served(self) -> None:
+        """Count a query answered from the index."""
+        with self._lock:
+            self.stats["served"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Lookup counters, hit rate and mean lookup time."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["faqs"] = len(self.answers)
+        stats["threshold"] = self.threshold
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["served_rate"] = stats["served"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["mean_lookup_ms"] = stats["lookup_ms"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+    
+    def save(self, path: str = SUPPORT_FAQ_PATH) -> None:
+        """Save the index with its calibrated threshold."""
+        meta = {"vocabulary": list(self.vocabulary), "default_idf": self.default_idf,
+                "answers": self.answers, "rows": self.rows, "signatures": [list(sig) for sig in self.signatures],
+                "threshold": self.threshold, "calibration": self.calibration}
+        with open(path, "wb") as index_file:
+            np.savez_compressed(index_file, matrix=self.matrix, idf=self.idf, meta=np.array(json.dumps(meta)))
+    
+    @classmethod
+    def load(cls, path: str = SUPPORT_FAQ_PATH, threshold: Optional[float] = SUPPORT_FAQ_THRESHOLD) -> "FAQIndex":
+        """Load a saved index, at its calibrated threshold unless one is given; without one every lookup misses."""
+        fallback = threshold if threshold is not None else DEFAULT_FAQ_THRESHOLD
+        if not os.path.exists(path):
+            return cls(threshold=fallback)
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                if "signatures" not in meta:
+                    print(f"FAQ index at {path} has no query signatures; rebuild it with support_faq.py build")
+                    return cls(threshold=fallback)
+                return cls({term: i for i, term in enumerate(meta["vocabulary"])}, data["idf"],
+                           meta["default_idf"], data["matrix"], meta["answers"], meta["rows"], meta["signatures"],
+                           threshold if threshold is not None else meta["threshold"], meta.get("calibration"))
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error loading FAQ index from {path}: {str(e)}")
+            return cls(threshold=fallback)
+
+def print_calibration(calibration: Dict[str, Any]) -> None:
+    """Print how the threshold was chosen."""
+    if not calibration.get("calibrated"):
+        print(f"Threshold not calibrated ({calibration.get('held_out', 0)} held-out pairs, "
+              f"needs {MIN_CALIBRATION_PAIRS}); using {DEFAULT_FAQ_THRESHOLD}")
+        return
+    print(f"Threshold {calibration['threshold']:.3f} calibrated on {calibration['held_out']} held-out pairs: "
+          f"would answer {calibration['coverage']:.1%} of them at {calibration['precision']:.1%} precision "
+          f"(target {calibration['target_precision']:.0%}) and {calibration.get('recall', 0.0):.1%} recall "
+          f"(minimum {calibration.get('min_recall', MIN_RECALL):.0%})")
+    if calibration["served"] == 0:
+        print("No threshold reached the target precision; the index will answer almost no queries.")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: build the index or try a query against it."""
+    parser = argparse.ArgumentParser(description="Build or query the support FAQ index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the index from past (query, response) pairs")
+    build.add_argument("sources", nargs="+", help="JSONL or CSV files with query and response fields")
+    build.add_argument("--output", default=SUPPORT_FAQ_PATH)
+    build.add_argument("--min-count", type=int, default=2, help="Times a question must have been asked")
+    build.add_argument("--max-faqs", type=int, default=200)
+    build.add_argument("--target-precision", type=float, default=0.95,
+                       help="Share of served answers that must agree with the held-out responses")
+    build.add_argument("--min-recall", type=float, default=MIN_RECALL,
+                       help="Share of answerable held-out queries that must be served, even below the target precision")
+    match = commands.add_parser("match", help="Look up a query")
+    match.add_argument("query")
+    match.add_argument("--index", default=SUPPORT_FAQ_PATH)
+    args = parser.parse_args(argv)
+    
+    if args.command == "match":
+        found = FAQIndex.load(args.index).match(args.query)
+        if found is None:
+            print("No FAQ above the threshold.")
+            return 1
+        answer, score = found
+        print(f"{score:.3f} [{answer['category']}] {answer['question']}\n{answer['response']}")
+        return 0
+    
+    pairs = load_pairs(args.sources)
+    index = FAQIndex.build(pairs, args.min_count, args.max_faqs, target_precision=args.target_precision,
+                           min_recall=args.min_recall)
+    print(f"{len(pairs)} usable pairs -> {len(index.answers)} FAQs ({len(index.rows)} phrasings, "
+          f"{len(index.vocabulary)} terms)")
+    for answer in index.answers[:12]:
+        print(f"  {answer['count']:>5}x [{answer['category']}] {answer['question']}")
+    print_calibration(index.calibration)
+    if not index.answers:
+        print("No question was asked often enough; index not saved.")
+        return 1
+    index.save(args.output)
+    print(f"Saved index to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Multi-customer service mode for the customer-support graph.
+
+Conversations are keyed by thread id (e.g. the customer id). The graph runs
+with a SQLite-backed LangGraph checkpointer, so each turn sends only the new
+query and the rest of the thread's state is loaded from its checkpoint.
+
+The graph state holds only the last HISTORY_WINDOW turns, which is all the
+prompts read. Every turn is also inserted as one row into an append-only
+support_turns table, which holds the full history. After each turn the
+thread's superseded checkpoints are deleted, so each thread keeps only its
+latest checkpoint and storage grows linearly with conversation length.
+
+Turns of the same thread run one at a time; different threads run
+concurrently.
+
+Needs the SQLite checkpointer: pip install langgraph-checkpoint-sqlite
+
+Usage:
+    python support_service.py CUSTOMER_ID [--db support_threads.sqlite]
+"""
+from typing import Dict, List, Optional, Any
+import os
+import sys
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
+from langgraph.checkpoint.sqlite import SqliteSaver # type: ignore
+import langgraph_customer_support_agent as agent
+
+SUPPORT_CHECKPOINT_PATH = os.environ.get(
+    "SUPPORT_CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "support_threads.sqlite")
+)
+
+class ThreadLocks:
+    """One lock per thread id, dropped again when no turn holds or waits for it."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: Dict[str, List[Any]] = {}  # thread id -> [lock, holders and waiters]
+    
+    @contextmanager
+    def hold(self, thread_id: str):
+        """Run the block while no other turn of the thread runs."""
+        with self._lock:
+            entry = self._locks.setdefault(thread_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[thread_id]
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locks)
+
+class SupportService:
+    """Handles turns of many concurrent conversations, persisted per thread id."""
+    
+    def __init__(self, db_path: str = SUPPORT_CHECKPOINT_PATH):
+        # One connection shared by all threads; every access goes through the
+        # SqliteSaver's cursor(), which holds its lock and commits
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.checkpointer = SqliteSaver(self.connection)
+        self.graph = agent.build_workflow(checkpointer=self.checkpointer)
+        self.locks = ThreadLocks()
+        with self.checkpointer.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS support_turns ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, thread_id TEXT NOT NULL, query TEXT NOT NULL, "
+                "category TEXT, sentiment TEXT, response TEXT)"
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS support_turns_thread ON support_turns (thread_id, id)")
+    
+    def _append_turn(self, thread_id: str, turn: Dict[str, str]) -> None:
+        """Store one turn of a thread."""
+        with self.checkpointer.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO support_turns (thread_id, query, category, sentiment, response) VALUES (?, ?, ?, ?, ?)",
+                (thread_id, turn.get("query", ""), turn.get("category"), turn.get("sentiment"), turn.get("response"))
+            )
+    
+    def _prune_checkpoints(self, thread_id: str) -> None:
+        """Delete a thread's checkpoints and pending writes older than its latest checkpoint."""
+        with self.checkpointer.cursor() as cursor:
+            cursor.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id,)
+            )
+            latest = cursor.fetchone()
+            if latest is None:
+                return
+            for table in ("checkpoints", "writes"):
+                cursor.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id != ?",
+                               (thread_id, latest[0]))
+    
+    def handle(self, thread_id: str, query: str) -> Dict[str, Any]:
+        """Process one customer query in its conversation thread."""
+        # Only this turn's fields go in; history and everything else come from the checkpoint
+        turn = {
+            "query": query,
+            "category": None,
+            "sentiment": None,
+            "response": None,
+            "category_source": None,
+            "sentiment_source": None,
+            "faq_answer": None,
+            "faq_score": None
+        }
+        config = {
+            "recursion_limit": 25,
+            "configurable": {"thread_id": thread_id, "sentiment_signal": Future()}
+        }
+        try:
+            with self.locks.hold(thread_id):
+                result = self.graph.invoke(turn, config=config)
+                history = result.get("conversation_history") or []
+                if query and history:
+                    self._append_turn(thread_id, history[-1])
+                self._prune_checkpoints(thread_id)
+        except Exception as e:
+            print(f"Error processing query for thread {thread_id}: {str(e)}")
+            return {
+                "thread_id": thread_id,
+                "category": "Error",
+                "sentiment": "Neutral",
+                "response": f"I'm sorry, but I encountered an error processing your request: {str(e)}",
+                "escalated": False,
+                "error": str(e),
+                "should_exit": False
+            }
+        
+        is_escalated = "escalated" in (result.get("response") or "").lower()
+        return {
+            "thread_id": thread_id,
+            "category": result.get("category", "Unknown"),
+            "sentiment": result.get("sentiment", "Unknown"),
+            "response": result.get("response") or "I couldn't process your request.",
+            "escalated": is_escalated,
+            "should_exit": agent.is_exit_phrase(query) or is_escalated
+        }
+    
+    def history(self, thread_id: str, last: Optional[int] = None) -> List[Dict[str, str]]:
+        """Get a thread's stored history, or only its last turns."""
+        query = "SELECT query, category, sentiment, response FROM support_turns WHERE thread_id = ? ORDER BY id DESC"
+        parameters: tuple = (thread_id,)
+        if last:
+            query += " LIMIT ?"
+            parameters += (last,)
+        with self.checkpointer.cursor(transaction=False) as cursor:
+            rows = cursor.execute(query, parameters).fetchall()
+        return [
+            {"query": query_text, "category": category, "sentiment": sentiment, "response": response}
+            for query_text, category, sentiment, response in reversed(rows)
+        ]
+    
+    def close(self) -> None:
+        """Close the checkpoint database."""
+        self.connection.close()
+
+def interactive_session(service: SupportService, thread_id: str) -> None:
+    """Continue (or start) a customer's conversation interactively."""
+    previous = service.history(thread_id, last=agent.HISTORY_WINDOW)
+    if previous:
+        print(f"Resuming conversation {thread_id}. Last turns:")
+        print(agent.format_conversation_history(previous))
+    else:
+        print(f"Welcome to Customer Support! Conversation {thread_id}. Type 'exit' or 'thank you' to end it.")
+    
+    while True:
+        user_input = input("\nHow can I help you today? ")
+        
+        if not user_input.strip():
+            print("I didn't catch that. Could you please repeat your question?")
+            continue
+        
+        if agent.is_exit_phrase(user_input):
+            print("Thank you for contacting Customer Support. Have a great day!")
+            break
+        
+        result = service.handle(thread_id, user_input)
+        print(f"\nCategory: {result.get('category')}")
+        print(f"\nAgent: {result.get('response')}")
+        
+        if result.get("escalated"):
+            print("This conversation has been handed over to a human agent who will contact you shortly.")
+            break
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Customer support conversation persisted per customer.")
+    parser.add_argument("thread_id", help="Customer or conversation id")
+    parser.add_argument("--db", default=SUPPORT_CHECKPOINT_PATH, help="SQLite checkpoint database")
+    args = parser.parse_args(argv)
+    
+    service = SupportService(args.db)
+    try:
+        interactive_session(service, args.thread_id)
+    finally:
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+Shared setup for the customer support agent tests.
+
+The model is never called: tests replace get_model with a fake.
+
+    pip install langgraph langgraph-checkpoint-sqlite langchain-google-genai python-dotenv numpy pytest
+    python -m pytest tests
+"""
+import os
+import sys
+
+# The support modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+"""
+Tests for invoke_model's timeouts, failover and abandoned-call accounting.
+"""
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+import langgraph_customer_support_agent as agent
+
+PROMPT = ChatPromptTemplate.from_template("{query}")
+
+@pytest.fixture
+def models(monkeypatch):
+    """Fake model per name; set an entry to a function of the prompt."""
+    released = threading.Event()
+    answers = {}
+    
+    def hung(prompt):
+        released.wait(5)
+        return "late"
+    
+    def get_model(model):
+        return RunnableLambda(lambda prompt: AIMessage(content=answers.get(model, hung)(prompt)))
+    
+    monkeypatch.setattr(agent, "get_model", get_model)
+    monkeypatch.setattr(agent, "_model_circuits", {})
+    monkeypatch.setattr(agent, "_model_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(agent, "MODEL_REQUEST_TIMEOUT", 0.05)
+    monkeypatch.setattr(agent, "MODEL_MAX_RETRIES", 0)
+    monkeypatch.setattr(agent, "MODEL_MAX_ABANDONED_CALLS", 2)
+    monkeypatch.setattr(agent, "MODEL_CIRCUIT_FAILURE_THRESHOLD", 100)
+    yield answers
+    released.set()
+
+def test_abandoned_call_does_not_hold_up_the_fallback(models):
+    models[agent.FALLBACK_MODEL] = lambda prompt: "fallback"
+    
+    started = time.monotonic()
+    assert agent.invoke_model(PROMPT, {"query": "hi"}) == "fallback"
+    assert time.monotonic() - started < 1
+    assert agent._model_circuits[agent.MODEL]["abandoned"] == 1
+
+def test_model_with_too_many_abandoned_calls_is_skipped(models, monkeypatch):
+    monkeypatch.setattr(agent, "FALLBACK_MODEL", "")
+    
+    for _ in range(2):
+        with pytest.raises(agent.ModelUnavailableError, match="did not respond"):
+            agent.invoke_model(PROMPT, {"query": "hi"})
+    assert not agent.circuit_allows(agent.MODEL)
+    with pytest.raises(agent.ModelUnavailableError, match="circuit open"):
+        agent.invoke_model(PROMPT, {"query": "hi"})
+
+def test_cancelled_call_makes_no_attempt(models):
+    models[agent.MODEL] = lambda prompt: pytest.fail("model called after cancellation")
+    cancelled = threading.Event()
+    cancelled.set()
+    
+    with pytest.raises(agent.ModelUnavailableError):
+        agent.invoke_model(PROMPT, {"query": "hi"}, cancelled)
@@ -0,0 +1,80 @@
+"""
+Tests for running categorize and analyze_sentiment as parallel branches.
+"""
+import threading
+import time
+
+import pytest
+
+import langgraph_customer_support_agent as agent
+from support_classifier import SupportClassifier
+from support_faq import FAQIndex
+
+@pytest.fixture
+def model(monkeypatch):
+    """Fake invoke_model; set "category" and "sentiment" to functions of the cancel event."""
+    answers = {"category": lambda cancelled: "Technical", "sentiment": lambda cancelled: "Neutral"}
+    
+    def invoke_model(prompt, inputs, cancelled=None):
+        text = prompt.format(**inputs)
+        if "Categorize" in text:
+            return answers["category"](cancelled or threading.Event())
+        if "sentiment" in text:
+            return answers["sentiment"](cancelled or threading.Event())
+        return "Try restarting the router."
+    
+    monkeypatch.setattr(agent, "invoke_model", invoke_model)
+    monkeypatch.setattr(agent, "classifier", SupportClassifier())
+    monkeypatch.setattr(agent, "faq_index", FAQIndex())
+    monkeypatch.setattr(agent, "append_example", lambda *args, **kwargs: None)
+    return answers
+
+def test_classifiers_run_concurrently(model):
+    # Each branch waits for the other, so this only passes if both run at once
+    both_started = threading.Barrier(2, timeout=2)
+    
+    def after_barrier(label):
+        def answer(cancelled):
+            both_started.wait()
+            return label
+        return answer
+    
+    model["category"] = after_barrier("Technical")
+    model["sentiment"] = after_barrier("Neutral")
+    
+    result = agent.process_query("My router keeps disconnecting")
+    
+    assert (result["category"], result["sentiment"]) == ("Technical", "Neutral")
+    assert result["response"] == "Try restarting the router."
+    assert not result["escalated"]
+
+def test_negative_query_does_not_wait_for_its_category(model):
+    category_started = threading.Event()
+    category_cancelled = threading.Event()
+    
+    def slow_category(cancelled):
+        category_started.set()
+        cancelled.wait(5)
+        if cancelled.is_set():
+            category_cancelled.set()
+        return "Technical"
+    
+    model["category"] = slow_category
+    model["sentiment"] = lambda cancelled: category_started.wait(2) and "Negative"
+    
+    started = time.monotonic()
+    result = agent.process_query("This is the third time your service broke, I am furious")
+    
+    assert time.monotonic() - started < 2
+    assert result["escalated"] and result["category"] == "Unknown"
+    assert category_cancelled.wait(2)
+
+def test_category_is_kept_when_it_answers_first(model):
+    def slow_sentiment(cancelled):
+        time.sleep(0.2)
+        return "Negative"
+    
+    model["sentiment"] = slow_sentiment
+    result = agent.process_query("I was charged twice")
+    
+    assert result["escalated"] and result["category"] == "Technical"
@@ -0,0 +1,48 @@
+"""
+Tests for batch triage input handling and the labelled history it writes.
+"""
+import json
+import threading
+
+import langgraph_customer_support_agent as agent
+import support_batch
+from support_classifier import append_example, load_examples
+
+def test_tickets_without_a_text_query_are_skipped_and_counted(tmp_path, monkeypatch):
+    tickets = tmp_path / "tickets.jsonl"
+    tickets.write_text("\n".join([
+        json.dumps({"id": "a", "query": "My invoice is wrong"}),
+        json.dumps({"id": "b", "query": None}),
+        json.dumps({"id": "c", "query": 404}),
+        json.dumps({"id": "d", "query": ["not", "text"]}),
+        "{not json",
+        json.dumps({"id": "e", "text": "Reset my password"}),
+    ]) + "\n")
+    monkeypatch.setattr(agent, "process_query", lambda query, history: {
+        "category": "General", "sentiment": "Neutral", "response": f"re: {query}"
+    })
+    
+    counts = support_batch.run_batch(str(tickets), str(tmp_path / "results.jsonl"))
+    
+    results = [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+    assert sorted((result["ticket_id"], result["query"]) for result in results) == [
+        ("a", "My invoice is wrong"), ("c", "404"), ("e", "Reset my password")
+    ]
+    assert (counts["processed"], counts["no_query"], counts["malformed"]) == (3, 2, 1)
+
+def test_concurrent_history_writes_keep_lines_whole(tmp_path):
+    history = str(tmp_path / "history.jsonl")
+    
+    def label(worker):
+        for i in range(50):
+            append_example(f"worker {worker} query {i} " + "x" * 4000, "Billing", "Neutral", path=history)
+    
+    threads = [threading.Thread(target=label, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    lines = open(history, encoding="utf-8").read().splitlines()
+    assert len(lines) == 400
+    assert len(load_examples(history)) == 400
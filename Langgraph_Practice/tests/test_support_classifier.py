@@ -0,0 +1,37 @@
+"""
+Tests for training the local support query classifier.
+"""
+from support_classifier import MIN_EXAMPLES_PER_LABEL, SupportClassifier
+
+TEMPLATES = {
+    ("Technical", "Negative"): "the app keeps crashing on {} and I am furious",
+    ("Technical", "Neutral"): "how do I reset the router settings on {}",
+    ("Billing", "Neutral"): "when is the invoice for {} due",
+    ("Billing", "Positive"): "thanks for refunding my {} subscription quickly",
+    ("General", "Positive"): "great service, love the {} team",
+    ("General", "Neutral"): "what are your opening hours in {}",
+}
+PLACES = ["monday", "tuesday", "march", "april", "london", "paris", "berlin", "tokyo", "madrid", "rome"]
+
+def history(*pairs):
+    return [{"query": TEMPLATES[pair].format(place), "category": pair[0], "sentiment": pair[1]}
+            for pair in pairs for place in PLACES]
+
+def test_head_missing_a_label_falls_back_to_the_llm():
+    classifier = SupportClassifier(threshold=0.5)
+    report = classifier.train(history(("Technical", "Neutral"), ("Billing", "Neutral"), ("Billing", "Positive"),
+                                      ("General", "Positive"), ("General", "Neutral")))
+    
+    assert "Negative" in report["sentiment"]["skipped"]
+    assert report["sentiment"]["label_counts"]["Negative"] == 0
+    assert "sentiment" not in classifier.heads
+    assert classifier.predict("sentiment", "the app keeps crashing on friday and I am furious")[0] is None
+    assert classifier.predict("category", "when is the invoice for june due")[0] == "Billing"
+
+def test_head_is_trained_once_every_label_has_examples():
+    classifier = SupportClassifier(threshold=0.5)
+    report = classifier.train(history(*TEMPLATES))
+    
+    assert "skipped" not in report["sentiment"]
+    assert min(report["sentiment"]["label_counts"].values()) >= MIN_EXAMPLES_PER_LABEL
+    assert classifier.predict("sentiment", "the app keeps crashing on friday and I am furious")[0] == "Negative"
@@ -0,0 +1,79 @@
+"""
+Tests for clustering past queries into FAQs and calibrating the match threshold.
+"""
+import itertools
+
+from support_faq import FAQIndex
+
+QUESTIONS = {
+    "Update your card under Settings > Billing > Payment method.": [
+        "how do I update my credit card", "how can I update my credit card", "how do I change my credit card"
+    ],
+    "Use the Forgot password link on the sign-in page to reset it.": [
+        "how do I reset my password", "how can I reset my password", "how to reset my password"
+    ],
+    "Invoices are under Settings > Billing > Invoices.": [
+        "where can I find my invoices", "where do I find my invoices", "where can I see my invoice"
+    ],
+    "Open Settings > Account and choose Delete account.": [
+        "how do I delete my account", "how can I delete my account", "how do I close my account"
+    ],
+}
+PREFIXES = ["", "hi ", "hello, ", "please tell me ", "good morning, "]
+SUFFIXES = ["", "?", " please", " thanks", " asap"]
+# Phrasings are indexed with half of the prefix and suffix combinations; the other half is held out
+TRAINING = [(prefix, suffix) for (i, prefix), (j, suffix) in itertools.product(enumerate(PREFIXES), enumerate(SUFFIXES))
+            if (i + j) % 2 == 0]
+HELD_OUT = [(prefix, suffix) for prefix, suffix in itertools.product(PREFIXES, SUFFIXES)
+            if (prefix, suffix) not in TRAINING]
+
+def pairs():
+    return [
+        {"query": f"{prefix}{question}{suffix}", "response": response, "category": "General"}
+        for response, questions in QUESTIONS.items()
+        for question, (prefix, suffix) in itertools.product(questions, TRAINING)
+        for _ in range(2)
+    ]
+
+def test_paraphrases_cluster_into_one_faq_per_question():
+    index = FAQIndex.build(pairs())
+    
+    assert len(index.answers) == len(QUESTIONS)
+    assert sorted(answer["response"] for answer in index.answers) == sorted(QUESTIONS)
+
+def test_calibrated_threshold_serves_held_out_paraphrases():
+    index = FAQIndex.build(pairs())
+    assert index.calibration["calibrated"]
+    assert index.calibration["recall"] >= 0.8
+    
+    served = correct = total = 0
+    for response, questions in QUESTIONS.items():
+        for question, (prefix, suffix) in itertools.product(questions, HELD_OUT):
+            total += 1
+            found = index.match(f"{prefix}{question}{suffix}")
+            if found is not None:
+                served += 1
+                correct += found[0]["response"] == response
+    assert served / total >= 0.8
+    assert correct == served
+
+def test_unrelated_questions_are_not_served():
+    index = FAQIndex.build(pairs())
+    
+    assert index.match("what time does your store open on sundays") is None
+    assert index.match("my parcel arrived damaged") is None
+
+def test_threshold_keeps_the_minimum_recall_when_precision_is_out_of_reach():
+    index = FAQIndex.build(pairs())
+    held_out = [{"query": f"{prefix}{question}{suffix}", "response": response}
+                for response, questions in QUESTIONS.items()
+                for question, (prefix, suffix) in itertools.product(questions, HELD_OUT)]
+    # Exact repeats of indexed questions that were answered differently score highest
+    held_out += [{"query": questions[0], "response": "Please call our support line."}
+                 for questions in QUESTIONS.values()]
+    
+    calibration = index.calibrate(held_out, target_precision=0.99, min_recall=0.8)
+    
+    assert calibration["precision"] < 0.99
+    assert calibration["recall"] >= 0.8
+    assert calibration["threshold"] < 1.0
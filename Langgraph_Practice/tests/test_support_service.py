@@ -0,0 +1,63 @@
+"""
+Tests for the per-thread conversation storage of SupportService.
+"""
+import pytest
+
+import langgraph_customer_support_agent as agent
+from support_service import SupportService
+
+ANSWER = "Try restarting the router. " * 80  # About 2 KB per turn
+
+def fake_model(prompt, inputs, cancelled=None):
+    text = prompt.format(**{name: inputs.get(name, "") for name in prompt.input_variables})
+    if "Categorize" in text:
+        return "Technical"
+    if "sentiment" in text:
+        return "Neutral"
+    return ANSWER
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent, "invoke_model", fake_model)
+    monkeypatch.setattr(agent, "append_example", lambda *args, **kwargs: None)
+    service = SupportService(str(tmp_path / "threads.sqlite"))
+    yield service
+    service.close()
+
+def stored_bytes(service, thread_id):
+    with service.checkpointer.cursor(transaction=False) as cursor:
+        checkpoints, size = cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(checkpoint)), 0) FROM checkpoints WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        writes = cursor.execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes WHERE thread_id = ?", (thread_id,)
+        ).fetchone()[0]
+    return checkpoints, size + writes
+
+def test_full_history_is_kept_while_checkpoints_stay_bounded(service):
+    for turn in range(10):
+        service.handle("customer-1", f"My router fails, attempt {turn}")
+    after_ten = stored_bytes(service, "customer-1")
+    for turn in range(10, 30):
+        service.handle("customer-1", f"My router fails, attempt {turn}")
+    after_thirty = stored_bytes(service, "customer-1")
+    
+    history = service.history("customer-1")
+    assert [turn["query"] for turn in history] == [f"My router fails, attempt {turn}" for turn in range(30)]
+    assert history[-1]["response"] == ANSWER
+    assert [turn["query"] for turn in service.history("customer-1", last=2)] == [
+        "My router fails, attempt 28", "My router fails, attempt 29"
+    ]
+    
+    assert after_thirty[0] == after_ten[0] == 1
+    assert after_thirty[1] < after_ten[1] * 1.2
+    state = service.graph.get_state({"configurable": {"thread_id": "customer-1"}})
+    assert len(state.values["conversation_history"]) == agent.HISTORY_WINDOW
+
+def test_threads_are_pruned_independently(service):
+    service.handle("customer-1", "My router fails")
+    service.handle("customer-2", "My router fails too")
+    service.handle("customer-1", "Still failing")
+    
+    assert stored_bytes(service, "customer-1")[0] == stored_bytes(service, "customer-2")[0] == 1
+    assert [turn["query"] for turn in service.history("customer-2")] == ["My router fails too"]